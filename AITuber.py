@@ -9,36 +9,95 @@ import argparse
 import json
 import re
 import time
-import queue
+import itertools
 import random
 import threading
 import traceback
+import queue
+from concurrent.futures import Future
 from time import sleep
 from pathlib import Path
 from datetime import datetime
 
-import numpy as np
-import sounddevice as sd
-import google.generativeai as genai
-from dotenv import load_dotenv
+from streaming_tts import StreamingTTSPipeline, iter_response_text
+from tts_cache import TTSAudioCache
+from tts_warmup import TTSWarmup
+from keyword_matcher import KeywordMatcher, build_response_matcher
+from config_store import ConfigStore
+from conversation_logger import ConversationLogger
+from script_prefetch import ParagraphPrefetcher, load_checkpoint, save_checkpoint, clear_checkpoint
+from script_render import render_script, split_paragraphs
+from chat_history import ChatHistoryManager, ManagedChatSession, make_model_summarizer
+from providers import LLM_PROVIDERS, TTS_PROVIDERS, create_llm, create_tts
+from latency_metrics import LatencyRecorder, start_metrics_server
+# numpy・sounddevice・asyncio・google.generativeai を使うモジュールは、起動を速くするため使う時点で読み込む
+# (audio_playback, conversation_core, chat_ingest, question_batcher, response_cache)
 
 
 # モジュール検索パスにカレントディレクトリを追加
 sys.path.append(os.getcwd())
 
-# WindowsのコンソールでUnicode文字が正しく表示されるように標準出力をUTF-8に設定
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-
 # コマンドライン引数の処理
-def parse_arguments():
+def parse_arguments(argv=None):
+    """コマンドライン引数を解析します。
+
+    Args:
+        argv (list, optional): 解析する引数のリスト。省略時は `sys.argv[1:]`
+
+    Returns:
+        argparse.Namespace: 解析結果
+    """
     parser = argparse.ArgumentParser(description='AITuberシステム')
     parser.add_argument('--language', type=str, choices=['ja', 'en', 'es'], default='ja',
                         help='AITuberが使用する言語 (ja: 日本語, en: 英語, es: スペイン語)')
-    parser.add_argument('--mode', type=str, choices=['interactive', 'script'], default=None,
-                        help='動作モード (interactive: インタラクティブモード, script: 原稿読み上げモード)')
+    parser.add_argument('--mode', type=str, choices=['interactive', 'script', 'render'], default=None,
+                        help='動作モード (interactive: インタラクティブモード, script: 原稿読み上げモード, '
+                             'render: 原稿を音声ファイルに一括レンダリング)')
     parser.add_argument('--script-dir', type=str, default='scripts',
                         help='原稿ファイルが格納されているディレクトリパス')
-    return parser.parse_args()
+    parser.add_argument('--script-file', type=str, action='append', default=None,
+                        help='レンダリングする原稿ファイル (複数指定可)。省略時は --script-dir 内のすべての .txt')
+    parser.add_argument('--render-dir', type=str, default='renders',
+                        help='レンダリング結果の出力ディレクトリ')
+    parser.add_argument('--render-format', type=str, choices=['wav', 'opus'], default='wav',
+                        help='段落ごとの音声ファイルの形式 (opus は pydub と ffmpeg が必要)')
+    parser.add_argument('--render-workers', type=int, default=4,
+                        help='レンダリングで同時に音声合成するスレッド数')
+    parser.add_argument('--render-rpm', type=float, default=10,
+                        help='レンダリングでのTTS APIの1分あたりの最大リクエスト数 (0で無制限)')
+    parser.add_argument('--force-render', action='store_true',
+                        help='最新の段落も含めてすべて合成し直す')
+    parser.add_argument('--prefetch', type=int, default=2,
+                        help='原稿読み上げモードで、再生中の段落より先に音声合成しておく段落数')
+    parser.add_argument('--prefetch-workers', type=int, default=2,
+                        help='原稿読み上げモードで、同時に音声合成するスレッド数')
+    parser.add_argument('--prefetch-max-mb', type=float, default=64,
+                        help='原稿読み上げモードで、先読みした未再生の音声の合計の上限 (MB)')
+    parser.add_argument('--resume', action='store_true',
+                        help='原稿読み上げモードで、前回中断した段落から再開する')
+    parser.add_argument('--start-paragraph', type=int, default=None,
+                        help='原稿読み上げモードで、指定した段落番号 (1始まり) から読み上げる')
+    parser.add_argument('--streaming-tts', action='store_true',
+                        help='応答をストリーミングで受け取り、文単位で音声合成しながら再生する')
+    parser.add_argument('--async-core', action='store_true',
+                        help='インタラクティブモードをasyncioの会話コアで動かす (新しい入力で再生中の応答を打ち切る)')
+    parser.add_argument('--chat-http', type=int, default=None, metavar='PORT',
+                        help='視聴者コメントを受け取るローカルHTTPエンドポイント (POST /chat) のポート')
+    parser.add_argument('--chat-replay', type=str, default=None, metavar='PATH',
+                        help='視聴者コメントとして再生するJSONLファイル')
+    parser.add_argument('--chat-replay-interval', type=float, default=2.0,
+                        help='JSONLにtimestampがない場合のコメントの送信間隔 (秒)')
+    parser.add_argument('--llm-provider', type=str, choices=sorted(LLM_PROVIDERS), default=None,
+                        help='対話に使うLLMプロバイダー (省略時は config.local.json の providers.llm.name、既定は gemini)')
+    parser.add_argument('--tts-provider', type=str, choices=sorted(TTS_PROVIDERS), default=None,
+                        help='音声合成に使うTTSプロバイダー (省略時は config.local.json の providers.tts.name、既定は gemini)')
+    parser.add_argument('--metrics-port', type=int, default=None, metavar='PORT',
+                        help='遅延の集計をPrometheus形式で返すHTTPエンドポイント (GET /metrics) のポート')
+    parser.add_argument('--warmup', action='store_true',
+                        help='起動時に挨拶・自己紹介・特殊応答をバックグラウンドで事前に音声合成する')
+    parser.add_argument('--warmup-workers', type=int, default=4,
+                        help='ウォームアップで同時に音声合成するスレッド数')
+    return parser.parse_args(argv)
 
 
 
@@ -46,54 +105,21 @@ def parse_arguments():
 CONFIG_FILE_PATH = "config.local.json"  # ローカル設定ファイル
 RESPONSE_PATTERNS_FILE_PATH = "response_patterns.json" # 特殊応答パターンファイル
 LOG_DIR = "logs"  # ログディレクトリ
+SCRIPT_CHECKPOINT_PATH = os.path.join(LOG_DIR, "script_progress.json")  # 原稿読み上げの再生位置
 
-# --- 設定ファイルの読み込み --- #
+# --- 設定 (load_config() で config.local.json とコマンドライン引数から設定される) --- #
+args = None  # コマンドライン引数 (argparse.Namespace)
+config_data = {}  # config.local.json の内容
+config_store = None  # config.local.json を一度だけ解析して保持するストア (テンプレートの取得にも使う)
 GEMINI_API_KEY = None
 AUDIO_OUTPUT_DEVICE_INDEX = None  # 音声出力デバイスのインデックス
-
-try:
-    with open(CONFIG_FILE_PATH, "r", encoding="utf-8") as f:
-        config_data = json.load(f)
-    
-    # Gemini APIキーの読み込み
-    GEMINI_API_KEY = config_data.get("gemini_api_key")
-    if GEMINI_API_KEY:
-        print("Gemini APIキーを config.local.json から正常に読み込みました。")
-        try:
-            genai.configure(api_key=GEMINI_API_KEY)
-            print("Gemini APIクライアントを正常に初期化しました。")
-        except Exception as e:
-            print(f"エラー: Gemini APIクライアントの初期化に失敗しました: {e}")
-    else:
-        print("警告: config.local.json に Gemini APIキーが見つかりません。")
-    
-    # 音声出力デバイスの設定読み込み
-    AUDIO_OUTPUT_DEVICE_INDEX = config_data.get("audio_output_device_index")
-    if AUDIO_OUTPUT_DEVICE_INDEX is not None:
-        print(f"音声出力デバイスインデックスを設定しました: {AUDIO_OUTPUT_DEVICE_INDEX}")
-except FileNotFoundError:
-    print(f"エラー: 設定ファイル {CONFIG_FILE_PATH} が見つかりません。プログラムを終了します。")
-    exit()
-except ValueError as e:
-    print(e)
-    print("プログラムを終了します。")
-    exit()
-except json.JSONDecodeError:
-    print(f"エラー: {CONFIG_FILE_PATH} のJSON形式が正しくありません。プログラムを終了します。")
-    exit()
-
-# --- 標準ライブラリ・外部ライブラリのインポート --- #
-
-
-
-
+TTS_CACHE_SETTINGS = {}  # TTS音声キャッシュの設定 (enabled, directory, max_mb)
+RESPONSE_CACHE_SETTINGS = {}  # AI応答キャッシュの設定 (enabled, path, ttl_hours, max_entries)
+PROVIDER_SETTINGS = {}  # LLM・TTSプロバイダーの設定 (llm, tts)
+LATENCY_SETTINGS = {}  # 遅延の計測の設定 (window, log_turns, prometheus_port)
 
 LOG_FILE_PATH = os.path.join(LOG_DIR, "conversation_log.txt")  # 会話ログファイルのフルパス
 
-# --- ログディレクトリの準備 --- #
-if not os.path.exists(LOG_DIR):
-    os.makedirs(LOG_DIR) # ログディレクトリが存在しない場合は作成
-
 # --- グローバル変数 (言語設定など) --- #
 # 対応言語の定義
 SUPPORTED_LANGUAGES_MAP = {  # アプリケーション内部で使用する言語コードとBCP47コードのマッピング
@@ -102,20 +128,11 @@ SUPPORTED_LANGUAGES_MAP = {  # アプリケーション内部で使用する言
     "es": "es-ES"
 }
 
-# コマンドライン引数を解析
-args = parse_arguments()
-
-# コマンドライン引数から言語設定を取得
-TARGET_LANGUAGE = args.language  # AITuberが使用する言語コード (デフォルト: 日本語、起動時引数で変更可能)
+TARGET_LANGUAGE = "ja"  # AITuberが使用する言語コード (デフォルト: 日本語、起動時引数で変更可能)
+TARGET_LANGUAGE_BCP47 = "ja-JP"  # AITuberが使用する言語のBCP47コード
 
-# 言語コードからBCP47コードを設定
-if TARGET_LANGUAGE in SUPPORTED_LANGUAGES_MAP:
-    TARGET_LANGUAGE_BCP47 = SUPPORTED_LANGUAGES_MAP[TARGET_LANGUAGE]  # AITuberが使用する言語のBCP47コード
-else:
-    TARGET_LANGUAGE_BCP47 = "ja-JP"  # 不正な言語コードの場合は日本語を使用
-
-# コマンドライン引数から動作モードを取得
-SELECTED_MODE = args.mode  # コマンドライン引数で指定された動作モード
+SELECTED_MODE = None  # コマンドライン引数で指定された動作モード
+STREAMING_TTS = False  # 文単位ストリーミングTTSを使用するかどうか
 LANGUAGE_NAMES = {  # 各言語コードに対応する表示名
     "ja": "Japanese",
     "en": "English",
@@ -149,6 +166,7 @@ def get_template(template_key, language_code="ja-JP"):
     """config.local.json から指定されたキーと言語に対応するテンプレート文字列を取得します。
 
     指定された言語のテンプレートが存在しない場合は、デフォルト言語（日本語）のテンプレートを返します。
+    ファイルは毎回読み込まず、`config_store` がメモリ上に保持している内容から取得します。
 
     Args:
         template_key (str): 取得したいテンプレートのキー。
@@ -158,55 +176,34 @@ def get_template(template_key, language_code="ja-JP"):
     Returns:
         str or None: テンプレート文字列。見つからない場合はNone。
     """
-    # print(f"DEBUG: get_template called with template_key: {template_key}, language_code: {language_code}") # デバッグ用
-    try:
-        with open(CONFIG_FILE_PATH, "r", encoding="utf-8") as f:
-            config = json.load(f)
-
-        # config.local.json の languages セクションのキーは 'ja', 'en' のような短縮形
-        # language_code (BCP47) から短縮形コードを取得
-        short_lang_code = None
-        for k, v in SUPPORTED_LANGUAGES_MAP.items():
-            if v == language_code:
-                short_lang_code = k
-                break
-
-        # デフォルト言語（日本語）の短縮コードを取得
-        default_short_lang_code = [k for k, v in SUPPORTED_LANGUAGES_MAP.items() if v == "ja-JP"][0]
-
-        # 1. 指定された言語のテンプレートを試みる
-        if short_lang_code:
-            lang_specific_templates = config.get("languages", {}).get(short_lang_code, {}).get("templates", {})
-            template = lang_specific_templates.get(template_key)
-            if template is not None: # 空文字列も有効なテンプレートとして扱うため is not None でチェック
-                # print(f"DEBUG: Template found for '{template_key}' in '{short_lang_code}': {template}")
-                return template
-            # print(f"DEBUG: Template NOT found for '{template_key}' in '{short_lang_code}', falling back to default language.")
+    return config_store.get_template(template_key, language_code)
 
-        # 2. デフォルト言語（日本語）のテンプレートを試みる (フォールバック)
-        default_lang_templates = config.get("languages", {}).get(default_short_lang_code, {}).get("templates", {})
-        default_template = default_lang_templates.get(template_key)
-        if default_template is not None:
-            # print(f"DEBUG: Returning default template for '{template_key}': {default_template}")
-            return default_template
+# --- 自己紹介リクエストの判定 --- #
+_intro_trigger_matchers = {}  # 言語コード -> (設定のバージョン, 自己紹介トリガーのKeywordMatcher)
 
-        # print(f"DEBUG: Template for '{template_key}' not found in specified or default language.")
-        return None  # どちらの言語にもテンプレートが見つからない場合
+def _get_intro_trigger_matcher(language_code):
+    """指定された言語の自己紹介トリガーフレーズをコンパイルしたマッチャーを返します。
 
-    except FileNotFoundError:
-        print(f"エラー: 設定ファイル '{CONFIG_FILE_PATH}' が見つかりません。テンプレートを取得できませんでした。")
-        return None
-    except json.JSONDecodeError:
-        print(f"エラー: 設定ファイル '{CONFIG_FILE_PATH}' のJSON形式が正しくありません。テンプレートを取得できませんでした。")
-        return None
+    トリガーフレーズは `get_template` 経由で取得し、設定ファイルが更新されるまで再利用します。
+    """
+    version = config_store.version
+    cached = _intro_trigger_matchers.get(language_code)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    # get_template はリストを返すことを想定 (config.local.json の templates セクションで定義)
+    trigger_phrases = get_template("self_introduction_triggers", language_code)
+    matcher = KeywordMatcher()
+    if isinstance(trigger_phrases, list): # trigger_phrases がリストであることを確認
+        matcher.add_group(trigger_phrases, payload=True)
+    _intro_trigger_matchers[language_code] = (version, matcher.build())
+    return matcher
 
-# --- 自己紹介リクエストの判定 --- #
 def is_self_introduction_request(text):
     """ユーザーの入力テキストが自己紹介のリクエストかどうかを判定します。
 
     判定には、現在のAITuberの言語設定 (`TARGET_LANGUAGE_BCP47`) に基づいて
     `config.local.json` から取得した自己紹介トリガーフレーズを使用します。
-    トリガーフレーズは `get_template` 関数経由で取得されます。
+    トリガーフレーズは `get_template` 関数経由で取得し、マッチャーにコンパイルして再利用します。
 
     Args:
         text (str): ユーザーの入力テキスト。
@@ -214,20 +211,8 @@ def is_self_introduction_request(text):
     Returns:
         bool: 自己紹介のリクエストであればTrue、そうでなければFalse。
     """
-    # print(f"DEBUG: is_self_introduction_request called with text: {text}") # デバッグ用
-    trigger_phrases_key = "self_introduction_triggers"
-    # get_template はリストを返すことを想定 (config.local.json の templates セクションで定義)
-    trigger_phrases = get_template(trigger_phrases_key, TARGET_LANGUAGE_BCP47)
-
-    # print(f"DEBUG: Self-introduction trigger phrases for {TARGET_LANGUAGE_BCP47}: {trigger_phrases}") # デバッグ用
-
-    if isinstance(trigger_phrases, list): # trigger_phrases がリストであることを確認
-        for phrase in trigger_phrases:
-            if isinstance(phrase, str) and phrase.lower() in text.lower(): # phraseが文字列であることも確認し、部分一致で判定
-                # print(f"DEBUG: Self-introduction request detected with phrase: {phrase}") # デバッグ用
-                return True
-    # print(f"DEBUG: No self-introduction request detected or trigger phrases are not a list/valid.") # デバッグ用
-    return False
+    # 部分一致・大文字小文字を区別せずに判定
+    return bool(_get_intro_trigger_matcher(TARGET_LANGUAGE_BCP47).match(text))
 
 # --- 特殊応答の確認 --- #
 def check_special_response(text, patterns_data):
@@ -235,11 +220,12 @@ def check_special_response(text, patterns_data):
 
     一致した場合、対応する応答文字列を返します。
     `patterns_data` は `load_response_patterns()` 関数によって `response_patterns.json` から読み込まれた
-    辞書型のデータであることを想定しています。
+    辞書型のデータ、または `build_response_matcher()` でコンパイル済みのマッチャーであることを想定しています。
+    毎ターン呼び出す場合は、起動時に一度だけコンパイルしたマッチャーを渡してください。
 
     Args:
         text (str): ユーザーの入力テキスト。
-        patterns_data (dict): 特殊応答パターンが格納された辞書。
+        patterns_data (dict or KeywordMatcher): 特殊応答パターンが格納された辞書、またはコンパイル済みのマッチャー。
                               期待される構造:
                               {
                                   "patterns": [
@@ -255,79 +241,120 @@ def check_special_response(text, patterns_data):
         str or None: 一致する応答が見つかればその応答文字列。見つからない場合や、
                      `patterns_data` が不正な場合はNone。
     """
-    # print(f"DEBUG: check_special_response called with text: '{text}'") # デバッグ用
-    if not patterns_data or not isinstance(patterns_data.get("patterns"), list):
-        # print("DEBUG: patterns_data is empty, None, or 'patterns' key is not a list. Skipping special response check.")
-        return None
-
-    for pattern_group in patterns_data["patterns"]:
-        if not isinstance(pattern_group, dict):
-            # print(f"DEBUG: Skipping invalid pattern_group (not a dict): {pattern_group}")
-            continue  # パターングループが辞書でない場合はスキップ
-
-        keywords = pattern_group.get("keywords", [])
-        response_text = pattern_group.get("response", "") # 変数名を response から response_text に変更
-
-        # print(f"DEBUG: Checking keywords: {keywords} for response: {response_text}")
-
-        if not isinstance(keywords, list) or not keywords: # キーワードがリストでない、または空の場合はスキップ
-            # print(f"DEBUG: Skipping pattern_group due to invalid or empty keywords: {keywords}")
-            continue
-
-        # キーワードのいずれかがテキストに含まれているか確認（大文字・小文字を区別しない、部分一致）
-        if any(isinstance(keyword, str) and keyword.lower() in text.lower() for keyword in keywords):
-            # print(f"DEBUG: Special response triggered by keywords: {keywords}")
-            if isinstance(response_text, str):
-                return response_text
-            else:
-                # print(f"DEBUG: Invalid response_text type (not a string) for triggered keywords: {keywords}, response_text: {response_text}")
-                return None # 応答が文字列でない場合はNoneを返す
-
-    # print("DEBUG: No special response triggered.")
-    return None
+    if isinstance(patterns_data, KeywordMatcher):
+        matcher = patterns_data
+    else:
+        matcher = build_response_matcher(patterns_data)
+    # キーワードのいずれかがテキストに含まれているか確認（大文字・小文字を区別しない、部分一致）
+    # 複数のパターンに一致する場合はファイル内で先に定義されたパターンを優先する
+    return matcher.match(text)
 
 # --- グローバル設定の読み込み --- #
-# スクリプトのトップレベルで一度だけ実行され、主にデフォルト言語での初期設定を行う。
-# main()関数内では、コマンドライン引数に基づいて再度設定が読み込まれ、これらの値は上書きされる可能性がある。
+# load_config() で、コマンドライン引数で指定された言語の設定に上書きされる。
 character_name = "AITuber"  # デフォルトのキャラクター名
 persona = "あなたは親切なAIアシスタントです。"  # デフォルトのペルソナ
 greeting = "こんにちは！"  # デフォルトの挨拶
 guidelines = []  # デフォルトのガイドライン (空のリスト)
 full_persona = persona # ペルソナとガイドラインを結合したもの
 
-try:
-    with open(CONFIG_FILE_PATH, "r", encoding="utf-8") as f:
-        config_data_global = json.load(f) # グローバルスコープ用の変数名
+def load_config(cli_args=None):
+    """コマンドライン引数と config.local.json を読み込み、グローバル設定に反映します。
+
+    モジュールの読み込み時には何もしないため、起動時 (`main()`) やベンチマークから一度だけ呼び出します。
+    config.local.json の解析は `config_store` による1回だけで、ここでの設定とテンプレートの取得で共有します。
+    Gemini APIクライアントの初期化はここでは行わず、最初に使うとき (`configure_gemini()`) に行います。
+
+    Args:
+        cli_args (argparse.Namespace, optional): 解析済みのコマンドライン引数。省略時は `sys.argv` を解析します。
+
+    Returns:
+        argparse.Namespace: コマンドライン引数
+    """
+    global args, config_data, config_store, GEMINI_API_KEY, AUDIO_OUTPUT_DEVICE_INDEX
+    global TTS_CACHE_SETTINGS, RESPONSE_CACHE_SETTINGS, PROVIDER_SETTINGS, LATENCY_SETTINGS
+    global TARGET_LANGUAGE, TARGET_LANGUAGE_BCP47, SELECTED_MODE, STREAMING_TTS
+    global character_name, persona, greeting, guidelines, full_persona
+
+    args = cli_args if cli_args is not None else parse_arguments()
+    TARGET_LANGUAGE = args.language
+    TARGET_LANGUAGE_BCP47 = SUPPORTED_LANGUAGES_MAP.get(TARGET_LANGUAGE, "ja-JP")  # 不正な言語コードの場合は日本語を使用
+    SELECTED_MODE = args.mode
+    STREAMING_TTS = args.streaming_tts
+
+    if not os.path.exists(CONFIG_FILE_PATH):
+        print(f"エラー: 設定ファイル {CONFIG_FILE_PATH} が見つかりません。プログラムを終了します。")
+        exit()
+    # config.local.json は一度だけ解析してメモリに保持し、ファイルが更新されたときだけ読み直す
+    config_store = ConfigStore(CONFIG_FILE_PATH, SUPPORTED_LANGUAGES_MAP, default_language="ja-JP")
+    if config_store.version == 0:
+        print("プログラムを終了します。")  # JSON形式のエラーは ConfigStore が表示済み
+        exit()
+    config_data = config_store.data
+
+    # Gemini APIキーの読み込み
+    GEMINI_API_KEY = config_data.get("gemini_api_key")
+    if GEMINI_API_KEY:
+        print("Gemini APIキーを config.local.json から正常に読み込みました。")
+    else:
+        print("警告: config.local.json に Gemini APIキーが見つかりません。")
+
+    # 音声出力デバイスの設定読み込み
+    AUDIO_OUTPUT_DEVICE_INDEX = config_data.get("audio_output_device_index")
+    if AUDIO_OUTPUT_DEVICE_INDEX is not None:
+        print(f"音声出力デバイスインデックスを設定しました: {AUDIO_OUTPUT_DEVICE_INDEX}")
+
+    # TTS音声キャッシュ・AI応答キャッシュなどの設定読み込み
+    TTS_CACHE_SETTINGS = config_data.get("tts_cache", {})
+    RESPONSE_CACHE_SETTINGS = config_data.get("response_cache", {})
+    PROVIDER_SETTINGS = config_data.get("providers", {})
+    LATENCY_SETTINGS = config_data.get("latency_metrics", {})
+
+    # ログディレクトリが存在しない場合は作成
+    os.makedirs(LOG_DIR, exist_ok=True)
 
-    # デバッグ情報を追加
-    print(f"デバッグ: コマンドライン引数で指定された言語: {TARGET_LANGUAGE}")
-    
     # コマンドライン引数から指定された言語の設定を読み込む
-    selected_lang_settings = config_data_global.get("languages", {}).get(TARGET_LANGUAGE, {})
-    print(f"デバッグ: 選択された言語設定の存在: {bool(selected_lang_settings)}")
-    
+    selected_lang_settings = config_data.get("languages", {}).get(TARGET_LANGUAGE, {})
     # 設定が存在しない場合はデフォルト言語(日本語 'ja')にフォールバック
     if not selected_lang_settings:
-        selected_lang_settings = config_data_global.get("languages", {}).get("ja", {})
+        selected_lang_settings = config_data.get("languages", {}).get("ja", {})
         print(f"警告: {TARGET_LANGUAGE} の設定が見つからないため、日本語設定を使用します。")
-    
+
     character_name = selected_lang_settings.get("character_name", character_name)
     persona = selected_lang_settings.get("persona", persona)
     greeting = selected_lang_settings.get("greeting", greeting)
     guidelines = selected_lang_settings.get("guidelines", guidelines)
-    
-    print(f"デバッグ: 設定された character_name: {character_name}")
-    print(f"デバッグ: 設定された persona の先頭部分: {persona[:30]}...")
 
     full_persona = persona
     if guidelines: # ガイドラインが存在する場合のみ結合
         full_persona += "\n\nガイドライン:\n- " + "\n- ".join(guidelines)
     print(f"情報: {CONFIG_FILE_PATH} から {LANGUAGE_NAMES.get(TARGET_LANGUAGE, TARGET_LANGUAGE)} 設定を読み込みました。")
+    return args
+
+_gemini_configured = None  # genai.configure() の結果 (None: 未実行)
+_gemini_lock = threading.Lock()
 
-except (FileNotFoundError, json.JSONDecodeError) as e:
-    print(f"警告: 設定ファイル '{CONFIG_FILE_PATH}' が見つかりません、またはJSON形式が正しくありません。グローバル設定にはデフォルト値を使用します。 Error: {e}")
-    # character_name, persona, greeting, guidelines は既にデフォルト値が設定されているため、ここでは何もしない
-    # (既に定義済みのデフォルト値が使用される)
+def configure_gemini():
+    """google.generativeai を読み込み、APIキーを設定します。2回目以降は何もしません。
+
+    SDKの読み込みには時間がかかるため、起動時ではなくGeminiのモデルを最初に作るとき
+    (またはバックグラウンドの事前初期化 `start_client_warmup()`) に呼び出します。
+
+    Returns:
+        bool: 設定できた場合はTrue
+    """
+    global _gemini_configured
+    with _gemini_lock:
+        if _gemini_configured is None:
+            _gemini_configured = False
+            if GEMINI_API_KEY:
+                try:
+                    import google.generativeai as genai
+                    genai.configure(api_key=GEMINI_API_KEY)
+                    print("Gemini APIクライアントを正常に初期化しました。")
+                    _gemini_configured = True
+                except Exception as e:
+                    print(f"エラー: Gemini APIクライアントの初期化に失敗しました: {e}")
+        return _gemini_configured
 
 # --- Google Cloud Platform (GCP) 関連 --- #
 
@@ -374,42 +401,129 @@ def get_gcp_voice_name(language_code="ja-JP"):
         return "ja-JP-Neural2-B"  # デフォルトは日本語女性音声
 
 # --- ログ関連関数 --- #
-import os
-import datetime
+_conversation_logger = None  # 会話ログライター (get_conversation_logger() で遅延初期化)
 
-def log_to_file(speaker, message, language=""):
+def get_conversation_logger():
+    """会話ログをバックグラウンドで書き込むロガーを返します。
+
+    `config.local.json` の `conversation_log` で、フラッシュ間隔 (`flush_interval` 秒) と
+    構造化ログ (`jsonl`) の出力を設定できます。
+
+    Returns:
+        ConversationLogger: 会話ログライター
+    """
+    global _conversation_logger
+    if _conversation_logger is None:
+        settings = config_data.get("conversation_log", {})
+        _conversation_logger = ConversationLogger(
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs"),
+            flush_interval=settings.get("flush_interval", 1.0),
+            jsonl=settings.get("jsonl", False),
+        )
+    return _conversation_logger
+
+def log_to_file(speaker, message, language="", **fields):
     """会話内容をログファイルに記録します。
     
+    書き込みはバックグラウンドのスレッドで行われるため、この関数はすぐに戻ります。
+    
     Args:
         speaker (str): 発言者名
         message (str): メッセージ内容
         language (str, optional): 言語コードや言語名。デフォルトは空文字列。
+        **fields: 構造化ログ (JSONL) に追加する項目。応答時間などの計測値を渡します。
     """
     try:
-        # ログディレクトリの確認と作成
-        log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        
-        # 日付フォーマットのファイル名を作成
-        today = datetime.datetime.now().strftime("%Y-%m-%d")
-        log_file = os.path.join(log_dir, f"conversation_{today}.log")
-        
-        # 現在時刻を取得
-        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        
-        # 言語情報があれば追加
-        lang_info = f" ({language})" if language else ""
-        
-        # ログメッセージのフォーマット
-        log_message = f"[{timestamp}] {speaker}{lang_info}: {message}\n\n"
-        
-        # ファイルに追記
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(log_message)
+        get_conversation_logger().log(speaker, message, language, **fields)
     except Exception as e:
         # ログ書き込みエラーはプログラム全体に影響しないようにする
         print(f"警告: ログ書き込みエラー: {e}")
 
+# --- 遅延の計測 --- #
+_latency_recorder = None  # 遅延の集計 (get_latency_recorder() で遅延初期化)
+
+def _log_latency_record(record):
+    spans = record["spans"]
+    summary = " / ".join(f"{name} {spans[name]:.2f}s" for name in ("time_to_first_audio", "turn_total") if name in spans)
+    log_to_file("Latency", summary, record["kind"], turn=record["turn"], stages=record["stages"], **spans)
+
+def get_latency_recorder():
+    """ターンごとの遅延の集計を返します。
+
+    `config.local.json` の `latency_metrics` で、パーセンタイルの計算に使う直近のターン数 (`window`) と、
+    ターンごとの記録を会話ログに書き込むかどうか (`log_turns`) を設定できます。
+
+    Returns:
+        LatencyRecorder: 遅延の集計
+    """
+    global _latency_recorder
+    if _latency_recorder is None:
+        _latency_recorder = LatencyRecorder(
+            window=LATENCY_SETTINGS.get("window", 500),
+            on_record=_log_latency_record if LATENCY_SETTINGS.get("log_turns", True) else None,
+        )
+    return _latency_recorder
+
+_finish_queue = None  # 再生の終了後に集計するターン (集計用のスレッドが取り出す)
+_finish_queue_lock = threading.Lock()
+
+def _finish_worker(turns):
+    while True:
+        timer = turns.get()
+        if isinstance(timer, threading.Event):
+            timer.set()  # wait_for_finished_turns() の目印
+            continue
+        try:
+            get_latency_recorder().finish(timer)
+        except Exception as e:
+            print(f"警告: 遅延の集計中にエラーが発生しました: {e}")
+
+def get_finish_queue():
+    """再生の終了後にターンを集計するキューを返します (初回に集計用のスレッドを開始します)。"""
+    global _finish_queue
+    with _finish_queue_lock:
+        if _finish_queue is None:
+            _finish_queue = queue.SimpleQueue()
+            threading.Thread(target=_finish_worker, args=(_finish_queue,), name="latency-finish", daemon=True).start()
+    return _finish_queue
+
+def wait_for_finished_turns(timeout=2.0):
+    """再生の終了時に集計を依頼したターンが、集計し終わるまで待ちます。"""
+    if _finish_queue is not None:
+        marker = threading.Event()
+        _finish_queue.put(marker)
+        marker.wait(timeout)
+
+def playback_hooks(timer, finish=False):
+    """`play_pcm_audio` に渡す、再生の開始・終了の時刻を記録するフックを返します。
+
+    フックは出力のコールバックから呼ばれるため、時刻を記録するだけにしています。
+    `finish=True` の場合の集計 (ログへの書き込みを含む) は、集計用のスレッドで行います。
+
+    Args:
+        timer (TurnTimer or None): ターンの時刻の記録。Noneの場合は空の辞書を返します。
+        finish (bool, optional): Trueの場合、再生の終了後にターンを集計に加えます
+
+    Returns:
+        dict: `on_start` と `on_done`
+    """
+    if timer is None:
+        return {}
+    turns = get_finish_queue() if finish else None
+
+    def on_done():
+        timer.mark("playback_end", last=True)
+        if turns is not None:
+            turns.put(timer)
+
+    return {"on_start": lambda: timer.mark("playback_start"), "on_done": on_done}
+
+def print_latency_report():
+    """これまでのターンの区間ごとの p50/p95/p99 を表示します。"""
+    recorder = get_latency_recorder()
+    if recorder.records:
+        print("\n情報: 遅延の集計 (直近のターン)\n" + recorder.format_report())
+
 # --- TTS関連関数 --- #
 import wave
 
@@ -429,85 +543,364 @@ def wave_file(filename, pcm, channels=1, rate=24000, sample_width=2):
         wf.setframerate(rate)
         wf.writeframes(pcm)
 
+CHAT_MODEL_NAME = "gemini-1.5-flash-latest"  # 対話用のGeminiモデル (providers.llm.gemini.model で変更可)
+GEMINI_TTS_MODEL = "models/gemini-2.5-flash-preview-tts"  # テスト済みの動作するモデル名
+GEMINI_TTS_VOICE = "zephyr"  # ボイスをzephyrに固定
+GEMINI_TTS_SAMPLE_RATE = 24000  # Gemini TTSの固定サンプルレート
+
+def get_provider_settings(kind):
+    """LLMまたはTTSのプロバイダー名と、そのプロバイダーの設定を返します。
+
+    コマンドライン引数 (`--llm-provider` / `--tts-provider`) が `config.local.json` の
+    `providers.<kind>.name` より優先されます。プロバイダーごとの設定は `providers.<kind>.<プロバイダー名>` に書きます。
+
+    Args:
+        kind (str): "llm" または "tts"
+
+    Returns:
+        tuple: (プロバイダー名, 設定の辞書)
+    """
+    section = PROVIDER_SETTINGS.get(kind, {})
+    name = getattr(args, f"{kind}_provider", None) or section.get("name", "gemini")
+    options = dict(section.get(name, {}))
+    if name == "gemini" and kind == "llm":
+        options.setdefault("model", CHAT_MODEL_NAME)
+    elif name == "gemini":
+        options.setdefault("model", GEMINI_TTS_MODEL)
+        options.setdefault("voice", GEMINI_TTS_VOICE)
+        options.setdefault("sample_rate", GEMINI_TTS_SAMPLE_RATE)
+    return name, options
+
+def create_llm_model(system_instruction=None):
+    """設定されたLLMプロバイダーのモデルを作成します。"""
+    name, options = get_provider_settings("llm")
+    if name == "gemini":
+        configure_gemini()
+    return create_llm(name, system_instruction=system_instruction, **options)
+
+_tts_provider = None  # TTSプロバイダー (get_tts_provider() で遅延初期化)
+_tts_provider_lock = threading.Lock()  # バックグラウンドの事前初期化と同時に呼ばれても1回だけ初期化する
+
 def get_tts_provider():
     """使用するTTSプロバイダーを返します。
-    
+
+    初期化に失敗した場合 (Style-Bert-VITS2 の設定ファイルがないなど) は、Gemini API TTS に切り替えます。
+
+    Returns:
+        TTSプロバイダー (`synthesize(text, language_code)` と `name`・`voice`・`model`・`sample_rate` を持つ)
+    """
+    global _tts_provider
+    if _tts_provider is None:
+        with _tts_provider_lock:
+            if _tts_provider is None:
+                name, options = get_provider_settings("tts")
+                try:
+                    provider = create_tts(name, **options)
+                except Exception as e:
+                    print(f"警告: TTSプロバイダー '{name}' を初期化できませんでした。Gemini API TTS を使用します。 {e}")
+                    provider = create_tts("gemini", model=GEMINI_TTS_MODEL, voice=GEMINI_TTS_VOICE,
+                                          sample_rate=GEMINI_TTS_SAMPLE_RATE)
+                if provider.name == "gemini":
+                    configure_gemini()
+                print(f"情報: TTSプロバイダー: {provider.name} (ボイス: {provider.voice})")
+                batch_settings = PROVIDER_SETTINGS.get("tts", {}).get("batch", {})
+                if batch_settings.get("enabled", False):
+                    # 先読みなどで同時に届いた合成の依頼をまとめて合成する
+                    from tts_batcher import BatchingTTSProvider
+                    provider = BatchingTTSProvider(provider, max_batch=batch_settings.get("max_batch", 4),
+                                                   max_wait=batch_settings.get("max_wait", 0.02))
+                    print(f"情報: TTSの依頼を最大 {provider.max_batch} 件・{provider.max_wait * 1000:g} ms 待ってまとめて合成します。")
+                _tts_provider = provider
+    return _tts_provider
+
+_tts_cache = None  # TTS音声キャッシュ (get_tts_cache() で遅延初期化)
+_tts_cache_lock = threading.Lock()
+
+def get_tts_cache():
+    """TTS音声キャッシュを返します。設定で無効化されている場合はNone。
+
+    Returns:
+        TTSAudioCache or None: TTS音声キャッシュ
+    """
+    global _tts_cache
+    if _tts_cache is None and TTS_CACHE_SETTINGS.get("enabled", True):
+        with _tts_cache_lock:
+            if _tts_cache is None and TTS_CACHE_SETTINGS.get("enabled", True):
+                cache_dir = TTS_CACHE_SETTINGS.get("directory", os.path.join("cache", "tts"))
+                max_bytes = int(TTS_CACHE_SETTINGS.get("max_mb", 256) * 1024 * 1024)
+                try:
+                    _tts_cache = TTSAudioCache(cache_dir, max_bytes=max_bytes)
+                except OSError as e:
+                    print(f"警告: TTS音声キャッシュを初期化できませんでした。キャッシュなしで続行します。 {e}")
+                    TTS_CACHE_SETTINGS["enabled"] = False
+    return _tts_cache
+
+def synthesize_speech(text, language_code="ja-JP", verbose=True):
+    """テキストを設定されたTTSプロバイダー (`get_tts_provider()`) で音声合成し、RAW PCMデータを返します。
+
+    同じテキスト・ボイス・モデル・言語の音声がTTS音声キャッシュにあれば、APIを呼ばずにそれを返します。
+
+    Args:
+        text (str): 音声合成するテキスト
+        language_code (str): 言語コード。キャッシュキーの一部として使用されます。
+        verbose (bool, optional): 進行状況を表示するかどうか。デフォルトはTrue
+
+    Returns:
+        bytes-like or None: プロバイダーのサンプルレート・モノラル・int16のRAW PCMデータ。失敗した場合はNone。
+    """
+    cache = get_tts_cache()
+    if cache is None:
+        return _request_tts(text, language_code, verbose)
+
+    key = get_tts_cache_key(text, language_code)
+    cached = cache.get(key)
+    if cached is not None:
+        if verbose:
+            print(f"TTSキャッシュから音声を取得しました。 テキスト: 「{text[:30]}...」")
+        return cached
+    audio_data_bytes = _request_tts(text, language_code, verbose)
+    if audio_data_bytes:
+        try:
+            cache.put(key, audio_data_bytes)
+        except OSError as e:
+            print(f"警告: TTS音声キャッシュへの保存に失敗しました: {e}")
+    return audio_data_bytes
+
+def get_tts_cache_key(text, language_code):
+    """現在のTTSプロバイダーでのTTS音声キャッシュのキーを返します。"""
+    provider = get_tts_provider()
+    return TTSAudioCache.make_key(text, provider.voice, provider.model, language_code)
+
+def _request_tts(text, language_code="ja-JP", verbose=True):
+    """TTSプロバイダーにリクエストを送り、RAW PCMデータを返します。"""
+    provider = get_tts_provider()
+    if provider.name == "gemini" and not GEMINI_API_KEY:
+        if verbose:
+            print("警告: Gemini APIキーが設定されていないため、音声合成をスキップします。")
+        return None
+
+    if verbose:
+        print(f"{provider.name} で音声を生成中... テキスト: 「{text[:30]}...」")
+
+    audio_data_bytes = provider.synthesize(text, language_code)
+
+    if not audio_data_bytes:
+        print("エラー: APIから音声データが返されませんでした。")
+        return None
+    return audio_data_bytes
+
+_playback_engines = {}  # 出力デバイスのインデックス -> PlaybackEngine
+_playback_lock = threading.Lock()
+PLAYBACK_BACKEND_FACTORY = None  # 出力デバイスのインデックスから再生バックエンドを作る関数 (Noneの場合は SoundDeviceBackend、ベンチマークでは差し替える)
+
+def get_playback_engine(output_device_index=None):
+    """指定された出力デバイスの再生エンジンを返します。
+
+    エンジンは出力ストリームを開いたまま保持するため、発話ごとにストリームを開き直しません。
+
+    Args:
+        output_device_index (int, optional): 音声出力デバイスのインデックス。Noneの場合はグローバル設定を使用。
+
     Returns:
-        str: TTSプロバイダー名 ("google_aistudio")
+        PlaybackEngine: 再生エンジン
     """
-    # Gemini API TTS (Google AI Studio TTS) を使用
-    return "google_aistudio"
+    device_to_use = output_device_index if output_device_index is not None else AUDIO_OUTPUT_DEVICE_INDEX
+    engine = _playback_engines.get(device_to_use)
+    if engine is None:
+        with _playback_lock:
+            engine = _playback_engines.get(device_to_use)
+            if engine is None:
+                # numpy・sounddevice の読み込みは最初の再生 (または事前初期化) まで遅らせる
+                from audio_playback import PlaybackEngine, SoundDeviceBackend
+                backend_factory = PLAYBACK_BACKEND_FACTORY or SoundDeviceBackend
+                engine = PlaybackEngine(backend_factory(device_to_use), samplerate=get_tts_provider().sample_rate)
+                _playback_engines[device_to_use] = engine
+    return engine
+
+def play_pcm_audio(audio_data_bytes, output_device_index=None, wait=True, on_start=None, on_done=None):
+    """RAW PCMデータ (int16) を再生します。
 
-def play_audio_google_aistudio(text, language_code="ja-JP", output_device_index=None):
-    """テキストをGemini API TTSで音声合成して再生します。
+    Args:
+        audio_data_bytes (bytes-like): int16のRAW PCMデータ
+        output_device_index (int, optional): 音声出力デバイスのインデックス。Noneの場合はグローバル設定を使用。
+        wait (bool, optional): Trueの場合は再生完了まで待機します。Falseの場合はすぐに戻ります。
+        on_start (callable, optional): 再生が始まったときに呼ばれる関数 (遅延の計測用)
+        on_done (callable, optional): 再生が終わったときに呼ばれる関数 (遅延の計測用)
+    """
+    engine = get_playback_engine(output_device_index)
+    engine.enqueue(audio_data_bytes, on_start=on_start, on_done=on_done)
+    if wait:
+        engine.flush() # 再生完了まで待機
+
+def wait_for_playback():
+    """すべての再生エンジンで、再生待ちの音声が終わるまで待ちます (再生の終了後の集計も待ちます)。"""
+    for engine in list(_playback_engines.values()):
+        engine.flush()
+    wait_for_finished_turns()
+
+def play_audio(text, language_code="ja-JP", output_device_index=None, wait=True, timer=None):
+    """テキストを設定されたTTSプロバイダーで音声合成して再生します。
     
     Args:
         text (str): 音声合成するテキスト
         language_code (str): 言語コード。現在は使用されていませんが、将来の拡張のために残されています。
         output_device_index (int, optional): 音声出力デバイスのインデックス。Noneの場合はグローバル設定を使用。
+        wait (bool, optional): Trueの場合は再生完了まで待機します。Falseの場合は再生を開始してすぐに戻ります。
+        timer (TurnTimer, optional): ターンの時刻の記録。音声合成・再生の時刻を記録し、再生が終わったら集計に加えます。
+                                     TTSは音声全体を一度に返すため、最初の音声データの時刻は合成の完了時刻です。
     """
-    if not GEMINI_API_KEY:
-        print("警告: Gemini APIキーが設定されていないため、音声合成をスキップします。")
-        return
-
     try:
-        print(f"Gemini TTSで音声を生成中... テキスト: 「{text[:30]}...」")
-        
-        # テスト済みの動作するモデル名を使用
-        tts_model = genai.GenerativeModel("models/gemini-2.5-flash-preview-tts")
-
-        # テスト済みのリクエスト形式を使用
-        generation_config = {
-            "response_modalities": ["AUDIO"],
-            "speech_config": {
-                "voice_config": {
-                    "prebuilt_voice_config": {
-                        "voice_name": "zephyr" # ボイスをzephyrに固定
-                    }
-                }
-            }
-        }
-
-        audio_response = tts_model.generate_content(
-           text,
-           generation_config=generation_config
-        )
-
-        # API応答からRAWオーディオデータを直接取得
-        audio_data_bytes = audio_response.candidates[0].content.parts[0].inline_data.data
-
+        if timer is not None:
+            timer.mark("tts_request")
+        audio_data_bytes = synthesize_speech(text, language_code)
+        if timer is not None:
+            timer.mark("tts_first_byte")
         if not audio_data_bytes:
-            print("エラー: APIから音声データが返されませんでした。")
+            if timer is not None:
+                get_latency_recorder().finish(timer)
             return
 
-        # RAW PCMデータをnumpy配列に変換し、再生
-        samplerate = 24000  # Gemini TTSの固定サンプルレート
-        audio_array = np.frombuffer(audio_data_bytes, dtype=np.int16)
-        audio_array_float32 = audio_array.astype(np.float32) / 32768.0
-
         device_to_use = output_device_index if output_device_index is not None else AUDIO_OUTPUT_DEVICE_INDEX
-
         if device_to_use is not None:
             print(f"オーディオ出力デバイス {device_to_use} で再生します。")
-            sd.play(audio_array_float32, samplerate, device=device_to_use)
         else:
             print("デフォルトのオーディオ出力デバイスで再生します。")
-            sd.play(audio_array_float32, samplerate)
-            
-        sd.wait() # 再生完了まで待機
-        print("音声の再生が完了しました。")
+
+        play_pcm_audio(audio_data_bytes, output_device_index=device_to_use, wait=wait,
+                       **playback_hooks(timer, finish=True))
+        if wait:
+            print("音声の再生が完了しました。")
 
     except Exception as e:
-        print(f"Gemini API TTS の再生中にエラーが発生しました: {e}")
+        print(f"音声合成・再生中にエラーが発生しました: {e}")
         import traceback
         traceback.print_exc()
+        if timer is not None:
+            get_latency_recorder().finish(timer)
+
+def speak_streaming(chat_session, user_input, language_code="ja-JP", output_device_index=None, timer=None):
+    """LLMの応答をストリーミングで受け取り、文単位で音声合成しながら再生します。
+
+    前の文を再生している間に次の文を合成するため、長い応答でも最初の音声が
+    すぐに再生されます。最初の音声が再生されるまでの時間 (TTFA) を表示します。
+
+    Args:
+        chat_session: `send_message(text, stream=True)` を持つチャットセッション
+        user_input (str): ユーザーの入力テキスト
+        language_code (str): 音声合成に使用する言語コード (BCP47形式)
+        output_device_index (int, optional): 音声出力デバイスのインデックス
+        timer (TurnTimer, optional): ターンの時刻の記録 (LLM・音声合成・再生の各段階を記録します)
+
+    Returns:
+        tuple: (応答全文, AI応答キャッシュの利用状況 (`send_chat_message` を参照))
+    """
+    started_at = time.monotonic()
+    chunks, cache_status = send_chat_message(chat_session, user_input, language_code, stream=True)
+    if timer is not None:
+        chunks = timer.wrap_stream(chunks)
+
+    def synthesize(sentence):
+        if timer is not None:
+            timer.mark("tts_request")
+        pcm = synthesize_speech(sentence, language_code)
+        if timer is not None and pcm:
+            timer.mark("tts_first_byte")
+        return pcm
+
+    hooks = playback_hooks(timer)
+    pipeline = StreamingTTSPipeline(
+        synthesize=synthesize,
+        play=lambda pcm: play_pcm_audio(pcm, output_device_index=output_device_index, **hooks),
+        on_sentence=lambda sentence: print(f"{character_name}: {sentence}"),
+    )
+    result = pipeline.run(chunks, started_at=started_at)
+
+    if result.time_to_first_audio is not None:
+        print(f"情報: 最初の音声まで {result.time_to_first_audio:.2f} 秒 (全体 {result.total_time:.2f} 秒, {len(result.sentences)} 文)")
+    for e in result.errors:
+        print(f"ストリーミング音声合成中にエラーが発生しました: {e}")
+    return result.text, cache_status
+
+# --- TTSウォームアップ --- #
+def collect_warmup_texts(patterns_data=None):
+    """起動時に事前合成しておく定型文を集めます。
+
+    対象は各言語の挨拶 (`greeting`)・別れの挨拶 (`farewell`)・自己紹介テンプレート、
+    および `response_patterns.json` の特殊応答 (`response`) です。
+    キャッシュキーが実際の再生時と一致するよう、再生時と同じ言語コードを組み合わせます。
+
+    Args:
+        patterns_data (dict, optional): `load_response_patterns()` の戻り値。省略時は読み込みます。
+
+    Returns:
+        list[tuple[str, str]]: (テキスト, 言語コード) のリスト
+    """
+    items = []
+    languages_config = config_data.get("languages", {})
+    for short_code, bcp47_code in SUPPORTED_LANGUAGES_MAP.items():
+        lang_settings = languages_config.get(short_code, {})
+        for key in ("greeting", "farewell"):
+            text = lang_settings.get(key)
+            if isinstance(text, str):
+                items.append((text, bcp47_code))
+        template = get_template("self_introduction", bcp47_code)
+        if isinstance(template, str):
+            items.append((template, bcp47_code))
+
+    if patterns_data is None:
+        patterns_data = load_response_patterns()
+    for pattern_group in patterns_data.get("patterns", []) if isinstance(patterns_data, dict) else []:
+        if isinstance(pattern_group, dict) and isinstance(pattern_group.get("response"), str):
+            # 特殊応答は現在の言語設定のまま再生される
+            items.append((pattern_group["response"], TARGET_LANGUAGE_BCP47))
+    return items
+
+def start_tts_warmup(max_workers=4):
+    """定型文の事前合成をバックグラウンドで開始します。プロンプトの表示は待たせません。
+
+    Args:
+        max_workers (int, optional): 同時に合成するスレッド数
+
+    Returns:
+        TTSWarmup or None: 実行中のウォームアップ。TTS音声キャッシュが無効な場合はNone。
+    """
+    cache = get_tts_cache()
+    if cache is None:
+        print("警告: TTS音声キャッシュが無効なため、ウォームアップをスキップします。")
+        return None
+
+    def is_cached(text, language_code):
+        return cache.contains(get_tts_cache_key(text, language_code))
+
+    def on_complete(warmup):
+        print(f"\n情報: TTSウォームアップが完了しました。 合成 {warmup.completed} 件 / "
+              f"キャッシュ済み {warmup.skipped} 件 / 失敗 {warmup.failed} 件 ({warmup.elapsed:.1f} 秒)")
+
+    warmup = TTSWarmup(
+        collect_warmup_texts(),
+        synthesize=lambda text, language_code: synthesize_speech(text, language_code, verbose=False),
+        max_workers=max_workers,
+        is_cached=is_cached,
+        on_complete=on_complete,
+    )
+    print(f"情報: TTSウォームアップをバックグラウンドで開始します ({warmup.total} 件, {warmup.max_workers} スレッド)。")
+    return warmup.start()
 
 # --- 原稿読み上げモード --- #
-def script_mode(script_dir="scripts"):
+def script_mode(script_dir="scripts", prefetch=2, prefetch_workers=2, prefetch_max_mb=64,
+                resume=False, start_paragraph=None):
     """原稿読み上げモードのメイン処理
     
+    段落を再生している間に、後続の段落を先読みで音声合成します。
+    再生位置は `SCRIPT_CHECKPOINT_PATH` に保存され、`resume=True` で続きから再開できます。
+    
     Args:
         script_dir (str): 原稿ファイルが格納されているディレクトリパス。デフォルトは "scripts"
+        prefetch (int, optional): 再生中の段落より先に合成しておく段落数。デフォルトは2
+        prefetch_workers (int, optional): 同時に音声合成するスレッド数。デフォルトは2
+        prefetch_max_mb (float, optional): 先読みした未再生の音声の合計の上限 (MB)。デフォルトは64
+        resume (bool, optional): 前回中断した段落から再開するかどうか
+        start_paragraph (int, optional): 読み上げを開始する段落番号 (1始まり)。指定時は resume より優先
     """
     global TARGET_LANGUAGE, TARGET_LANGUAGE_BCP47, full_persona, character_name, persona, greeting, guidelines
     
@@ -564,60 +957,522 @@ def script_mode(script_dir="scripts"):
         print(f"\n=== 読み上げ開始: {selected_file} ===\n")
         
         # テキストを段落ごとに分割
-        paragraphs = [p.strip() for p in script_text.split('\n\n') if p.strip()]
+        paragraphs = split_paragraphs(script_text)
         
-        # 各段落を読み上げ
-        for i, paragraph in enumerate(paragraphs):
-            if not paragraph.strip():
-                continue
+        # 再開位置の決定 (--start-paragraph が優先、次に --resume で保存済みの位置)
+        start_index = 0
+        if start_paragraph is not None:
+            if not 1 <= start_paragraph <= len(paragraphs):
+                # 範囲外の段落から始めると何も再生せずに保存済みの再開位置を消してしまうため、読み上げない
+                print(f"エラー: --start-paragraph には 1〜{len(paragraphs)} を指定してください (指定: {start_paragraph})。")
+                return
+            start_index = start_paragraph - 1
+        elif resume:
+            saved_index = load_checkpoint(SCRIPT_CHECKPOINT_PATH, file_path)
+            if saved_index is not None and 0 < saved_index < len(paragraphs):
+                start_index = saved_index
+        if start_index:
+            print(f"情報: 段落 {start_index + 1}/{len(paragraphs)} から読み上げを再開します。")
+        
+        # 先読みでの合成の時刻 (段落のテキスト -> (依頼時刻, 完了時刻))
+        recorder = get_latency_recorder()
+        synth_times = {}
+        
+        def synthesize(text):
+            requested_at = time.monotonic()
+            audio = synthesize_speech(text, TARGET_LANGUAGE_BCP47, verbose=False)
+            synth_times[text] = (requested_at, time.monotonic())
+            return audio
+        
+        # 再生中に次の段落を先読みで合成しておく
+        prefetcher = ParagraphPrefetcher(
+            paragraphs,
+            synthesize=synthesize,
+            lookahead=prefetch,
+            workers=prefetch_workers,
+            max_buffered_bytes=int(prefetch_max_mb * 1024 * 1024),
+            start_index=start_index,
+        )
+        
+        # 各段落を読み上げ (段落の順番が来た時刻を、その段落のターンの開始とする)
+        due_at = time.monotonic()
+        with prefetcher:
+            for i, paragraph, audio_data_bytes, error in prefetcher:
+                timer = recorder.start_turn("script")
+                timer.mark("input_received", at=due_at, last=True)
+                if paragraph in synth_times:
+                    requested_at, done_at = synth_times.pop(paragraph)
+                    timer.mark("tts_request", at=requested_at)
+                    timer.mark("tts_first_byte", at=done_at)
+                print(f"{character_name}: {paragraph}")
+                log_to_file(character_name, paragraph)
                 
-            print(f"{character_name}: {paragraph}")
-            log_to_file(character_name, paragraph)
-            
-            # 音声合成と再生
-            tts_provider = get_tts_provider()
-            if tts_provider == "google_aistudio":
-                play_audio_google_aistudio(paragraph, language_code=TARGET_LANGUAGE_BCP47, output_device_index=AUDIO_OUTPUT_DEVICE_INDEX)
-            else:
-                play_audio_gcp(paragraph, language_code=TARGET_LANGUAGE_BCP47)
-            
-            # 段落間に少し間を空ける
-            if i < len(paragraphs) - 1:
-                time.sleep(1.5)
+                # 音声の再生 (合成は先読みで済んでいる)
+                if error is not None:
+                    print(f"音声合成中にエラーが発生しました: {error}")
+                elif audio_data_bytes:
+                    play_pcm_audio(audio_data_bytes, output_device_index=AUDIO_OUTPUT_DEVICE_INDEX,
+                                   **playback_hooks(timer))
+                recorder.finish(timer)
+                
+                # 再生位置を保存し、クラッシュしても続きから再開できるようにする
+                try:
+                    save_checkpoint(SCRIPT_CHECKPOINT_PATH, file_path, i + 1, len(paragraphs))
+                except OSError as e:
+                    print(f"警告: 再生位置を保存できませんでした: {e}")
+                
+                # 段落間に少し間を空ける
+                if i < len(paragraphs) - 1:
+                    time.sleep(1.5)
+                due_at = time.monotonic()
         
+        clear_checkpoint(SCRIPT_CHECKPOINT_PATH, file_path)
         print(f"\n=== 読み上げ終了: {selected_file} ===\n")
+        print_latency_report()
         
     except Exception as e:
         print(f"ファイルの読み込みまたは処理中にエラーが発生しました: {e}")
         traceback.print_exc()
 
+# --- レンダリングモード --- #
+def render_mode(script_dir="scripts", script_files=None, render_dir="renders", audio_format="wav",
+                workers=4, requests_per_minute=10, force=False):
+    """原稿を音声ファイルに一括レンダリングするモードのメイン処理 (非対話)
+    
+    原稿ごとに `<render_dir>/<原稿名>/` へ段落ごとの音声・連結した音声・マニフェストを書き出します。
+    
+    Args:
+        script_dir (str): 原稿ファイルが格納されているディレクトリパス。デフォルトは "scripts"
+        script_files (list[str], optional): レンダリングする原稿ファイル。Noneの場合は script_dir 内のすべての .txt
+        render_dir (str, optional): 出力ディレクトリ。デフォルトは "renders"
+        audio_format (str, optional): 段落ごとの音声ファイルの形式 ("wav" または "opus")
+        workers (int, optional): 同時に音声合成するスレッド数
+        requests_per_minute (float, optional): TTS APIの1分あたりの最大リクエスト数。0の場合は制限しません。
+        force (bool, optional): Trueの場合、最新の段落も含めてすべて合成し直します
+
+    Returns:
+        bool: すべての原稿のすべての段落をレンダリングできた場合はTrue
+    """
+    print(f"\n=== 原稿レンダリングモードを開始します ===\n")
+    print(f"言語: {LANGUAGE_NAMES.get(TARGET_LANGUAGE, 'Unknown')} ({TARGET_LANGUAGE_BCP47})")
+    
+    if not script_files:
+        if not os.path.isdir(script_dir):
+            print(f"エラー: 原稿ディレクトリ '{script_dir}' が存在しません。")
+            return False
+        script_files = [os.path.join(script_dir, f) for f in sorted(os.listdir(script_dir)) if f.endswith('.txt')]
+    if not script_files:
+        print(f"エラー: ディレクトリ '{script_dir}' にテキストファイル (.txt) が見つかりません。")
+        return False
+    
+    def synthesize(text):
+        # 例外はそのまま送出し、レート制限の場合は render_script 側で再試行する
+        return synthesize_speech(text, TARGET_LANGUAGE_BCP47, verbose=False)
+    
+    cache = get_tts_cache()
+    
+    def lookup(text):
+        # TTS音声キャッシュにある段落はAPIを呼ばないため、レート制限の枠を使わない
+        return cache.get(get_tts_cache_key(text, TARGET_LANGUAGE_BCP47)) if cache is not None else None
+    
+    provider = get_tts_provider()
+    ok = True
+    for file_path in script_files:
+        output_dir = os.path.join(render_dir, os.path.splitext(os.path.basename(file_path))[0])
+        print(f"\n--- レンダリング: {file_path} -> {output_dir} ---")
+        try:
+            manifest = render_script(
+                file_path, output_dir, synthesize, wave_file,
+                voice_name=provider.voice, model=provider.model, language=TARGET_LANGUAGE_BCP47,
+                sample_rate=provider.sample_rate, workers=workers, requests_per_minute=requests_per_minute,
+                audio_format=audio_format, force=force, lookup=lookup,
+            )
+        except (OSError, ValueError) as e:
+            print(f"エラー: 原稿 '{file_path}' をレンダリングできませんでした: {e}")
+            ok = False
+            continue
+        failed = manifest["failed_paragraphs"]
+        skipped = sum(1 for p in manifest["paragraphs"] if p.get("skipped"))
+        print(f"情報: {len(manifest['paragraphs'])} 段落 (省略 {skipped}, 失敗 {len(failed)}) / "
+              f"合計 {manifest['total_duration_seconds']:.1f} 秒 / 所要時間 {manifest['render_seconds']:.1f} 秒")
+        if failed:
+            print(f"エラー: 段落 {', '.join(map(str, failed))} を合成できなかったため、連結した音声は書き出していません。"
+                  f"もう一度実行すると失敗した段落だけを合成し直します。")
+            ok = False
+    
+    print(f"\n=== レンダリング終了 ===\n")
+    return ok
+
 # --- インタラクティブモード --- #
-def interactive_mode():
-    """インタラクティブモードのメインループ"""
-    global TARGET_LANGUAGE, TARGET_LANGUAGE_BCP47, full_persona, character_name, persona, greeting, guidelines
+_response_cache = None  # AI応答キャッシュ (get_response_cache() で遅延初期化)
+_response_cache_lock = threading.Lock()
 
-    chat_session = None
-    try:
-        # グローバルに初期化済みのgenaiを使用
-        model = genai.GenerativeModel(
-            'gemini-1.5-flash-latest',
-            system_instruction=full_persona
-        )
-        chat_session = model.start_chat()
-        print("情報: 対話用Geminiモデルを正常に初期化しました。")
+def get_response_cache():
+    """AI応答キャッシュを返します。設定で無効化されている場合はNone。
+
+    `config.local.json` の `response_cache` で、保存先 (`path`)・有効期限 (`ttl_hours`)・
+    最大件数 (`max_entries`) を指定できます。
+
+    Returns:
+        ResponseCache or None: AI応答キャッシュ
+    """
+    global _response_cache
+    if _response_cache is None and RESPONSE_CACHE_SETTINGS.get("enabled", True):
+        with _response_cache_lock:
+            if _response_cache is None and RESPONSE_CACHE_SETTINGS.get("enabled", True):
+                try:
+                    from response_cache import ResponseCache
+                    _response_cache = ResponseCache(
+                        RESPONSE_CACHE_SETTINGS.get("path", os.path.join("cache", "responses.sqlite3")),
+                        ttl_seconds=RESPONSE_CACHE_SETTINGS.get("ttl_hours", 24) * 3600,
+                        max_entries=RESPONSE_CACHE_SETTINGS.get("max_entries", 1000),
+                    )
+                except Exception as e:
+                    print(f"警告: AI応答キャッシュを初期化できませんでした。キャッシュなしで続行します。 {e}")
+                    RESPONSE_CACHE_SETTINGS["enabled"] = False
+    return _response_cache
+
+def send_chat_message(chat_session, user_input, language_code="ja-JP", stream=False):
+    """AI応答キャッシュを確認してから、チャットセッションにメッセージを送ります。
+
+    直前の会話に依存する質問 (「さっきの続き」など) はキャッシュを使いません。
+    キャッシュから返した応答はチャットセッションの履歴には追加されません。
+
+    Args:
+        chat_session: `send_message` を持つチャットセッション
+        user_input (str): ユーザーの入力テキスト
+        language_code (str): 言語コード (BCP47形式)
+        stream (bool, optional): Trueの場合はテキスト断片のイテレーターを返します
+
+    Returns:
+        tuple: (応答テキスト または テキスト断片のイテレーター, キャッシュの利用状況)
+               利用状況は "hit" / "miss" / "bypass" (文脈依存のため不使用) / "disabled" (キャッシュ無効)
+    """
+    def send():
+        if stream:
+            return iter_response_text(chat_session.send_message(user_input, stream=True))
+        return chat_session.send_message(user_input).text
+
+    cache = get_response_cache()
+    if cache is None:
+        return send(), "disabled"
+    from response_cache import ResponseCache, is_context_dependent  # get_response_cache() で読み込み済み
+    if is_context_dependent(user_input):
+        return send(), "bypass"
+
+    llm_name, llm_options = get_provider_settings("llm")
+    persona_hash = ResponseCache.persona_hash(full_persona, llm_options.get("model", llm_name))
+    key = ResponseCache.make_key(user_input, language_code, persona_hash)
+    cached = cache.get(key)
+    if cached is not None:
+        print("情報: AI応答キャッシュの応答を使用します。")
+        if hasattr(chat_session, "record_turn"):
+            chat_session.record_turn(user_input, cached)
+        return (iter([cached]) if stream else cached), "hit"
+    if stream:
+        return cache.wrap_stream(key, user_input, language_code, send()), "miss"
+    response_text = send()
+    cache.put(key, user_input, language_code, response_text)
+    return response_text, "miss"
+
+def get_chat_request_stats(chat_session, cache_status):
+    """直前のAIへのリクエストの大きさ (履歴のトークン数・ペイロードのバイト数など) を返します。
+
+    AIを呼ばなかったターン (定型応答・キャッシュヒット) では空の辞書を返します。
+    """
+    if cache_status not in ("miss", "bypass", "disabled"):
+        return {}
+    return dict(getattr(chat_session, "last_request", {}))
+
+def get_fixed_response(user_input, response_matcher, language_code):
+    """AIを使わずに返せる定型の応答 (特殊応答・自己紹介テンプレート) を返します。
+
+    Args:
+        user_input (str): ユーザーの入力テキスト
+        response_matcher: 特殊応答のマッチャー (`build_response_matcher` の戻り値)
+        language_code (str): 言語コード (BCP47形式)
 
+    Returns:
+        tuple: (応答テキスト or None, 特殊応答かどうか)
+    """
+    special_response = check_special_response(user_input, response_matcher)
+    if special_response:
+        return special_response, True
+    if is_self_introduction_request(user_input):
+        template = get_template("self_introduction", language_code)
+        if template:
+            return template, False
+    return None, False
+
+def create_chat_session():
+    """対話用のチャットセッションを、設定されたLLMプロバイダーで作成します。失敗した場合はNoneを返します。
+    
+    `config.local.json` の `chat_history` が有効な場合 (デフォルト) は、直近の往復だけを残して
+    古い会話を要約する `ManagedChatSession` を返します。長時間の配信でもリクエストが大きくなり続けません。
+    """
+    try:
+        # Geminiの場合は create_llm_model() がSDKを読み込み、APIキーを設定する
+        model = create_llm_model(system_instruction=full_persona)
+        settings = config_data.get("chat_history", {})
+        if settings.get("enabled", True):
+            history = ChatHistoryManager(
+                make_model_summarizer(create_llm_model(), max_chars=settings.get("summary_chars", 600)),
+                keep_turns=settings.get("keep_turns", 6),
+                token_budget=settings.get("token_budget", 3000),
+                background=True,  # 要約のAI呼び出しで応答の終わりを待たせない
+            )
+            chat_session = ManagedChatSession(model, history)
+        else:
+            chat_session = model.start_chat()
+        print(f"情報: 対話用モデル ({get_provider_settings('llm')[0]}) を正常に初期化しました。")
+        return chat_session
     except Exception as e:
-        print(f"エラー: 対話用Geminiモデルの初期化に失敗しました。 {e}")
+        print(f"エラー: 対話用モデルの初期化に失敗しました。 {e}")
         print("警告: AIとの対話機能は無効になります。")
+        return None
+
+_client_warmup = None  # クライアントの事前初期化 (start_client_warmup() で開始した Future)
+
+def start_client_warmup(create_session=True, playback=True):
+    """LLM・TTSのクライアント、キャッシュ、音声出力の初期化をバックグラウンドのスレッドで始めます。
+
+    SDKの読み込みや出力ストリームのオープンをプロンプトの表示と並行して行い、
+    最初の入力が届くまでに済ませておきます。初期化済みのものは各 `get_*()` がそのまま返し、
+    初期化の途中で呼ばれた場合は終わるまで待ちます。
+
+    Args:
+        create_session (bool, optional): 対話用のチャットセッションも作成するかどうか
+        playback (bool, optional): 音声出力の再生エンジンも準備するかどうか
+
+    Returns:
+        concurrent.futures.Future: 結果は作成したチャットセッション (作成しない場合・失敗した場合はNone)
+    """
+    global _client_warmup
+    future = Future()
+
+    def run():
+        chat_session = create_chat_session() if create_session else None
+        steps = [get_tts_provider, get_tts_cache, get_response_cache]
+        if playback:
+            steps.append(lambda: get_playback_engine(AUDIO_OUTPUT_DEVICE_INDEX))
+        for step in steps:
+            try:
+                step()
+            except Exception as e:
+                print(f"警告: バックグラウンドでの初期化に失敗しました。使用時に再試行します。 {e}")
+        future.set_result(chat_session)
+
+    threading.Thread(target=run, name="client-warmup", daemon=True).start()
+    _client_warmup = future
+    return future
+
+def get_warmed_up_chat_session(create=True):
+    """事前初期化したチャットセッションを返します。初期化の途中であれば終わるまで待ちます。
+
+    Args:
+        create (bool, optional): 事前初期化を始めていない場合に、ここで作成するかどうか
+
+    Returns:
+        チャットセッション。初期化に失敗した場合はNone
+    """
+    if _client_warmup is None:
+        return create_chat_session() if create else None
+    return _client_warmup.result()
+
+def async_interactive_mode(chat_sources=None):
+    """asyncioの会話コアで動かすインタラクティブモード
+    
+    入力・応答生成・音声合成・再生を別々のタスクで並行に処理します。
+    話している途中でも次の入力を受け付け、新しい入力が届くと古い応答の再生を打ち切ります。
+    
+    視聴者コメントの入力元 (`chat_sources`) を指定した場合は、コンソール入力と合わせて
+    優先度付きキューにまとめ (`config.local.json` の `chat_ingest` で調整)、応答は打ち切らずに1件ずつ話します。
+    コンソール (配信者) の入力は優先して処理されます。
+    
+    Args:
+        chat_sources (list, optional): 視聴者コメントの入力元 (`HTTPChatSource`, `JSONLReplaySource` など)
+    """
+    import asyncio
+    from conversation_core import ConversationCore, ConsoleInputSource
+    from chat_ingest import ChatIngestor
+    from question_batcher import BatchingSource, QuestionBatcher, format_askers
+
+    if _client_warmup is None:
+        start_client_warmup()
+    chat_session = None  # 最初の応答の生成時に、事前初期化の完了を待って取得する
+    response_matcher = build_response_matcher(load_response_patterns())
+    state = {"language": TARGET_LANGUAGE_BCP47}
+    engine = get_playback_engine(AUDIO_OUTPUT_DEVICE_INDEX)
+    
+    def respond(message):
+        nonlocal chat_session
+        state["cache"] = None
+        user_input = message.text
+        askers = getattr(message, "askers", [message.user])
+        if message.source != "console":
+            print(f"{', '.join(askers)}: {user_input}")
+        language_match = re.match(LANGUAGE_COMMAND_PATTERN, user_input)
+        if language_match:
+            lang_code = language_match.group(1)
+            user_input = language_match.group(2)
+            state["language"] = SUPPORTED_LANGUAGES_MAP.get(lang_code, TARGET_LANGUAGE_BCP47)
+            print(f"言語を {lang_code} ({state['language']}) に切り替えました。")
+        log_to_file(message.user, user_input)
+        
+        # 同じ質問をまとめた場合は、回答の前に質問者へ呼びかける
+        prefix = format_askers(askers, state["language"])
+        fixed_response, _ = get_fixed_response(user_input, response_matcher, state["language"])
+        if fixed_response:
+            return prefix + fixed_response
+        if chat_session is None:
+            chat_session = get_warmed_up_chat_session()
+        if not chat_session:
+            return "申し訳ありません、AIモデルが初期化されていないため、お答えできません。"
+        chunks, state["cache"] = send_chat_message(chat_session, user_input, state["language"], stream=True)
+        return itertools.chain([prefix], chunks) if prefix else chunks
+    
+    def play(pcm):
+        engine.enqueue(pcm)
+        engine.flush()
+    
+    def on_turn_complete(result):
+        log_to_file(character_name, result.reply, state["language"],
+                    response_seconds=round(result.total_time, 3), streamed=True, cancelled=result.cancelled,
+                    cache=state["cache"], **get_chat_request_stats(chat_session, state["cache"]))
+        for e in result.errors:
+            print(f"応答の処理中にエラーが発生しました: {e}")
+    
+    console = ConsoleInputSource()
+    source = console
+    if chat_sources:
+        settings = config_data.get("chat_ingest", {})
+        source = ChatIngestor(
+            [console] + list(chat_sources),
+            max_queue=settings.get("max_queue", 100),
+            user_rate_capacity=settings.get("user_rate_capacity", 3),
+            user_rate_per_minute=settings.get("user_rate_per_minute", 6),
+            dedupe_window=settings.get("dedupe_window", 30.0),
+            until=console,
+        )
+        batching = config_data.get("question_batching", {})
+        if batching.get("enabled", True):
+            source = BatchingSource(source, QuestionBatcher(
+                window=batching.get("window", 3.0),
+                threshold=batching.get("threshold", 0.7),
+            ))
+    
+    core = ConversationCore(
+        respond,
+        synthesize=lambda sentence: synthesize_speech(sentence, state["language"], verbose=False),
+        play=play,
+        interrupt_playback=engine.interrupt,
+        interrupt=not chat_sources,  # 視聴者コメントごとに応答を打ち切らない
+        max_pending_turns=1 if chat_sources else 0,  # 取り出しを遅らせ、キュー側で優先度順に並べる
+        on_sentence=lambda message, sentence: print(f"{character_name}: {sentence}"),
+        on_turn_complete=on_turn_complete,
+    )
+    asyncio.run(core.run(source))
+    if chat_sources:
+        ingestor = source.source if isinstance(source, BatchingSource) else source
+        print(f"情報: チャット取り込みの統計: {ingestor.stats}")
+        if isinstance(source, BatchingSource):
+            print(f"情報: 似た質問をまとめて省略したAIへの質問: {source.batcher.calls_saved} 件")
+    print("プログラムを終了します。")
+    log_to_file("System", "入力終了によりプログラムを終了しました。")
 
-    # 特殊応答パターンの読み込み
+def process_turn(user_input, chat_session, response_matcher, language_code, timer, streaming=None):
+    """インタラクティブモードの1ターン (言語切り替え・特殊応答・AIの応答・ログ・音声再生) を処理します。
+
+    再生の完了は待たずに戻り、ターンの遅延は再生の終了時に `timer` から集計されます。
+    ベンチマーク (`benchmarks/bench_replay_session.py`) からも、記録した会話の再生に使われます。
+
+    Args:
+        user_input (str): ユーザーの入力テキスト
+        chat_session: チャットセッション (`create_chat_session()` の戻り値。Noneの場合はAIの応答なし)
+        response_matcher: 特殊応答のマッチャー (`build_response_matcher` の戻り値)
+        language_code (str): 現在の言語コード (BCP47形式)
+        timer (TurnTimer): ターンの時刻の記録 (`get_latency_recorder().start_turn()`)
+        streaming (bool, optional): 文単位ストリーミングTTSを使うかどうか。省略時は `--streaming-tts` の設定
+
+    Returns:
+        str: ターン後の言語コード (「!en ...」などで切り替わった場合は新しい言語)
+    """
+    streaming = STREAMING_TTS if streaming is None else streaming
+    language_match = re.match(LANGUAGE_COMMAND_PATTERN, user_input)
+    if language_match:
+        lang_code = language_match.group(1)
+        user_input = language_match.group(2)
+        language_code = SUPPORTED_LANGUAGES_MAP.get(lang_code, TARGET_LANGUAGE_BCP47)
+        print(f"言語を {lang_code} ({language_code}) に切り替えました。")
+    
+    log_to_file("User", user_input)
+    
+    fixed_response, special_response = get_fixed_response(user_input, response_matcher, language_code)
+    timer.mark("pattern_matched")
+    already_spoken = False  # ストリーミングTTSで再生済みかどうか
+    cache_status = None  # AI応答キャッシュの利用状況
+    
+    if fixed_response:
+        response_text = fixed_response
+    elif is_self_introduction_request(user_input):
+        # 自己紹介のテンプレートがない場合はAIに任せる
+        if chat_session:
+            response_text, cache_status = send_chat_message(chat_session, user_input, language_code)
+            timer.mark("llm_first_token")
+            timer.mark("llm_done")
+        else:
+            response_text = "申し訳ありません、AIモデルが初期化されていないため、お答えできません。"
+    else:
+        if chat_session:
+            try:
+                if streaming:
+                    response_text, cache_status = speak_streaming(chat_session, user_input, language_code=language_code, output_device_index=AUDIO_OUTPUT_DEVICE_INDEX, timer=timer)
+                    already_spoken = True
+                else:
+                    response_text, cache_status = send_chat_message(chat_session, user_input, language_code)
+                    timer.mark("llm_first_token")
+                    timer.mark("llm_done")
+            except Exception as e:
+                response_text = f"申し訳ありません、応答の生成中にエラーが発生しました。 {e}"
+                print(f"チャット応答生成中にエラーが発生しました: {e}")
+        else:
+            response_text = "申し訳ありません、AIモデルが初期化されていないため、お答えできません。"
+    
+    log_to_file(character_name, response_text, language_code,
+                response_seconds=round(time.monotonic() - timer.marks["input_received"], 3),
+                special_response=special_response, streamed=already_spoken, cache=cache_status,
+                **get_chat_request_stats(chat_session, cache_status))
+    
+    if already_spoken:
+        get_latency_recorder().finish(timer)
+        return language_code
+    
+    print(f"{character_name}: {response_text}")
+    
+    # 再生の完了は待たず、再生中でも次の入力を受け付ける (ターンは再生の終了時に集計される)
+    play_audio(response_text, language_code=language_code, output_device_index=AUDIO_OUTPUT_DEVICE_INDEX, wait=False, timer=timer)
+    return language_code
+
+def interactive_mode():
+    """インタラクティブモードのメインループ"""
+    global TARGET_LANGUAGE, TARGET_LANGUAGE_BCP47, full_persona, character_name, persona, greeting, guidelines
+
+    # LLM・TTSのクライアントはバックグラウンドで初期化し、プロンプトの表示を待たせない
+    if _client_warmup is None:
+        start_client_warmup()
+    chat_session = None  # 最初の入力で、事前初期化の完了を待って取得する
+
+    # 特殊応答パターンの読み込み (キーワードは一度だけマッチャーにコンパイルする)
     response_patterns = load_response_patterns()
+    response_matcher = build_response_matcher(response_patterns)
 
     # 現在の言語設定
     current_language = TARGET_LANGUAGE_BCP47
+    recorder = get_latency_recorder()
     
     # メインループ
     while True:
+        timer = None  # このターンの各段階の時刻の記録
         try:
             # ユーザー入力を受け付ける
             try:
@@ -625,79 +1480,61 @@ def interactive_mode():
             except EOFError:
                 print("入力が終了しました。プログラムを終了します。")
                 log_to_file("System", "入力終了によりプログラムを終了しました。")
+                wait_for_playback()
+                print_latency_report()
                 break
             
             if not user_input.strip():
                 continue
+            timer = recorder.start_turn("interactive")
             
             if user_input.lower() in ["exit", "quit", "終了", "退出"]:
                 print("プログラムを終了します。")
                 log_to_file("System", "終了コマンドによりプログラムを終了しました。")
+                wait_for_playback()
+                print_latency_report()
                 break
             
-            language_match = re.match(LANGUAGE_COMMAND_PATTERN, user_input)
-            if language_match:
-                lang_code = language_match.group(1)
-                user_input = language_match.group(2)
-                current_language = SUPPORTED_LANGUAGES_MAP.get(lang_code, TARGET_LANGUAGE_BCP47)
-                print(f"言語を {lang_code} ({current_language}) に切り替えました。")
-            
-            log_to_file("User", user_input)
-            
-            special_response = check_special_response(user_input, response_patterns)
-            is_intro_request = is_self_introduction_request(user_input)
-            
-            if special_response:
-                response_text = special_response
-            elif is_intro_request:
-                template = get_template("self_introduction", current_language)
-                if template:
-                    response_text = template
-                else:
-                    if chat_session:
-                        response = chat_session.send_message(user_input)
-                        response_text = response.text
-                    else:
-                        response_text = "申し訳ありません、AIモデルが初期化されていないため、お答えできません。"
-            else:
-                if chat_session:
-                    try:
-                        response = chat_session.send_message(user_input)
-                        response_text = response.text
-                    except Exception as e:
-                        response_text = f"申し訳ありません、応答の生成中にエラーが発生しました。 {e}"
-                        print(f"チャット応答生成中にエラーが発生しました: {e}")
-                else:
-                    response_text = "申し訳ありません、AIモデルが初期化されていないため、お答えできません。"
-            
-            log_to_file(character_name, response_text, current_language)
-            
-            print(f"{character_name}: {response_text}")
-            
-            tts_provider = get_tts_provider()
-            if tts_provider == "google_aistudio":
-                play_audio_google_aistudio(response_text, language_code=current_language, output_device_index=AUDIO_OUTPUT_DEVICE_INDEX)
+            if chat_session is None:
+                chat_session = get_warmed_up_chat_session()
+            current_language = process_turn(user_input, chat_session, response_matcher, current_language, timer)
             
         except Exception as e:
             error_message = f"エラーが発生しました: {e}"
             print(error_message)
             log_to_file("Error", error_message)
             traceback.print_exc()
+            if timer is not None:
+                recorder.finish(timer)
 
 # --- メインループ --- #
 def main():
     """メイン関数。コマンドライン引数を解析し、適切なモードを開始します。"""
-    global TARGET_LANGUAGE, TARGET_LANGUAGE_BCP47
+    # WindowsのコンソールでUnicode文字が正しく表示されるように標準出力をUTF-8に設定
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     
-    # コマンドライン引数の解析
-    args = parse_arguments()
-    
-    # 言語設定の更新
-    TARGET_LANGUAGE = args.language
-    TARGET_LANGUAGE_BCP47 = SUPPORTED_LANGUAGES_MAP.get(TARGET_LANGUAGE, "ja-JP")
+    # コマンドライン引数と設定ファイルの読み込み (設定ファイルの解析は1回だけ)
+    args = load_config(parse_arguments())
     
     print(f"情報: 言語設定を {TARGET_LANGUAGE} ({TARGET_LANGUAGE_BCP47}) に設定しました。")
     
+    # LLM・TTSのクライアントと音声出力の初期化をバックグラウンドで始める (レンダリングでは不要)
+    if args.mode != "render":
+        start_client_warmup(create_session=args.mode != "script")
+    
+    # 遅延の集計をPrometheus形式で公開する
+    metrics_port = args.metrics_port if args.metrics_port is not None else LATENCY_SETTINGS.get("prometheus_port")
+    if metrics_port is not None:
+        try:
+            server = start_metrics_server(get_latency_recorder(), port=metrics_port)
+            print(f"情報: 遅延の集計を http://127.0.0.1:{server.server_address[1]}/metrics で公開しています。")
+        except OSError as e:
+            print(f"警告: メトリクスのエンドポイントを開始できませんでした: {e}")
+    
+    # 定型文の事前合成 (バックグラウンドで実行し、プロンプトは待たせない)
+    if args.warmup:
+        start_tts_warmup(max_workers=args.warmup_workers)
+    
     # 挨拶を表示
     print(f"{character_name}: {greeting}")
     
@@ -722,12 +1559,29 @@ def main():
     
     # 選択されたモードで実行
     try:
-        if mode == "script":
+        if mode == "render":
+            if not render_mode(args.script_dir, script_files=args.script_file, render_dir=args.render_dir,
+                               audio_format=args.render_format, workers=args.render_workers,
+                               requests_per_minute=args.render_rpm, force=args.force_render):
+                # バッチ処理から失敗を検出できるよう、0以外の終了コードで終了する
+                sys.exit(1)
+        elif mode == "script":
             print(f"情報: 原稿読み上げモードを開始します。")
-            script_mode(args.script_dir)
+            script_mode(args.script_dir, prefetch=args.prefetch, prefetch_workers=args.prefetch_workers,
+                        prefetch_max_mb=args.prefetch_max_mb, resume=args.resume,
+                        start_paragraph=args.start_paragraph)
         else:
             print(f"情報: インタラクティブモードを開始します。")
-            interactive_mode()
+            from chat_ingest import HTTPChatSource, JSONLReplaySource
+            chat_sources = []
+            if args.chat_http is not None:
+                chat_sources.append(HTTPChatSource(port=args.chat_http))
+            if args.chat_replay:
+                chat_sources.append(JSONLReplaySource(args.chat_replay, interval=args.chat_replay_interval))
+            if args.async_core or chat_sources:
+                async_interactive_mode(chat_sources)
+            else:
+                interactive_mode()
     except Exception as e:
         print(f"エラー: モードの実行中に例外が発生しました: {e}")
         import traceback
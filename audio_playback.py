@@ -0,0 +1,351 @@
+############################################
+# 音声再生エンジン
+# 1本の出力ストリームを開いたまま保持し、コールバックでリングバッファから
+# PCMを供給します。発話ごとにストリームを開き直さず、再生中も呼び出し元を待たせません。
+############################################
+import threading
+import time
+import wave
+from collections import deque
+
+import numpy as np
+
+
+def apply_gain(pcm, gain):
+    """int16 PCMに音量倍率を掛けます。倍率が1.0の場合は何もせずそのまま返します。
+
+    書き込み可能なバッファ (bytearray や書き込み可能なnumpy配列) で倍率が1.0以下の場合は
+    その場で書き換え、読み取り専用のバッファ (bytes や mmap) の場合のみコピーを作ります。
+
+    Args:
+        pcm (bytes-like): int16のRAW PCM
+        gain (float): 音量倍率
+
+    Returns:
+        bytes-like: 倍率を掛けたPCM
+    """
+    if gain == 1.0:
+        return pcm
+    samples = pcm if isinstance(pcm, np.ndarray) else np.frombuffer(pcm, dtype=np.int16)
+    if gain <= 1.0:
+        if not samples.flags.writeable:
+            samples = samples.copy()
+        np.multiply(samples, gain, out=samples, casting="unsafe")
+        return samples
+    # 1.0を超える倍率はクリップが必要なため、float32で計算する
+    return np.clip(samples * np.float32(gain), -32768, 32767).astype(np.int16)
+
+
+def resample(pcm, src_rate, dst_rate):
+    """int16 PCMを線形補間でリサンプリングします。レートが同じ場合はそのまま返します。
+
+    Args:
+        pcm (bytes-like): int16のRAW PCM (モノラル)
+        src_rate (int): 元のサンプルレート
+        dst_rate (int): 変換後のサンプルレート
+
+    Returns:
+        bytes-like: リサンプリング後のPCM
+    """
+    if src_rate == dst_rate:
+        return pcm
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    n_out = int(round(len(samples) * dst_rate / src_rate))
+    positions = np.arange(n_out, dtype=np.float64) * (src_rate / dst_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.int16)
+
+
+class PlaybackEngine:
+    """常駐する出力ストリームにPCMを流し込む再生エンジン。
+
+    `enqueue()` で追加した音声は順番に再生され、呼び出し元はすぐに戻ります。
+    再生完了を待つ場合は `flush()`、再生中の音声を打ち切る場合は `interrupt()` を呼びます。
+
+    ストリームはint16で開き、TTSが返したバッファ (bytes や TTSキャッシュの mmap) を
+    memoryviewのまま保持します。コールバックではmemoryviewのスライスを出力バッファに
+    コピーするだけなので、float32への変換や中間配列の確保は行いません。
+    音量やサンプルレートの変換は、必要な場合のみ行います。
+
+    Args:
+        backend: 出力先のバックエンド (`SoundDeviceBackend`, `NullBackend`, `FileSinkBackend`)
+        samplerate (int, optional): サンプルレート
+        channels (int, optional): チャンネル数
+        blocksize (int, optional): コールバック1回あたりのフレーム数
+    """
+
+    SAMPLE_WIDTH = 2  # int16
+
+    def __init__(self, backend, samplerate=24000, channels=1, blocksize=1024):
+        self.backend = backend
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.frame_bytes = self.SAMPLE_WIDTH * channels
+        self._chunks = deque()  # 再生待ちのPCMチャンク (バイト単位のmemoryview)
+        self._hooks = deque()   # チャンクごとの (on_start, on_done)
+        self._offset = 0        # 先頭チャンクの再生済みバイト数
+        self._queued_bytes = 0
+        self._played_bytes = 0
+        self._cond = threading.Condition()
+        self._started = False
+        self._silence = memoryview(bytes(blocksize * self.frame_bytes))  # 無音埋め用 (コールバック内で確保しないため)
+
+    def start(self):
+        """出力ストリームを開始します (enqueue時に自動で呼ばれます)。
+
+        Returns:
+            PlaybackEngine: 自分自身
+        """
+        if not self._started:
+            self.backend.start(self._callback, self.samplerate, self.channels, self.blocksize, "int16")
+            self._started = True
+        return self
+
+    def enqueue(self, pcm, samplerate=None, gain=1.0, on_start=None, on_done=None):
+        """音声を再生キューに追加します。再生の完了は待ちません。
+
+        `on_start` / `on_done` は出力のコールバック (ロックの外) から呼ばれるため、時刻の記録など
+        すぐに終わる処理だけを渡してください。集計やファイルへの書き込みは別のスレッドで行ってください。
+        `interrupt()` で破棄された音声の `on_done` は呼ばれません。
+
+        Args:
+            pcm (bytes-like): int16のRAW PCM (bytes, bytearray, mmap, int16のnumpy配列など)。
+                              float32のnumpy配列 (-1.0〜1.0) も受け付けますが、その場合はint16に変換します。
+            samplerate (int, optional): PCMのサンプルレート。エンジンと異なる場合のみリサンプリングします。
+            gain (float, optional): 音量倍率。1.0以外の場合のみ適用します。
+            on_start (callable, optional): この音声の再生が始まったときに呼ばれる `on_start()`
+            on_done (callable, optional): この音声を最後まで出力したときに呼ばれる `on_done()`
+        """
+        if isinstance(pcm, np.ndarray) and pcm.dtype != np.int16:
+            pcm = (np.clip(pcm, -1.0, 1.0) * 32767).astype(np.int16)
+        if samplerate is not None:
+            pcm = resample(pcm, samplerate, self.samplerate)
+        pcm = apply_gain(pcm, gain)
+        view = memoryview(pcm).cast("B")
+        # フレームの途中で切れている端数は捨てる
+        usable = len(view) - len(view) % self.frame_bytes
+        if not usable:
+            for hook in (on_start, on_done):
+                if hook is not None:
+                    hook()
+            return
+        if usable != len(view):
+            view = view[:usable]
+        self.start()
+        with self._cond:
+            self._chunks.append(view)
+            self._hooks.append((on_start, on_done))
+            self._queued_bytes += usable
+        notify = getattr(self.backend, "notify", None)
+        if notify is not None:
+            notify()  # 再生待ちがない間は待機しているバックエンドを起こす
+
+    def flush(self, timeout=None):
+        """キューにある音声の再生が終わるまで待ちます。
+
+        Args:
+            timeout (float, optional): 最大待機秒数
+
+        Returns:
+            bool: 再生が終わった場合はTrue
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._chunks, timeout)
+
+    def interrupt(self):
+        """再生中・再生待ちの音声をすべて破棄します。"""
+        with self._cond:
+            self._chunks.clear()
+            self._hooks.clear()
+            self._offset = 0
+            self._queued_bytes = 0
+            self._cond.notify_all()
+
+    @property
+    def is_playing(self):
+        """再生中または再生待ちの音声があるかどうか。"""
+        with self._cond:
+            return bool(self._chunks)
+
+    @property
+    def pending_seconds(self):
+        """再生待ちの音声の長さ (秒)。"""
+        with self._cond:
+            return (self._queued_bytes - self._offset) / self.frame_bytes / self.samplerate
+
+    @property
+    def played_seconds(self):
+        """これまでに再生した音声の合計時間 (秒)。"""
+        return self._played_bytes / self.frame_bytes / self.samplerate
+
+    def close(self):
+        """出力ストリームを閉じます。再生待ちの音声は破棄されます。"""
+        self.interrupt()
+        if self._started:
+            self.backend.stop()
+            self._started = False
+
+    def _callback(self, outdata, frames):
+        """バックエンドから呼ばれ、`outdata` (int16の書き込み可能バッファ) にPCMを書き込みます。
+
+        足りない分は無音で埋めます。
+
+        Returns:
+            int: 再生待ちの音声から書き込んだバイト数 (0の場合は無音だけのブロック)
+        """
+        out = memoryview(outdata).cast("B")
+        total = frames * self.frame_bytes
+        written = 0
+        hooks = []  # ロックを放してから呼ぶフック
+        with self._cond:
+            while written < total and self._chunks:
+                chunk = self._chunks[0]
+                if self._offset == 0 and self._hooks[0][0] is not None:
+                    hooks.append(self._hooks[0][0])
+                n = min(total - written, len(chunk) - self._offset)
+                out[written:written + n] = chunk[self._offset:self._offset + n]
+                written += n
+                self._offset += n
+                if self._offset >= len(chunk):
+                    self._chunks.popleft()
+                    on_done = self._hooks.popleft()[1]
+                    if on_done is not None:
+                        hooks.append(on_done)
+                    self._queued_bytes -= len(chunk)
+                    self._offset = 0
+            self._played_bytes += written
+            drained = not self._chunks
+            if drained and not hooks:
+                self._cond.notify_all()
+        for hook in hooks:
+            hook()
+        if drained and hooks:
+            with self._cond:
+                self._cond.notify_all()  # on_done を呼んでから flush() を戻す
+        if written < total:
+            n = total - written
+            out[written:total] = self._silence[:n] if n <= len(self._silence) else bytes(n)
+        return written
+
+
+class SoundDeviceBackend:
+    """sounddevice の RawOutputStream に出力するバックエンド。
+
+    Args:
+        device (int, optional): 音声出力デバイスのインデックス。Noneの場合はデフォルトデバイス。
+    """
+
+    def __init__(self, device=None):
+        self.device = device
+        self._stream = None
+
+    def start(self, callback, samplerate, channels, blocksize, dtype):
+        import sounddevice as sd
+
+        def stream_callback(outdata, frames, time_info, status):
+            callback(outdata, frames)
+
+        # RawOutputStream ならコールバックの出力バッファがnumpy配列に変換されず、そのまま書き込める
+        self._stream = sd.RawOutputStream(samplerate=samplerate, channels=channels, dtype=dtype,
+                                          blocksize=blocksize, device=self.device, callback=stream_callback)
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+class NullBackend:
+    """サウンドカードなしで再生エンジンを動かすバックエンド。
+
+    スレッドからコールバックを呼び出し、出力は捨てます。テストやベンチマーク用です。
+
+    Args:
+        realtime (bool, optional): Trueの場合は実時間に合わせてコールバックを呼び、
+                                   Falseの場合はできるだけ速く呼びます (再生待ちがない間は、
+                                   `notify()` で起こされるまで待ちます)。
+        speed (float, optional): 実時間の何倍の速さで再生するか (realtime=True の場合のみ)
+    """
+
+    def __init__(self, realtime=True, speed=1.0):
+        self.realtime = realtime
+        self.speed = speed
+        self._thread = None
+        self._running = False
+        self._wake = threading.Event()
+
+    def start(self, callback, samplerate, channels, blocksize, dtype):
+        self._running = True
+        self._wake.clear()
+        self._thread = threading.Thread(target=self._run, args=(callback, samplerate, channels, blocksize, dtype),
+                                        name="audio-null-backend", daemon=True)
+        self._thread.start()
+
+    def _run(self, callback, samplerate, channels, blocksize, dtype):
+        outdata = bytearray(blocksize * channels * np.dtype(dtype).itemsize)
+        period = blocksize / samplerate / self.speed
+        next_time = time.monotonic()
+        while self._running:
+            written = callback(outdata, blocksize)
+            self._consume(outdata, written)
+            if self.realtime:
+                next_time += period
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            elif not written:
+                # 再生待ちがないときは、コアを使い続けないように次の enqueue まで待つ
+                self._wake.wait(period)
+                self._wake.clear()
+
+    def notify(self):
+        """再生待ちの音声が追加されたことを知らせます (`PlaybackEngine.enqueue` から呼ばれます)。"""
+        self._wake.set()
+
+    def _consume(self, outdata, written):
+        """出力されたブロックを受け取ります。`written` は再生待ちの音声から書き込まれたバイト数です。"""
+        pass
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class FileSinkBackend(NullBackend):
+    """出力をWAVファイルに書き出すバックエンド (int16のみ対応, サウンドカード不要)。
+
+    Args:
+        path (str): 出力するWAVファイルのパス
+        realtime (bool, optional): 実時間に合わせてコールバックを呼ぶかどうか
+        skip_silence (bool, optional): Trueの場合、再生待ちがなく無音のブロックは書き出しません
+    """
+
+    def __init__(self, path, realtime=False, skip_silence=True):
+        super().__init__(realtime=realtime)
+        self.path = path
+        self.skip_silence = skip_silence
+        self._wave = None
+
+    def start(self, callback, samplerate, channels, blocksize, dtype):
+        self._wave = wave.open(self.path, "wb")
+        self._wave.setnchannels(channels)
+        self._wave.setsampwidth(2)
+        self._wave.setframerate(samplerate)
+        super().start(callback, samplerate, channels, blocksize, dtype)
+
+    def _consume(self, outdata, written):
+        # 音声の途中の無音は書き出し、再生待ちの音声がなかったブロックだけを飛ばす
+        if self.skip_silence and written == 0:
+            return
+        self._wave.writeframes(outdata)
+
+    def stop(self):
+        super().stop()
+        if self._wave is not None:
+            self._wave.close()
+            self._wave = None
@@ -11,6 +11,29 @@ from tts_engine import StyleBertVITS2
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def _to_int16(frames):
+    """WAVのサンプル形式のままのフレームを、16ビット整数に変換します。"""
+    if frames.dtype == np.int16:
+        return frames
+    if frames.dtype.kind == "f":
+        return (np.clip(frames, -1.0, 1.0) * 32767).astype(np.int16)
+    if frames.dtype == np.uint8:
+        return ((frames.astype(np.int16) - 128) << 8).astype(np.int16)
+    return (frames >> 16).astype(np.int16)  # 32ビット整数
+
+
+def _make_sound(frames, mixer_channels):
+    """16ビットのフレームを、ミキサーのチャンネル数に合わせた `pygame.mixer.Sound` にします。"""
+    if frames.ndim == 1:
+        frames = frames[:, np.newaxis]
+    if frames.shape[1] != mixer_channels:
+        # モノラルは各チャンネルに複製し、それ以外は左右の平均をとってから複製する
+        frames = np.repeat(frames.mean(axis=1, keepdims=True).astype(np.int16), mixer_channels, axis=1)
+    if mixer_channels == 1:
+        frames = frames[:, 0]
+    return pygame.sndarray.make_sound(np.ascontiguousarray(frames))
+
+
 class AITuberApp:
     def __init__(self, config_path="config.json"):
         """
@@ -138,11 +161,26 @@ class AITuberApp:
         """
         テキストを音声に変換し、アバターに喋らせます。
         
+        ストリーミング再生 (config.json の audio.streaming、既定で有効) では、音声を受信しながら再生を始め、
+        音声ファイルは output_path を指定した場合だけ保存します。
+        
         Args:
             text (str): 喋らせるテキスト
             output_path (str, optional): 音声ファイルの出力パス
         """
         try:
+            if self.config.get("audio", {}).get("streaming", True):
+                # Pygameが初期化されていない場合は初期化
+                if not hasattr(self, 'screen'):
+                    self.init_pygame()
+                
+                # 受信した音声を順に再生しながらアバターの口を動かす
+                frames = self.tts_engine.synthesize_stream(text, output_path)
+                self._play_stream_with_animation(frames)
+                
+                logger.info(f"アバターが発話しました: {text[:30]}...")
+                return
+            
             # 出力パスが指定されていない場合はデフォルトのパスを使用
             if output_path is None:
                 output_path = f"./output/speech_{int(time.time())}.wav"
@@ -163,6 +201,70 @@ class AITuberApp:
             logger.error(f"発話中にエラーが発生しました: {str(e)}")
             raise
     
+    def _play_stream_with_animation(self, frames):
+        """
+        受信中の音声のフレームを順に再生しながら、アバターの口を動かします。
+        
+        フレームは `audio.stream_chunk_seconds` 秒分ずつまとめてPygameのチャンネルの再生待ちに入れます。
+        
+        Args:
+            frames (iterable): `StyleBertVITS2.synthesize_stream` が返すフレーム
+        """
+        state = {"feeding": True, "channel": None}
+        
+        def feed():
+            try:
+                for sound in self._iter_stream_sounds(frames):
+                    channel = state["channel"]
+                    if channel is None:
+                        state["channel"] = pygame.mixer.find_channel(True)
+                        state["channel"].play(sound)
+                        continue
+                    # チャンネルの再生待ちは1つだけのため、空くまで待ってから入れる
+                    while channel.get_queue() is not None and self.running:
+                        time.sleep(0.005)
+                    if not self.running:
+                        break
+                    channel.queue(sound)
+            except Exception as e:
+                logger.error(f"音声の受信中にエラーが発生しました: {str(e)}")
+            finally:
+                state["feeding"] = False
+        
+        def is_playing():
+            channel = state["channel"]
+            return state["feeding"] or (channel is not None and channel.get_busy())
+        
+        self.speaking = True
+        threading.Thread(target=feed, daemon=True).start()
+        threading.Thread(target=self._animation_thread, args=(None, is_playing)).start()
+    
+    def _iter_stream_sounds(self, frames):
+        """
+        フレームを一定の長さずつまとめ、ミキサーの形式 (16ビット・チャンネル数) の `pygame.mixer.Sound` にして返します。
+        
+        ミキサーのサンプルレートが音声と異なる場合は、最初のフレームを受け取った時点でミキサーを初期化し直します。
+        """
+        chunk_seconds = self.config.get("audio", {}).get("stream_chunk_seconds", 0.2)
+        pending = []
+        pending_frames = 0
+        mixer_channels = None
+        for block in frames:
+            if mixer_channels is None:
+                sample_rate = self.tts_engine.sample_rate
+                frequency, _, mixer_channels = pygame.mixer.get_init()
+                if frequency != sample_rate:
+                    pygame.mixer.quit()
+                    pygame.mixer.init(frequency=sample_rate, size=-16, channels=mixer_channels)
+                min_frames = max(1, int(sample_rate * chunk_seconds))
+            pending.append(_to_int16(block))
+            pending_frames += len(block)
+            if pending_frames >= min_frames:
+                yield _make_sound(np.concatenate(pending), mixer_channels)
+                pending, pending_frames = [], 0
+        if pending:
+            yield _make_sound(np.concatenate(pending), mixer_channels)
+    
     def _play_audio_with_animation(self, audio_path):
         """
         音声を再生しながらアバターの口を動かします。
@@ -185,12 +287,13 @@ class AITuberApp:
             self.speaking = False
             raise
     
-    def _animation_thread(self, audio_path):
+    def _animation_thread(self, audio_path, is_playing=None):
         """
         音声再生とアニメーションを行うスレッド。
         
         Args:
-            audio_path (str): 音声ファイルのパス
+            audio_path (str): 音声ファイルのパス (ストリーミング再生ではNone)
+            is_playing (callable, optional): 再生中かどうかを返す関数。省略時は読み込んだ音声ファイルを再生します。
         """
         try:
             # アニメーション設定の取得
@@ -203,8 +306,10 @@ class AITuberApp:
             enable_mouth_animation = animation_config.get("enable_mouth_animation", True)
             enable_smooth_transitions = animation_config.get("enable_smooth_transitions", True)
             
-            # 音声の再生
-            pygame.mixer.music.play()
+            # 音声の再生 (ストリーミング再生では再生済み)
+            if is_playing is None:
+                pygame.mixer.music.play()
+                is_playing = pygame.mixer.music.get_busy
             
             # 音声が再生されている間、アニメーションを表示
             clock = pygame.time.Clock()
@@ -219,7 +324,7 @@ class AITuberApp:
             # 音声振幅の取得（仮のランダム値）
             audio_amplitudes = [np.random.random() for _ in range(1000)]
             
-            while pygame.mixer.music.get_busy() and self.running:
+            while is_playing() and self.running:
                 current_time = time.time()
                 
                 # イベント処理
@@ -227,6 +332,7 @@ class AITuberApp:
                     if event.type == pygame.QUIT:
                         self.running = False
                         pygame.mixer.music.stop()
+                        pygame.mixer.stop()
                         return
                 
                 # 背景を描画
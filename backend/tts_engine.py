@@ -1,15 +1,443 @@
 import os
+import contextlib
+import hashlib
 import json
-import torch
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import soundfile as sf
 import requests
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Style-Bert-VITS2サーバーへのHTTP接続の既定値 (config.json の style_bert_vits2.http で変更可)
+DEFAULT_HTTP_SETTINGS = {
+    "connect_timeout": 3.05,   # 接続の確立を待つ秒数
+    "read_timeout": 60.0,      # 応答の受信を待つ秒数 (長文の合成に合わせて長め)
+    "max_retries": 2,          # 接続エラー・タイムアウト・5xx・429 のときの再試行回数
+    "retry_backoff": 0.5,      # 再試行の待ち時間の基準 (秒)。試行ごとに2倍、0〜上限の一様乱数で待つ
+    "retry_backoff_max": 4.0,  # 再試行の待ち時間の上限 (秒)
+    "pool_size": 4,            # 保持しておく接続の数 (同時リクエスト数)
+    "breaker_failures": 5,     # 連続して失敗したらサーキットブレーカーを開く回数
+    "breaker_reset": 30.0,     # サーキットブレーカーを開いてから、試しにリクエストを通すまでの秒数
+}
+
+# 長いテキストを文ごとに分けて並列に合成する設定の既定値 (config.json の style_bert_vits2.segmentation で変更可)
+DEFAULT_SEGMENT_SETTINGS = {
+    "enabled": True,        # Falseの場合は全文を1回のリクエストで送り、サーバーの自動分割 (auto_split) に任せる
+    "max_workers": 3,       # 同時に送る /voice リクエストの数
+    "min_chars": 8,         # これより短い文は次の文とまとめて1回のリクエストにする
+    "split_interval": 0.5,  # 文と文の間に入れる無音 (秒)
+}
+
+# プロセス内でモデルを読み込んで合成する設定の既定値 (config.json の style_bert_vits2.local で変更可)
+DEFAULT_LOCAL_SETTINGS = {
+    "model_file": None,         # モデルの重み (.safetensors)。Noneの場合は model_path 内の最初のもの
+    "style_vectors": None,      # スタイルベクトル (.npy)。Noneの場合は model_path/style_vectors.npy
+    "bert_model": "ku-nlp/deberta-v2-large-japanese-char-wwm",  # 日本語のBERTモデル
+    "num_threads": None,        # 推論に使うCPUスレッド数 (torch.set_num_threads)。Noneの場合はtorchの既定値
+    "num_interop_threads": None,  # 演算間の並列に使うスレッド数 (torch.set_num_interop_threads)
+    "warmup_text": "こんにちは",  # 読み込み後に一度合成しておくテキスト (空の場合は行わない)
+}
+
+# モデルのダウンロードの既定値 (config.json の style_bert_vits2.download で変更可)
+DEFAULT_DOWNLOAD_SETTINGS = {
+    "segments": 4,                        # 並列にダウンロードする範囲の数 (サーバーが Range に対応している場合)
+    "min_segment_size": 8 * 1024 * 1024,  # 1つの範囲の最小のバイト数 (これより小さいファイルは分けない)
+    "chunk_size": 1024 * 1024,            # 1回に受信して書き込むバイト数
+    "max_retries": 5,                     # 範囲ごとに、接続が切れたとき続きから再開する回数
+    "state_interval": 8 * 1024 * 1024,    # 進み具合をファイルに保存する間隔 (バイト)
+}
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+# 文末 (句点・感嘆符・疑問符と、続く閉じ括弧) の直後、英文のピリオドと空白の間、改行で区切る
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[。！？!?])(?![。！？!?」』）)])\s*|(?<=[。！？!?][」』）)])\s*|(?<=\.)\s+|\s*\n\s*")
+
+
+def split_sentences(text, min_chars=8):
+    """
+    テキストを文ごとに分割します。`min_chars` 文字より短い文は次の文 (最後の文は前の文) とまとめます。
+    
+    Args:
+        text (str): 分割するテキスト
+        min_chars (int, optional): 1つの区切りの最小の文字数
+        
+    Returns:
+        list: 文 (前後の空白を除いたもの) のリスト
+    """
+    segments = []
+    pending = ""
+    for sentence in _SENTENCE_BOUNDARY.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if pending and pending[-1].isascii():
+            pending += " "  # 英文は空白で区切ってつなげる
+        pending += sentence
+        if len(pending) >= min_chars:
+            segments.append(pending)
+            pending = ""
+    if pending:
+        if segments:
+            segments[-1] += (" " if segments[-1][-1].isascii() else "") + pending
+        else:
+            segments.append(pending)
+    return segments
+
+
+class CircuitOpenError(Exception):
+    """サーキットブレーカーが開いているため、サーバーにリクエストを送らなかったことを表す例外。"""
+
+
+class CircuitBreaker:
+    """
+    連続した失敗でサーバーへのリクエストを一時的に止めるサーキットブレーカー (スレッドセーフ)。
+    
+    `failure_threshold` 回続けて失敗すると開き、`reset_timeout` 秒の間はリクエストを通しません。
+    その後は1件だけ試しに通し (半開)、成功すれば閉じ、失敗すればまた開きます。
+    
+    Args:
+        failure_threshold (int): ブレーカーを開く連続失敗回数
+        reset_timeout (float): ブレーカーを開いておく秒数
+        clock (callable, optional): 単調増加する時刻を返す関数
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """"closed" (通常)・"open" (遮断中)・"half_open" (試しに1件通す) のいずれか。"""
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if self.clock() - self.opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        """リクエストを送ってよければTrueを返します。半開の状態では1件だけTrueを返します。"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.clock() - self.opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        """リクエストが成功したことを記録し、ブレーカーを閉じます。"""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """リクエストが失敗したことを記録します。連続失敗回数が閾値に達するか、半開での試行が失敗するとブレーカーを開きます。"""
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self._trial_in_flight = False
+
+
+def create_http_session(pool_size=4):
+    """
+    Keep-Aliveで接続を使い回す `requests.Session` を作成します。
+    
+    再試行はサーキットブレーカーと合わせて呼び出し側で行うため、urllib3の再試行は無効にします。
+    
+    Args:
+        pool_size (int): ホストごとに保持する接続の数
+        
+    Returns:
+        requests.Session: HTTPセッション
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# WAVの音声形式 (fmtチャンクのフォーマットID, ビット数) -> numpyのdtype
+_WAV_DTYPES = {
+    (1, 8): np.dtype("u1"),
+    (1, 16): np.dtype("<i2"),
+    (1, 32): np.dtype("<i4"),
+    (3, 32): np.dtype("<f4"),
+    (3, 64): np.dtype("<f8"),
+}
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class WavStreamParser:
+    """
+    受信途中のWAVを先頭から少しずつ受け取り、ヘッダーを解析してPCMのフレームを取り出します。
+    
+    fmt・data 以外のチャンク (LIST など) は読み飛ばします。dataチャンクの長さが 0 や 0xFFFFFFFF の
+    場合 (長さを決めずに送るサーバー) は、受信が終わるまでをすべて音声として扱います。
+    フレームの途中で区切られたバイトは、次に受け取ったバイトとつなげて返します。
+    """
+
+    def __init__(self):
+        self.sample_rate = None
+        self.channels = None
+        self.dtype = None
+        self._buffer = bytearray()
+        self._riff_checked = False
+        self._in_data = False
+        self._data_remaining = None  # dataチャンクの残りのバイト数 (Noneは受信の終わりまで)
+        self._frame_bytes = None
+
+    @property
+    def header_parsed(self):
+        """dataチャンクの手前までのヘッダーを解析し終えたかどうか。"""
+        return self._in_data
+
+    def feed(self, data):
+        """
+        受信したバイト列を渡し、取り出せたフレームを返します。
+        
+        Args:
+            data (bytes): 受信したバイト列
+            
+        Returns:
+            np.ndarray or None: フレーム (モノラルは1次元、ステレオ以上は (フレーム数, チャンネル数))。
+                                取り出せるフレームがない場合はNone。
+        """
+        self._buffer += data
+        if not self._in_data and not self._parse_header():
+            return None
+        usable = len(self._buffer)
+        if self._data_remaining is not None:
+            usable = min(usable, self._data_remaining)
+        usable -= usable % self._frame_bytes
+        if usable == 0:
+            return None
+        frames = np.frombuffer(bytes(self._buffer[:usable]), dtype=self.dtype)
+        del self._buffer[:usable]
+        if self._data_remaining is not None:
+            self._data_remaining -= usable
+            if self._data_remaining < self._frame_bytes:
+                self._buffer.clear()  # dataチャンクの後ろのチャンクは使わない
+        return frames.reshape(-1, self.channels) if self.channels > 1 else frames
+
+    def close(self):
+        """受信が終わったときに呼び出します。ヘッダーを解析できていなければ ValueError を送出します。"""
+        if not self._in_data:
+            raise ValueError("WAVのヘッダーを解析できませんでした (受信したデータが短すぎるか、WAVではありません)")
+
+    def _parse_header(self):
+        """バッファの先頭からdataチャンクの手前までを解析します。ヘッダーの途中で足りなくなった場合はFalse。"""
+        buf = self._buffer
+        if not self._riff_checked:
+            if len(buf) < 12:
+                return False
+            if buf[:4] != b"RIFF" or buf[8:12] != b"WAVE":
+                raise ValueError("WAVファイルではありません (RIFF/WAVEヘッダーがありません)")
+            del buf[:12]
+            self._riff_checked = True
+        while len(buf) >= 8:
+            chunk_id = bytes(buf[:4])
+            size = int.from_bytes(buf[4:8], "little")
+            if chunk_id == b"data":
+                if self.dtype is None:
+                    raise ValueError("WAVのfmtチャンクがdataチャンクより前にありません")
+                del buf[:8]
+                self._in_data = True
+                self._data_remaining = None if size in (0, 0xFFFFFFFF) else size
+                return True
+            padded = size + (size & 1)  # チャンクは2バイト境界にそろえられている
+            if len(buf) < 8 + padded:
+                return False
+            if chunk_id == b"fmt ":
+                self._parse_fmt(bytes(buf[8:8 + size]))
+            del buf[:8 + padded]
+        return False
+
+    def _parse_fmt(self, fmt):
+        audio_format = int.from_bytes(fmt[0:2], "little")
+        self.channels = int.from_bytes(fmt[2:4], "little")
+        self.sample_rate = int.from_bytes(fmt[4:8], "little")
+        bits = int.from_bytes(fmt[14:16], "little")
+        if audio_format == _WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            audio_format = int.from_bytes(fmt[24:26], "little")  # SubFormat GUIDの先頭2バイト
+        self.dtype = _WAV_DTYPES.get((audio_format, bits))
+        if self.dtype is None:
+            raise ValueError(f"未対応のWAV形式です (フォーマット {audio_format}, {bits} ビット)")
+        self._frame_bytes = self.dtype.itemsize * self.channels
+
+
+# 読み込み済みのモデル ((重みのパス, デバイス) -> LocalModel)。同じモデルはプロセス内で1回だけ読み込む
+_local_models = {}
+_local_models_lock = threading.Lock()
+
+
+class LocalModel:
+    """
+    Style-Bert-VITS2のモデルをプロセス内に常駐させ、サーバーを介さずに合成します。
+    
+    `style_bert_vits2` パッケージと torch が必要です。推論は `torch.inference_mode()` の中で行い、
+    同じモデルへの推論は1件ずつ実行します。インスタンスは `load_local_model()` で取得してください。
+    
+    Args:
+        model_file (str): モデルの重み (.safetensors) のパス
+        config_path (str): モデルの設定ファイル (config.json) のパス
+        style_vectors (str): スタイルベクトル (.npy) のパス
+        device (str): 推論に使うデバイス ("cpu" または "cuda")
+        settings (dict): `DEFAULT_LOCAL_SETTINGS` と同じキーを持つ設定
+    """
+    
+    def __init__(self, model_file, config_path, style_vectors, device, settings):
+        import torch
+        from style_bert_vits2.constants import Languages
+        from style_bert_vits2.nlp import bert_models
+        from style_bert_vits2.tts_model import TTSModel
+        
+        self._torch = torch
+        self._languages = Languages
+        if settings["num_threads"]:
+            torch.set_num_threads(settings["num_threads"])
+        if settings["num_interop_threads"]:
+            try:
+                torch.set_num_interop_threads(settings["num_interop_threads"])
+            except RuntimeError as e:
+                # 並列の処理を一度でも実行した後は変更できない
+                logger.warning(f"演算間のスレッド数を変更できませんでした: {str(e)}")
+        
+        bert_models.load_model(Languages.JP, settings["bert_model"])
+        bert_models.load_tokenizer(Languages.JP, settings["bert_model"])
+        self.model = TTSModel(model_path=model_file, config_path=config_path, style_vec_path=style_vectors, device=device)
+        self.model.load()
+        self.id2style = {style_id: name for name, style_id in self.model.style2id.items()}
+        self._lock = threading.Lock()
+        logger.info(f"モデルを常駐させました: {model_file} ({device}, CPUスレッド数 {torch.get_num_threads()})")
+    
+    def infer(self, text, params):
+        """
+        テキストを合成します。
+        
+        Args:
+            text (str): 合成するテキスト
+            params (dict): `StyleBertVITS2._voice_request()` が返すクエリパラメータと同じキーの辞書
+            
+        Returns:
+            tuple: (サンプルレート, int16のモノラルのフレーム)
+        """
+        style = self.id2style.get(params["style"], params["style"])
+        with self._lock, self._torch.inference_mode():
+            sample_rate, audio = self.model.infer(
+                text=text,
+                language=self._languages[params["language"]],
+                speaker_id=params["speaker_id"],
+                style=style,
+                sdp_ratio=params["sdp_ratio"],
+                noise=params["noise"],
+                noise_w=params["noisew"],
+                length=params["length"],
+                line_split=params["auto_split"],
+                split_interval=params["split_interval"],
+            )
+        return sample_rate, np.asarray(audio, dtype=np.int16)
+
+
+def load_local_model(model_file, config_path, style_vectors, device, settings):
+    """
+    モデルを読み込んで返します。同じ重みとデバイスのモデルは、2回目以降は読み込み済みのものを返します。
+    
+    Returns:
+        LocalModel: 常駐させたモデル
+    """
+    key = (os.path.abspath(model_file), device)
+    with _local_models_lock:
+        model = _local_models.get(key)
+        if model is None:
+            model = LocalModel(model_file, config_path, style_vectors, device, settings)
+            _local_models[key] = model
+    return model
+
+
+def _write_json_atomic(path, data):
+    """一時ファイルに書いてから置き換え、書き込みの途中で止まっても壊れたJSONが残らないようにします。"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _write_all(f, data):
+    """バッファなしのファイルに、途中までしか書けなかった場合も含めて全部書き込みます。"""
+    view = memoryview(data)
+    while view:
+        view = view[f.write(view):]
+
+
+def _sha256_file(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _manifest_sha256(manifest, save_path):
+    """
+    マニフェストから、保存するファイル名に対応するSHA-256を返します。
+    
+    Args:
+        manifest (dict or str): `{ファイル名: SHA-256}` (または `{"files": {...}}`) の辞書か、そのJSONファイルのパス
+        save_path (str): 保存先パス (ファイル名で検索します)
+        
+    Returns:
+        str: 小文字の16進数のSHA-256
+    """
+    if isinstance(manifest, str):
+        with open(manifest, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    files = manifest.get("files", manifest)
+    name = os.path.basename(save_path)
+    if name not in files:
+        raise ValueError(f"マニフェストに {name} のSHA-256がありません")
+    return files[name].lower()
+
+
+def _plan_segments(size, settings):
+    """ファイルを並列にダウンロードする範囲 ([開始, 終了, 受信済みのバイト数]) に分けます。"""
+    count = max(1, min(settings["segments"], size // max(1, settings["min_segment_size"])))
+    bounds = [size * i // count for i in range(count + 1)]
+    return [[bounds[i], bounds[i + 1] - 1, 0] for i in range(count)]
+
+
+def _silence(frame_count, channels, dtype):
+    """指定した形式の無音のフレームを返します (8ビットPCMは128が無音)。"""
+    shape = (frame_count, channels) if channels > 1 else frame_count
+    return np.full(shape, 128 if dtype == np.dtype("u1") else 0, dtype=dtype)
+
+
+def _to_float(frames):
+    """PCMのフレームを、`soundfile.read` と同じ -1.0〜1.0 のfloat64に変換します。"""
+    if frames.dtype == np.dtype("u1"):
+        return (frames.astype(np.float64) - 128) / 128
+    if frames.dtype.kind == "i":
+        return frames.astype(np.float64) / 2 ** (8 * frames.dtype.itemsize - 1)
+    return frames.astype(np.float64)
+
+
 class StyleBertVITS2:
     def __init__(self, config_path):
         """
@@ -22,6 +450,20 @@ class StyleBertVITS2:
         self.model_config = self.config["style_bert_vits2"]
         self.device = self.model_config["device"]
         
+        # サーバーへの接続は使い回し、タイムアウト・再試行・サーキットブレーカーを設定する
+        self.http_settings = dict(DEFAULT_HTTP_SETTINGS, **self.model_config.get("http", {}))
+        self.segment_settings = dict(DEFAULT_SEGMENT_SETTINGS, **self.model_config.get("segmentation", {}))
+        pool_size = max(self.http_settings["pool_size"], self.segment_settings["max_workers"])
+        self.session = create_http_session(pool_size)
+        self.breaker = CircuitBreaker(self.http_settings["breaker_failures"], self.http_settings["breaker_reset"])
+        self._executor = None  # 文ごとのリクエストを並列に送るスレッドプール (初回に作成)
+        self._executor_lock = threading.Lock()
+        
+        # backend が "local" の場合は、サーバーを使わずにプロセス内でモデルを読み込んで合成する
+        self.backend = self.model_config.get("backend", "server")
+        self.local_settings = dict(DEFAULT_LOCAL_SETTINGS, **self.model_config.get("local", {}))
+        self.local_model = None
+        
         # モデルが存在しない場合はダウンロードするためのディレクトリを作成
         os.makedirs(self.model_config["model_path"], exist_ok=True)
         
@@ -44,6 +486,8 @@ class StyleBertVITS2:
             # モデルが存在するか確認
             model_config_path = self.model_config["config_path"]
             if not os.path.exists(model_config_path):
+                if self.backend == "local":
+                    raise FileNotFoundError(f"モデル設定ファイルが見つかりません: {model_config_path}")
                 logger.warning(f"モデル設定ファイルが見つかりません: {model_config_path}")
                 logger.info("モデルのダウンロードが必要です。公式リポジトリからダウンロードしてください。")
                 return
@@ -55,14 +499,31 @@ class StyleBertVITS2:
             # モデルのパラメータを設定
             self.sample_rate = model_config.get("audio", {}).get("sampling_rate", 24000)
             
-            # デバイスの設定
+            if self.backend != "local":
+                logger.info(f"Style-Bert-VITS2サーバーで合成します: {self.model_config.get('server_url', 'http://127.0.0.1:8080')}")
+                return
+            
+            # デバイスの設定 (torchはプロセス内でモデルを読み込むときだけ必要なため、ここで読み込む)
+            import torch
             if self.device == "cuda" and not torch.cuda.is_available():
                 logger.warning("CUDAが利用できないため、CPUを使用します。")
                 self.device = "cpu"
             
-            # モデルをロード（実際のStyle-Bert-VITS2のコードに合わせて調整が必要）
+            # モデルをプロセス内に読み込み、以降の合成で使い回す
             logger.info(f"モデルを{self.device}にロードしています...")
-            # ここに実際のモデル読み込みコードを追加
+            model_dir = self.model_config["model_path"]
+            model_file = self.local_settings["model_file"]
+            if not model_file:
+                weights = sorted(name for name in os.listdir(model_dir) if name.endswith(".safetensors"))
+                if not weights:
+                    raise FileNotFoundError(f"モデルの重み (.safetensors) が見つかりません: {model_dir}")
+                model_file = os.path.join(model_dir, weights[0])
+            style_vectors = self.local_settings["style_vectors"] or os.path.join(model_dir, "style_vectors.npy")
+            self.local_model = load_local_model(model_file, model_config_path, style_vectors, self.device, self.local_settings)
+            
+            if self.local_settings["warmup_text"]:
+                # 最初の発話で辞書の読み込みなどを待たないように、一度合成しておく
+                self.local_model.infer(self.local_settings["warmup_text"], self._voice_request("")[1])
             
             logger.info("モデルの読み込みが完了しました。")
         
@@ -70,6 +531,44 @@ class StyleBertVITS2:
             logger.error(f"モデルの読み込み中にエラーが発生しました: {str(e)}")
             raise
     
+    def _voice_request(self, text, auto_split=True):
+        """
+        Style-Bert-VITS2サーバーの `/voice` のURLとクエリパラメータを返します。
+        
+        Args:
+            text (str): 合成するテキスト
+            auto_split (bool, optional): サーバー側で長いテキストを自動分割するかどうか
+            
+        Returns:
+            tuple: (URL, クエリパラメータの辞書)
+        """
+        # パラメータの設定
+        language = self.model_config["language"]
+        speaker_id = self.model_config["speaker_id"]
+        style_id = self.model_config["style_id"]
+        noise_scale = self.model_config["noise_scale"]
+        noise_scale_w = self.model_config["noise_scale_w"]
+        length_scale = self.model_config["length_scale"]
+        
+        # Style-Bert-VITS2サーバーの音声合成API
+        server_url = self.model_config.get("server_url", "http://127.0.0.1:8080")
+        voice_api_url = f"{server_url}/voice"
+        
+        params = {
+            "text": text,
+            "language": language,
+            "speaker_id": speaker_id,
+            "style": style_id,  # スタイルIDをスタイルとして使用
+            "noise": noise_scale,
+            "noisew": noise_scale_w,
+            "length": length_scale,
+            "sdp_ratio": 0.2,  # デフォルト値
+            "auto_split": auto_split,  # 長いテキストを自動分割
+            "split_interval": self.segment_settings["split_interval"]  # 分割間隔
+        }
+        
+        return voice_api_url, params
+    
     def synthesize(self, text, output_path=None):
         """
         テキストから音声を合成します。
@@ -84,37 +583,27 @@ class StyleBertVITS2:
         try:
             logger.info(f"テキストを音声に変換しています: {text[:30]}...")
             
-            # パラメータの設定
-            language = self.model_config["language"]
-            speaker_id = self.model_config["speaker_id"]
-            style_id = self.model_config["style_id"]
-            noise_scale = self.model_config["noise_scale"]
-            noise_scale_w = self.model_config["noise_scale_w"]
-            length_scale = self.model_config["length_scale"]
-            
-            # Style-Bert-VITS2サーバーにHTTPリクエストを送信
-            server_url = self.model_config.get("server_url", "http://127.0.0.1:8080")
-            voice_api_url = f"{server_url}/voice"
-            
-            params = {
-                "text": text,
-                "language": language,
-                "speaker_id": speaker_id,
-                "style": style_id,  # スタイルIDをスタイルとして使用
-                "noise": noise_scale,
-                "noisew": noise_scale_w,
-                "length": length_scale,
-                "sdp_ratio": 0.2,  # デフォルト値
-                "auto_split": True,  # 長いテキストを自動分割
-                "split_interval": 0.5  # 分割間隔
-            }
+            segments = self._split_text(text)
+            if len(segments) > 1:
+                audio = _to_float(np.concatenate(list(self._iter_segments(segments))))
+                if output_path:
+                    sf.write(output_path, audio, self.sample_rate)
+                    logger.info(f"音声ファイルを保存しました: {output_path}")
+                    return None
+                return audio
             
-            logger.info(f"Style-Bert-VITS2サーバーにリクエストを送信: {voice_api_url}")
-            response = requests.get(voice_api_url, params=params)
+            if self.local_model is not None:
+                self.sample_rate, frames = self._infer_local(text, auto_split=True)
+                if output_path:
+                    sf.write(output_path, frames, self.sample_rate)
+                    logger.info(f"音声ファイルを保存しました: {output_path}")
+                    return None
+                return _to_float(frames)
             
-            if response.status_code != 200:
-                logger.error(f"サーバーからエラーレスポンスを受信: {response.status_code} {response.text}")
-                raise Exception(f"サーバーエラー: {response.status_code}")
+            voice_api_url, params = self._voice_request(text)
+            
+            logger.info(f"Style-Bert-VITS2サーバーにリクエストを送信: {voice_api_url}")
+            response = self._get_with_retry(voice_api_url, params)
             
             # レスポンスから音声データを取得
             audio_data = response.content
@@ -129,45 +618,406 @@ class StyleBertVITS2:
                 # 音声データをnumpy配列に変換
                 import io
                 with io.BytesIO(audio_data) as buf:
-                    sample_rate, audio = sf.read(buf)
+                    audio, sample_rate = sf.read(buf)
+                self.sample_rate = sample_rate  # サーバーが返した音声のサンプルレート
                 return audio
                 
         except Exception as e:
             logger.error(f"音声合成中にエラーが発生しました: {str(e)}")
             raise
     
-    def download_model(self, url, save_path):
+    def synthesize_stream(self, text, output_path=None, chunk_size=8192):
+        """
+        テキストから音声を合成し、受信しながら音声のフレームを順に返すジェネレーター。
+        
+        WAVのヘッダーを受信した時点でサンプルレート (`self.sample_rate`) を設定し、以降は届いた分の
+        フレームをすぐに返すため、音声全体の受信を待たずに再生を始められます。
+        音声ファイルは `output_path` を指定した場合だけ、受信したバイト列をそのまま書き込みます。
+        再試行は応答のヘッダーを受け取るまでで、受信の途中で切れた場合は例外を送出します。
+        プロセス内のモデルで合成する場合は、文ごとに合成し終えた音声を返します。
+        複数の文に分割した場合は、文ごとのリクエストを並列に送り、受信し終えた文から順に
+        (文の間の無音と合わせて) 返します。このときの音声ファイルはデコードした音声から書き込みます。
+        
+        Args:
+            text (str): 合成するテキスト
+            output_path (str, optional): 受信したWAVを保存するファイルパス
+            chunk_size (int, optional): 1回に受信するバイト数
+            
+        Yields:
+            np.ndarray: WAVのサンプル形式のままのフレーム (モノラルは1次元、ステレオ以上は (フレーム数, チャンネル数))
+        """
+        try:
+            logger.info(f"テキストを音声に変換しています (ストリーミング): {text[:30]}...")
+            segments = self._split_text(text)
+            if len(segments) > 1:
+                blocks = []
+                for frames in self._iter_segments(segments):
+                    if output_path:
+                        blocks.append(frames)
+                    yield frames
+                if output_path:
+                    sf.write(output_path, np.concatenate(blocks), self.sample_rate)
+                    logger.info(f"音声ファイルを保存しました: {output_path}")
+                return
+            if self.local_model is not None:
+                self.sample_rate, frames = self._infer_local(text, auto_split=True)
+                if output_path:
+                    sf.write(output_path, frames, self.sample_rate)
+                    logger.info(f"音声ファイルを保存しました: {output_path}")
+                yield frames
+                return
+            voice_api_url, params = self._voice_request(text)
+            parser = WavStreamParser()
+            with self._get_with_retry(voice_api_url, params, stream=True) as response, \
+                    (open(output_path, 'wb') if output_path else contextlib.nullcontext()) as f:
+                for data in response.iter_content(chunk_size):
+                    if f is not None:
+                        f.write(data)
+                    frames = parser.feed(data)
+                    if frames is None:
+                        continue
+                    self.sample_rate = parser.sample_rate  # サーバーが返した音声のサンプルレート
+                    yield frames
+            parser.close()
+            if output_path:
+                logger.info(f"音声ファイルを保存しました: {output_path}")
+        except Exception as e:
+            logger.error(f"音声合成中にエラーが発生しました: {str(e)}")
+            raise
+    
+    def synthesize_batch(self, texts):
+        """
+        複数のテキストをまとめて合成し、テキストごとの音声データを返します。
+        
+        サーバーを使う場合は、テキストごとのリクエストを最大 `segmentation.max_workers` 件ずつ並列に送ります
+        (各テキストはサーバーの自動分割で合成します)。プロセス内のモデルで合成する場合は、
+        `style_bert_vits2` の推論が1件ずつのため、順に合成します。
+        
+        Args:
+            texts (list): 合成するテキストのリスト
+            
+        Returns:
+            tuple: (テキストと同じ順の音声データのリスト (`synthesize()` と同じ -1.0〜1.0 のnp.ndarray), サンプルレート)
+                   共有の `self.sample_rate` は並行する合成に書き換えられることがあるため、サンプルレートも一緒に返します。
+        """
+        if not texts:
+            return [], getattr(self, "sample_rate", None)
+        logger.info(f"{len(texts)} 件のテキストをまとめて音声に変換しています")
+        executor = self._get_executor()
+        futures = [executor.submit(self._fetch_segment, text, True) for text in texts]
+        try:
+            results = [future.result() for future in futures]
+        except Exception as e:
+            logger.error(f"音声合成中にエラーが発生しました: {str(e)}")
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+        batch_rate = results[0][1]  # サーバーが返した音声のサンプルレート
+        for frames, sample_rate, channels, dtype in results:
+            if sample_rate != batch_rate:
+                raise ValueError(f"テキストごとの音声のサンプルレートが一致しません: {batch_rate} と {sample_rate}")
+        return [_to_float(frames) for frames, sample_rate, channels, dtype in results], batch_rate
+    
+    def _split_text(self, text):
+        """クライアント側での分割が有効なら文ごとに分割し、無効なら全文を1つの区切りとして返します。"""
+        settings = self.segment_settings
+        if not settings["enabled"]:
+            return [text]
+        return split_sentences(text, settings["min_chars"]) or [text]
+    
+    def _fetch_segment(self, text, auto_split=False):
+        """
+        1つの文を合成し、デコードしたフレームを返します (スレッドプールから呼び出されます)。
+        
+        Returns:
+            tuple: (フレーム, サンプルレート, チャンネル数, dtype)
+        """
+        if self.local_model is not None:
+            sample_rate, frames = self._infer_local(text, auto_split=auto_split)
+            return frames, sample_rate, 1, frames.dtype
+        voice_api_url, params = self._voice_request(text, auto_split=auto_split)
+        response = self._get_with_retry(voice_api_url, params)
+        parser = WavStreamParser()
+        frames = parser.feed(response.content)
+        parser.close()
+        if frames is None:
+            frames = np.zeros((0, parser.channels) if parser.channels > 1 else 0, dtype=parser.dtype)
+        return frames, parser.sample_rate, parser.channels, parser.dtype
+    
+    def _iter_segments(self, segments):
+        """
+        文ごとのリクエストを最大 `max_workers` 件ずつ並列に送り、元の順にフレームを返すジェネレーター。
+        プロセス内のモデルで合成する場合は1件ずつ順に合成し、呼び出し側が前の文を再生している間に次の文を合成します。
+        
+        文と文の間には `split_interval` 秒の無音を挟みます。途中で例外が起きた場合や、
+        呼び出し側が読むのをやめた場合は、まだ送っていないリクエストを取り消します。
+        
+        Args:
+            segments (list): 合成する文のリスト
+            
+        Yields:
+            np.ndarray: WAVのサンプル形式のままのフレーム
+        """
+        executor = self._get_executor()
+        futures = [executor.submit(self._fetch_segment, segment) for segment in segments]
+        try:
+            first_format = None
+            for index, future in enumerate(futures):
+                frames, sample_rate, channels, dtype = future.result()
+                if first_format is None:
+                    first_format = (sample_rate, channels, dtype)
+                    self.sample_rate = sample_rate  # サーバーが返した音声のサンプルレート
+                elif (sample_rate, channels, dtype) != first_format:
+                    raise ValueError(f"文ごとの音声の形式が一致しません: {first_format} と {(sample_rate, channels, dtype)}")
+                if index > 0:
+                    yield _silence(int(sample_rate * self.segment_settings["split_interval"]), channels, dtype)
+                yield frames
+        finally:
+            for future in futures:
+                future.cancel()
+    
+    def _infer_local(self, text, auto_split):
+        """プロセス内のモデルで合成し、(サンプルレート, int16のフレーム) を返します。"""
+        return self.local_model.infer(text, self._voice_request(text, auto_split=auto_split)[1])
+    
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                # プロセス内のモデルは1件ずつしか推論しないため、次の文を先に合成しておく1スレッドで足りる
+                max_workers = 1 if self.local_model is not None else self.segment_settings["max_workers"]
+                self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sbv2-segment")
+            return self._executor
+    
+    def _get_with_retry(self, url, params, stream=False):
+        """
+        GETリクエストを送り、接続エラー・タイムアウト・5xx・429 の場合は待ち時間にジッターを入れて再試行します。
+        
+        サーキットブレーカーが開いている間はサーバーに送らず、すぐに `CircuitOpenError` を送出します。
+        
+        Args:
+            url (str): リクエストのURL
+            params (dict): クエリパラメータ
+            stream (bool, optional): Trueの場合は本文を受信せずに応答を返します (`iter_content` で受信)
+            
+        Returns:
+            requests.Response: ステータス200の応答
+        """
+        settings = self.http_settings
+        timeout = (settings["connect_timeout"], settings["read_timeout"])
+        attempts = settings["max_retries"] + 1
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Style-Bert-VITS2サーバーへの接続に続けて失敗したため、"
+                                       f"{self.breaker.reset_timeout:g} 秒間リクエストを止めています: {url}")
+            try:
+                response = self.session.get(url, params=params, timeout=timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.breaker.record_failure()
+                error = e
+            except requests.RequestException:
+                self.breaker.record_failure()  # 不正なURLなど再試行しても直らないエラー
+                raise
+            else:
+                if response.status_code == 200:
+                    self.breaker.record_success()
+                    return response
+                if response.status_code not in RETRYABLE_STATUS:
+                    # 4xxはリクエストの問題のため、再試行せず、サーバーは正常とみなす
+                    self.breaker.record_success()
+                    logger.error(f"サーバーからエラーレスポンスを受信: {response.status_code} {response.text}")
+                    raise Exception(f"サーバーエラー: {response.status_code}")
+                self.breaker.record_failure()
+                response.close()  # ストリーミングで受信していない本文を捨て、接続をプールに戻す
+                error = Exception(f"サーバーエラー: {response.status_code}")
+            if attempt + 1 < attempts:
+                delay = random.uniform(0, min(settings["retry_backoff_max"], settings["retry_backoff"] * 2 ** attempt))
+                logger.warning(f"リクエストに失敗しました ({error})。{delay:.2f} 秒後に再試行します ({attempt + 1}/{attempts - 1})")
+                time.sleep(delay)
+        raise error
+    
+    def close(self):
+        """文ごとのリクエストを送るスレッドと、サーバーとの接続を閉じます。"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+        self.session.close()
+    
+    def download_model(self, url, save_path, sha256=None, manifest=None, **options):
         """
         モデルをダウンロードします。
         
+        サーバーが Range に対応している場合は、ファイルを `segments` 個の範囲に分けて並列にダウンロードし、
+        途中で接続が切れた範囲は続きから再開します。受信中のデータは `save_path + ".part"` に、
+        範囲ごとの進み具合は `save_path + ".part.json"` に保存するため、失敗したり中断したりした後に
+        同じ引数で呼び出すと、サーバー上のファイルが変わっていない限り続きからダウンロードします。
+        全体を受信し終えたら SHA-256 を確かめ、保存先パスに置き換えます (途中のファイルが保存先に残ることはありません)。
+        
         Args:
             url (str): ダウンロードURL
             save_path (str): 保存先パス
+            sha256 (str, optional): ファイルのSHA-256 (16進数)
+            manifest (dict or str, optional): `{ファイル名: SHA-256}` の辞書か、そのJSONファイルのパス。
+                                              `sha256` を指定しない場合に、保存先のファイル名で検索します
+            **options: `DEFAULT_DOWNLOAD_SETTINGS` の項目 (`segments`, `chunk_size` など)
+            
+        Raises:
+            ValueError: SHA-256 が一致しない場合 (途中のファイルは削除します)
         """
+        settings = dict(DEFAULT_DOWNLOAD_SETTINGS, **self.model_config.get("download", {}))
+        settings.update(options)
+        expected = sha256.lower() if sha256 else (_manifest_sha256(manifest, save_path) if manifest else None)
+        part_path = save_path + ".part"
+        state_path = part_path + ".json"
+        state = None
+        state_lock = threading.Lock()
         try:
             logger.info(f"モデルをダウンロードしています: {url}")
+            if os.path.dirname(save_path):
+                os.makedirs(os.path.dirname(save_path), exist_ok=True)
             
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-            
-            total_size = int(response.headers.get('content-length', 0))
-            block_size = 1024
+            download_url, size, validator = self._probe_download(url)
+            ranges = size is not None and validator is not None
+            state = self._load_download_state(state_path, part_path, url, size, validator) if ranges else None
+            if state is None:
+                segments = _plan_segments(size, settings) if ranges and size else [[0, None, 0]]
+                state = {"url": url, "size": size, "validator": validator, "segments": segments}
+                with open(part_path, "wb") as f:
+                    if size:
+                        f.truncate(size)  # 範囲ごとに書き込む位置を確保しておく
+                if ranges:
+                    _write_json_atomic(state_path, state)
+            else:
+                done = sum(segment[2] for segment in state["segments"])
+                logger.info(f"途中から再開します: {done} / {size} バイト")
             
-            with open(save_path, 'wb') as f, tqdm(
+            pending = [segment for segment in state["segments"]
+                       if segment[1] is None or segment[2] < segment[1] - segment[0] + 1]
+            with tqdm(
                 desc=os.path.basename(save_path),
-                total=total_size,
+                total=size,
+                initial=sum(segment[2] for segment in state["segments"]),
                 unit='iB',
                 unit_scale=True,
                 unit_divisor=1024,
             ) as bar:
-                for data in response.iter_content(block_size):
-                    size = f.write(data)
-                    bar.update(size)
+                def fetch(segment):
+                    self._download_segment(download_url, segment, part_path, ranges, state, state_path, state_lock,
+                                           bar, settings)
+                
+                if len(pending) == 1:
+                    fetch(pending[0])
+                elif pending:
+                    with ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix="model-download") as executor:
+                        for future in [executor.submit(fetch, segment) for segment in pending]:
+                            future.result()
+            
+            if expected:
+                actual = _sha256_file(part_path, settings["chunk_size"])
+                if actual != expected:
+                    for path in (part_path, state_path):
+                        if os.path.exists(path):
+                            os.remove(path)
+                    state = None
+                    raise ValueError(f"ダウンロードしたファイルのSHA-256が一致しません: {actual} (期待値 {expected})")
+                logger.info("SHA-256を確認しました。")
             
+            os.replace(part_path, save_path)
+            if os.path.exists(state_path):
+                os.remove(state_path)
             logger.info(f"モデルのダウンロードが完了しました: {save_path}")
         
         except Exception as e:
             logger.error(f"モデルのダウンロード中にエラーが発生しました: {str(e)}")
-            if os.path.exists(save_path):
-                os.remove(save_path)
+            if state is not None and state["validator"] is not None and os.path.exists(part_path):
+                with state_lock:
+                    _write_json_atomic(state_path, state)  # 次に呼び出したときに続きから再開する
             raise
+    
+    def _probe_download(self, url):
+        """
+        ダウンロードするファイルの情報をHEADリクエストで取得します。
+        
+        Returns:
+            tuple: (リダイレクト後のURL, バイト数, 検証子)。Range で再開できない場合、検証子はNone
+                   (サーバーが Range に対応していない、長さが不明、または ETag・Last-Modified がない)
+        """
+        timeout = (self.http_settings["connect_timeout"], self.http_settings["read_timeout"])
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.warning(f"ファイルの情報を取得できませんでした。1本の接続でダウンロードします: {str(e)}")
+            return url, None, None
+        length = response.headers.get("Content-Length")
+        size = int(length) if length and length.isdigit() else None
+        etag = response.headers.get("ETag")
+        # If-Range には弱いETagを使えないため、その場合は更新日時を使う
+        validator = etag if etag and not etag.startswith("W/") else response.headers.get("Last-Modified")
+        if response.headers.get("Accept-Ranges", "").lower() != "bytes" or not size:
+            validator = None
+        return response.url, size, validator
+    
+    def _load_download_state(self, state_path, part_path, url, size, validator):
+        """前回の進み具合を読み込みます。同じファイルの続きとして使えない場合はNone。"""
+        if not (os.path.exists(state_path) and os.path.exists(part_path)):
+            return None
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (state.get("url"), state.get("size"), state.get("validator")) != (url, size, validator) \
+                or os.path.getsize(part_path) != size:
+            logger.info("サーバー上のファイルが変わったため、最初からダウンロードし直します。")
+            return None
+        return state
+    
+    def _download_segment(self, url, segment, part_path, ranges, state, state_path, state_lock, bar, settings):
+        """
+        ファイルの1つの範囲をダウンロードして `.part` ファイルの同じ位置に書き込みます。
+        
+        接続が切れたりタイムアウトしたりした場合は、受信済みの続きから最大 `max_retries` 回再開します。
+        `segment` ([開始, 終了, 受信済みのバイト数]) の受信済みのバイト数は、ファイルに書き込んだ分だけ進めます。
+        """
+        start, end = segment[0], segment[1]
+        timeout = (self.http_settings["connect_timeout"], self.http_settings["read_timeout"])
+        attempt = 0
+        unsaved = 0
+        with open(part_path, "r+b", buffering=0) as f:
+            while True:
+                offset = start + segment[2]
+                headers = {}
+                if ranges:
+                    headers = {"Range": f"bytes={offset}-{end}", "If-Range": state["validator"]}
+                try:
+                    with self.session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                        response.raise_for_status()
+                        if ranges and response.status_code != 206:
+                            raise RuntimeError("サーバーが範囲を指定したダウンロードに応じませんでした"
+                                               " (ダウンロード中にファイルが更新された可能性があります)")
+                        f.seek(offset)
+                        for data in response.iter_content(settings["chunk_size"]):
+                            if end is not None:
+                                data = data[:end + 1 - (start + segment[2])]
+                            _write_all(f, data)
+                            unsaved += len(data)
+                            with state_lock:
+                                segment[2] += len(data)
+                                bar.update(len(data))
+                                if ranges and unsaved >= settings["state_interval"]:
+                                    _write_json_atomic(state_path, state)
+                                    unsaved = 0
+                    if end is None or segment[2] >= end - start + 1:
+                        return
+                    raise requests.ConnectionError(f"範囲 {start}-{end} の受信が途中で終わりました")
+                except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                    if not ranges or attempt >= settings["max_retries"]:
+                        raise
+                    attempt += 1
+                    delay = random.uniform(0, min(self.http_settings["retry_backoff_max"],
+                                                  self.http_settings["retry_backoff"] * 2 ** (attempt - 1)))
+                    logger.warning(f"ダウンロードが途中で切れました ({e})。{delay:.2f} 秒後に {start + segment[2]} バイト目から"
+                                   f"再開します ({attempt}/{settings['max_retries']})")
+                    time.sleep(delay)
@@ -0,0 +1,78 @@
+"""
+長時間の会話での履歴の大きさと応答遅延のベンチマーク。
+
+合成した会話を数百往復続け、従来の「履歴をすべて送る」場合と、`ChatHistoryManager` で
+直近の往復 + 要約に抑えた場合の、1リクエストあたりの見積もりトークン数・ペイロードの大きさ・
+遅延モデル (固定遅延 + トークン数に比例する遅延) による応答遅延を比較します。
+要約はAIを使わない `truncating_summarizer` で行うため、ネットワークは不要です。
+
+実行例:
+    python benchmarks/bench_chat_history.py --turns 600 --budget 3000
+"""
+import argparse
+import os
+import random
+import sys
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from chat_history import ChatHistoryManager, ManagedChatSession, truncating_summarizer
+
+QUESTIONS = ["Monadって何？", "好きな食べ物は？", "今日の配信何時まで？", "テストネットはいつ？",
+             "おすすめのDAppある？", "関西のどこ出身？", "最近ハマってることは？"]
+REPLY = "それはな、Monadは並列実行でめっちゃ速いL1ブロックチェーンなんや。みんなも触ってみてな！"
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class EchoModel:
+    """固定の応答を返すモデル (リクエストの内容だけを記録します)。"""
+
+    def generate_content(self, contents, stream=False):
+        return _Chunk(REPLY)
+
+
+def run(turns, history, latency_base, latency_per_token, seed):
+    rng = random.Random(seed)
+    session = ManagedChatSession(EchoModel(), history)
+    rows = []
+    for turn in range(1, turns + 1):
+        session.send_message(f"{rng.choice(QUESTIONS)} (視聴者{rng.randrange(100)})")
+        stats = session.last_request
+        rows.append((turn, stats["request_tokens"], stats["payload_bytes"],
+                     latency_base + latency_per_token * stats["request_tokens"]))
+    return rows, history.compactions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="会話履歴の大きさと応答遅延のベンチマーク")
+    parser.add_argument("--turns", type=int, default=600, help="会話の往復数")
+    parser.add_argument("--budget", type=int, default=3000, help="履歴の見積もりトークン数の上限")
+    parser.add_argument("--keep-turns", type=int, default=6, help="そのまま残す直近の往復数")
+    parser.add_argument("--latency-base", type=float, default=0.4, help="遅延モデルの固定遅延 (秒)")
+    parser.add_argument("--latency-per-token", type=float, default=0.00015, help="遅延モデルの1トークンあたりの遅延 (秒)")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    args = parser.parse_args()
+
+    unbounded = ChatHistoryManager(truncating_summarizer(), keep_turns=args.turns, token_budget=float("inf"))
+    managed = ChatHistoryManager(truncating_summarizer(), keep_turns=args.keep_turns, token_budget=args.budget)
+    full_rows, _ = run(args.turns, unbounded, args.latency_base, args.latency_per_token, args.seed)
+    managed_rows, compactions = run(args.turns, managed, args.latency_base, args.latency_per_token, args.seed)
+
+    print(f"{'turn':>6}{'tokens (all)':>15}{'KB (all)':>10}{'latency':>10}"
+          f"{'tokens (managed)':>19}{'KB':>8}{'latency':>10}")
+    checkpoints = sorted({1, 10, 50, 100, 200, 400, args.turns} & set(range(1, args.turns + 1)))
+    for turn in checkpoints:
+        _, ft, fb, fl = full_rows[turn - 1]
+        _, mt, mb, ml = managed_rows[turn - 1]
+        print(f"{turn:>6}{ft:>15}{fb / 1024:>10.1f}{fl:>9.2f}s{mt:>19}{mb / 1024:>8.1f}{ml:>9.2f}s")
+    print(f"要約の実行回数: {compactions}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+asyncio会話コアの負荷試験。
+
+スタブのチャットセッションとTTSを使い、スクリプト化した入力ソースから一定間隔で
+メッセージを送り込みます。最初の音声までの時間 (TTFA) の分布と、
+新しいメッセージによって打ち切られたターンの数を表示します。
+
+実行例:
+    python benchmarks/bench_conversation_core.py --messages 50 --interval 0.5 --speed 8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from conversation_core import ConversationCore, ScriptedInputSource
+from streaming_tts import StubChatSession, StubTTS, iter_response_text, make_sleep_player
+
+REPLY_TEXT = (
+    "はいはい！質問ありがとうな。"
+    "Monadは高性能なLayer-1ブロックチェーンで、並列実行で速いのが自慢なんや。"
+    "他にも聞きたいことがあったら、いつでも聞いてな！"
+)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="asyncio会話コアの負荷試験")
+    parser.add_argument("--messages", type=int, default=30, help="送信するメッセージ数")
+    parser.add_argument("--interval", type=float, default=1.0, help="メッセージの送信間隔 (秒)")
+    parser.add_argument("--speed", type=float, default=4.0, help="再生速度の倍率 (大きいほど早く終わる)")
+    parser.add_argument("--no-interrupt", action="store_true", help="新しいメッセージで古い応答を打ち切らない")
+    args = parser.parse_args()
+
+    chat = StubChatSession(REPLY_TEXT, first_token_delay=0.2)
+    tts = StubTTS(base_latency=0.15)
+    core = ConversationCore(
+        respond=lambda message: iter_response_text(chat.send_message(message.text, stream=True)),
+        synthesize=tts,
+        play=make_sleep_player(speed=args.speed),
+        interrupt=not args.no_interrupt,
+    )
+    source = ScriptedInputSource([f"質問{i}" for i in range(args.messages)], interval=args.interval)
+
+    t0 = time.monotonic()
+    results = asyncio.run(core.run(source))
+    elapsed = time.monotonic() - t0
+
+    ttfa = [r.time_to_first_audio for r in results if r.time_to_first_audio is not None]
+    cancelled = sum(1 for r in results if r.cancelled)
+    print(f"メッセージ: {len(results)} / 打ち切り: {cancelled} / TTS呼び出し: {tts.calls} / 全体: {elapsed:.2f} 秒")
+    if ttfa:
+        print(f"TTFA  mean {statistics.mean(ttfa):.3f} s  p50 {percentile(ttfa, 0.5):.3f} s  "
+              f"p95 {percentile(ttfa, 0.95):.3f} s  max {max(ttfa):.3f} s")
+
+
+if __name__ == "__main__":
+    main()
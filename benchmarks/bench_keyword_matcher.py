@@ -0,0 +1,94 @@
+"""
+特殊応答キーワード照合のベンチマーク。
+
+数千件の合成パターンに対して、従来の「パターンごとに text.lower() して部分一致を調べる」
+線形スキャンと、Aho-Corasickオートマトン (keyword_matcher.KeywordMatcher) の
+1ターンあたりの照合時間を比較します。
+
+実行例:
+    python benchmarks/bench_keyword_matcher.py --patterns 5000 --keywords 4
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from keyword_matcher import build_response_matcher
+
+ALPHABET = "あいうえおかきくけこさしすせそたちつてとなにぬねのモナミンabcdefghijklmnopqrstuvwxyz"
+
+
+def naive_check_special_response(text, patterns_data):
+    """従来の check_special_response と同じ線形スキャン。"""
+    for pattern_group in patterns_data["patterns"]:
+        keywords = pattern_group.get("keywords", [])
+        if any(isinstance(keyword, str) and keyword.lower() in text.lower() for keyword in keywords):
+            return pattern_group.get("response")
+    return None
+
+
+def make_patterns(n_patterns, n_keywords, rng):
+    patterns = []
+    for i in range(n_patterns):
+        keywords = ["".join(rng.choice(ALPHABET) for _ in range(rng.randint(4, 10))) for _ in range(n_keywords)]
+        patterns.append({"keywords": keywords, "response": f"response {i}"})
+    return {"patterns": patterns}
+
+
+def make_inputs(patterns_data, n_inputs, rng):
+    inputs = []
+    for i in range(n_inputs):
+        filler = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(20, 80)))
+        if i % 4 == 0:
+            # 4回に1回は後ろの方のパターンに一致させる (線形スキャンの最悪に近いケース)
+            group = patterns_data["patterns"][rng.randint(len(patterns_data["patterns"]) // 2,
+                                                          len(patterns_data["patterns"]) - 1)]
+            filler = filler[:10] + group["keywords"][0].upper() + filler[10:]
+        inputs.append(filler)
+    return inputs
+
+
+def bench(func, inputs, repeat):
+    t0 = time.perf_counter()
+    results = None
+    for _ in range(repeat):
+        results = [func(text) for text in inputs]
+    return (time.perf_counter() - t0) / (repeat * len(inputs)), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="キーワード照合のベンチマーク")
+    parser.add_argument("--patterns", type=int, default=5000, help="パターングループ数")
+    parser.add_argument("--keywords", type=int, default=4, help="1グループあたりのキーワード数")
+    parser.add_argument("--inputs", type=int, default=200, help="照合する入力の数")
+    parser.add_argument("--repeat", type=int, default=3, help="繰り返し回数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    patterns_data = make_patterns(args.patterns, args.keywords, rng)
+    inputs = make_inputs(patterns_data, args.inputs, rng)
+
+    t0 = time.perf_counter()
+    matcher = build_response_matcher(patterns_data)
+    build_time = time.perf_counter() - t0
+
+    naive_time, naive_results = bench(lambda text: naive_check_special_response(text, patterns_data), inputs, args.repeat)
+    ac_time, ac_results = bench(matcher.match, inputs, args.repeat)
+    assert naive_results == ac_results, "照合結果が一致しません"
+
+    print(f"パターン: {args.patterns} グループ x {args.keywords} キーワード / 入力: {args.inputs} 件")
+    print(f"オートマトン構築: {build_time * 1000:.1f} ms (起動時に1回)")
+    print(f"{'method':<14}{'per turn (us)':>16}")
+    print(f"{'linear scan':<14}{naive_time * 1e6:>16.1f}")
+    print(f"{'aho-corasick':<14}{ac_time * 1e6:>16.1f}")
+    print(f"高速化: {naive_time / ac_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+TTS応答から出力デバイスまでのPCM処理のメモリ・遅延ベンチマーク。
+
+原稿読み上げモードの数分間の段落を想定したint16 PCMについて、
+従来の「np.frombuffer → astype(float32) / 32768 → 再生」と、
+int16のままmemoryviewで再生エンジンに流す経路を比較します。
+出力はサウンドカード不要の NullBackend (できるだけ速く消費) に送ります。
+
+実行例:
+    python benchmarks/bench_pcm_path.py --minutes 5
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from audio_playback import NullBackend, PlaybackEngine
+
+SAMPLE_RATE = 24000
+BLOCKSIZE = 1024
+
+
+def legacy_path(pcm):
+    """従来の経路: float32に変換してから、ブロック単位で出力バッファにコピーする。"""
+    t0 = time.perf_counter()
+    audio_array = np.frombuffer(pcm, dtype=np.int16)
+    audio_array_float32 = audio_array.astype(np.float32) / 32768.0
+    ready = time.perf_counter() - t0
+    outdata = np.zeros((BLOCKSIZE, 1), dtype=np.float32)
+    for start in range(0, len(audio_array_float32), BLOCKSIZE):
+        block = audio_array_float32[start:start + BLOCKSIZE]
+        outdata[:len(block), 0] = block
+    return ready, time.perf_counter() - t0
+
+
+def engine_path(pcm):
+    """新しい経路: int16のまま再生エンジンに渡し、コールバックでmemoryviewをコピーする。"""
+    engine = PlaybackEngine(NullBackend(realtime=False), samplerate=SAMPLE_RATE, blocksize=BLOCKSIZE)
+    engine.start()
+    t0 = time.perf_counter()
+    engine.enqueue(pcm)
+    ready = time.perf_counter() - t0
+    engine.flush()
+    total = time.perf_counter() - t0
+    engine.close()
+    return ready, total
+
+
+def measure(func, pcm):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    ready, total = func(pcm)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ready, total, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PCM処理経路のメモリ・遅延ベンチマーク")
+    parser.add_argument("--minutes", type=float, default=5.0, help="段落の長さ (分)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    pcm = rng.integers(-8000, 8000, int(args.minutes * 60 * SAMPLE_RATE), dtype=np.int16).tobytes()
+    print(f"段落の長さ: {args.minutes:.1f} 分 / PCM: {len(pcm) / 1e6:.1f} MB (int16, {SAMPLE_RATE} Hz)")
+
+    results = {"legacy float32": measure(legacy_path, pcm), "int16 zero-copy": measure(engine_path, pcm)}
+    print(f"{'path':<18}{'ready (ms)':>12}{'total (ms)':>12}{'peak alloc (MB)':>17}")
+    for name, (ready, total, peak) in results.items():
+        print(f"{name:<18}{ready * 1000:>12.2f}{total * 1000:>12.1f}{peak / 1e6:>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+似た質問のまとめ (QuestionBatcher) のベンチマーク。
+
+配信中のコメントを模した合成チャットを生成し、時間窓ごとに似た質問をまとめた場合に
+省略できるAIへの質問の数と、誤って別の話題をまとめてしまったグループの割合を表示します。
+`--write-jsonl` を指定すると、同じ合成チャットを `--chat-replay` で再生できるJSONLとして書き出します。
+
+実行例:
+    python benchmarks/bench_question_batcher.py --messages 2000 --per-minute 300 --window 3
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from conversation_core import UserMessage
+from question_batcher import QuestionBatcher
+
+# 話題ごとの言い回し (表記ゆれ・語尾の違いを含む)
+TOPICS = {
+    "intro": ["自己紹介して", "自己紹介して！", "自己紹介してください", "自己紹介お願い", "Introduce yourself",
+              "introduce yourself please"],
+    "monad": ["What is Monad?", "what is monad", "Monadって何？", "Monadってなに", "monadって何ですか"],
+    "food": ["好きな食べ物は？", "好きな食べ物は何？", "好きな食べ物教えて", "What's your favorite food?"],
+    "testnet": ["テストネットはいつ？", "テストネットっていつ始まるの", "when is the testnet", "When is testnet?"],
+    "tps": ["Monadって何TPS出るの？", "Monadの TPS は？", "how many tps does monad do"],
+}
+SUFFIXES = ["", "", "", "!", "！！", "？", " w", "〜"]
+# どの話題にも当てはまらない、1回きりのコメント
+ONE_OFFS = ["こんばんは", "初見です", "今日の配信何時まで？", "BGMいいね", "おつかれさま", "画面見えない",
+            "声かわいい", "次の企画は？", "昨日の配信見たよ", "今日寒いね", "猫飼ってる？", "ゲームしないの？"]
+
+
+def generate_chat(messages, per_minute, one_off_ratio, seed):
+    rng = random.Random(seed)
+    t = 0.0
+    chat = []
+    for i in range(messages):
+        t += rng.expovariate(per_minute / 60.0)
+        if rng.random() < one_off_ratio:
+            topic, text = f"one-off-{i}", rng.choice(ONE_OFFS) + rng.choice(SUFFIXES)
+        else:
+            topic = rng.choice(list(TOPICS))
+            text = rng.choice(TOPICS[topic]) + rng.choice(SUFFIXES)
+        chat.append({"timestamp": round(t, 3), "user": f"viewer{rng.randrange(messages // 3 + 1)}",
+                     "text": text, "topic": topic})
+    return chat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="似た質問のまとめのベンチマーク")
+    parser.add_argument("--messages", type=int, default=2000, help="合成するコメント数")
+    parser.add_argument("--per-minute", type=float, default=300, help="1分あたりのコメント数")
+    parser.add_argument("--window", type=float, default=3.0, help="まとめる時間窓 (秒)")
+    parser.add_argument("--threshold", type=float, default=0.7, help="同じ質問とみなすJaccard係数の下限")
+    parser.add_argument("--one-off-ratio", type=float, default=0.3, help="話題に属さないコメントの割合")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    parser.add_argument("--write-jsonl", type=str, default=None, help="合成チャットを書き出すJSONLファイル")
+    args = parser.parse_args()
+
+    chat = generate_chat(args.messages, args.per_minute, args.one_off_ratio, args.seed)
+    if args.write_jsonl:
+        with open(args.write_jsonl, "w", encoding="utf-8") as f:
+            for record in chat:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        print(f"合成チャットを {args.write_jsonl} に書き出しました。")
+
+    batcher = QuestionBatcher(window=args.window, threshold=args.threshold)
+    groups = []
+    topics = {}
+    t0 = time.perf_counter()
+    for record in chat:
+        message = UserMessage(record["text"], user=record["user"], source="replay")
+        topics[id(message)] = record["topic"].split("-")[0] if record["topic"].startswith("one-off") else record["topic"]
+        groups.extend(batcher.pop_ready(now=record["timestamp"]))
+        batcher.add(message, now=record["timestamp"])
+    groups.extend(batcher.flush())
+    elapsed = time.perf_counter() - t0
+
+    mixed = sum(1 for g in groups if len({topics[id(m)] for m in g.messages} - {"one"}) > 1)
+    sizes = Counter(min(g.size, 5) for g in groups)
+    calls = len(groups)
+    print(f"コメント: {len(chat)} ({args.per_minute:.0f}/分, 時間窓 {args.window:.1f} 秒)")
+    print(f"AIへの質問: {calls} 回 (省略 {len(chat) - calls} 回, {100 * (1 - calls / len(chat)):.1f}% 削減)")
+    print(f"別の話題が混ざったグループ: {mixed} / {calls}")
+    print("グループの大きさ: " + ", ".join(f"{'5+' if k == 5 else k}: {v}" for k, v in sorted(sizes.items())))
+    print(f"処理時間: {elapsed * 1e6 / len(chat):.1f} µs/コメント")
+
+
+if __name__ == "__main__":
+    main()
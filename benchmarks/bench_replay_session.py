@@ -0,0 +1,237 @@
+"""
+記録した会話を AITuber.py のターン処理 (`process_turn`) で再生するベンチマーク。
+
+会話ログ (`logs/conversation_log.txt` 形式のテキスト、または会話ログ・チャット再生用のJSONL) から
+ユーザーの入力を取り出し、LLM・TTSをスタブのプロバイダーに、音声出力を `NullBackend` に差し替えて、
+特殊応答の判定・AI応答キャッシュ・会話履歴・TTS音声キャッシュ・再生を含むターン処理をそのまま実行します。
+スループット (ターン/秒)・区間ごとの遅延 (p50/p95)・Pythonのメモリ使用量のピーク (tracemalloc) を計測し、
+保存した基準値 (`benchmarks/baselines/replay_session.json`) より `--tolerance` 以上悪化していれば終了コード1で終わります。
+
+基準値は計測したマシンに依存します。別のマシンで比較する場合は、先に変更前のコードで
+`--update-baseline` を実行してください。キャッシュ・ログは一時ディレクトリに書き込まれ、`logs/` や `cache/` は変更しません。
+
+実行例:
+    python benchmarks/bench_replay_session.py
+    python benchmarks/bench_replay_session.py --session logs/conversation_log.txt --repeat 3 --no-check
+    python benchmarks/bench_replay_session.py --streaming --baseline benchmarks/baselines/replay_session_streaming.json
+    python benchmarks/bench_replay_session.py --update-baseline
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from chat_ingest import JSONLReplaySource
+
+DEFAULT_SESSION = os.path.join(os.path.dirname(__file__), "fixtures", "session_ja.jsonl")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "replay_session.json")
+
+# テキストの会話ログの見出し行: "[2025-05-29 14:43:31] User: ..." / "[14:43:31] User (ja-JP): ..."
+_LOG_LINE_PATTERN = re.compile(r"^\[(?:\d{4}-\d{2}-\d{2} )?\d{2}:\d{2}:\d{2}\] ([^:()]+?)(?: \(([^)]*)\))?: (.*)$")
+
+# 比較する区間 (latency_metrics.SPANS のうち、ターン処理の遅延を表すもの)
+CHECKED_SPANS = ("pattern_match", "llm_total", "tts_first_byte", "time_to_first_audio", "turn_total")
+
+
+def load_session(path, speaker="User"):
+    """会話ログからユーザーの入力を順に取り出します。
+
+    Args:
+        path (str): テキストの会話ログ、またはJSONL (`speaker`/`message` の会話ログ、`text`/`user` のチャット記録)
+        speaker (str, optional): 入力として取り出す発言者名 (会話ログの場合)
+
+    Returns:
+        list[str]: 入力テキストのリスト
+    """
+    inputs = []
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if "speaker" in record:
+                    if record["speaker"] == speaker and record.get("message"):
+                        inputs.append(record["message"])
+                else:
+                    text = next((record[k] for k in JSONLReplaySource.TEXT_KEYS if record.get(k)), None)
+                    if text:
+                        inputs.append(str(text))
+        return inputs
+
+    current = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            match = _LOG_LINE_PATTERN.match(line.rstrip("\n"))
+            if match:
+                if current is not None:
+                    inputs.append(current.strip())
+                current = match.group(3) if match.group(1) == speaker else None
+            elif current is not None and line.strip():
+                current += "\n" + line.rstrip("\n")
+    if current is not None:
+        inputs.append(current.strip())
+    return [text for text in inputs if text]
+
+
+def load_aituber(tmp_dir, args):
+    """AITuber.py を読み込み、スタブのプロバイダー・無音の出力・一時ディレクトリのキャッシュとログに差し替えます。"""
+    os.chdir(project_root)  # config.local.json / response_patterns.json は作業ディレクトリから読まれる
+    import AITuber as aituber
+    aituber.load_config(aituber.parse_arguments([]))
+
+    from audio_playback import NullBackend
+    from conversation_logger import ConversationLogger
+
+    aituber.PROVIDER_SETTINGS = {
+        "llm": {"name": "stub", "stub": {"latency": args.llm_latency, "chunk_interval": args.llm_chunk_interval}},
+        "tts": {"name": "stub", "stub": {"latency": args.tts_latency, "seconds_per_char": args.tts_seconds_per_char}},
+    }
+    aituber._tts_provider = None
+    aituber.TTS_CACHE_SETTINGS = {"enabled": not args.no_tts_cache, "directory": os.path.join(tmp_dir, "tts")}
+    aituber.RESPONSE_CACHE_SETTINGS = {"enabled": not args.no_response_cache,
+                                       "path": os.path.join(tmp_dir, "responses.sqlite3")}
+    aituber._conversation_logger = ConversationLogger(os.path.join(tmp_dir, "logs"), jsonl=True)
+    aituber.PLAYBACK_BACKEND_FACTORY = lambda device: NullBackend(realtime=True, speed=args.playback_speed)
+    return aituber
+
+
+def replay(aituber, inputs, repeat, streaming, verbose):
+    """入力を順にターン処理に渡し、計測結果を返します。"""
+    chat_session = aituber.create_chat_session()
+    matcher = aituber.build_response_matcher(aituber.load_response_patterns())
+    recorder = aituber.get_latency_recorder()
+    language = aituber.TARGET_LANGUAGE_BCP47
+    quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    with quiet:
+        for _ in range(repeat):
+            for text in inputs:
+                timer = recorder.start_turn("interactive")
+                language = aituber.process_turn(text, chat_session, matcher, language, timer, streaming=streaming)
+        aituber.wait_for_playback()
+    elapsed = time.perf_counter() - started_at
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    summary = recorder.summary()
+    turns = len(inputs) * repeat
+    return {
+        "turns": turns,
+        "elapsed_seconds": round(elapsed, 3),
+        "turns_per_second": round(turns / elapsed, 3),
+        "peak_memory_mb": round(peak_bytes / 1024 / 1024, 2),
+        "latency_p50": {name: round(stats["p50"], 4) for (kind, name), stats in sorted(summary.items())},
+        "latency_p95": {name: round(stats["p95"], 4) for (kind, name), stats in sorted(summary.items())},
+    }
+
+
+def compare(result, baseline, tolerance, slack=0.005):
+    """基準値と比べて悪化した項目のメッセージのリストを返します。
+
+    Args:
+        result (dict): 今回の計測結果
+        baseline (dict): 基準値
+        tolerance (float): 許容する悪化の割合
+        slack (float, optional): 遅延の比較で許容する絶対値 (秒)。ごく短い区間の揺らぎを無視するためです。
+    """
+    regressions = []
+    if result["turns_per_second"] < baseline["turns_per_second"] * (1 - tolerance):
+        regressions.append(f"スループット: {result['turns_per_second']:.2f} ターン/秒 "
+                           f"(基準 {baseline['turns_per_second']:.2f})")
+    if result["peak_memory_mb"] > baseline["peak_memory_mb"] * (1 + tolerance):
+        regressions.append(f"メモリのピーク: {result['peak_memory_mb']:.1f} MB (基準 {baseline['peak_memory_mb']:.1f})")
+    for name in CHECKED_SPANS:
+        base = baseline["latency_p95"].get(name)
+        value = result["latency_p95"].get(name)
+        if base is not None and value is not None and value > base * (1 + tolerance) + slack:
+            regressions.append(f"p95 {name}: {value * 1000:.1f} ms (基準 {base * 1000:.1f})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="記録した会話をターン処理で再生するベンチマーク")
+    parser.add_argument("--session", type=str, default=DEFAULT_SESSION, help="再生する会話ログ (.txt または .jsonl)")
+    parser.add_argument("--speaker", type=str, default="User", help="入力として取り出す発言者名")
+    parser.add_argument("--repeat", type=int, default=2, help="会話を繰り返す回数 (2回目以降はキャッシュが効きます)")
+    parser.add_argument("--streaming", action="store_true", help="文単位ストリーミングTTSで再生する")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="スタブLLMの最初の断片までの遅延 (秒)")
+    parser.add_argument("--llm-chunk-interval", type=float, default=0.005, help="スタブLLMの断片ごとの間隔 (秒)")
+    parser.add_argument("--tts-latency", type=float, default=0.02, help="スタブTTSの1回の合成の遅延 (秒)")
+    parser.add_argument("--tts-seconds-per-char", type=float, default=0.0005, help="スタブTTSの1文字あたりの遅延 (秒)")
+    parser.add_argument("--playback-speed", type=float, default=1000.0,
+                        help="無音の出力で再生する速さ (実時間の倍率。大きくすると再生待ちが溜まらず、ターン処理だけを計測できます)")
+    parser.add_argument("--no-tts-cache", action="store_true", help="TTS音声キャッシュを使わない")
+    parser.add_argument("--no-response-cache", action="store_true", help="AI応答キャッシュを使わない")
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE, help="基準値のJSONファイル")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="許容する悪化の割合")
+    parser.add_argument("--update-baseline", action="store_true", help="今回の結果を基準値として保存する")
+    parser.add_argument("--no-check", action="store_true", help="基準値と比較しない")
+    parser.add_argument("--verbose", action="store_true", help="ターン処理の出力を表示する")
+    args = parser.parse_args()
+
+    inputs = load_session(args.session, args.speaker)
+    if not inputs:
+        print(f"エラー: {args.session} に '{args.speaker}' の発言が見つかりません。")
+        sys.exit(2)
+
+    tmp_dir = tempfile.mkdtemp(prefix="aituber-replay-")
+    try:
+        aituber = load_aituber(tmp_dir, args)
+        result = replay(aituber, inputs, args.repeat, args.streaming, args.verbose)
+        aituber.get_conversation_logger().close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    settings = {key: getattr(args, key) for key in ("repeat", "streaming", "llm_latency", "llm_chunk_interval",
+                                                    "tts_latency", "tts_seconds_per_char", "playback_speed",
+                                                    "no_tts_cache", "no_response_cache")}
+    settings["session"] = os.path.relpath(os.path.abspath(args.session), project_root)
+    print(f"\n会話: {settings['session']} ({len(inputs)} 入力 x {args.repeat} 回)")
+    print(f"スループット: {result['turns_per_second']:.2f} ターン/秒 ({result['turns']} ターン, {result['elapsed_seconds']:.2f} 秒)")
+    print(f"メモリのピーク (tracemalloc): {result['peak_memory_mb']:.1f} MB")
+    print(f"{'区間':<22}{'p50':>10}{'p95':>10}")
+    for name, p50 in result["latency_p50"].items():
+        print(f"{name:<22}{p50 * 1000:>8.1f}ms{result['latency_p95'][name] * 1000:>8.1f}ms")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, **result}, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"\n基準値を {args.baseline} に保存しました。")
+        return
+    if args.no_check:
+        return
+    if not os.path.exists(args.baseline):
+        print(f"\n基準値 {args.baseline} がないため比較しません (--update-baseline で作成できます)。")
+        return
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != settings:
+        print("\n警告: 基準値と計測の設定が異なります。比較結果は参考値です。")
+    regressions = compare(result, baseline, args.tolerance)
+    if regressions:
+        print(f"\n基準値から {args.tolerance:.0%} 以上悪化しました:")
+        for message in regressions:
+            print(f"  - {message}")
+        sys.exit(1)
+    print(f"\n基準値との比較: OK (許容 {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
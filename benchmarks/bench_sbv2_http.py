@@ -0,0 +1,93 @@
+"""
+Style-Bert-VITS2 サーバーへのリクエストの1件あたりのオーバーヘッドのベンチマーク。
+
+ローカルのスタブ `/voice` サーバー (合成時間 0) に同じ短文を繰り返し送り、
+従来の「毎回 `requests.get` で接続し直す」場合と、`StyleBertVITS2` の接続を使い回すセッションの場合
+(セッションのみ、および `synthesize()` 全体) の1リクエストあたりの時間 (平均・p50・p95) と、サーバーが受け付けた接続数を比較します。
+
+実行例:
+    python benchmarks/bench_sbv2_http.py --requests 300
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import requests
+
+from backend.tts_engine import StyleBertVITS2
+from latency_metrics import percentile
+from stub_voice_server import StubVoiceServer
+
+TEXT = "こんにちは"
+
+
+def create_engine(server_url, tmp_dir, segmentation=None):
+    """スタブサーバーに接続する `StyleBertVITS2` を、一時ディレクトリの設定ファイルで作成します。"""
+    config_path = os.path.join(tmp_dir, "config.json")
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump({"style_bert_vits2": {
+            "model_path": os.path.join(tmp_dir, "models"),
+            "config_path": os.path.join(tmp_dir, "models", "config.json"),  # 存在しない (サーバーのみ使用)
+            "device": "cpu", "language": "JP", "speaker_id": 0, "style_id": 0,
+            "noise_scale": 0.6, "noise_scale_w": 0.8, "length_scale": 1.0,
+            "server_url": server_url, "segmentation": segmentation or {},
+        }}, f)
+    return StyleBertVITS2(config_path)
+
+
+def measure(call, count):
+    times = []
+    for _ in range(count):
+        started_at = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - started_at)
+    return sorted(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Style-Bert-VITS2 サーバーへのリクエストのオーバーヘッドのベンチマーク")
+    parser.add_argument("--requests", type=int, default=300, help="リクエストの回数")
+    args = parser.parse_args()
+    logging.getLogger("backend.tts_engine").setLevel(logging.WARNING)
+
+    with StubVoiceServer() as server, tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(server.url, tmp_dir)
+        url = f"{server.url}/voice"
+
+        def bare():
+            response = requests.get(url, params={"text": TEXT})
+            response.raise_for_status()
+            return response.content
+
+        def pooled():
+            response = engine.session.get(url, params={"text": TEXT})
+            response.raise_for_status()
+            return response.content
+
+        rows = []
+        for name, call in (("requests.get (毎回接続)", bare), ("Session.get (接続を使い回す)", pooled),
+                           ("StyleBertVITS2.synthesize", lambda: engine.synthesize(TEXT))):
+            call()  # ウォームアップ
+            connections_before = server.connections
+            times = measure(call, args.requests)
+            rows.append((name, times, server.connections - connections_before))
+        engine.close()
+
+    print(f"{'方式':<32}{'平均':>9}{'p50':>9}{'p95':>9}{'接続数':>8}")
+    for name, times, connections in rows:
+        print(f"{name:<32}{statistics.mean(times) * 1000:>7.2f}ms{percentile(times, 50) * 1000:>7.2f}ms"
+              f"{percentile(times, 95) * 1000:>7.2f}ms{connections:>8}")
+    print("(StyleBertVITS2.synthesize は接続を使い回すセッションで送り、WAVのデコードを含みます)")
+
+
+if __name__ == "__main__":
+    main()
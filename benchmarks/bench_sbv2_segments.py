@@ -0,0 +1,81 @@
+"""
+Style-Bert-VITS2 の長文を文ごとに分けて並列に合成する場合の、合成時間のベンチマーク。
+
+ローカルのスタブ `/voice` サーバー (1回の合成に `latency + seconds_per_char * 文字数` 秒かかる) に、
+- 従来どおり全文を1回のリクエストで送る場合 (`segmentation.enabled = false`、サーバーの auto_split に任せる)
+- 文ごとに分けて、`max_workers` 件ずつ並列に送る場合
+の、`synthesize()` が音声全体を返すまでの時間と、`synthesize_stream()` が最初の音声を返すまでの時間を比較します。
+スタブサーバーはリクエストを並列に処理します。実際のサーバーでの効果は、サーバーが同時に合成できる数に左右されます。
+
+実行例:
+    python benchmarks/bench_sbv2_segments.py --sentences 6 --latency 0.15 --seconds-per-char 0.01
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from bench_sbv2_http import create_engine
+from stub_voice_server import StubVoiceServer
+
+SENTENCES = [
+    "みんな、Gmonamin！モナミンだよ。",
+    "今日はMonadのテストネットについてお話しするね！",
+    "Monadは並列実行でとっても速いブロックチェーンなんだ。",
+    "テストネットなら、無料でdAppsを試せるよ。",
+    "わからないことがあったら、気軽にコメントしてね！",
+    "それじゃあ、さっそく始めていこう。",
+]
+
+
+def measure(engine, text):
+    started_at = time.perf_counter()
+    first = None
+    for _ in engine.synthesize_stream(text):
+        if first is None:
+            first = time.perf_counter() - started_at
+    stream_total = time.perf_counter() - started_at
+    started_at = time.perf_counter()
+    engine.synthesize(text)
+    return first, stream_total, time.perf_counter() - started_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Style-Bert-VITS2 の文ごとの並列合成のベンチマーク")
+    parser.add_argument("--sentences", type=int, default=6, help="合成する文の数")
+    parser.add_argument("--latency", type=float, default=0.15, help="スタブサーバーの1回の合成の固定の遅延 (秒)")
+    parser.add_argument("--seconds-per-char", type=float, default=0.01, help="スタブサーバーの1文字あたりの合成の遅延 (秒)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="比較する同時リクエスト数")
+    parser.add_argument("--runs", type=int, default=3, help="計測の回数 (中央値を使います)")
+    args = parser.parse_args()
+    logging.getLogger("backend.tts_engine").setLevel(logging.ERROR)
+
+    text = "".join((SENTENCES * args.sentences)[:args.sentences])
+    settings = [("全文を1回で送る (auto_split)", {"enabled": False})]
+    settings += [(f"文ごと・同時 {workers} 件", {"max_workers": workers}) for workers in args.workers]
+    results = []
+    with StubVoiceServer(latency=args.latency, seconds_per_char=args.seconds_per_char) as server:
+        for name, segmentation in settings:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                engine = create_engine(server.url, tmp_dir, segmentation)
+                engine.synthesize("ウォームアップ")
+                runs = [measure(engine, text) for _ in range(args.runs)]
+                engine.close()
+            results.append((name, [statistics.median(run[i] for run in runs) for i in range(3)]))
+
+    baseline = results[0][1][2]
+    print(f"テキスト: {len(text)} 文字 ({args.sentences} 文), 合成の遅延 {args.latency:g} 秒 + {args.seconds_per_char:g} 秒/文字")
+    print(f"{'方式':<28}{'最初の音声':>12}{'全体 (stream)':>14}{'全体 (synthesize)':>18}{'速度比':>8}")
+    for name, (first, stream_total, total) in results:
+        print(f"{name:<28}{first * 1000:>10.0f}ms{stream_total * 1000:>12.0f}ms{total * 1000:>16.0f}ms{baseline / total:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Style-Bert-VITS2 の音声を受信しながら再生する場合の、最初の音声までの時間のベンチマーク。
+
+ローカルのスタブ `/voice` サーバーから、本文を一定の速さ (`--bytes-per-second`) で送るWAVを受け取り、
+- 従来の `synthesize()` (全体を受信してからデコード。ファイル経由の再生ではさらに書き込みと読み込み)
+- `synthesize_stream()` (ヘッダーを解析し、届いた分のフレームをすぐに返す)
+の、最初の音声のフレームが手に入るまでの時間と、全体を受け取るまでの時間を比較します。
+
+実行例:
+    python benchmarks/bench_sbv2_streaming.py --chars 80 --bytes-per-second 400000
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from bench_sbv2_http import create_engine
+from stub_voice_server import StubVoiceServer
+
+
+def measure_buffered(engine, text):
+    started_at = time.perf_counter()
+    audio = engine.synthesize(text)
+    elapsed = time.perf_counter() - started_at
+    return elapsed, elapsed, len(audio)
+
+
+def measure_streaming(engine, text):
+    started_at = time.perf_counter()
+    first = None
+    frames = 0
+    for block in engine.synthesize_stream(text):
+        if first is None:
+            first = time.perf_counter() - started_at
+        frames += len(block)
+    return first, time.perf_counter() - started_at, frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Style-Bert-VITS2 の音声のストリーミング受信のベンチマーク")
+    parser.add_argument("--chars", type=int, default=80, help="合成するテキストの文字数")
+    parser.add_argument("--bytes-per-second", type=float, default=400000, help="スタブサーバーが本文を送る速さ (バイト/秒)")
+    parser.add_argument("--latency", type=float, default=0.05, help="スタブサーバーの合成の固定の遅延 (秒)")
+    parser.add_argument("--runs", type=int, default=5, help="計測の回数 (中央値を使います)")
+    args = parser.parse_args()
+    logging.getLogger("backend.tts_engine").setLevel(logging.ERROR)
+
+    text = ("モナミンだよ。" * args.chars)[:args.chars]
+    with StubVoiceServer(latency=args.latency, bytes_per_second=args.bytes_per_second) as server, \
+            tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(server.url, tmp_dir)
+        engine.synthesize("ウォームアップ")
+        results = {}
+        for name, measure in (("synthesize (全体を受信)", measure_buffered), ("synthesize_stream", measure_streaming)):
+            runs = [measure(engine, text) for _ in range(args.runs)]
+            results[name] = runs
+        engine.close()
+
+    seconds = results["synthesize_stream"][0][2] / engine.sample_rate
+    print(f"音声: {seconds:.1f} 秒 ({args.chars} 文字), 送信速度 {args.bytes_per_second / 1000:.0f} KB/s")
+    print(f"{'方式':<28}{'最初の音声':>12}{'全体':>10}")
+    for name, runs in results.items():
+        first = statistics.median(run[0] for run in runs)
+        total = statistics.median(run[1] for run in runs)
+        print(f"{name:<28}{first * 1000:>10.1f}ms{total * 1000:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+AITuber.py の起動時間のベンチマーク。
+
+1. `python -X importtime -c "import AITuber"` を別プロセスで繰り返し実行し、読み込み時間 (中央値) と
+   時間のかかったモジュールを表示します。numpy・sounddevice・google.generativeai・asyncio などの
+   重いモジュールが読み込み時に読み込まれていないことも確認します。
+2. スタブのLLM/TTSでインタラクティブモードを起動し、プロンプト (「あなた: 」) が表示されるまでの時間
+   (time-to-prompt) を計測します。クライアントの初期化はバックグラウンドで行われるため、プロンプトを待たせません。
+   作業ディレクトリは一時ディレクトリにするため、キャッシュやログはプロジェクトに書き込まれません。
+
+予算を超えた場合や重いモジュールが読み込まれていた場合は終了コード 1 で終わります。
+
+実行例:
+    python benchmarks/bench_startup.py --import-budget-ms 300 --prompt-budget 1.0
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# 読み込み時に読み込まれていてはいけないモジュール (使う時点で読み込む)
+HEAVY_MODULES = ("numpy", "sounddevice", "soundfile", "google.generativeai", "torch", "asyncio", "http.server")
+PROMPT = "あなた: ".encode("utf-8")
+
+_IMPORTTIME_PATTERN = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_import(python=sys.executable):
+    """`import AITuber` を1回実行し、(AITuberの累積読み込み時間 (秒), {モジュール: (自身の時間, 累積時間)}) を返します。"""
+    result = subprocess.run([python, "-X", "importtime", "-c", "import AITuber"], cwd=project_root,
+                            capture_output=True, text=True, encoding="utf-8")
+    if result.returncode != 0:
+        raise RuntimeError(f"AITuber.py の読み込みに失敗しました:\n{result.stderr[-2000:]}")
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_PATTERN.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)) / 1e6, int(match.group(2)) / 1e6)
+    return modules["AITuber"][1], modules
+
+
+def measure_time_to_prompt(timeout=30.0, python=sys.executable):
+    """スタブのプロバイダーでインタラクティブモードを起動し、プロンプトが表示されるまでの秒数を返します。"""
+    work_dir = tempfile.mkdtemp(prefix="aituber-startup-")
+    try:
+        for name in ("config.local.json", "response_patterns.json"):
+            if os.path.exists(os.path.join(project_root, name)):
+                shutil.copy(os.path.join(project_root, name), work_dir)
+        command = [python, os.path.join(project_root, "AITuber.py"), "--mode", "interactive",
+                   "--llm-provider", "stub", "--tts-provider", "stub"]
+        started_at = time.perf_counter()
+        process = subprocess.Popen(command, cwd=work_dir, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT)
+        output = bytearray()
+        prompted = threading.Event()
+        prompt_at = []
+
+        def read_output():
+            while True:
+                data = process.stdout.read1(4096)
+                if not data:
+                    break
+                output.extend(data)
+                if not prompted.is_set() and PROMPT in output:
+                    prompt_at.append(time.perf_counter())
+                    prompted.set()
+
+        reader = threading.Thread(target=read_output, daemon=True)
+        reader.start()
+        prompted.wait(timeout)
+        # 終了コマンドは会話ログを書くため、プロンプトを確認したらプロセスを止める
+        process.kill()
+        process.wait()
+        reader.join(timeout=5)
+        if not prompt_at:
+            raise RuntimeError("プロンプトが表示されませんでした:\n" + output.decode("utf-8", "replace")[-2000:])
+        return prompt_at[0] - started_at
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AITuber.py の起動時間のベンチマーク")
+    parser.add_argument("--runs", type=int, default=5, help="計測の回数 (中央値を使います)")
+    parser.add_argument("--import-budget-ms", type=float, default=300.0, help="`import AITuber` の時間の予算 (ミリ秒)")
+    parser.add_argument("--prompt-budget", type=float, default=1.0, help="プロンプトが表示されるまでの時間の予算 (秒)")
+    parser.add_argument("--top", type=int, default=10, help="表示する時間のかかったモジュールの数")
+    args = parser.parse_args()
+
+    measure_import()  # バイトコードのキャッシュを作るため、1回目は計測に含めない
+    import_times = []
+    modules = {}
+    for _ in range(args.runs):
+        total, modules = measure_import()
+        import_times.append(total)
+    import_time = statistics.median(import_times)
+
+    print(f"import AITuber: {import_time * 1000:.1f}ms (中央値, {args.runs} 回)")
+    print(f"{'モジュール':<36}{'自身':>10}{'累積':>10}")
+    for name, (self_time, cumulative) in sorted(modules.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"{name:<36}{self_time * 1000:>8.1f}ms{cumulative * 1000:>8.1f}ms")
+
+    prompt_times = [measure_time_to_prompt() for _ in range(args.runs)]
+    time_to_prompt = statistics.median(prompt_times)
+    print(f"time-to-prompt: {time_to_prompt:.3f}s (中央値, 最大 {max(prompt_times):.3f}s)")
+
+    failures = []
+    heavy = [name for name in HEAVY_MODULES if name in modules]
+    if heavy:
+        failures.append(f"読み込み時に重いモジュールが読み込まれています: {', '.join(heavy)}")
+    if import_time * 1000 > args.import_budget_ms:
+        failures.append(f"import AITuber が予算を超えました: {import_time * 1000:.1f}ms > {args.import_budget_ms:.0f}ms")
+    if time_to_prompt > args.prompt_budget:
+        failures.append(f"time-to-prompt が予算を超えました: {time_to_prompt:.3f}s > {args.prompt_budget:.3f}s")
+    for failure in failures:
+        print(f"エラー: {failure}")
+    if failures:
+        sys.exit(1)
+    print("起動時間: OK")
+
+
+if __name__ == "__main__":
+    main()
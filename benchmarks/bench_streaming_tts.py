@@ -0,0 +1,71 @@
+"""
+文単位ストリーミングTTSパイプラインのオフラインベンチマーク。
+
+スタブのチャットセッションとTTSを使い、従来の「全文生成 → 全文合成 → 再生」と
+文単位パイプラインの最初の音声までの時間 (TTFA) と全体時間を比較します。
+
+実行例:
+    python benchmarks/bench_streaming_tts.py --speed 4
+"""
+import argparse
+import os
+import sys
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from streaming_tts import (StreamingTTSPipeline, StubChatSession, StubTTS,
+                           iter_response_text, make_sleep_player)
+
+REPLY_TEXT = (
+    "はいはい！初めまして、モナミンやで。"
+    "ウチはMonad Testnetとブロックチェーンにめっちゃ詳しい女の子やねん。"
+    "Monadは高性能なLayer-1ブロックチェーンで、並列実行で速いのが自慢なんや。"
+    "質問とかあったら、いつでも聞いてな！"
+    "好きな食べ物はタピオカミルクティーとカップ焼きそばやで。"
+    "みんなにMonadの魅力を伝えられるように、精一杯頑張るから仲良くしてな！"
+)
+
+
+def run_serial(chat, tts, play):
+    t0 = time.monotonic()
+    text = chat.send_message("自己紹介して").text
+    pcm = tts(text)
+    ttfa = time.monotonic() - t0
+    play(pcm)
+    return ttfa, time.monotonic() - t0
+
+
+def run_pipelined(chat, tts, play):
+    pipeline = StreamingTTSPipeline(synthesize=tts, play=play)
+    t0 = time.monotonic()
+    result = pipeline.run(iter_response_text(chat.send_message("自己紹介して", stream=True)), started_at=t0)
+    return result.time_to_first_audio, result.total_time, len(result.sentences)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ストリーミングTTSパイプラインのベンチマーク")
+    parser.add_argument("--speed", type=float, default=4.0,
+                        help="再生速度の倍率 (大きいほど早く終わる。実時間は1.0)")
+    parser.add_argument("--tts-latency", type=float, default=0.4, help="TTS 1リクエストあたりの固定遅延 (秒)")
+    parser.add_argument("--first-token", type=float, default=0.3, help="LLMの最初の断片までの遅延 (秒)")
+    args = parser.parse_args()
+
+    chat = StubChatSession(REPLY_TEXT, first_token_delay=args.first_token)
+    play = make_sleep_player(speed=args.speed)
+
+    serial_ttfa, serial_total = run_serial(chat, StubTTS(base_latency=args.tts_latency), play)
+    tts = StubTTS(base_latency=args.tts_latency)
+    pipe_ttfa, pipe_total, sentences = run_pipelined(chat, tts, play)
+
+    print(f"応答文字数: {len(REPLY_TEXT)}  文数: {sentences}  TTS呼び出し: {tts.calls}")
+    print(f"{'mode':<10}{'TTFA (s)':>10}{'total (s)':>12}")
+    print(f"{'serial':<10}{serial_ttfa:>10.3f}{serial_total:>12.3f}")
+    print(f"{'pipelined':<10}{pipe_ttfa:>10.3f}{pipe_total:>12.3f}")
+    print(f"TTFA短縮: {serial_ttfa / pipe_ttfa:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+TTSの依頼をまとめて合成する場合 (`tts_batcher.BatchingTTSProvider`) の、まとめる件数ごとのスループットのベンチマーク。
+
+`--producers` 個のスレッドが、セリフを合わせて `--lines` 件、同時に合成を依頼します (原稿の先読みなど)。
+まとめる最大の件数 (`max_batch`) ごとに、全件を合成し終えるまでの時間・1秒あたりの件数・1件あたりの待ち時間 (p50/p95)
+と、1回にまとめた平均の件数を比較します。`max_batch = 1` が従来の1件ずつの合成です。
+
+- stub: パディングしたバッチで推論するエンジンを真似たスタブのTTS (固定の遅延は1バッチに1回)
+- style_bert_vits2: ローカルのスタブ `/voice` サーバーに、まとめた依頼を並列のリクエストで送る
+
+実行例:
+    python benchmarks/bench_tts_batch.py --lines 32 --producers 8 --batch-sizes 1 2 4 8
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from bench_sbv2_http import create_engine
+from latency_metrics import percentile
+from providers import StubTTSProvider, StyleBertVITS2TTSProvider
+from stub_voice_server import StubVoiceServer
+from tts_batcher import BatchingTTSProvider
+
+LINES = [
+    "みんな、Gmonamin！",
+    "今日はMonadのテストネットについてお話しするね。",
+    "Monadは並列実行でとっても速いんだ。",
+    "わからないことがあったら、気軽にコメントしてね！",
+    "テストネットなら無料でdAppsを試せるよ。",
+    "それじゃあ、さっそく始めていこう。",
+]
+
+
+def run(provider, max_batch, max_wait, lines, producers):
+    """`producers` 個のスレッドから `lines` 件を依頼し、(全体の秒数, 1件ごとの待ち時間のリスト, 平均の件数) を返します。"""
+    batcher = BatchingTTSProvider(provider, max_batch=max_batch, max_wait=max_wait)
+    texts = [LINES[i % len(LINES)] + f" ({i})" for i in range(lines)]
+    waits = []
+    lock = threading.Lock()
+
+    def produce(indexes):
+        for i in indexes:
+            started_at = time.perf_counter()
+            batcher.synthesize(texts[i])
+            with lock:
+                waits.append(time.perf_counter() - started_at)
+
+    threads = [threading.Thread(target=produce, args=(range(p, lines, producers),)) for p in range(producers)]
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started_at
+    batcher.close()
+    return elapsed, sorted(waits), batcher.average_batch_size
+
+
+def report(title, provider, args):
+    print(title)
+    print(f"{'max_batch':>10}{'全体':>10}{'件/秒':>9}{'p50':>10}{'p95':>10}{'平均の件数':>12}")
+    for max_batch in args.batch_sizes:
+        elapsed, waits, average = run(provider, max_batch, args.max_wait, args.lines, args.producers)
+        print(f"{max_batch:>10}{elapsed:>9.2f}s{args.lines / elapsed:>9.1f}{percentile(waits, 50) * 1000:>8.0f}ms"
+              f"{percentile(waits, 95) * 1000:>8.0f}ms{average:>12.1f}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTSのバッチ合成のスループットのベンチマーク")
+    parser.add_argument("--lines", type=int, default=32, help="合成するセリフの件数")
+    parser.add_argument("--producers", type=int, default=8, help="同時に依頼するスレッドの数")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8], help="比較する max_batch")
+    parser.add_argument("--max-wait", type=float, default=0.02, help="ほかの依頼を待つ最大の秒数")
+    parser.add_argument("--latency", type=float, default=0.15, help="1回の合成の固定の遅延 (秒)")
+    parser.add_argument("--seconds-per-char", type=float, default=0.005, help="1文字あたりの合成の遅延 (秒)")
+    args = parser.parse_args()
+    logging.getLogger("backend.tts_engine").setLevel(logging.ERROR)
+
+    print(f"{args.lines} 件 / {args.producers} スレッド, 合成の遅延 {args.latency:g} 秒 + {args.seconds_per_char:g} 秒/文字,"
+          f" max_wait {args.max_wait * 1000:g} ms\n")
+    report("stub (バッチで推論するエンジン)",
+           StubTTSProvider(latency=args.latency, seconds_per_char=args.seconds_per_char), args)
+
+    with StubVoiceServer(latency=args.latency, seconds_per_char=args.seconds_per_char) as server, \
+            tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(server.url, tmp_dir, {"max_workers": max(args.batch_sizes)})
+        engine.synthesize("ウォームアップ")
+        report(f"style_bert_vits2 (スタブサーバーに並列のリクエスト, max_workers {max(args.batch_sizes)})",
+               StyleBertVITS2TTSProvider(engine=engine), args)
+        engine.close()
+
+
+if __name__ == "__main__":
+    main()
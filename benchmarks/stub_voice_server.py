@@ -0,0 +1,118 @@
+"""
+Style-Bert-VITS2 サーバーの `/voice` を真似るローカルのHTTPサーバー (ベンチマーク用)。
+
+`GET /voice?text=...` に、文字数に比例した長さの正弦波のWAV (モノラル・int16) を返します。
+合成にかかる時間 (`latency + seconds_per_char * 文字数`) と、本文を送る速さ (`bytes_per_second`) を
+設定でき、受け付けた接続数とリクエスト数を数えます。HTTP/1.1 の Keep-Alive に対応しています。
+"""
+import io
+import math
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+
+def make_wav(text, sample_rate=44100, chars_per_second=8.0):
+    """テキストに応じた高さ・長さの正弦波のWAVファイルの内容を返します。"""
+    samples = max(1, int(sample_rate * len(text) / chars_per_second))
+    frequency = 220 + sum(text.encode("utf-8")) % 440
+    t = np.arange(samples) / sample_rate
+    pcm = (0.1 * np.sin(2 * math.pi * frequency * t) * 32767).astype("<i2").tobytes()
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm)
+    return buf.getvalue()
+
+
+class StubVoiceServer:
+    """
+    `/voice` に正弦波のWAVを返すHTTPサーバー。
+
+    Args:
+        sample_rate (int, optional): 返す音声のサンプルレート
+        chars_per_second (float, optional): 音声の長さ (1秒あたりに読み上げる文字数)
+        latency (float, optional): 1回の合成の固定の遅延 (秒)
+        seconds_per_char (float, optional): 1文字あたりの合成の遅延 (秒)
+        bytes_per_second (float, optional): 本文を送る速さ (バイト/秒)。Noneの場合は一度に送ります
+        port (int, optional): ポート番号 (0の場合は空いているポート)
+    """
+
+    def __init__(self, sample_rate=44100, chars_per_second=8.0, latency=0.0, seconds_per_char=0.0,
+                 bytes_per_second=None, host="127.0.0.1", port=0):
+        self.sample_rate = sample_rate
+        self.chars_per_second = chars_per_second
+        self.latency = latency
+        self.seconds_per_char = seconds_per_char
+        self.bytes_per_second = bytes_per_second
+        self.connections = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-Alive
+            disable_nagle_algorithm = True  # ヘッダーと本文を分けて書くため、Nagleと遅延ACKで待たされないようにする
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != "/voice":
+                    self.send_error(404)
+                    return
+                text = parse_qs(url.query).get("text", [""])[0]
+                with stub._lock:
+                    stub.requests += 1
+                time.sleep(stub.latency + stub.seconds_per_char * len(text))
+                body = make_wav(text, stub.sample_rate, stub.chars_per_second)
+                self.send_response(200)
+                self.send_header("Content-Type", "audio/wav")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if not stub.bytes_per_second:
+                    self.wfile.write(body)
+                    return
+                chunk_bytes = 8192
+                for start in range(0, len(body), chunk_bytes):
+                    self.wfile.write(body[start:start + chunk_bytes])
+                    time.sleep(chunk_bytes / stub.bytes_per_second)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-voice-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,234 @@
+############################################
+# 会話履歴の管理
+# 直近N往復の会話はそのまま残し、それより古い会話は要約にまとめます。
+# 長時間の配信でも、Geminiに送る履歴の大きさ (トークン数) が一定の範囲に収まります。
+############################################
+import json
+import re
+import threading
+
+_CJK_PATTERN = re.compile(r"[　-鿿가-힯＀-￯]")
+
+
+def estimate_tokens(text):
+    """テキストのおおよそのトークン数を見積もります。
+
+    日本語などのCJK文字は1文字1トークン、それ以外は4文字1トークンとして数えます。
+    APIを呼ばずに毎ターン計算できる程度の精度です。
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncating_summarizer(max_chars=600):
+    """AIを使わない要約関数を返します (各発言の冒頭だけを残し、古い部分から切り詰めます)。
+
+    Args:
+        max_chars (int, optional): 要約の最大文字数
+
+    Returns:
+        callable: `summarize(previous_summary, turns) -> str`
+    """
+    def summarize(previous_summary, turns):
+        lines = [previous_summary] if previous_summary else []
+        for user_text, reply_text in turns:
+            lines.append(f"ユーザー: {user_text[:40]} / 応答: {reply_text[:60]}")
+        summary = "\n".join(lines)
+        return summary[-max_chars:]
+    return summarize
+
+
+SUMMARY_PROMPT = (
+    "以下はAIキャラクターと視聴者のこれまでの会話の要約と、その後の会話です。"
+    "今後の会話で必要になる事実 (視聴者の名前・話題・約束など) を残して、"
+    "{max_chars}文字以内の日本語の要約にまとめてください。要約だけを出力してください。\n\n"
+    "これまでの要約:\n{summary}\n\nその後の会話:\n{turns}"
+)
+
+
+def make_model_summarizer(model, max_chars=600):
+    """Geminiのモデルで要約する関数を返します。失敗した場合は切り詰めによる要約に切り替えます。
+
+    Args:
+        model: `generate_content(prompt)` を持つモデル
+        max_chars (int, optional): 要約の最大文字数
+
+    Returns:
+        callable: `summarize(previous_summary, turns) -> str`
+    """
+    fallback = truncating_summarizer(max_chars)
+
+    def summarize(previous_summary, turns):
+        conversation = "\n".join(f"ユーザー: {u}\nキャラクター: {r}" for u, r in turns)
+        prompt = SUMMARY_PROMPT.format(max_chars=max_chars, summary=previous_summary or "(なし)", turns=conversation)
+        try:
+            return model.generate_content(prompt).text.strip()[:max_chars * 2]
+        except Exception as e:
+            print(f"警告: 会話履歴の要約に失敗したため、切り詰めた要約を使います: {e}")
+            return fallback(previous_summary, turns)
+    return summarize
+
+
+class ChatHistoryManager:
+    """直近の会話と、それより古い会話の要約を保持する履歴マネージャー。
+
+    履歴の見積もりトークン数が `token_budget` を超えると、直近 `keep_turns` 往復を残して
+    それより古い往復を `summarize(これまでの要約, 往復のリスト)` で要約に畳み込みます。
+    `background=True` の場合、要約 (AIの呼び出し) は別スレッドで行い、`add_turn()` はすぐに戻ります。
+    要約している間に追加された往復は、要約が終わった後もそのまま残ります。
+
+    Args:
+        summarize (callable): `summarize(previous_summary, turns) -> str` 要約関数
+        keep_turns (int, optional): そのまま残す直近の往復数
+        token_budget (int, optional): 履歴の見積もりトークン数の上限
+        background (bool, optional): 要約を別スレッドで行うかどうか
+    """
+
+    def __init__(self, summarize, keep_turns=6, token_budget=3000, background=False):
+        self.summarize = summarize
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.background = background
+        self.summary = ""
+        self.turns = []  # (ユーザーの発言, 応答) のリスト
+        self.compactions = 0
+        self._lock = threading.RLock()
+        self._compacting = False
+        self._thread = None
+
+    @property
+    def token_count(self):
+        """履歴 (要約 + 直近の往復) の見積もりトークン数。"""
+        return estimate_tokens(self.summary) + sum(estimate_tokens(u) + estimate_tokens(r) for u, r in self.turns)
+
+    def add_turn(self, user_text, reply_text):
+        """往復を追加し、必要なら古い往復を要約に畳み込みます。
+
+        Returns:
+            bool: 要約を行った (`background=True` の場合は開始した) 場合はTrue
+        """
+        with self._lock:
+            self.turns.append((user_text, reply_text))
+            if self._compacting or self.token_count <= self.token_budget or len(self.turns) <= self.keep_turns:
+                return False
+            self._compacting = True
+        if self.background:
+            self._thread = threading.Thread(target=self._compact, name="chat-history-summary", daemon=True)
+            self._thread.start()
+        else:
+            self._compact()
+        return True
+
+    def _compact(self):
+        # 要約の間はロックを持たない (応答の生成・履歴の追加を止めないため)
+        try:
+            with self._lock:
+                old_turns = self.turns[:-self.keep_turns] if self.keep_turns else list(self.turns)
+                previous_summary = self.summary
+            summary = self.summarize(previous_summary, old_turns)
+            with self._lock:
+                self.summary = summary
+                self.turns = self.turns[len(old_turns):]
+                self.compactions += 1
+        except Exception as e:
+            print(f"警告: 会話履歴の要約中にエラーが発生しました: {e}")
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def wait(self, timeout=None):
+        """別スレッドで行っている要約が終わるまで待ちます。"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def build_contents(self, user_text=None):
+        """Geminiの `generate_content` に渡す会話の内容 (contents) を作ります。
+
+        Args:
+            user_text (str, optional): 今回のユーザーの発言
+
+        Returns:
+            list[dict]: `{"role": "user" | "model", "parts": [テキスト]}` のリスト
+        """
+        with self._lock:
+            summary, turns = self.summary, list(self.turns)
+        contents = []
+        if summary:
+            contents.append({"role": "user", "parts": [f"(これまでの会話の要約)\n{summary}"]})
+            contents.append({"role": "model", "parts": ["了解しました。"]})
+        for u, r in turns:
+            contents.append({"role": "user", "parts": [u]})
+            contents.append({"role": "model", "parts": [r]})
+        if user_text is not None:
+            contents.append({"role": "user", "parts": [user_text]})
+        return contents
+
+
+def payload_bytes(contents):
+    """会話の内容をJSONにしたときのバイト数 (リクエストの大きさの目安)。"""
+    return len(json.dumps(contents, ensure_ascii=False).encode("utf-8"))
+
+
+INTERRUPTED_REPLY = "(応答が中断されました)"  # 応答を1文字も受け取れなかったターンの履歴 (Geminiは空のテキストを受け付けない)
+
+
+def _chunk_text(chunk):
+    """ストリーミング応答の断片のテキストを返します (安全性フィルターなどでテキストがない場合は空文字列)。"""
+    try:
+        return getattr(chunk, "text", "") or ""
+    except ValueError:
+        return ""
+
+
+class ManagedChatSession:
+    """`model.start_chat()` の代わりに使う、履歴の大きさを抑えたチャットセッション。
+
+    `send_message(text, stream=False)` は `start_chat()` のセッションと同じように使えます。
+    毎回 `ChatHistoryManager` の履歴 + 今回の発言を `model.generate_content()` に送ります。
+
+    Args:
+        model: `generate_content(contents, stream=...)` を持つモデル
+        history (ChatHistoryManager): 履歴マネージャー
+    """
+
+    def __init__(self, model, history):
+        self.model = model
+        self.history = history
+        self.last_request = {}
+
+    def _prepare(self, text):
+        contents = self.history.build_contents(text)
+        self.last_request = {
+            "history_tokens": self.history.token_count,
+            "request_tokens": self.history.token_count + estimate_tokens(text),
+            "payload_bytes": payload_bytes(contents),
+            "history_turns": len(self.history.turns),
+            "compactions": self.history.compactions,
+        }
+        return contents
+
+    def send_message(self, text, stream=False):
+        """メッセージを送り、応答を返します。応答を受け取り終えた時点で履歴に追加します。"""
+        contents = self._prepare(text)
+        if not stream:
+            response = self.model.generate_content(contents)
+            self.history.add_turn(text, response.text)
+            return response
+        return self._stream(text, self.model.generate_content(contents, stream=True))
+
+    def _stream(self, text, response):
+        parts = []
+        try:
+            for chunk in response:
+                parts.append(_chunk_text(chunk))
+                yield chunk
+        finally:
+            # 途中で打ち切られた (GeneratorExit・エラー) 場合も、発言とそこまでの応答を履歴に残す
+            self.history.add_turn(text, "".join(parts) or INTERRUPTED_REPLY)
+
+    def record_turn(self, text, reply_text):
+        """AIを呼ばずに返した応答 (キャッシュなど) を履歴に追加します。"""
+        self.history.add_turn(text, reply_text)
@@ -0,0 +1,359 @@
+############################################
+# チャット入力の取り込み
+# 標準入力・ローカルHTTPエンドポイント・JSONLファイルの再生など複数の入力元から
+# メッセージを受け取り、優先度付きキューにまとめます。ユーザーごとのレート制限・
+# 重複除去・あふれた場合の古いメッセージの破棄により、大量のコメントが来ても遅れません。
+############################################
+import asyncio
+import heapq
+import itertools
+import json
+import re
+import time
+
+from conversation_core import CONSOLE_PRIORITY, UserMessage
+
+
+class TokenBucket:
+    """トークンバケット方式のレート制限。
+
+    Args:
+        capacity (float): バケットの容量 (連続で受け付けられる最大数)
+        refill_per_second (float): 1秒あたりに補充されるトークン数
+        clock (callable, optional): 現在時刻を返す関数 (テスト用)
+    """
+
+    def __init__(self, capacity, refill_per_second, clock=time.monotonic):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.clock = clock
+        self.tokens = capacity
+        self.updated_at = clock()
+
+    def consume(self, amount=1.0):
+        """トークンを消費します。足りない場合はFalseを返します。"""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+        if self.tokens < amount:
+            return False
+        self.tokens -= amount
+        return True
+
+
+def normalize_for_dedupe(text):
+    """重複判定用にテキストを正規化します (小文字化・空白の圧縮)。"""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class ChatIngestor:
+    """複数の入力元のメッセージを1本の優先度付きキューにまとめる非同期イテラブル。
+
+    取り出しは優先度の高い順、同じ優先度では到着順です。次のメッセージは
+    受け付けた時点で以下の順に判定されます。
+
+    1. 重複除去: 同じユーザーの同じ内容 (正規化後) が `dedupe_window` 秒以内にあれば破棄
+    2. レート制限: ユーザーごとのトークンバケットが空なら破棄
+    3. 背圧: キューが `max_queue` 件を超えたら、優先度が最も低いもののうち最も古いものを破棄
+
+    `ConversationCore.run()` の入力ソースとして使えます。すべての入力元が終わると、キューに残った
+    メッセージをすべて取り出してから終了します。`until` に指定した入力元が終わる (または `close()` が
+    呼ばれる) と、配信者の終了の指示に応答が続かないよう、キューに残った視聴者のコメント
+    (`exempt_sources` 以外) を破棄して終了します。`drain_on_close=True` の場合は破棄せずに取り出します。
+
+    Args:
+        sources (list): `UserMessage` を返す非同期イテラブルのリスト
+        max_queue (int, optional): キューの最大件数
+        user_rate_capacity (float, optional): ユーザーごとに連続で受け付ける最大数
+        user_rate_per_minute (float, optional): ユーザーごとに1分あたり補充される受付数
+        dedupe_window (float, optional): 重複とみなす秒数
+        until (optional): この入力元が終わったら全体を終了する (例: コンソール入力)
+        exempt_sources (iterable, optional): レート制限・重複除去を適用しない入力元の名前 (例: "console")
+        exempt_priority (int, optional): `exempt_sources` のメッセージに与える最低の優先度
+            (配信者の入力が視聴者のコメントの後ろで待たないように)
+        on_drop (callable, optional): `on_drop(message, reason)` 破棄したときに呼ばれる
+        drain_on_close (bool, optional): `until` の終了後・`close()` の後も、キューに残ったコメントを取り出すかどうか
+        clock (callable, optional): 現在時刻を返す関数 (テスト用)
+    """
+
+    def __init__(self, sources, max_queue=100, user_rate_capacity=3, user_rate_per_minute=6,
+                 dedupe_window=30.0, until=None, exempt_sources=("console",), exempt_priority=CONSOLE_PRIORITY,
+                 on_drop=None, drain_on_close=False, clock=time.monotonic):
+        self.sources = list(sources)
+        self.max_queue = max_queue
+        self.user_rate_capacity = user_rate_capacity
+        self.user_rate_per_minute = user_rate_per_minute
+        self.dedupe_window = dedupe_window
+        self.until = until
+        self.exempt_sources = set(exempt_sources)
+        self.exempt_priority = exempt_priority
+        self.on_drop = on_drop
+        self.drain_on_close = drain_on_close
+        self.clock = clock
+        self.stats = {"accepted": 0, "duplicate": 0, "rate_limited": 0, "overflow": 0, "discarded": 0}
+        self._heap = []  # (-priority, seq, message)
+        self._seq = itertools.count()
+        self._buckets = {}
+        self._recent = {}  # (user, 正規化テキスト) -> 受付時刻
+        self._available = None
+        self._closed = False
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _drop(self, message, reason):
+        self.stats[reason] += 1
+        if self.on_drop is not None:
+            self.on_drop(message, reason)
+
+    def offer(self, message):
+        """メッセージをキューに追加します。
+
+        Args:
+            message (UserMessage): メッセージ
+
+        Returns:
+            bool: 受け付けた場合はTrue (あふれて別のメッセージが破棄された場合もTrue)
+        """
+        if message.source not in self.exempt_sources:
+            now = self.clock()
+            key = (message.user, normalize_for_dedupe(message.text))
+            last = self._recent.get(key)
+            if last is not None and now - last < self.dedupe_window:
+                self._drop(message, "duplicate")
+                return False
+            bucket = self._buckets.get(message.user)
+            if bucket is None:
+                bucket = TokenBucket(self.user_rate_capacity, self.user_rate_per_minute / 60.0, clock=self.clock)
+                self._buckets[message.user] = bucket
+            if not bucket.consume():
+                self._drop(message, "rate_limited")
+                return False
+            self._recent[key] = now
+            if len(self._recent) > self.max_queue * 20:
+                self._recent = {k: t for k, t in self._recent.items() if now - t < self.dedupe_window}
+        elif message.priority < self.exempt_priority:
+            message.priority = self.exempt_priority
+
+        heapq.heappush(self._heap, (-message.priority, next(self._seq), message))
+        self.stats["accepted"] += 1
+        if len(self._heap) > self.max_queue:
+            # 優先度が最も低く、その中で最も古いものを捨てる
+            victim = max(self._heap, key=lambda item: (item[0], -item[1]))
+            self._heap.remove(victim)
+            heapq.heapify(self._heap)
+            self._drop(victim[2], "overflow")
+        if self._available is not None:
+            self._available.set()
+        return True
+
+    @property
+    def discarding(self):
+        """`close()` の後で、視聴者のコメントを破棄しているかどうか。"""
+        return self._closed and not self.drain_on_close
+
+    def close(self):
+        """入力の受け付けを終了します。
+
+        `drain_on_close=False` の場合は、キューに残った視聴者のコメントを破棄します
+        (配信者の入力は取り出せます)。
+        """
+        self._closed = True
+        if not self.drain_on_close:
+            kept = [item for item in self._heap if item[2].source in self.exempt_sources]
+            for item in self._heap:
+                if item[2].source not in self.exempt_sources:
+                    self._drop(item[2], "discarded")
+            self._heap = kept
+            heapq.heapify(self._heap)
+        if self._available is not None:
+            self._available.set()
+
+    async def _pump(self, source):
+        try:
+            async for message in source:
+                if self._closed:
+                    break
+                self.offer(message)
+        except Exception as e:
+            print(f"警告: チャット入力元 {type(source).__name__} でエラーが発生しました: {e}")
+        finally:
+            if source is self.until:
+                self.close()
+
+    async def __aiter__(self):
+        self._available = asyncio.Event()
+        tasks = [asyncio.create_task(self._pump(source)) for source in self.sources]
+        try:
+            while True:
+                if self._heap:
+                    yield heapq.heappop(self._heap)[2]
+                    continue
+                if self._closed or all(task.done() for task in tasks):
+                    return
+                self._available.clear()
+                waiter = asyncio.create_task(self._available.wait())
+                await asyncio.wait([waiter, *[t for t in tasks if not t.done()]],
+                                   return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+        finally:
+            for source in self.sources:
+                close = getattr(source, "close", None)
+                if close is not None:
+                    close()
+            for task in tasks:
+                task.cancel()
+
+
+class JSONLReplaySource:
+    """JSONLファイルのメッセージを再生する入力ソース (配信ログの再生や負荷試験用)。
+
+    1行に1つのJSONオブジェクトを置きます。本文は `text` / `message` / `title` / `body`、
+    送信者は `user` / `author` / `request_id` の最初に見つかったキーから取り出します。
+    `timestamp` (秒) があれば、その間隔を `speed` 倍で再現し、なければ `interval` 秒ごとに送ります。
+    `priority` は 0〜`max_priority` に切り詰め、数値でない行は読み飛ばします。
+
+    Args:
+        path (str): JSONLファイルのパス
+        speed (float, optional): 再生速度の倍率
+        interval (float, optional): `timestamp` がない場合の送信間隔 (秒)
+        source_name (str, optional): メッセージの入力元の名前
+        max_priority (int, optional): 行に指定できる優先度の上限
+    """
+
+    TEXT_KEYS = ("text", "message", "title", "body")
+    USER_KEYS = ("user", "author", "request_id")
+
+    def __init__(self, path, speed=1.0, interval=0.0, source_name="replay", max_priority=10):
+        self.path = path
+        self.speed = speed
+        self.interval = interval
+        self.source_name = source_name
+        self.max_priority = max_priority
+
+    def _parse(self, line):
+        record = json.loads(line)
+        text = next((record[k] for k in self.TEXT_KEYS if record.get(k)), None)
+        user = next((str(record[k]) for k in self.USER_KEYS if record.get(k)), "viewer")
+        priority = min(max(int(record.get("priority", 0)), 0), self.max_priority)
+        return text, user, record.get("timestamp"), priority
+
+    async def __aiter__(self):
+        previous_ts = None
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    text, user, ts, priority = self._parse(line)
+                except (json.JSONDecodeError, AttributeError, TypeError, ValueError):
+                    print(f"警告: JSONLの行を読み取れませんでした: {line[:50]!r}")
+                    continue
+                if not text:
+                    continue
+                if ts is not None and previous_ts is not None:
+                    delay = max(0.0, (ts - previous_ts) / self.speed)
+                else:
+                    delay = self.interval
+                previous_ts = ts if ts is not None else previous_ts
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                yield UserMessage(text, user=user, source=self.source_name, priority=priority)
+
+
+class HTTPChatSource:
+    """ローカルのHTTPエンドポイントでメッセージを受け取る入力ソース。
+
+    コメント取得ツールなどから `POST /chat` にJSON
+    (`{"user": "...", "text": "...", "priority": 0}`) を送ると、キューに追加されます。
+    `priority` は 0〜`max_priority` に切り詰めます (配信者の入力より優先されないように)。
+    標準ライブラリのasyncioだけで動く最小限のHTTP/1.1サーバーです。
+
+    Args:
+        host (str, optional): 待ち受けるホスト
+        port (int, optional): 待ち受けるポート (0の場合は空いているポート)
+        source_name (str, optional): メッセージの入力元の名前
+        max_body_bytes (int, optional): 受け付けるリクエストボディの最大サイズ
+        max_priority (int, optional): クライアントが指定できる優先度の上限
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, source_name="http", max_body_bytes=16 * 1024, max_priority=10):
+        self.host = host
+        self.port = port
+        self.source_name = source_name
+        self.max_body_bytes = max_body_bytes
+        self.max_priority = max_priority
+        self._queue = None
+        self._server = None
+        self._closed = False
+
+    @property
+    def bound_port(self):
+        """実際に待ち受けているポート番号 (サーバー開始後のみ)。"""
+        return self._server.sockets[0].getsockname()[1] if self._server else None
+
+    async def start(self):
+        """サーバーを開始します (イテレーション開始時に自動で呼ばれます)。"""
+        if self._server is None:
+            self._queue = asyncio.Queue()
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            print(f"情報: チャット受信用HTTPエンドポイントを http://{self.host}:{self.bound_port}/chat で開始しました。")
+        return self
+
+    def close(self):
+        """サーバーを停止します。"""
+        self._closed = True
+        if self._server is not None:
+            self._server.close()
+        if self._queue is not None:
+            self._queue.put_nowait(None)
+
+    async def _respond(self, writer, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("ascii") + body)
+        await writer.drain()
+        writer.close()
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            if len(request_line) < 2 or request_line[0] != "POST" or request_line[1] != "/chat":
+                await self._respond(writer, "404 Not Found", {"error": "POST /chat only"})
+                return
+            length = int(headers.get("content-length", "0"))
+            if length > self.max_body_bytes:
+                await self._respond(writer, "413 Payload Too Large", {"error": "body too large"})
+                return
+            payload = json.loads((await reader.readexactly(length)).decode("utf-8"))
+            if not isinstance(payload, dict):
+                await self._respond(writer, "400 Bad Request", {"error": "JSON object is required"})
+                return
+            text = str(payload.get("text", "")).strip()
+            if not text:
+                await self._respond(writer, "400 Bad Request", {"error": "text is required"})
+                return
+            priority = min(max(int(payload.get("priority", 0)), 0), self.max_priority)
+            message = UserMessage(text, user=str(payload.get("user", "viewer")), source=self.source_name,
+                                  priority=priority)
+            self._queue.put_nowait(message)
+            await self._respond(writer, "202 Accepted", {"queued": True})
+        except (ValueError, TypeError, asyncio.IncompleteReadError, UnicodeDecodeError) as e:
+            await self._respond(writer, "400 Bad Request", {"error": str(e)})
+        except ConnectionError:
+            writer.close()
+
+    async def __aiter__(self):
+        await self.start()
+        while not self._closed:
+            message = await self._queue.get()
+            if message is None:
+                break
+            yield message
@@ -0,0 +1,140 @@
+############################################
+# 設定ストア
+# config.local.json を一度だけ解析してメモリに保持し、テンプレートを
+# (キー, 言語コード) → 値 のフラットな辞書で引けるようにします。
+# ファイルの更新時刻が変わったときだけ再読み込みします。
+############################################
+import json
+import os
+import threading
+import time
+
+
+class _Snapshot:
+    """ある時点の設定内容 (差し替えは参照の代入1回で行うため、読み取り側はロック不要)。"""
+
+    def __init__(self, data, templates, mtime, version):
+        self.data = data
+        self.templates = templates
+        self.mtime = mtime
+        self.version = version
+
+
+class ConfigStore:
+    """設定ファイルの内容をキャッシュし、テンプレートをO(1)で返すストア。
+
+    テンプレートは読み込み時に言語のフォールバック (指定言語 → デフォルト言語) を解決済みの
+    `(テンプレートキー, BCP47言語コード) → 値` の辞書に展開します。
+    ファイルの更新確認は `check_interval` 秒に1回だけ `os.stat` で行い、
+    更新時刻が変わっていた場合のみ再解析して、新しい内容にまとめて差し替えます。
+    配信中に設定ファイルを編集しても、再起動なしで反映されます。
+
+    Args:
+        path (str): 設定ファイルのパス
+        languages_map (dict): 短縮言語コード → BCP47言語コード の対応表 (例: {"ja": "ja-JP"})
+        default_language (str, optional): フォールバック先のBCP47言語コード
+        check_interval (float, optional): ファイル更新を確認する最小間隔 (秒)。0なら毎回確認します。
+    """
+
+    def __init__(self, path, languages_map, default_language="ja-JP", check_interval=1.0):
+        self.path = path
+        self.languages_map = dict(languages_map)
+        self.default_language = default_language
+        self.check_interval = check_interval
+        self._snapshot = _Snapshot({}, {}, None, 0)
+        self._next_check = 0.0
+        self._reload_lock = threading.Lock()
+        self._reported_error = None
+        self.reload_if_changed(force=True)
+
+    @property
+    def version(self):
+        """設定を読み込み直すたびに増える番号。派生データのキャッシュ無効化に使います。"""
+        self._check()
+        return self._snapshot.version
+
+    @property
+    def data(self):
+        """解析済みの設定全体 (dict)。呼び出し側で変更しないでください。"""
+        self._check()
+        return self._snapshot.data
+
+    def get_template(self, template_key, language_code=None):
+        """指定されたキーと言語に対応するテンプレートを返します。
+
+        指定言語のテンプレートがなければデフォルト言語のテンプレートを返します。
+
+        Args:
+            template_key (str): テンプレートのキー
+            language_code (str, optional): BCP47言語コード。省略時はデフォルト言語。
+
+        Returns:
+            テンプレートの値 (文字列やリスト)。見つからない場合はNone。
+        """
+        self._check()
+        templates = self._snapshot.templates
+        value = templates.get((template_key, language_code or self.default_language))
+        if value is None:
+            # 未対応の言語コードはデフォルト言語として扱う
+            value = templates.get((template_key, self.default_language))
+        return value
+
+    def _check(self):
+        if time.monotonic() >= self._next_check:
+            self.reload_if_changed()
+
+    def reload_if_changed(self, force=False):
+        """ファイルの更新時刻が変わっていれば再読み込みします。
+
+        Args:
+            force (bool, optional): 更新時刻に関係なく再読み込みする
+
+        Returns:
+            bool: 再読み込みした場合はTrue
+        """
+        with self._reload_lock:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                self._report_error(f"エラー: 設定ファイル '{self.path}' が見つかりません。テンプレートを取得できませんでした。")
+                return False
+            if not force and mtime == self._snapshot.mtime:
+                return False
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                # 編集途中の不完全なファイルを読んだ可能性があるため、以前の内容を使い続ける
+                self._report_error(f"エラー: 設定ファイル '{self.path}' のJSON形式が正しくありません。テンプレートを取得できませんでした。")
+                return False
+            self._snapshot = _Snapshot(data, self._resolve_templates(data), mtime, self._snapshot.version + 1)
+            self._reported_error = None
+            return True
+
+    def _report_error(self, message):
+        # 同じエラーを毎ターン表示しないよう、状態が変わったときだけ表示する
+        if message != self._reported_error:
+            print(message)
+            self._reported_error = message
+
+    def _resolve_templates(self, data):
+        """言語ごとのテンプレートを、フォールバック解決済みのフラットな辞書に展開します。"""
+        languages = data.get("languages", {}) if isinstance(data, dict) else {}
+        short_codes = {bcp47: short for short, bcp47 in self.languages_map.items()}
+        default_short = short_codes.get(self.default_language)
+
+        def templates_of(short_code):
+            templates = languages.get(short_code, {}).get("templates", {}) if short_code else {}
+            return templates if isinstance(templates, dict) else {}
+
+        default_templates = templates_of(default_short)
+        resolved = {}
+        for bcp47, short in short_codes.items():
+            merged = dict(default_templates)
+            # 空文字列も有効なテンプレートとして扱うため、Noneのものだけフォールバックさせる
+            merged.update({k: v for k, v in templates_of(short).items() if v is not None})
+            for key, value in merged.items():
+                if value is not None:
+                    resolved[(key, bcp47)] = value
+        return resolved
@@ -0,0 +1,304 @@
+############################################
+# asyncioベースの会話コア
+# 入力・LLMの応答生成・音声合成・再生をそれぞれ独立したタスクとして動かし、
+# キューでつなぎます。新しいメッセージが届くと、古い応答の生成・合成・再生を打ち切ります。
+############################################
+import asyncio
+import time
+
+from streaming_tts import SentenceSplitter, drain_stream
+
+_END = object()       # 1ターン分の応答の終わり
+_SHUTDOWN = object()  # パイプライン全体の終了
+
+CONSOLE_PRIORITY = 100  # 配信者 (コンソール) の入力の優先度。視聴者のコメントより先に処理する
+
+
+class UserMessage:
+    """入力ソースから届いたメッセージ。
+
+    Args:
+        text (str): メッセージ本文
+        user (str, optional): 送信者名
+        source (str, optional): 入力元の名前 ("console", "http", "replay" など)
+        priority (int, optional): 優先度 (大きいほど先に処理されます)
+    """
+
+    def __init__(self, text, user="User", source="console", priority=0):
+        self.text = text
+        self.user = user
+        self.source = source
+        self.priority = priority
+        self.received_at = time.monotonic()
+
+    def __repr__(self):
+        return f"UserMessage({self.text!r}, user={self.user!r})"
+
+
+class TurnResult:
+    """1ターン (1メッセージへの応答) の結果と計測値。"""
+
+    def __init__(self, turn_id, message):
+        self.turn_id = turn_id
+        self.message = message
+        self.sentences = []
+        self.first_audio_at = None
+        self.finished_at = None
+        self.cancelled = False
+        self.errors = []
+
+    @property
+    def reply(self):
+        """応答全文 (打ち切られた場合はそれまでに生成された分)。"""
+        return "".join(self.sentences)
+
+    @property
+    def time_to_first_audio(self):
+        """メッセージの受信から最初の音声の再生開始までの秒数。"""
+        if self.first_audio_at is None:
+            return None
+        return self.first_audio_at - self.message.received_at
+
+    @property
+    def total_time(self):
+        """メッセージの受信からターン終了までの秒数。"""
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.message.received_at
+
+    def __repr__(self):
+        state = "cancelled" if self.cancelled else "done"
+        return f"TurnResult(#{self.turn_id} {state}, sentences={len(self.sentences)}, errors={len(self.errors)})"
+
+
+class ScriptedInputSource:
+    """あらかじめ用意したメッセージを順に送る入力ソース (テスト・負荷試験用)。
+
+    Args:
+        messages (list): メッセージのリスト。要素は文字列、または `(送信までの待機秒数, 文字列)` のタプル
+        interval (float, optional): 待機秒数を指定しなかったメッセージの送信間隔
+    """
+
+    def __init__(self, messages, interval=0.0):
+        self.messages = messages
+        self.interval = interval
+
+    async def __aiter__(self):
+        for item in self.messages:
+            delay, text = item if isinstance(item, tuple) else (self.interval, item)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield UserMessage(text)
+
+
+class ConsoleInputSource:
+    """標準入力から1行ずつ読み取る入力ソース。
+
+    `input()` は別スレッドで呼ぶため、入力待ちの間も合成・再生は止まりません。
+    EOF または `stop_words` のいずれかが入力されると終了します。
+
+    Args:
+        prompt (str, optional): 入力プロンプト
+        stop_words (iterable, optional): 入力を終了する単語 (大文字小文字は区別しません)
+        priority (int, optional): メッセージの優先度 (既定では視聴者のコメントより優先します)
+    """
+
+    def __init__(self, prompt="あなた: ", stop_words=("exit", "quit", "終了", "退出"), priority=CONSOLE_PRIORITY):
+        self.prompt = prompt
+        self.stop_words = {w.lower() for w in stop_words}
+        self.priority = priority
+
+    async def __aiter__(self):
+        while True:
+            try:
+                text = await asyncio.to_thread(input, self.prompt)
+            except EOFError:
+                return
+            if not text.strip():
+                continue
+            if text.strip().lower() in self.stop_words:
+                return
+            yield UserMessage(text, priority=self.priority)
+
+
+class ConversationCore:
+    """入力 → 応答生成 → 音声合成 → 再生 を独立したタスクで並行に動かす会話コア。
+
+    各ステージはasyncio.Queueでつながり、ブロッキングする処理 (LLM呼び出し・音声合成・再生) は
+    スレッドで実行します。応答は文単位で合成・再生するため、生成中でも最初の文から話し始めます。
+
+    `interrupt=True` の場合、新しいメッセージが届くと世代 (epoch) が進み、古い世代の
+    応答生成・合成待ち・再生待ちはすべて破棄され、再生中の音声も `interrupt_playback()` で止めます。
+
+    Args:
+        respond (callable): `respond(message) -> str またはテキスト断片のイテラブル` 応答生成関数
+        synthesize (callable): `synthesize(text) -> bytes` 音声合成関数
+        play (callable): `play(pcm)` 再生が終わるまでブロックする再生関数
+        interrupt_playback (callable, optional): 再生中の音声を止める関数
+        interrupt (bool, optional): 新しいメッセージで古い応答を打ち切るかどうか
+        min_chars (int, optional): 文として合成する最小文字数
+        max_pending_sentences (int, optional): 合成待ちの文の最大数
+        max_pending_audio (int, optional): 再生待ちの音声の最大数
+        on_sentence (callable, optional): `on_sentence(message, sentence)` 文の再生開始時に呼ばれる
+        on_turn_complete (callable, optional): `on_turn_complete(result)` ターン終了時に呼ばれる
+        max_pending_turns (int, optional): 応答生成待ちのメッセージの最大数。0の場合は無制限。
+            上限に達すると入力ソースからの取り出しを止めるため、優先度付きの入力ソース
+            (`ChatIngestor`) 側でメッセージの並べ替えや破棄ができます。
+    """
+
+    def __init__(self, respond, synthesize, play, interrupt_playback=None, interrupt=True, min_chars=8,
+                 max_pending_sentences=4, max_pending_audio=2, on_sentence=None, on_turn_complete=None,
+                 max_pending_turns=0):
+        self.respond = respond
+        self.synthesize = synthesize
+        self.play = play
+        self.interrupt_playback = interrupt_playback
+        self.interrupt = interrupt
+        self.min_chars = min_chars
+        self.max_pending_sentences = max_pending_sentences
+        self.max_pending_audio = max_pending_audio
+        self.on_sentence = on_sentence
+        self.on_turn_complete = on_turn_complete
+        self.max_pending_turns = max_pending_turns
+        self.epoch = 0
+        self.results = []
+        self._next_turn_id = 0
+        self._draining = None  # 打ち切った応答のストリームを読み捨てているタスク
+
+    def cancel_current(self):
+        """処理中・処理待ちの応答をすべて打ち切ります。"""
+        self.epoch += 1
+        if self.interrupt_playback is not None:
+            self.interrupt_playback()
+
+    def _is_stale(self, turn):
+        return turn["epoch"] != self.epoch
+
+    def _finish(self, turn, cancelled=False):
+        result = turn["result"]
+        if result.finished_at is not None:
+            return
+        result.cancelled = cancelled
+        result.finished_at = time.monotonic()
+        if self.on_turn_complete is not None:
+            try:
+                self.on_turn_complete(result)
+            except Exception as e:
+                result.errors.append(e)
+
+    async def run(self, source):
+        """入力ソースが終わり、すべての応答を再生し終えるまで会話を処理します。
+
+        Args:
+            source: `UserMessage` を返す非同期イテラブル (`ScriptedInputSource`, `ConsoleInputSource` など)
+
+        Returns:
+            list[TurnResult]: ターンごとの結果
+        """
+        input_queue = asyncio.Queue(maxsize=self.max_pending_turns)
+        sentence_queue = asyncio.Queue(maxsize=self.max_pending_sentences)
+        audio_queue = asyncio.Queue(maxsize=self.max_pending_audio)
+        tasks = [
+            asyncio.create_task(self._generate_stage(input_queue, sentence_queue), name="conversation-llm"),
+            asyncio.create_task(self._synthesize_stage(sentence_queue, audio_queue), name="conversation-tts"),
+            asyncio.create_task(self._play_stage(audio_queue), name="conversation-play"),
+        ]
+        try:
+            async for message in source:
+                if self.interrupt:
+                    self.cancel_current()
+                turn = {"epoch": self.epoch, "result": TurnResult(self._next_turn_id, message)}
+                self._next_turn_id += 1
+                self.results.append(turn["result"])
+                await input_queue.put(turn)
+            await input_queue.put(_SHUTDOWN)
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return self.results
+
+    async def _wait_drained(self):
+        """打ち切った応答のストリームを読み終えるまで待ちます。"""
+        if self._draining is not None:
+            await self._draining
+            self._draining = None
+
+    async def _generate_stage(self, input_queue, sentence_queue):
+        while True:
+            turn = await input_queue.get()
+            if turn is _SHUTDOWN:
+                await self._wait_drained()
+                await sentence_queue.put(_SHUTDOWN)
+                return
+            if self._is_stale(turn):
+                self._finish(turn, cancelled=True)
+                continue
+            splitter = SentenceSplitter(min_chars=self.min_chars)
+            chunks = None
+            finished = False
+            try:
+                # 前のターンのストリームを読み終える前に次を送ると、チャットセッションがエラーになる
+                await self._wait_drained()
+                reply = await asyncio.to_thread(self.respond, turn["result"].message)
+                chunks = iter([reply] if isinstance(reply, str) else reply)
+                while not self._is_stale(turn):
+                    # 断片ごとにスレッドで待つので、ストリーミング応答の途中でも打ち切れる
+                    chunk = await asyncio.to_thread(next, chunks, _END)
+                    if chunk is _END:
+                        finished = True
+                        break
+                    for sentence in splitter.feed(chunk):
+                        await sentence_queue.put((turn, sentence))
+            except Exception as e:
+                turn["result"].errors.append(e)
+                finished = True
+            finally:
+                if chunks is not None and not finished:
+                    # 打ち切った応答は、次のメッセージの処理と並行して別スレッドで最後まで読み捨てる
+                    self._draining = asyncio.ensure_future(asyncio.to_thread(drain_stream, chunks))
+            if not self._is_stale(turn):
+                for sentence in splitter.flush():
+                    await sentence_queue.put((turn, sentence))
+            await sentence_queue.put((turn, _END))
+
+    async def _synthesize_stage(self, sentence_queue, audio_queue):
+        while True:
+            item = await sentence_queue.get()
+            if item is _SHUTDOWN:
+                await audio_queue.put(_SHUTDOWN)
+                return
+            turn, sentence = item
+            if sentence is _END or self._is_stale(turn):
+                await audio_queue.put((turn, sentence, None))
+                continue
+            try:
+                pcm = await asyncio.to_thread(self.synthesize, sentence)
+            except Exception as e:
+                turn["result"].errors.append(e)
+                pcm = None
+            await audio_queue.put((turn, sentence, pcm))
+
+    async def _play_stage(self, audio_queue):
+        while True:
+            item = await audio_queue.get()
+            if item is _SHUTDOWN:
+                return
+            turn, sentence, pcm = item
+            if sentence is _END:
+                self._finish(turn, cancelled=self._is_stale(turn))
+                continue
+            if self._is_stale(turn):
+                continue
+            result = turn["result"]
+            result.sentences.append(sentence)
+            if self.on_sentence is not None:
+                self.on_sentence(result.message, sentence)
+            if not pcm:
+                continue
+            if result.first_audio_at is None:
+                result.first_audio_at = time.monotonic()
+            try:
+                await asyncio.to_thread(self.play, pcm)
+            except Exception as e:
+                result.errors.append(e)
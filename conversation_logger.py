@@ -0,0 +1,168 @@
+############################################
+# 会話ログライター
+# 会話ログをキュー経由でバックグラウンドスレッドに渡し、まとめて書き込みます。
+# 日付ごとにファイルを開いたままにし、日付が変わったら切り替えます。
+############################################
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+
+class _FlushRequest:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class ConversationLogger:
+    """会話ログを非同期に書き込むロガー。
+
+    `log()` はレコードをキューに入れるだけなので、会話処理のスレッドはファイルI/Oを待ちません。
+    書き込みスレッドは日付ごとのファイル (`conversation_YYYY-MM-DD.log`) を開いたまま保持し、
+    `flush_interval` 秒ごと、または `max_batch` 件たまるごとにまとめてフラッシュします。
+    プログラム終了時には残りのレコードを書き込んでから閉じます。
+    `cache` 項目 (応答キャッシュの利用状況) はJSONLを無効にしていても、テキストログに `[cache hit]` のように残します。
+
+    Args:
+        log_dir (str): ログディレクトリ
+        flush_interval (float, optional): フラッシュ間隔 (秒)
+        max_batch (int, optional): この件数たまったら間隔を待たずにフラッシュします
+        jsonl (bool, optional): Trueの場合、`conversation_YYYY-MM-DD.jsonl` に構造化ログも出力します
+        max_queue (int, optional): キューの最大件数。超えた場合は書き込みが追いつくまで `log()` が待ちます
+    """
+
+    def __init__(self, log_dir, flush_interval=1.0, max_batch=64, jsonl=False, max_queue=10000):
+        self.log_dir = log_dir
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.jsonl = jsonl
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._date = None
+        self._text_file = None
+        self._jsonl_file = None
+        self._closed = False
+        os.makedirs(log_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="conversation-logger", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, speaker, message, language="", **fields):
+        """会話ログを1件記録します。
+
+        Args:
+            speaker (str): 発言者名
+            message (str): メッセージ内容
+            language (str, optional): 言語コードや言語名。デフォルトは空文字列。
+            **fields: 構造化ログに追加する項目 (応答時間などの計測値)
+        """
+        if self._closed:
+            return
+        self._queue.put((datetime.now(), speaker, message, language, fields))
+
+    def flush(self, timeout=None):
+        """それまでに記録したログがファイルに書き込まれるまで待ちます。
+
+        Args:
+            timeout (float, optional): 最大待機秒数
+
+        Returns:
+            bool: 書き込みが完了した場合はTrue
+        """
+        if self._closed or not self._thread.is_alive():
+            return False
+        request = _FlushRequest()
+        self._queue.put(request)
+        return request.done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """残りのログを書き込み、ファイルを閉じます。"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _run(self):
+        pending = 0
+        next_flush = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(0.0, next_flush - time.monotonic()) if pending else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._flush_files()
+                self._close_files()
+                return
+            if isinstance(item, _FlushRequest):
+                self._flush_files()
+                pending = 0
+                item.done.set()
+                continue
+            if item is not None:
+                try:
+                    self._write(*item)
+                except Exception as e:
+                    # ログ書き込みエラーはプログラム全体に影響しないようにする
+                    print(f"警告: ログ書き込みエラー: {e}")
+                if not pending:
+                    next_flush = time.monotonic() + self.flush_interval
+                pending += 1
+
+            if pending and (pending >= self.max_batch or time.monotonic() >= next_flush):
+                self._flush_files()
+                pending = 0
+
+    def _write(self, timestamp, speaker, message, language, fields):
+        self._rotate(timestamp)
+        # 言語情報があれば追加
+        lang_info = f" ({language})" if language else ""
+        # キャッシュの利用状況があれば追加
+        cache_info = f" [cache {fields['cache']}]" if fields.get("cache") else ""
+        self._text_file.write(f"[{timestamp.strftime('%H:%M:%S')}] {speaker}{lang_info}{cache_info}: {message}\n\n")
+        if self._jsonl_file:
+            record = {
+                "timestamp": timestamp.isoformat(timespec="milliseconds"),
+                "speaker": speaker,
+                "language": language,
+                "message": message,
+            }
+            record.update(fields)
+            self._jsonl_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _rotate(self, timestamp):
+        """レコードの日付が変わっていれば、その日のファイルに切り替えます。"""
+        date = timestamp.strftime("%Y-%m-%d")
+        if date == self._date:
+            return
+        self._flush_files()
+        self._close_files()
+        self._text_file = open(os.path.join(self.log_dir, f"conversation_{date}.log"), "a", encoding="utf-8")
+        if self.jsonl:
+            self._jsonl_file = open(os.path.join(self.log_dir, f"conversation_{date}.jsonl"), "a", encoding="utf-8")
+        self._date = date
+
+    def _flush_files(self):
+        for f in (self._text_file, self._jsonl_file):
+            if f:
+                try:
+                    f.flush()
+                except OSError as e:
+                    print(f"警告: ログ書き込みエラー: {e}")
+
+    def _close_files(self):
+        for f in (self._text_file, self._jsonl_file):
+            if f:
+                f.close()
+        self._text_file = None
+        self._jsonl_file = None
+        self._date = None
@@ -0,0 +1,163 @@
+############################################
+# キーワードマッチャー (Aho-Corasick法)
+# 特殊応答のキーワードや自己紹介トリガーを起動時に一度だけオートマトンに
+# コンパイルし、入力テキストを1回走査するだけで最初に一致するグループを求めます。
+############################################
+
+
+class KeywordMatcher:
+    """複数グループのキーワードをまとめて部分一致検索するマッチャー。
+
+    キーワードは大文字・小文字を区別しません。グループは追加した順に優先度が高く、
+    入力に複数のグループのキーワードが含まれる場合は最も先に追加したグループを返します
+    (従来の「パターンを先頭から順に調べる」処理と同じ結果になります)。
+
+    使い方:
+        matcher = KeywordMatcher()
+        matcher.add_group(["自己紹介", "名前は"], payload="intro")
+        matcher.build()
+        matcher.match("名前は何？")  # -> "intro"
+    """
+
+    _NO_MATCH = -1
+
+    def __init__(self):
+        self._goto = [{}]      # ノードごとの遷移表 (文字 -> ノード番号)
+        self._fail = [0]       # 失敗遷移
+        self._best = [self._NO_MATCH]  # そのノード (とその接尾辞) で一致する最優先のグループ番号
+        self._payloads = []
+        self._built = False
+
+    def __len__(self):
+        return len(self._payloads)
+
+    @staticmethod
+    def normalize(text):
+        """照合用にテキストを正規化します (小文字化)。"""
+        return text.lower()
+
+    def add_group(self, keywords, payload=None):
+        """キーワードグループを追加します。
+
+        Args:
+            keywords (iterable[str]): グループのキーワード。文字列以外は無視します。
+            payload: グループが一致したときに `match` が返す値
+
+        Returns:
+            int: グループ番号 (追加順)
+        """
+        group_id = len(self._payloads)
+        self._payloads.append(payload)
+        for keyword in keywords:
+            if isinstance(keyword, str):
+                self._add_keyword(self.normalize(keyword), group_id)
+        self._built = False
+        return group_id
+
+    def _add_keyword(self, keyword, group_id):
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(self._NO_MATCH)
+            node = nxt
+        if self._best[node] == self._NO_MATCH or group_id < self._best[node]:
+            self._best[node] = group_id
+
+    def build(self):
+        """失敗遷移を計算してオートマトンを完成させます。
+
+        Returns:
+            KeywordMatcher: 自分自身
+        """
+        queue = []
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            queue.append(child)
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                # 接尾辞で一致するキーワードの優先度も引き継ぐ (幅優先なので失敗先は計算済み)
+                inherited = self._best[self._fail[child]]
+                if inherited != self._NO_MATCH and (self._best[child] == self._NO_MATCH or inherited < self._best[child]):
+                    self._best[child] = inherited
+        self._built = True
+        return self
+
+    def match_group(self, text):
+        """テキストに含まれるキーワードのうち、最も優先度の高いグループ番号を返します。
+
+        Args:
+            text (str): 入力テキスト
+
+        Returns:
+            int or None: グループ番号。一致しない場合はNone。
+        """
+        if not self._built:
+            self.build()
+        goto = self._goto
+        fail = self._fail
+        best_table = self._best
+        best = best_table[0]  # 空文字列のキーワードは常に一致する
+        if best == 0:
+            return 0
+        node = 0
+        for ch in self.normalize(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            candidate = best_table[node]
+            if candidate != self._NO_MATCH and (best == self._NO_MATCH or candidate < best):
+                best = candidate
+                if best == 0:
+                    break  # これ以上優先度の高いグループはない
+        return None if best == self._NO_MATCH else best
+
+    def match(self, text):
+        """テキストに一致する最優先グループのpayloadを返します。
+
+        Args:
+            text (str): 入力テキスト
+
+        Returns:
+            一致したグループのpayload。一致しない場合はNone。
+        """
+        group_id = self.match_group(text)
+        return None if group_id is None else self._payloads[group_id]
+
+
+def build_response_matcher(patterns_data):
+    """`response_patterns.json` の内容から特殊応答用のマッチャーを構築します。
+
+    グループの扱いは従来の `check_special_response` と同じです。辞書でないグループや
+    キーワードが空・リストでないグループは無視し、応答が文字列でないグループは
+    一致してもNoneを返します。
+
+    Args:
+        patterns_data (dict): `load_response_patterns()` の戻り値
+
+    Returns:
+        KeywordMatcher: payloadが応答文字列 (またはNone) のマッチャー
+    """
+    matcher = KeywordMatcher()
+    if patterns_data and isinstance(patterns_data.get("patterns"), list):
+        for pattern_group in patterns_data["patterns"]:
+            if not isinstance(pattern_group, dict):
+                continue
+            keywords = pattern_group.get("keywords", [])
+            if not isinstance(keywords, list) or not keywords:
+                continue
+            response_text = pattern_group.get("response", "")
+            matcher.add_group(keywords, response_text if isinstance(response_text, str) else None)
+    return matcher.build()
@@ -0,0 +1,265 @@
+############################################
+# 遅延の計測
+# 1ターン (ユーザーの入力・原稿の1段落) の各段階の時刻を time.monotonic() で記録し、
+# 段階ごとの遅延をターン単位の記録・直近の p50/p95/p99・Prometheus形式のテキストで出力します。
+############################################
+import math
+import threading
+import time
+from collections import deque
+
+# 1ターンの段階 (記録される順)
+STAGES = (
+    "input_received",   # 入力を受け取った (原稿読み上げでは段落の順番が来た)
+    "pattern_matched",  # 特殊応答・自己紹介の判定が終わった
+    "llm_first_token",  # LLMの最初の断片が届いた
+    "llm_done",         # LLMの応答を受け取り終えた
+    "tts_request",      # 最初の音声合成を依頼した
+    "tts_first_byte",   # 最初の音声データが届いた
+    "playback_start",   # 最初の音声の再生が始まった
+    "playback_end",     # 最後の音声の再生が終わった
+)
+
+# 集計する区間: 名前 -> (開始の段階, 終了の段階)
+SPANS = {
+    "pattern_match": ("input_received", "pattern_matched"),
+    "llm_first_token": ("input_received", "llm_first_token"),
+    "llm_total": ("input_received", "llm_done"),
+    "tts_first_byte": ("tts_request", "tts_first_byte"),
+    "time_to_first_audio": ("input_received", "playback_start"),
+    "playback": ("playback_start", "playback_end"),
+    "turn_total": ("input_received", "playback_end"),
+}
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+
+
+def percentile(sorted_values, q):
+    """ソート済みの値の q パーセンタイル (最近傍順位法) を返します。値がない場合はNone。"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class TurnTimer:
+    """1ターンの各段階の時刻を記録します (スレッドセーフ)。
+
+    作成した時点を `input_received` とします。同じ段階は最初の時刻だけを残しますが、
+    `last=True` で記録した段階 (複数の文の最後の再生終了など) は最新の時刻で上書きします。
+
+    Args:
+        turn_id (int): ターン番号
+        kind (str, optional): ターンの種類 ("interactive", "script" など)
+        clock (callable, optional): 単調増加する時刻を返す関数
+    """
+
+    def __init__(self, turn_id, kind="interactive", clock=time.monotonic):
+        self.turn_id = turn_id
+        self.kind = kind
+        self.clock = clock
+        self.marks = {}
+        self.finished = False
+        self._lock = threading.Lock()
+        self.mark("input_received")
+
+    def mark(self, stage, at=None, last=False):
+        """段階の時刻を記録します。
+
+        Args:
+            stage (str): 段階の名前 (`STAGES` のいずれか)
+            at (float, optional): 時刻。省略時は現在時刻
+            last (bool, optional): Trueの場合は記録済みでも上書きします
+        """
+        at = self.clock() if at is None else at
+        with self._lock:
+            if last or stage not in self.marks:
+                self.marks[stage] = at
+
+    def wrap_stream(self, chunks):
+        """LLMのストリーミング応答をそのまま流しつつ、最初の断片と受信完了の時刻を記録するジェネレーター。"""
+        for chunk in chunks:
+            self.mark("llm_first_token")
+            yield chunk
+        self.mark("llm_first_token")
+        self.mark("llm_done")
+
+    def spans(self):
+        """記録済みの段階から計算できる区間の秒数を返します。"""
+        with self._lock:
+            marks = dict(self.marks)
+        return {name: marks[end] - marks[start] for name, (start, end) in SPANS.items()
+                if start in marks and end in marks and marks[end] >= marks[start]}
+
+    def record(self):
+        """ターンの記録 (段階ごとの開始からの秒数と、区間の秒数) を返します。"""
+        with self._lock:
+            marks = dict(self.marks)
+        t0 = marks["input_received"]
+        return {
+            "turn": self.turn_id,
+            "kind": self.kind,
+            "stages": {stage: round(marks[stage] - t0, 4) for stage in STAGES if stage in marks},
+            "spans": {name: round(value, 4) for name, value in self.spans().items()},
+        }
+
+
+class LatencyRecorder:
+    """ターンの遅延を集計します (スレッドセーフ)。
+
+    区間ごとに、直近 `window` ターンの値 (p50/p95/p99 の計算用) と、
+    起動からの累積のヒストグラム (Prometheus形式の出力用) を保持します。
+
+    Args:
+        window (int, optional): パーセンタイルの計算に使う直近のターン数
+        buckets (tuple, optional): ヒストグラムのバケットの上限 (秒)
+        on_record (callable, optional): ターンが終わるたびに呼ばれる `on_record(record)`
+        clock (callable, optional): 単調増加する時刻を返す関数
+    """
+
+    def __init__(self, window=500, buckets=DEFAULT_BUCKETS, on_record=None, clock=time.monotonic):
+        self.window = window
+        self.buckets = tuple(sorted(buckets))
+        self.on_record = on_record
+        self.clock = clock
+        self.turns = 0
+        self.records = deque(maxlen=window)  # 直近のターンの記録
+        self._recent = {}     # (kind, span) -> deque
+        self._histograms = {}  # (kind, span) -> [バケットごとの件数, 合計, 件数]
+        self._lock = threading.Lock()
+
+    def start_turn(self, kind="interactive"):
+        """新しいターンの計測を開始します。
+
+        Returns:
+            TurnTimer: ターンの時刻の記録
+        """
+        with self._lock:
+            self.turns += 1
+            turn_id = self.turns
+        return TurnTimer(turn_id, kind, self.clock)
+
+    def finish(self, timer):
+        """ターンを集計に加えます。同じターンを2回渡した場合は何もしません。
+
+        `on_record` (ログへの書き込みなど) を呼ぶため、出力のコールバックからは呼ばないでください。
+
+        Returns:
+            dict or None: ターンの記録 (`TurnTimer.record()`)
+        """
+        with timer._lock:
+            if timer.finished:
+                return None
+            timer.finished = True
+        record = timer.record()
+        with self._lock:
+            self.records.append(record)
+            for name, value in record["spans"].items():
+                key = (timer.kind, name)
+                self._recent.setdefault(key, deque(maxlen=self.window)).append(value)
+                histogram = self._histograms.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+                for i, bound in enumerate(self.buckets):
+                    if value <= bound:
+                        histogram[0][i] += 1
+                histogram[1] += value
+                histogram[2] += 1
+        if self.on_record is not None:
+            self.on_record(record)
+        return record
+
+    def summary(self, quantiles=(50, 95, 99)):
+        """直近のターンの区間ごとのパーセンタイルを返します。
+
+        Returns:
+            dict: `{(種類, 区間): {"count": 件数, "p50": 秒, "p95": 秒, "p99": 秒}}`
+        """
+        with self._lock:
+            recent = {key: sorted(values) for key, values in self._recent.items()}
+        result = {}
+        for key, values in recent.items():
+            stats = {"count": len(values)}
+            for q in quantiles:
+                stats[f"p{q}"] = percentile(values, q)
+            result[key] = stats
+        return result
+
+    def format_report(self):
+        """区間ごとの p50/p95/p99 を表にした文字列を返します。"""
+        summary = self.summary()
+        if not summary:
+            return "遅延の記録はまだありません。"
+        order = {name: i for i, name in enumerate(SPANS)}
+        lines = [f"{'種類':<12}{'区間':<22}{'件数':>6}{'p50':>9}{'p95':>9}{'p99':>9}"]
+        for (kind, name), stats in sorted(summary.items(), key=lambda item: (item[0][0], order.get(item[0][1], 99))):
+            lines.append(f"{kind:<12}{name:<22}{stats['count']:>6}"
+                         f"{stats['p50']:>8.3f}s{stats['p95']:>8.3f}s{stats['p99']:>8.3f}s")
+        return "\n".join(lines)
+
+    def prometheus_text(self):
+        """Prometheusのテキスト形式 (exposition format 0.0.4) で集計を返します。"""
+        summary = self.summary()
+        with self._lock:
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self._histograms.items()}
+            turns = self.turns
+        lines = [
+            "# HELP aituber_turns_total 計測を開始したターン数",
+            "# TYPE aituber_turns_total counter",
+            f"aituber_turns_total {turns}",
+            "# HELP aituber_latency_seconds ターンの区間ごとの遅延 (起動からの累積)",
+            "# TYPE aituber_latency_seconds histogram",
+        ]
+        for (kind, name), (counts, total, count) in sorted(histograms.items()):
+            labels = f'kind="{kind}",span="{name}"'
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'aituber_latency_seconds_bucket{{{labels},le="{bound:g}"}} {bucket_count}')
+            lines.append(f'aituber_latency_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"aituber_latency_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"aituber_latency_seconds_count{{{labels}}} {count}")
+        lines.append(f"# HELP aituber_latency_recent_seconds 直近 {self.window} ターンの区間ごとの遅延のパーセンタイル")
+        lines.append("# TYPE aituber_latency_recent_seconds gauge")
+        for (kind, name), stats in sorted(summary.items()):
+            for key in ("p50", "p95", "p99"):
+                quantile = int(key[1:]) / 100
+                lines.append(f'aituber_latency_recent_seconds{{kind="{kind}",span="{name}",quantile="{quantile:g}"}} '
+                             f"{stats[key]:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+def _make_metrics_handler(recorder):
+    """`GET /metrics` に集計を返すリクエストハンドラーのクラスを作ります (http.server は起動を遅くしないよう使う時点で読み込む)。"""
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = recorder.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # アクセスログはコンソールに出さない
+
+    return MetricsHandler
+
+
+def start_metrics_server(recorder, port=9464, host="127.0.0.1"):
+    """`GET /metrics` で集計をPrometheus形式で返すHTTPサーバーを、デーモンスレッドで起動します。
+
+    Args:
+        recorder (LatencyRecorder): 集計
+        port (int, optional): ポート番号 (0の場合は空いているポート)
+        host (str, optional): 待ち受けるアドレス
+
+    Returns:
+        ThreadingHTTPServer: 起動したサーバー (`server_address[1]` で実際のポート、`shutdown()` で停止)
+    """
+    from http.server import ThreadingHTTPServer
+    server = ThreadingHTTPServer((host, port), _make_metrics_handler(recorder))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -0,0 +1,419 @@
+############################################
+# LLM・TTSプロバイダー
+# 対話用のLLMと音声合成 (TTS) のバックエンドを名前で切り替えられるようにします。
+# - gemini: Gemini API (対話・TTS)
+# - style_bert_vits2: Style-Bert-VITS2 サーバー (TTS, backend/tts_engine.py を使用)
+# - stub: ネットワークを使わない決定的なスタブ (遅延を設定でき、負荷試験・ベンチマーク用)
+############################################
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+# numpy・google.generativeai・Style-Bert-VITS2 は、プロバイダーの一覧だけを使う起動時に読み込まないよう、使う時点で読み込みます。
+
+DEFAULT_SAMPLE_RATE = 24000  # 再生エンジンが想定するサンプルレート (モノラル・int16)
+
+
+############################################
+# LLMプロバイダー
+# `create_llm()` は Geminiの `GenerativeModel` と同じように使えるモデルを返します
+# (`generate_content(contents, stream=...)` と `start_chat()`)。
+############################################
+
+def create_gemini_model(system_instruction=None, model="gemini-1.5-flash-latest"):
+    """Geminiの対話用モデルを作成します。APIキーの設定 (`genai.configure`) は呼び出し側で行います。
+
+    Args:
+        system_instruction (str, optional): ペルソナなどのシステム指示
+        model (str, optional): モデル名
+
+    Returns:
+        google.generativeai.GenerativeModel: モデル
+    """
+    import google.generativeai as genai
+    return genai.GenerativeModel(model, system_instruction=system_instruction)
+
+
+class _StubChunk:
+    """Geminiの応答・ストリーミングの断片と同じく `text` 属性を持つオブジェクト。"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class StubChatSession:
+    """`StubChatModel.start_chat()` が返すチャットセッション。履歴をすべてモデルに渡します。"""
+
+    def __init__(self, model):
+        self.model = model
+        self.history = []
+
+    def send_message(self, text, stream=False):
+        contents = self.history + [{"role": "user", "parts": [text]}]
+        response = self.model.generate_content(contents, stream=stream)
+        if not stream:
+            self.history = contents + [{"role": "model", "parts": [response.text]}]
+            return response
+        return self._stream(contents, response)
+
+    def _stream(self, contents, response):
+        parts = []
+        for chunk in response:
+            parts.append(chunk.text)
+            yield chunk
+        self.history = contents + [{"role": "model", "parts": ["".join(parts)]}]
+
+
+class StubChatModel:
+    """ネットワークを使わない決定的な対話モデル (負荷試験・ベンチマーク用)。
+
+    応答は最後のユーザーの発言から決まり、同じ入力には常に同じ応答を返します。
+    最初の断片までの遅延と、断片ごとの間隔を設定できます。
+
+    Args:
+        system_instruction (str, optional): システム指示 (応答には使いません)
+        latency (float, optional): 最初の断片 (非ストリーミングでは応答全体) までの秒数
+        chunk_interval (float, optional): ストリーミングでの断片ごとの間隔 (秒)
+        sentences (int, optional): 応答の文の数
+        chunk_chars (int, optional): ストリーミングでの断片の文字数
+    """
+
+    REPLY_SENTENCES = [
+        "「{text}」やな、ええ質問やで！",
+        "それについてはな、ちょっと説明させてな。",
+        "Monadは並列実行でめっちゃ速いブロックチェーンなんや。",
+        "みんなもテストネットで触ってみてな！",
+        "ほな、次の質問も待ってるで。",
+    ]
+
+    def __init__(self, system_instruction=None, latency=0.0, chunk_interval=0.0, sentences=3, chunk_chars=12):
+        self.system_instruction = system_instruction
+        self.latency = latency
+        self.chunk_interval = chunk_interval
+        self.sentences = sentences
+        self.chunk_chars = max(1, chunk_chars)
+        self.model_name = "stub"
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _last_user_text(contents):
+        if isinstance(contents, str):
+            return contents
+        for content in reversed(list(contents)):
+            if isinstance(content, str):
+                return content
+            if content.get("role") == "user":
+                return "".join(str(p) for p in content.get("parts", []))
+        return ""
+
+    def reply_for(self, text):
+        """入力テキストに対する応答テキストを返します (遅延なし)。"""
+        start = zlib.crc32(text.encode("utf-8")) % len(self.REPLY_SENTENCES)
+        first = self.REPLY_SENTENCES[0].format(text=text.strip()[:20])
+        rest = [self.REPLY_SENTENCES[1 + (start + i) % (len(self.REPLY_SENTENCES) - 1)]
+                for i in range(max(0, self.sentences - 1))]
+        return "".join([first] + rest)
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        """Geminiの `generate_content` と同じ形で応答を返します。"""
+        with self._lock:
+            self.calls += 1
+        reply = self.reply_for(self._last_user_text(contents))
+        if not stream:
+            time.sleep(self.latency)
+            return _StubChunk(reply)
+        return self._stream(reply)
+
+    def _stream(self, reply):
+        time.sleep(self.latency)
+        for i in range(0, len(reply), self.chunk_chars):
+            if i and self.chunk_interval:
+                time.sleep(self.chunk_interval)
+            yield _StubChunk(reply[i:i + self.chunk_chars])
+
+    def start_chat(self):
+        return StubChatSession(self)
+
+
+############################################
+# TTSプロバイダー
+# `synthesize(text, language_code)` はモノラル・int16のRAW PCMデータ (bytes) を返します。
+# `synthesize_batch(texts, language_code)` は複数のテキストをまとめて合成し、テキストごとのPCMのリストを返します
+# (持たないプロバイダーは `synthesize_batch()` 関数が1件ずつ合成します)。
+# `name`・`voice`・`model` はTTS音声キャッシュのキーに、`sample_rate` は再生に使われます。
+############################################
+
+class GeminiTTSProvider:
+    """Gemini API TTS。APIキーの設定 (`genai.configure`) は呼び出し側で行います。
+
+    Args:
+        model (str, optional): TTSモデル名
+        voice (str, optional): ボイス名
+        sample_rate (int, optional): APIが返すPCMのサンプルレート
+        max_concurrency (int, optional): `synthesize_batch()` で同時に送るリクエストの数
+    """
+
+    name = "gemini"
+
+    def __init__(self, model="models/gemini-2.5-flash-preview-tts", voice="zephyr", sample_rate=DEFAULT_SAMPLE_RATE,
+                 max_concurrency=4):
+        self.model = model
+        self.voice = voice
+        self.sample_rate = sample_rate
+        self.max_concurrency = max(1, max_concurrency)
+        self._tts_model = None
+
+    def _get_tts_model(self):
+        if self._tts_model is None:
+            import google.generativeai as genai
+            self._tts_model = genai.GenerativeModel(self.model)
+        return self._tts_model
+
+    def synthesize_batch(self, texts, language_code="ja-JP"):
+        """複数のテキストを、最大 `max_concurrency` 件ずつ並列のリクエストで合成します (TTSのAPIは1回に1テキストのため)。"""
+        if len(texts) <= 1:
+            return [self.synthesize(text, language_code) for text in texts]
+        self._get_tts_model()
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(texts)),
+                                thread_name_prefix="gemini-tts") as executor:
+            return list(executor.map(lambda text: self.synthesize(text, language_code), texts))
+
+    def synthesize(self, text, language_code="ja-JP"):
+        tts_model = self._get_tts_model()
+
+        # テスト済みのリクエスト形式を使用
+        generation_config = {
+            "response_modalities": ["AUDIO"],
+            "speech_config": {
+                "voice_config": {
+                    "prebuilt_voice_config": {
+                        "voice_name": self.voice
+                    }
+                }
+            }
+        }
+        audio_response = tts_model.generate_content(text, generation_config=generation_config)
+        # API応答からRAWオーディオデータを直接取得
+        return audio_response.candidates[0].content.parts[0].inline_data.data
+
+
+def to_pcm16(audio, source_rate, target_rate=DEFAULT_SAMPLE_RATE):
+    """浮動小数点 (-1.0〜1.0) または整数の音声配列を、指定したサンプルレートのモノラルint16 PCMに変換します。
+
+    Args:
+        audio (np.ndarray): 音声データ (1次元、または (サンプル数, チャンネル数))
+        source_rate (int): 元のサンプルレート
+        target_rate (int, optional): 変換後のサンプルレート
+
+    Returns:
+        bytes: モノラル・int16のRAW PCMデータ
+    """
+    import numpy as np
+    audio = np.asarray(audio)
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    if np.issubdtype(audio.dtype, np.integer):
+        audio = audio.astype(np.float32) / np.iinfo(audio.dtype).max
+    if source_rate != target_rate and len(audio):
+        length = max(1, int(round(len(audio) * target_rate / source_rate)))
+        positions = np.arange(length) * (source_rate / target_rate)
+        audio = np.interp(positions, np.arange(len(audio)), audio)
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+class StyleBertVITS2TTSProvider:
+    """Style-Bert-VITS2 サーバー (`/voice`) またはプロセス内のモデルによる音声合成。`backend/tts_engine.StyleBertVITS2` を使います。
+
+    サーバーが返す音声は、再生エンジンに合わせて `sample_rate` のモノラルint16 PCMに変換します。
+    `voice` には話者・スタイルIDに加えて、話速などの合成パラメータとモデルのファイルの短いハッシュを含めるため、
+    設定を変えるとTTSキャッシュの古い音声は使われません。
+
+    Args:
+        config_path (str, optional): `backend/config.json` のパス
+        sample_rate (int, optional): 出力するPCMのサンプルレート
+        engine (optional): `synthesize(text)` を持つ合成エンジン (テスト用。省略時は config_path から作成)
+    """
+
+    name = "style_bert_vits2"
+
+    def __init__(self, config_path="backend/config.json", sample_rate=DEFAULT_SAMPLE_RATE, engine=None):
+        if engine is None:
+            from backend.tts_engine import StyleBertVITS2
+            engine = StyleBertVITS2(config_path)
+        self.engine = engine
+        self.sample_rate = sample_rate
+        model_config = getattr(engine, "model_config", {})
+        if model_config.get("backend") == "local":
+            self.model = "local"  # プロセス内に読み込んだモデル
+        else:
+            self.model = model_config.get("server_url", "http://127.0.0.1:8080")
+        self.voice = (f"sbv2:{model_config.get('speaker_id', 0)}:{model_config.get('style_id', 0)}"
+                      f":{self._settings_hash(engine, model_config)}")
+
+    @staticmethod
+    def _settings_hash(engine, model_config):
+        """合成結果を左右する設定 (`/voice` のパラメータとモデルのファイル) の短いハッシュを返します。"""
+        if hasattr(engine, "_voice_request"):
+            _, params = engine._voice_request("")
+            params.pop("text", None)
+        else:
+            params = dict(model_config)
+        local = getattr(engine, "local_settings", None) or model_config.get("local", {})
+        params["model"] = [model_config.get("model_path"), local.get("model_file"), local.get("style_vectors")]
+        payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:8]
+
+    def synthesize(self, text, language_code="ja-JP"):
+        audio = self.engine.synthesize(text)
+        source_rate = getattr(self.engine, "sample_rate", self.sample_rate)
+        return to_pcm16(audio, source_rate, self.sample_rate)
+
+    def synthesize_batch(self, texts, language_code="ja-JP"):
+        """エンジンの `synthesize_batch()` (テキストごとのリクエストを並列に送る) でまとめて合成します。"""
+        audios, source_rate = self.engine.synthesize_batch(list(texts))
+        return [to_pcm16(audio, source_rate, self.sample_rate) for audio in audios]
+
+
+class StubTTSProvider:
+    """ネットワークを使わない決定的なTTS (負荷試験・ベンチマーク用)。
+
+    テキストに応じた高さの正弦波を返します。音声の長さは文字数に比例し、
+    合成にかかる時間は `latency + seconds_per_char * 文字数` 秒です。
+
+    `synthesize_batch()` は、パディングしたバッチで推論するエンジンのように、まとめた件数によらず
+    `latency + seconds_per_char * 最も長いテキストの文字数` 秒で全件を返します。
+
+    Args:
+        latency (float, optional): 1回の合成の固定の遅延 (秒)
+        seconds_per_char (float, optional): 1文字あたりの合成の遅延 (秒)
+        chars_per_second (float, optional): 音声の長さ (1秒あたりに読み上げる文字数)
+        sample_rate (int, optional): 出力するPCMのサンプルレート
+    """
+
+    name = "stub"
+
+    def __init__(self, latency=0.0, seconds_per_char=0.0, chars_per_second=8.0, sample_rate=DEFAULT_SAMPLE_RATE):
+        self.latency = latency
+        self.seconds_per_char = seconds_per_char
+        self.chars_per_second = chars_per_second
+        self.sample_rate = sample_rate
+        self.model = "stub"
+        self.voice = "stub-sine"
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def synthesize(self, text, language_code="ja-JP"):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency + self.seconds_per_char * len(text))
+        return self._render(text)
+
+    def synthesize_batch(self, texts, language_code="ja-JP"):
+        """バッチで推論するエンジンと同じく、固定の遅延は1回分、文字数の遅延は最も長いテキスト分 (パディング) かかります。"""
+        if not texts:
+            return []
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency + self.seconds_per_char * max(len(text) for text in texts))
+        return [self._render(text) for text in texts]
+
+    def _render(self, text):
+        import numpy as np
+        samples = max(1, int(self.sample_rate * len(text) / self.chars_per_second))
+        frequency = 220 + zlib.crc32(text.encode("utf-8")) % 440
+        t = np.arange(samples) / self.sample_rate
+        return (0.1 * np.sin(2 * math.pi * frequency * t) * 32767).astype("<i2").tobytes()
+
+
+def synthesize_batch(provider, texts, language_code="ja-JP"):
+    """TTSプロバイダーで複数のテキストを合成し、テキストごとのPCMのリストを返します。
+
+    `synthesize_batch` を持たないプロバイダー (登録された独自のプロバイダーなど) は1件ずつ合成します。
+
+    Args:
+        provider: TTSプロバイダー
+        texts (list[str]): 合成するテキストのリスト
+        language_code (str, optional): 言語コード
+
+    Returns:
+        list: テキストと同じ順のモノラル・int16のRAW PCMデータ
+    """
+    texts = list(texts)
+    if hasattr(provider, "synthesize_batch"):
+        return provider.synthesize_batch(texts, language_code)
+    return [provider.synthesize(text, language_code) for text in texts]
+
+
+############################################
+# レジストリ
+############################################
+
+LLM_PROVIDERS = {
+    "gemini": create_gemini_model,
+    "stub": StubChatModel,
+}
+
+TTS_PROVIDERS = {
+    "gemini": GeminiTTSProvider,
+    "style_bert_vits2": StyleBertVITS2TTSProvider,
+    "stub": StubTTSProvider,
+}
+
+_NAME_PATTERN = re.compile(r"^[a-z0-9_]+$")
+
+
+def register_llm_provider(name, factory):
+    """LLMプロバイダーを登録します。`factory(system_instruction=None, **options)` はモデルを返す関数です。"""
+    if not _NAME_PATTERN.match(name):
+        raise ValueError(f"プロバイダー名には英小文字・数字・_ だけを使えます: {name}")
+    LLM_PROVIDERS[name] = factory
+
+
+def register_tts_provider(name, factory):
+    """TTSプロバイダーを登録します。`factory(**options)` は `synthesize(text, language_code)` を持つオブジェクトを返します。"""
+    if not _NAME_PATTERN.match(name):
+        raise ValueError(f"プロバイダー名には英小文字・数字・_ だけを使えます: {name}")
+    TTS_PROVIDERS[name] = factory
+
+
+def create_llm(name, system_instruction=None, **options):
+    """名前を指定してLLMのモデルを作成します。
+
+    Args:
+        name (str): プロバイダー名 (`LLM_PROVIDERS` のキー)
+        system_instruction (str, optional): ペルソナなどのシステム指示
+        **options: プロバイダーごとの設定 (Geminiの `model`、スタブの `latency` など)
+
+    Returns:
+        `generate_content` と `start_chat` を持つモデル
+
+    Raises:
+        ValueError: 未登録のプロバイダー名の場合
+    """
+    if name not in LLM_PROVIDERS:
+        raise ValueError(f"未登録のLLMプロバイダーです: {name} (利用可能: {', '.join(sorted(LLM_PROVIDERS))})")
+    return LLM_PROVIDERS[name](system_instruction=system_instruction, **options)
+
+
+def create_tts(name, **options):
+    """名前を指定してTTSプロバイダーを作成します。
+
+    Args:
+        name (str): プロバイダー名 (`TTS_PROVIDERS` のキー)
+        **options: プロバイダーごとの設定 (Geminiの `voice`、スタブの `latency` など)
+
+    Returns:
+        `synthesize(text, language_code)` と `name`・`voice`・`model`・`sample_rate` を持つオブジェクト
+
+    Raises:
+        ValueError: 未登録のプロバイダー名の場合
+    """
+    if name not in TTS_PROVIDERS:
+        raise ValueError(f"未登録のTTSプロバイダーです: {name} (利用可能: {', '.join(sorted(TTS_PROVIDERS))})")
+    return TTS_PROVIDERS[name](**options)
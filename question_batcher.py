@@ -0,0 +1,326 @@
+############################################
+# 似た質問のまとめ
+# 視聴者から短時間に届いたほぼ同じ質問 (「自己紹介して」「what is Monad」など) を
+# 文字n-gramの類似度でグループにまとめ、グループごとに1回だけAIに質問します。
+# 候補の絞り込みにはMinHash + LSH を使い、最終判定は正確なJaccard係数で行います。
+# 「MonadとSolana」のように固有名詞 (英数字の単語) だけが入れ替わった質問はまとめません。
+############################################
+import asyncio
+import re
+import time
+import unicodedata
+import zlib
+
+import numpy as np
+
+from conversation_core import UserMessage
+
+
+def normalize_question(text):
+    """類似判定用にテキストを正規化します (NFKC・小文字化・記号と空白の除去)。"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return re.sub(r"[\W_]+", "", text)
+
+
+def latin_words(text):
+    """テキストに含まれる英数字の単語 (小文字) の集合を返します (固有名詞・数字の入れ替わりの判定用)。"""
+    return set(re.findall(r"[a-z0-9]+", unicodedata.normalize("NFKC", text).lower()))
+
+
+def char_ngrams(text, n=2):
+    """正規化済みテキストの文字n-gramの集合を返します。n文字未満の場合はテキスト全体を1要素とします。"""
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def jaccard(a, b):
+    """2つの集合のJaccard係数を返します。"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """n-gram集合のMinHash署名を計算します。
+
+    Args:
+        num_perm (int, optional): ハッシュ関数の数 (署名の長さ)
+        seed (int, optional): 乱数シード
+    """
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = np.random.default_rng(seed)
+        # multiply-shift 方式: (a*x + b) mod 2^64 の上位32ビット (a は奇数)
+        self.a = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, ngrams):
+        """MinHash署名 (長さ num_perm のuint64配列) を返します。"""
+        if not ngrams:
+            return np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        x = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in ngrams), dtype=np.uint64, count=len(ngrams))
+        hashed = (np.outer(self.a, x) + self.b[:, None]) >> np.uint64(32)  # uint64の桁あふれで mod 2^64 になる
+        return hashed.min(axis=1)
+
+
+class QuestionGroup:
+    """同じ内容とみなした質問のグループ。
+
+    Args:
+        message (UserMessage): 最初の質問 (代表)
+        created_at (float): グループを作った時刻
+        ngrams (set): 代表の質問の文字n-gram
+        words (set, optional): 代表の質問の英数字の単語
+    """
+
+    def __init__(self, message, created_at, ngrams, words=frozenset()):
+        self.messages = [message]
+        self.created_at = created_at
+        self.ngrams = ngrams
+        self.words = words
+
+    @property
+    def text(self):
+        """AIに送る質問文 (最初の質問)。"""
+        return self.messages[0].text
+
+    @property
+    def askers(self):
+        """質問したユーザー (重複なし・到着順)。"""
+        return list(dict.fromkeys(m.user for m in self.messages))
+
+    @property
+    def size(self):
+        return len(self.messages)
+
+    @property
+    def priority(self):
+        """グループ内の最大の優先度。"""
+        return max(m.priority for m in self.messages)
+
+    def to_message(self):
+        """グループを1つの `UserMessage` にまとめます (優先度はグループ内の最大値)。"""
+        first = self.messages[0]
+        message = UserMessage(first.text, user=first.user, source=first.source, priority=self.priority)
+        message.received_at = first.received_at
+        message.askers = self.askers
+        return message
+
+
+class QuestionBatcher:
+    """時間窓の中で届いた似た質問をグループにまとめます (時刻は呼び出し側が渡します)。
+
+    新しい質問は、受付中のグループの代表とのJaccard係数が `threshold` 以上なら
+    そのグループに加わり、そうでなければ新しいグループを作ります。ただし、お互いに相手にない
+    英数字の単語がある場合 (「Monadのノードの作り方は？」と「Solanaのノードの作り方は？」など、
+    固有名詞や数字が入れ替わった質問) は、係数にかかわらず別の質問とみなします。
+    グループは作られてから `window` 秒経つと `pop_ready()` で取り出せます。
+
+    Args:
+        window (float, optional): グループを受け付ける秒数
+        threshold (float, optional): 同じ質問とみなすJaccard係数の下限
+        ngram (int, optional): 文字n-gramのn
+        max_group_size (int, optional): 1グループの最大件数。達したらすぐに取り出せます。
+        num_perm (int, optional): MinHashのハッシュ関数の数
+        bands (int, optional): LSHのバンド数 (num_perm を割り切れる数)
+    """
+
+    def __init__(self, window=3.0, threshold=0.7, ngram=2, max_group_size=20, num_perm=64, bands=32):
+        if num_perm % bands:
+            raise ValueError("num_perm は bands で割り切れる必要があります")
+        self.window = window
+        self.threshold = threshold
+        self.ngram = ngram
+        self.max_group_size = max_group_size
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self._open = []           # 受付中のグループ (作成順)
+        self._buckets = {}        # (バンド番号, バンドのハッシュ) -> グループのリスト
+        self._group_keys = {}     # id(group) -> バケットのキーのリスト
+        self.messages_seen = 0
+        self.groups_emitted = 0
+
+    def _band_keys(self, ngrams):
+        signature = self.hasher.signature(ngrams)
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def add(self, message, now=None):
+        """質問を追加します。
+
+        Args:
+            message (UserMessage): 質問
+            now (float, optional): 現在時刻。省略時は time.monotonic()
+
+        Returns:
+            QuestionGroup: 質問が入ったグループ
+        """
+        now = time.monotonic() if now is None else now
+        self.messages_seen += 1
+        ngrams = char_ngrams(normalize_question(message.text), self.ngram)
+        words = latin_words(message.text)
+        keys = self._band_keys(ngrams)
+
+        best, best_score = None, 0.0
+        seen = set()
+        for key in keys:
+            for group in self._buckets.get(key, ()):
+                if id(group) in seen:
+                    continue
+                seen.add(id(group))
+                if words - group.words and group.words - words:
+                    continue  # 固有名詞・数字が入れ替わっている
+                score = jaccard(ngrams, group.ngrams)
+                if score > best_score:
+                    best, best_score = group, score
+        if best is not None and best_score >= self.threshold:
+            best.messages.append(message)
+            return best
+
+        group = QuestionGroup(message, now, ngrams, words)
+        self._open.append(group)
+        self._group_keys[id(group)] = keys
+        for key in keys:
+            self._buckets.setdefault(key, []).append(group)
+        return group
+
+    def _close(self, group):
+        self._open.remove(group)
+        for key in self._group_keys.pop(id(group)):
+            bucket = self._buckets[key]
+            bucket.remove(group)
+            if not bucket:
+                del self._buckets[key]
+        self.groups_emitted += 1
+
+    def next_deadline(self):
+        """次にグループが取り出せるようになる時刻を返します。受付中のグループがなければNone。"""
+        return self._open[0].created_at + self.window if self._open else None
+
+    def pop_ready(self, now=None):
+        """受付時間が終わった (または満杯の) グループを作成順に取り出します。"""
+        now = time.monotonic() if now is None else now
+        ready = [g for g in self._open if now - g.created_at >= self.window or g.size >= self.max_group_size]
+        for group in ready:
+            self._close(group)
+        return ready
+
+    def flush(self):
+        """受付中のグループをすべて取り出します。"""
+        groups = list(self._open)
+        for group in groups:
+            self._close(group)
+        return groups
+
+    @property
+    def calls_saved(self):
+        """まとめたことで省略できたAIへの質問の数。"""
+        return self.messages_seen - self.groups_emitted - len(self._open)
+
+
+ASKER_TEMPLATES = {
+    "ja": "{names}から同じ質問が来てるで！",
+    "en": "{names} asked the same thing!",
+    "es": "¡{names} preguntaron lo mismo!",
+}
+
+
+def format_askers(askers, language_code="ja-JP", max_names=3):
+    """複数の質問者に呼びかける一文を返します。質問者が1人の場合は空文字列を返します。
+
+    Args:
+        askers (list[str]): 質問者の名前
+        language_code (str, optional): 言語コード (BCP47形式)
+        max_names (int, optional): 名前を読み上げる最大人数
+
+    Returns:
+        str: 呼びかけの文
+    """
+    if len(askers) < 2:
+        return ""
+    lang = language_code.split("-")[0]
+    shown = askers[:max_names]
+    rest = len(askers) - len(shown)
+    if lang == "ja":
+        names = "、".join(f"{name}さん" for name in shown) + (f"ほか{rest}人" if rest else "")
+    elif lang == "es":
+        names = ", ".join(shown) + (f" y {rest} más" if rest else "")
+    else:
+        names = ", ".join(shown) + (f" and {rest} others" if rest else "")
+    return ASKER_TEMPLATES.get(lang, ASKER_TEMPLATES["en"]).format(names=names)
+
+
+class BatchingSource:
+    """入力ソースの質問を `QuestionBatcher` でまとめてから流す非同期イテラブル。
+
+    `ConversationCore.run()` の入力ソースとして、`ChatIngestor` などの後ろに挟んで使います。
+    まとめたメッセージには質問者のリスト `askers` が付きます。
+    `bypass_sources` の入力元 (配信者のコンソール入力など) はまとめずにすぐ流します。
+
+    入力ソースからは、取り出せるメッセージがないときだけ読み取ります。会話コアが応答している間は
+    メッセージが `ChatIngestor` のキューに残るため、その上限 (`max_queue`) と優先度順の並べ替えが働きます。
+    取り出せるメッセージが複数ある場合は優先度の高い順 (同じ優先度では受信順) に流します。
+    入力ソースが視聴者のコメントを破棄している間 (`ChatIngestor` の `until` が終わった後) は、
+    まとめている途中の質問も流さずに破棄します。
+
+    Args:
+        source: `UserMessage` を返す非同期イテラブル
+        batcher (QuestionBatcher): 質問のまとめ役
+        bypass_sources (iterable, optional): まとめずに流す入力元の名前
+    """
+
+    def __init__(self, source, batcher, bypass_sources=("console",)):
+        self.source = source
+        self.batcher = batcher
+        self.bypass_sources = set(bypass_sources)
+
+    async def __aiter__(self):
+        messages = self.source.__aiter__()
+        ready = []  # 取り出せるメッセージ
+        pull = None  # 入力ソースから次のメッセージを読み取るタスク
+        finished = False
+        try:
+            while True:
+                if getattr(self.source, "discarding", False):
+                    # 配信者が終了した後は、まとめている途中の視聴者の質問に応答しない
+                    self.batcher.flush()
+                    ready = [m for m in ready if m.source in self.bypass_sources]
+                ready.extend(group.to_message() for group in self.batcher.pop_ready())
+                if ready:
+                    message = min(ready, key=lambda m: (-m.priority, m.received_at))
+                    ready.remove(message)
+                    yield message
+                    continue
+                if finished:
+                    groups = self.batcher.flush()
+                    for group in sorted(groups, key=lambda g: (-g.priority, g.created_at)):
+                        yield group.to_message()
+                    return
+                if pull is None:
+                    pull = asyncio.ensure_future(messages.__anext__())
+                deadline = self.batcher.next_deadline()
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                # 読み取りを途中で取り消すと入力ソースが閉じてしまうため、タスクは取り消さずに待つ
+                done, _ = await asyncio.wait([pull], timeout=timeout)
+                if not done:
+                    continue
+                try:
+                    message = pull.result()
+                except StopAsyncIteration:
+                    finished = True
+                    continue
+                finally:
+                    pull = None
+                if message.source in self.bypass_sources:
+                    ready.append(message)
+                else:
+                    self.batcher.add(message)
+        finally:
+            if pull is not None:
+                pull.cancel()
+            else:
+                close = getattr(messages, "aclose", None)
+                if close is not None:
+                    await close()
@@ -0,0 +1,156 @@
+############################################
+# AI応答キャッシュ
+# 同じ質問 (正規化後のテキスト・言語・ペルソナが同じ) へのAIの応答をSQLiteに保存し、
+# 再起動後も再利用します。有効期限 (TTL) と件数の上限 (LRU) があります。
+############################################
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from question_batcher import normalize_question
+
+# 直前の会話に依存する質問 (キャッシュすると文脈に合わない応答を返してしまうもの)
+CONTEXT_DEPENDENT_PATTERN = re.compile(
+    r"さっき|前の|先ほど|続き|もう一[度回]|それ|あれ|これ|今の|"
+    r"\b(again|previous|earlier|continue|that|this|it|last)\b|"
+    r"\b(otra vez|anterior|eso|esto|continúa|continua)\b",
+    re.IGNORECASE,
+)
+
+
+def is_context_dependent(text):
+    """直前の会話に依存する質問かどうかを判定します (キャッシュしない質問)。"""
+    return bool(CONTEXT_DEPENDENT_PATTERN.search(text))
+
+
+class ResponseCache:
+    """SQLiteに保存するAI応答キャッシュ (スレッドセーフ)。
+
+    キーは正規化したユーザーのテキスト・言語・ペルソナのハッシュから作ります。
+    `ttl_seconds` を過ぎたエントリは使わずに削除し、件数が `max_entries` を超えたら
+    最も長く使われていないものから削除します。
+
+    Args:
+        db_path (str): SQLiteファイルのパス (":memory:" も可)
+        ttl_seconds (float, optional): エントリの有効期限 (秒)
+        max_entries (int, optional): 保存する最大件数
+        clock (callable, optional): 現在時刻 (UNIX時間) を返す関数 (テスト用)
+    """
+
+    def __init__(self, db_path, ttl_seconds=24 * 3600, max_entries=1000, clock=time.time):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(db_path)
+        if directory and db_path != ":memory:":
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, prompt TEXT, language TEXT, response TEXT,"
+            " created_at REAL, last_used_at REAL, hits INTEGER DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def persona_hash(*parts):
+        """ペルソナ・ガイドライン・モデル名などからハッシュを作ります。どれかが変わると以前の応答は使われません。"""
+        payload = json.dumps([str(p) for p in parts], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def make_key(text, language, persona_hash):
+        """キャッシュキーを生成します。
+
+        Args:
+            text (str): ユーザーのテキスト
+            language (str): 言語コード
+            persona_hash (str): `persona_hash()` の戻り値
+
+        Returns:
+            str: SHA-256の16進文字列
+        """
+        payload = json.dumps([normalize_question(text), language, persona_hash], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """キャッシュされた応答を返します。ない・期限切れの場合はNone。
+
+        Args:
+            key (str): `make_key` で生成したキー
+
+        Returns:
+            str or None: 応答テキスト
+        """
+        now = self.clock()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used_at = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, prompt, language, response):
+        """応答を保存します。
+
+        Args:
+            key (str): `make_key` で生成したキー
+            prompt (str): ユーザーのテキスト (確認用に保存)
+            language (str): 言語コード
+            response (str): 応答テキスト
+        """
+        if not response:
+            return
+        now = self.clock()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, prompt, language, response, created_at, last_used_at, hits)"
+                " VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (key, prompt, language, response, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def wrap_stream(self, key, prompt, language, chunks):
+        """ストリーミング応答をそのまま流しつつ、最後まで受け取れたら全文を保存するジェネレーター。
+
+        途中で打ち切られた応答は保存しません。
+        """
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        self.put(key, prompt, language, "".join(parts))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,182 @@
+############################################
+# 原稿読み上げの先読み
+# 段落Nを再生している間に、段落N+1以降を先に音声合成しておきます。
+# 再生位置はチェックポイントファイルに保存し、クラッシュ後に途中から再開できます。
+############################################
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+class ParagraphPrefetcher:
+    """段落を先読みで音声合成し、順番に取り出すイテレーター。
+
+    常に最大 `lookahead` 段落ぶん先まで合成を進めます。合成済みで未再生の音声の合計が
+    `max_buffered_bytes` を超えている間は、新しい合成を始めません。
+
+    使い方:
+        with ParagraphPrefetcher(paragraphs, synthesize, lookahead=2) as prefetcher:
+            for index, paragraph, pcm, error in prefetcher:
+                play(pcm)
+
+    Args:
+        paragraphs (list[str]): 段落のリスト
+        synthesize (callable): `synthesize(text) -> bytes` 合成関数
+        lookahead (int, optional): 再生中の段落より先に合成しておく段落数
+        workers (int, optional): 同時に合成するスレッド数
+        max_buffered_bytes (int, optional): 合成済みで未再生の音声の合計の上限 (バイト)
+        start_index (int, optional): 読み上げを開始する段落のインデックス
+    """
+
+    def __init__(self, paragraphs, synthesize, lookahead=2, workers=2,
+                 max_buffered_bytes=64 * 1024 * 1024, start_index=0):
+        self.paragraphs = paragraphs
+        self.synthesize = synthesize
+        self.lookahead = max(0, lookahead)
+        self.workers = max(1, workers)
+        self.max_buffered_bytes = max_buffered_bytes
+        self.start_index = max(0, start_index)
+        self._executor = None
+        self._futures = {}
+        self._next_submit = self.start_index
+        self._current = self.start_index
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """未開始の合成を取り消し、スレッドを終了します。"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    @property
+    def buffered_bytes(self):
+        """合成済みで未再生の音声の合計 (バイト)。"""
+        with self._lock:
+            return sum(self._result_size(future) for future in self._futures.values() if future.done())
+
+    @staticmethod
+    def _result_size(future):
+        if future.cancelled() or future.exception() is not None:
+            return 0
+        pcm = future.result()
+        return len(pcm) if pcm else 0
+
+    def _fill(self):
+        """先読みの枠・スレッド数・メモリの上限に収まる範囲で合成を投入します。
+
+        スレッドが空くたびに (合成の完了時にも) 呼ばれます。実行待ちの合成を
+        溜め込まないよう、同時に投入するのはスレッド数までです。
+        """
+        with self._lock:
+            if self._executor is None:
+                return
+            limit = min(len(self.paragraphs), self._current + self.lookahead + 1)
+            while self._next_submit < limit:
+                running = sum(1 for future in self._futures.values() if not future.done())
+                # 再生待ちの段落 (self._current) は必ず投入する。それ以降はスレッド数とメモリの上限を確認する
+                if self._next_submit > self._current and (
+                        running >= self.workers or self.buffered_bytes >= self.max_buffered_bytes):
+                    break
+                index = self._next_submit
+                future = self._executor.submit(self.synthesize, self.paragraphs[index])
+                self._futures[index] = future
+                self._next_submit += 1
+                future.add_done_callback(lambda _: self._fill())
+
+    def __iter__(self):
+        """(インデックス, 段落, PCM, 例外) を段落の順に返します。合成に失敗した場合PCMはNoneです。"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="script-prefetch")
+        try:
+            for index in range(self.start_index, len(self.paragraphs)):
+                with self._lock:
+                    self._current = index
+                    self._fill()
+                    future = self._futures[index]
+                try:
+                    pcm, error = future.result(), None
+                except Exception as e:
+                    pcm, error = None, e
+                # 再生中に次の段落の合成が進むよう、取り出した時点で枠を空けて補充する
+                with self._lock:
+                    self._futures.pop(index, None)
+                    self._current = index + 1
+                    self._fill()
+                yield index, self.paragraphs[index], pcm, error
+        finally:
+            self.close()
+
+
+# --- 再生位置のチェックポイント --- #
+
+def load_checkpoint(checkpoint_path, script_path):
+    """保存されている再生位置を読み込みます。
+
+    Args:
+        checkpoint_path (str): チェックポイントファイルのパス
+        script_path (str): 原稿ファイルのパス
+
+    Returns:
+        int or None: 次に読み上げる段落のインデックス。保存されていない場合はNone。
+    """
+    try:
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            checkpoints = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    entry = checkpoints.get(os.path.abspath(script_path))
+    return entry.get("next_paragraph") if isinstance(entry, dict) else None
+
+
+def _update_checkpoints(checkpoint_path, update):
+    try:
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            checkpoints = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        checkpoints = {}
+    update(checkpoints)
+    directory = os.path.dirname(checkpoint_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoints, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, checkpoint_path)  # 書き込み中にクラッシュしても壊れたファイルを残さない
+
+
+def save_checkpoint(checkpoint_path, script_path, next_paragraph, total_paragraphs):
+    """再生位置を保存します。
+
+    Args:
+        checkpoint_path (str): チェックポイントファイルのパス
+        script_path (str): 原稿ファイルのパス
+        next_paragraph (int): 次に読み上げる段落のインデックス
+        total_paragraphs (int): 段落の総数
+    """
+    def update(checkpoints):
+        checkpoints[os.path.abspath(script_path)] = {
+            "next_paragraph": next_paragraph,
+            "total_paragraphs": total_paragraphs,
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+        }
+    _update_checkpoints(checkpoint_path, update)
+
+
+def clear_checkpoint(checkpoint_path, script_path):
+    """原稿の再生位置を削除します (最後まで読み上げたときに呼びます)。"""
+    if not os.path.exists(checkpoint_path):
+        return
+    _update_checkpoints(checkpoint_path, lambda checkpoints: checkpoints.pop(os.path.abspath(script_path), None))
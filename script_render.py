@@ -0,0 +1,264 @@
+############################################
+# 原稿の一括レンダリング
+# 原稿の全段落を事前に音声合成し、段落ごとの音声ファイル・連結した1本の音声・
+# 長さを記録したマニフェストを書き出します。配信前に非対話で実行する用途です。
+############################################
+import hashlib
+import json
+import os
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+MANIFEST_NAME = "manifest.json"
+SUPPORTED_FORMATS = ("wav", "opus")
+
+
+def split_paragraphs(script_text):
+    """原稿テキストを空行区切りで段落に分割します。
+
+    Args:
+        script_text (str): 原稿テキスト
+
+    Returns:
+        list[str]: 空でない段落のリスト
+    """
+    return [p.strip() for p in script_text.split('\n\n') if p.strip()]
+
+
+def paragraph_key(text, voice_name, model, language):
+    """段落の音声を識別するハッシュを返します。テキスト・ボイス・モデル・言語のいずれかが変わると変わります。"""
+    payload = json.dumps([text, voice_name, model, language], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_rate_limit_error(error):
+    """APIのレート制限 (HTTP 429 / RESOURCE_EXHAUSTED) による例外かどうかを判定します。"""
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    message = str(error)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message or "rate limit" in message.lower()
+
+
+class RateLimiter:
+    """1分あたりのリクエスト数を制限するレートリミッター (スレッドセーフ)。
+
+    リクエストの間隔を均等に空けます。レート制限のエラーを受けた場合は `backoff()` で
+    全スレッドの次のリクエストを遅らせます。
+
+    Args:
+        requests_per_minute (float): 1分あたりの最大リクエスト数。0以下の場合は制限しません。
+    """
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute and requests_per_minute > 0 else 0.0
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """次のリクエストを送ってよい時刻まで待ちます。"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_time)
+            self._next_time = start + self.interval
+        delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def backoff(self, seconds):
+        """次のリクエストを少なくとも `seconds` 秒後まで遅らせます。"""
+        with self._lock:
+            self._next_time = max(self._next_time, time.monotonic() + seconds)
+
+
+def load_manifest(output_dir):
+    """出力ディレクトリのマニフェストを読み込みます。存在しない・壊れている場合はNoneを返します。"""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _read_wav_frames(path):
+    with wave.open(path, "rb") as wf:
+        return wf.readframes(wf.getnframes())
+
+
+def _export_opus(wav_path, opus_path):
+    """WAVファイルをOpusに変換します (pydub と ffmpeg が必要)。"""
+    from pydub import AudioSegment
+    AudioSegment.from_wav(wav_path).export(opus_path, format="opus")
+
+
+def render_script(script_path, output_dir, synthesize, write_wav, voice_name="", model="", language="",
+                  sample_rate=24000, workers=4, requests_per_minute=0, audio_format="wav",
+                  paragraph_gap=1.5, force=False, max_retries=3, retry_wait=10.0, lookup=None):
+    """原稿の全段落を並列に音声合成し、音声ファイルとマニフェストを書き出します。
+
+    出力ディレクトリの構成:
+        <output_dir>/0001.wav ...   段落ごとの音声 (audio_format="opus" の場合は .opus も出力)
+        <output_dir>/full.wav       全段落を `paragraph_gap` 秒の無音を挟んで連結した音声
+        <output_dir>/manifest.json  段落ごとのファイル名・長さ・ハッシュ
+
+    前回のマニフェストに同じハッシュ (テキスト・ボイス・モデル・言語) の段落があり、音声ファイルが残っていれば、
+    段落の位置が変わっていても合成を省略し、その音声を使います。
+
+    合成に失敗した段落がある場合は、以降の段落の時刻がずれないよう連結した音声 (full.*) を書き出さず、
+    マニフェストの `complete` をFalse、`failed_paragraphs` に失敗した段落番号 (1始まり) を記録します。
+    もう一度実行すると、失敗した段落だけを合成し直します。
+
+    Args:
+        script_path (str): 原稿ファイルのパス
+        output_dir (str): 出力ディレクトリ
+        synthesize (callable): `synthesize(text) -> bytes` int16 RAW PCMを返す合成関数
+        write_wav (callable): `write_wav(filename, pcm, rate=...)` WAVを書き出す関数 (`wave_file`)
+        voice_name (str, optional): ボイス名 (ハッシュに含めます)
+        model (str, optional): TTSモデル名 (ハッシュに含めます)
+        language (str, optional): 言語コード (ハッシュに含めます)
+        sample_rate (int, optional): PCMのサンプルレート
+        workers (int, optional): 同時に合成するスレッド数
+        requests_per_minute (float, optional): 1分あたりの最大リクエスト数。0の場合は制限しません。
+        audio_format (str, optional): 段落ごとの出力形式 ("wav" または "opus")
+        paragraph_gap (float, optional): 連結時に段落間に挟む無音の秒数
+        force (bool, optional): Trueの場合、最新の段落も含めてすべて合成し直します
+        max_retries (int, optional): レート制限のエラー時に再試行する回数
+        retry_wait (float, optional): レート制限のエラー時の最初の待機秒数 (再試行ごとに倍増)
+        lookup (callable, optional): `lookup(text) -> bytes or None` APIを呼ばずに音声を返せる場合
+            (TTS音声キャッシュにある場合など) はそれを返す関数。見つかった段落はレート制限の枠を使いません。
+
+    Returns:
+        dict: 書き出したマニフェスト (`complete` がFalseの場合は失敗した段落があります)
+    """
+    if audio_format not in SUPPORTED_FORMATS:
+        raise ValueError(f"未対応の出力形式です: {audio_format}")
+
+    with open(script_path, "r", encoding="utf-8") as f:
+        paragraphs = split_paragraphs(f.read())
+
+    os.makedirs(output_dir, exist_ok=True)
+    previous = load_manifest(output_dir) or {}
+    keys = [paragraph_key(text, voice_name, model, language) for text in paragraphs]
+    limiter = RateLimiter(requests_per_minute)
+    frame_bytes = 2  # int16 モノラル
+
+    # 前回の音声をハッシュで引けるように読み込んでおく (段落の追加・削除で位置がずれても使い回せるように、
+    # 段落ごとのファイルを書き換える前に読む)
+    reusable = {}     # ハッシュ -> PCM
+    reused_path = {}  # ファイルのパス -> そのファイルの音声のハッシュ
+    if not force:
+        for entry in previous.get("paragraphs", []):
+            key, name = entry.get("hash"), entry.get("file")
+            if key not in keys or not name:
+                continue
+            wav_path = os.path.join(output_dir, os.path.splitext(name)[0] + ".wav")
+            if not os.path.exists(wav_path) or (audio_format == "opus" and not os.path.exists(wav_path[:-4] + ".opus")):
+                continue
+            reused_path[wav_path] = key
+            if key not in reusable:
+                reusable[key] = _read_wav_frames(wav_path)
+
+    def render(index, text, key):
+        wav_path = os.path.join(output_dir, f"{index + 1:04d}.wav")
+        if key in reusable:
+            pcm = reusable[key]
+            if reused_path.get(wav_path) != key:
+                # 段落の位置が変わった場合は、合成し直さずに新しい番号のファイルへ書き出す
+                write_wav(wav_path, pcm, rate=sample_rate)
+                if audio_format == "opus":
+                    _export_opus(wav_path, wav_path[:-4] + ".opus")
+            return key, pcm, True
+
+        pcm = lookup(text) if lookup else None
+        if pcm is None:
+            for attempt in range(max_retries + 1):
+                limiter.acquire()
+                try:
+                    pcm = synthesize(text)
+                    break
+                except Exception as e:
+                    if not is_rate_limit_error(e) or attempt == max_retries:
+                        raise
+                    wait = retry_wait * (2 ** attempt)
+                    print(f"警告: レート制限のため {wait:.0f} 秒待機して再試行します (段落 {index + 1})")
+                    limiter.backoff(wait)
+        if not pcm:
+            raise RuntimeError("音声データが返されませんでした")
+
+        write_wav(wav_path, pcm, rate=sample_rate)
+        if audio_format == "opus":
+            _export_opus(wav_path, wav_path[:-4] + ".opus")
+        return key, pcm, False
+
+    started_at = time.monotonic()
+    results = [None] * len(paragraphs)
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="script-render") as executor:
+        futures = {executor.submit(render, i, text, keys[i]): i for i, text in enumerate(paragraphs)}
+        for done, future in enumerate(as_completed(futures), 1):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+                status = "最新のため省略" if results[index][2] else "合成完了"
+            except Exception as e:
+                errors[index] = e
+                status = f"エラー: {e}"
+            print(f"[{done}/{len(paragraphs)}] 段落 {index + 1}: {status}")
+
+    entries = []
+    track = []
+    gap = bytes(int(paragraph_gap * sample_rate) * frame_bytes)
+    for index, text in enumerate(paragraphs):
+        result = results[index]
+        if result is None:
+            entries.append({"index": index, "text": text, "error": str(errors.get(index))})
+            continue
+        key, pcm, skipped = result
+        if track:
+            track.append(gap)
+        track.append(pcm)
+        name = f"{index + 1:04d}.{audio_format}"
+        entries.append({
+            "index": index,
+            "file": name,
+            "text": text,
+            "hash": key,
+            "duration_seconds": round(len(pcm) / frame_bytes / sample_rate, 3),
+            "skipped": skipped,
+        })
+
+    full_pcm = b"".join(track)
+    if errors:
+        # 失敗した段落を抜いて連結すると以降の時刻がずれるため、連結した音声は書き出さない (古いものも消す)
+        for name in ("full.wav", "full.opus"):
+            path = os.path.join(output_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+    else:
+        full_path = os.path.join(output_dir, "full.wav")
+        write_wav(full_path, full_pcm, rate=sample_rate)
+        if audio_format == "opus":
+            _export_opus(full_path, os.path.join(output_dir, "full.opus"))
+
+    manifest = {
+        "script": os.path.abspath(script_path),
+        "rendered_at": datetime.now().isoformat(timespec="seconds"),
+        "voice": voice_name,
+        "model": model,
+        "language": language,
+        "sample_rate": sample_rate,
+        "format": audio_format,
+        "complete": not errors,
+        "failed_paragraphs": sorted(index + 1 for index in errors),
+        "full_track": None if errors else f"full.{audio_format}",
+        "total_duration_seconds": round(len(full_pcm) / frame_bytes / sample_rate, 3),
+        "render_seconds": round(time.monotonic() - started_at, 3),
+        "paragraphs": entries,
+    }
+    tmp_path = os.path.join(output_dir, MANIFEST_NAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, os.path.join(output_dir, MANIFEST_NAME))
+    return manifest
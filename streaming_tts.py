@@ -0,0 +1,366 @@
+############################################
+# 文単位ストリーミングTTSパイプライン
+# LLMの応答をストリーミングで受け取り、文ごとに音声合成して
+# 前の文を再生している間に次の文を合成します。
+############################################
+import queue
+import re
+import threading
+import time
+
+# 文末とみなす記号 (日本語・英語・スペイン語)
+# 全角記号と改行は常に区切り、半角の . ! ? は後ろに空白が届いた時点で区切る
+# (「1.5」や「Web3.0」のような小数点で文が切れないようにするため)
+# 文末記号の直後の閉じ括弧・引用符は前の文に含める
+_SENTENCE_END_PATTERN = re.compile(r"[。！？…‥\n]+[」』）)】]*|[.!?]+[\"')\]”’」』）】]*(?=\s)")
+
+_SENTINEL = object()
+
+
+class SentenceSplitter:
+    """ストリーミングで届くテキスト断片を文単位に分割します。
+
+    Args:
+        min_chars (int, optional): これより短い文は次の文と結合して出力します。
+                                   「はい。」のような極端に短い合成要求を減らすためです。
+    """
+
+    def __init__(self, min_chars=0):
+        self.min_chars = min_chars
+        self._buffer = ""
+        self._pending = ""
+
+    def feed(self, chunk):
+        """テキスト断片を追加し、確定した文のリストを返します。
+
+        Args:
+            chunk (str): LLMから届いたテキスト断片
+
+        Returns:
+            list[str]: 確定した文のリスト (まだ文末が来ていない部分はバッファに残ります)
+        """
+        if not chunk:
+            return []
+        self._buffer += chunk
+        sentences = []
+        while True:
+            match = _SENTENCE_END_PATTERN.search(self._buffer)
+            if not match:
+                break
+            end = match.end()
+            sentence = self._buffer[:end]
+            self._buffer = self._buffer[end:]
+            sentences.extend(self._emit(sentence))
+        return sentences
+
+    def flush(self):
+        """バッファに残っているテキストを最後の文として返します。
+
+        Returns:
+            list[str]: 残りの文のリスト (空の場合は空リスト)
+        """
+        rest = (self._pending + self._buffer).strip()
+        self._pending = ""
+        self._buffer = ""
+        return [rest] if rest else []
+
+    def _emit(self, sentence):
+        text = self._pending + sentence
+        if len(text.strip()) < self.min_chars:
+            self._pending = text
+            return []
+        self._pending = ""
+        text = text.strip()
+        return [text] if text else []
+
+
+def split_sentences(text, min_chars=0):
+    """テキスト全体を文単位に分割します。
+
+    Args:
+        text (str): 分割するテキスト
+        min_chars (int, optional): これより短い文は次の文と結合します
+
+    Returns:
+        list[str]: 文のリスト
+    """
+    splitter = SentenceSplitter(min_chars=min_chars)
+    return splitter.feed(text) + splitter.flush()
+
+
+def iter_response_text(response):
+    """Geminiのストリーミング応答 (またはテキスト断片のイテラブル) からテキストを取り出します。
+
+    Args:
+        response: `send_message(..., stream=True)` の戻り値、または文字列のイテラブル
+
+    Yields:
+        str: テキスト断片
+    """
+    for chunk in response:
+        text = chunk if isinstance(chunk, str) else getattr(chunk, "text", "")
+        if text:
+            yield text
+
+
+def drain_stream(chunks):
+    """途中で読むのをやめたストリームを、最後まで読み捨てます。
+
+    Geminiのチャットセッション (`start_chat()`) は、ストリーミング応答を最後まで読み終えないと
+    次の `send_message` で `IncompleteIterationError` を送出するため、中断したターンの応答も読み切っておきます。
+    読み捨てる途中のエラーは無視します。
+
+    Args:
+        chunks (iterator): 読みかけのストリーム (ジェネレーターなど)
+    """
+    try:
+        for _ in chunks:
+            pass
+    except Exception:
+        pass
+
+
+class PipelineResult:
+    """ストリーミングパイプラインの実行結果。
+
+    Attributes:
+        text (str): LLMから受け取った応答全文
+        sentences (list[str]): 音声合成した文のリスト
+        time_to_first_audio (float or None): 開始から最初の音声の再生開始までの秒数
+        total_time (float): 開始から最後の音声の再生完了までの秒数
+        errors (list[Exception]): パイプライン中で発生した例外
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.sentences = []
+        self.time_to_first_audio = None
+        self.total_time = 0.0
+        self.errors = []
+
+    def __repr__(self):
+        ttfa = f"{self.time_to_first_audio:.3f}s" if self.time_to_first_audio is not None else "None"
+        return (f"PipelineResult(sentences={len(self.sentences)}, "
+                f"time_to_first_audio={ttfa}, total_time={self.total_time:.3f}s)")
+
+
+class StreamingTTSPipeline:
+    """LLMのストリーミング応答を文単位で音声合成・再生するパイプライン。
+
+    生産者 (LLMストリーム読み取り) → 文キュー → 合成スレッド → 音声キュー → 再生スレッド
+    の3段構成です。各キューには上限があるため、再生が詰まると合成が、
+    合成が詰まるとLLMストリームの読み取りが待たされます。
+
+    Args:
+        synthesize (callable): `synthesize(text) -> bytes` 音声合成関数 (int16 PCMを返す)
+        play (callable): `play(pcm)` 再生関数 (再生完了までブロックする)
+        max_pending_sentences (int, optional): 合成待ちの文の最大数
+        max_pending_audio (int, optional): 再生待ちの音声の最大数
+        min_chars (int, optional): これより短い文は次の文と結合してから合成します
+        on_sentence (callable, optional): 文の再生開始時に呼ばれるコールバック `on_sentence(text)`
+    """
+
+    def __init__(self, synthesize, play, max_pending_sentences=4, max_pending_audio=2,
+                 min_chars=8, on_sentence=None):
+        self.synthesize = synthesize
+        self.play = play
+        self.max_pending_sentences = max_pending_sentences
+        self.max_pending_audio = max_pending_audio
+        self.min_chars = min_chars
+        self.on_sentence = on_sentence
+
+    def run(self, text_chunks, started_at=None):
+        """テキスト断片のイテラブルを受け取り、文単位で合成・再生します。
+
+        Args:
+            text_chunks (iterable[str]): LLMから届くテキスト断片
+            started_at (float, optional): 計測の起点となる `time.monotonic()` の値。
+                                          省略時はこのメソッドの呼び出し時刻。
+
+        Returns:
+            PipelineResult: 実行結果
+        """
+        t0 = started_at if started_at is not None else time.monotonic()
+        result = PipelineResult()
+        sentence_queue = queue.Queue(maxsize=self.max_pending_sentences)
+        audio_queue = queue.Queue(maxsize=self.max_pending_audio)
+        stop_event = threading.Event()
+        lock = threading.Lock()
+
+        def record_error(e):
+            with lock:
+                result.errors.append(e)
+            stop_event.set()
+
+        def put(q, item):
+            # 下流が停止した場合に永久に待たないよう、タイムアウト付きで投入する
+            while not stop_event.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def synth_worker():
+            try:
+                while True:
+                    sentence = sentence_queue.get()
+                    if sentence is _SENTINEL or stop_event.is_set():
+                        break
+                    pcm = self.synthesize(sentence)
+                    if pcm:
+                        if not put(audio_queue, (sentence, pcm)):
+                            break
+            except Exception as e:
+                record_error(e)
+            finally:
+                # 番兵は必ず届ける。停止時は再生待ちの音声を捨ててでも再生スレッドを終了させる
+                while True:
+                    try:
+                        audio_queue.put(_SENTINEL, timeout=0.1)
+                        break
+                    except queue.Full:
+                        if stop_event.is_set():
+                            try:
+                                audio_queue.get_nowait()
+                            except queue.Empty:
+                                pass
+
+        def play_worker():
+            try:
+                while True:
+                    item = audio_queue.get()
+                    if item is _SENTINEL:
+                        break
+                    if stop_event.is_set():
+                        continue
+                    sentence, pcm = item
+                    if result.time_to_first_audio is None:
+                        result.time_to_first_audio = time.monotonic() - t0
+                    if self.on_sentence:
+                        self.on_sentence(sentence)
+                    self.play(pcm)
+            except Exception as e:
+                record_error(e)
+
+        synth_thread = threading.Thread(target=synth_worker, name="tts-synth", daemon=True)
+        play_thread = threading.Thread(target=play_worker, name="tts-play", daemon=True)
+        synth_thread.start()
+        play_thread.start()
+
+        splitter = SentenceSplitter(min_chars=self.min_chars)
+        text_parts = []
+        chunks = iter(text_chunks)
+        try:
+            for chunk in chunks:
+                text_parts.append(chunk)
+                for sentence in splitter.feed(chunk):
+                    result.sentences.append(sentence)
+                    if not put(sentence_queue, sentence):
+                        break
+                if stop_event.is_set():
+                    break
+            for sentence in splitter.flush():
+                result.sentences.append(sentence)
+                put(sentence_queue, sentence)
+        except Exception as e:
+            record_error(e)
+        finally:
+            if stop_event.is_set():
+                # 合成・再生のエラーで中断した場合も、LLMのストリームは読み切ってセッションを使える状態に戻す
+                drain_stream(chunks)
+            while True:
+                try:
+                    sentence_queue.put(_SENTINEL, timeout=0.1)
+                    break
+                except queue.Full:
+                    if not synth_thread.is_alive():
+                        break
+            synth_thread.join()
+            play_thread.join()
+
+        result.text = "".join(text_parts)
+        result.total_time = time.monotonic() - t0
+        return result
+
+
+# --- オフライン計測用のスタブ --- #
+
+class _StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubChatSession:
+    """`chat_session.send_message` 互換のローカルスタブ。
+
+    ネットワークなしでパイプラインを計測するため、固定の応答を
+    指定した遅延でストリーミング風に返します。
+
+    Args:
+        reply_text (str): 返す応答テキスト
+        first_token_delay (float, optional): 最初の断片が届くまでの秒数
+        chunk_chars (int, optional): 1断片あたりの文字数
+        chunk_delay (float, optional): 断片ごとの秒数
+    """
+
+    def __init__(self, reply_text, first_token_delay=0.3, chunk_chars=8, chunk_delay=0.02):
+        self.reply_text = reply_text
+        self.first_token_delay = first_token_delay
+        self.chunk_chars = chunk_chars
+        self.chunk_delay = chunk_delay
+
+    def send_message(self, text, stream=False):
+        if not stream:
+            time.sleep(self.first_token_delay + self.chunk_delay * (len(self.reply_text) // self.chunk_chars))
+            return _StubResponse(self.reply_text)
+        return self._stream()
+
+    def _stream(self):
+        time.sleep(self.first_token_delay)
+        for i in range(0, len(self.reply_text), self.chunk_chars):
+            yield _StubResponse(self.reply_text[i:i + self.chunk_chars])
+            time.sleep(self.chunk_delay)
+
+
+class StubTTS:
+    """音声合成エンドポイントのローカルスタブ。
+
+    固定の遅延 + 文字数に比例した遅延の後、無音のint16 PCMを返します。
+    返す音声の長さは `seconds_per_char` × 文字数です。
+
+    Args:
+        base_latency (float, optional): 1リクエストあたりの固定遅延 (秒)
+        latency_per_char (float, optional): 1文字あたりの追加遅延 (秒)
+        seconds_per_char (float, optional): 1文字あたりの音声の長さ (秒)
+        sample_rate (int, optional): サンプルレート
+    """
+
+    def __init__(self, base_latency=0.4, latency_per_char=0.005, seconds_per_char=0.12, sample_rate=24000):
+        self.base_latency = base_latency
+        self.latency_per_char = latency_per_char
+        self.seconds_per_char = seconds_per_char
+        self.sample_rate = sample_rate
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        time.sleep(self.base_latency + self.latency_per_char * len(text))
+        frames = int(len(text) * self.seconds_per_char * self.sample_rate)
+        return b"\x00\x00" * frames
+
+
+def make_sleep_player(sample_rate=24000, speed=1.0):
+    """PCMの長さ分だけ待機する再生関数を返します (サウンドカード不要の計測用)。
+
+    Args:
+        sample_rate (int, optional): サンプルレート
+        speed (float, optional): 再生速度の倍率。2.0なら実時間の半分で終わります。
+
+    Returns:
+        callable: `play(pcm)`
+    """
+    def play(pcm):
+        time.sleep(len(pcm) / 2 / sample_rate / speed)
+    return play
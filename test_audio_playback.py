@@ -0,0 +1,151 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import wave
+
+import numpy as np
+
+from audio_playback import FileSinkBackend, NullBackend, PlaybackEngine, apply_gain, resample
+
+
+def make_pcm(seconds, samplerate=24000, value=1000):
+    return (np.full(int(seconds * samplerate), value, dtype=np.int16)).tobytes()
+
+
+class TestPlaybackEngine(unittest.TestCase):
+
+    def test_enqueue_returns_immediately_and_flush_waits(self):
+        """enqueueはすぐに戻り、flushで再生完了まで待てること"""
+        engine = PlaybackEngine(NullBackend(realtime=True))
+        t0 = time.monotonic()
+        engine.enqueue(make_pcm(0.2))
+        self.assertLess(time.monotonic() - t0, 0.1)
+        self.assertTrue(engine.is_playing)
+
+        self.assertTrue(engine.flush(timeout=5))
+        self.assertGreaterEqual(time.monotonic() - t0, 0.15)
+        self.assertFalse(engine.is_playing)
+        self.assertAlmostEqual(engine.played_seconds, 0.2, places=2)
+        engine.close()
+
+    def test_interrupt_discards_pending_audio(self):
+        """interruptで再生待ちの音声が破棄されること"""
+        engine = PlaybackEngine(NullBackend(realtime=True))
+        engine.enqueue(make_pcm(5.0))
+        time.sleep(0.05)
+        engine.interrupt()
+        self.assertTrue(engine.flush(timeout=1))
+        self.assertLess(engine.played_seconds, 1.0)
+        engine.close()
+
+    def test_playback_hooks_are_called_in_order(self):
+        """再生の開始・終了のフックが音声ごとに呼ばれ、flushが戻る前に終了のフックが呼ばれること"""
+        engine = PlaybackEngine(NullBackend(realtime=False))
+        events = []
+        engine.enqueue(make_pcm(0.1), on_start=lambda: events.append("start1"), on_done=lambda: events.append("done1"))
+        engine.enqueue(make_pcm(0.1), on_start=lambda: events.append("start2"), on_done=lambda: events.append("done2"))
+        self.assertTrue(engine.flush(timeout=5))
+        self.assertEqual(events, ["start1", "done1", "start2", "done2"])
+        engine.close()
+
+    def test_hooks_run_outside_the_engine_lock(self):
+        """フックはロックの外で呼ばれ、ほかのスレッドがエンジンを操作できること"""
+        engine = PlaybackEngine(NullBackend(realtime=False))
+        blocked = []
+
+        def on_done():
+            other = threading.Thread(target=lambda: engine.pending_seconds)
+            other.start()
+            other.join(timeout=1)
+            blocked.append(other.is_alive())
+
+        engine.enqueue(make_pcm(0.05), on_done=on_done)
+        self.assertTrue(engine.flush(timeout=5))
+        self.assertEqual(blocked, [False])
+        engine.close()
+
+    def test_idle_fast_backend_waits_instead_of_spinning(self):
+        """できるだけ速く再生するバックエンドは、再生待ちがない間はコールバックを呼び続けないこと"""
+        engine = PlaybackEngine(NullBackend(realtime=False))
+        calls = []
+        callback = engine._callback
+        engine._callback = lambda outdata, frames: calls.append(frames) or callback(outdata, frames)
+        engine.enqueue(make_pcm(0.1))
+        self.assertTrue(engine.flush(timeout=5))
+        time.sleep(0.2)
+        self.assertLess(len(calls), 20)
+        t0 = time.monotonic()
+        engine.enqueue(make_pcm(0.1))  # 待機中でもすぐに再生される
+        self.assertTrue(engine.flush(timeout=5))
+        self.assertLess(time.monotonic() - t0, 0.03)
+        engine.close()
+
+    def test_file_sink_receives_audio_in_order(self):
+        """ファイル出力バックエンドに、追加した順番で音声が書き出されること"""
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, "out.wav")
+            engine = PlaybackEngine(FileSinkBackend(path), blocksize=256)
+            engine.enqueue(make_pcm(0.1, value=100))
+            engine.enqueue(make_pcm(0.1, value=-200))
+            engine.flush(timeout=5)
+            engine.close()
+
+            with wave.open(path, "rb") as wf:
+                self.assertEqual(wf.getframerate(), 24000)
+                samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+            # 2つの追加の間にコールバックが走ると、つなぎ目に無音が入ることがある
+            first = np.flatnonzero(np.abs(samples.astype(np.int32) - 100) <= 1)
+            second = np.flatnonzero(np.abs(samples.astype(np.int32) + 200) <= 1)
+            self.assertEqual((len(first), len(second)), (2400, 2400))
+            self.assertEqual(first[0], 0)
+            self.assertLess(first[-1], second[0])
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def test_file_sink_keeps_silence_inside_the_audio(self):
+        """音声の途中の無音は書き出され、再生待ちがない間のブロックだけが飛ばされること"""
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, "out.wav")
+            engine = PlaybackEngine(FileSinkBackend(path), blocksize=256)
+            engine.enqueue(make_pcm(0.1, value=100) + make_pcm(0.2, value=0) + make_pcm(0.1, value=100))
+            engine.flush(timeout=5)
+            time.sleep(0.05)  # 再生待ちがない間のブロックは書き出されない
+            engine.close()
+
+            with wave.open(path, "rb") as wf:
+                samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+            self.assertEqual(len(samples), -(-9600 // 256) * 256)  # 最後のブロックは無音で埋まる
+            self.assertEqual(int(samples[4800]), 0)
+            self.assertEqual(int(samples[9599]), 100)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+class TestPCMConversions(unittest.TestCase):
+
+    def test_unity_gain_and_same_rate_do_not_copy(self):
+        """倍率1.0・同じサンプルレートの場合は入力をそのまま返すこと"""
+        pcm = make_pcm(0.01)
+        self.assertIs(apply_gain(pcm, 1.0), pcm)
+        self.assertIs(resample(pcm, 24000, 24000), pcm)
+
+    def test_gain_is_applied_in_place_for_writable_buffers(self):
+        """書き込み可能なバッファは倍率をその場で適用し、1.0超はクリップすること"""
+        samples = np.array([1000, -1000, 30000], dtype=np.int16)
+        result = apply_gain(samples, 0.5)
+        self.assertIs(result, samples)
+        self.assertEqual(samples.tolist(), [500, -500, 15000])
+        self.assertEqual(apply_gain(samples.tobytes(), 4.0).tolist(), [2000, -2000, 32767])
+
+    def test_resample_changes_length(self):
+        """リサンプリング後のサンプル数がレート比に従うこと"""
+        self.assertEqual(len(resample(make_pcm(0.1, samplerate=48000), 48000, 24000)), 2400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import threading
+import time
+import unittest
+
+from chat_history import (
+    INTERRUPTED_REPLY, ChatHistoryManager, ManagedChatSession, estimate_tokens, truncating_summarizer,
+)
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """送られた contents を記録し、固定の応答を返すモデル。"""
+
+    def __init__(self, reply="はい、そうやで。"):
+        self.reply = reply
+        self.requests = []
+
+    def generate_content(self, contents, stream=False):
+        self.requests.append(contents)
+        if stream:
+            return iter([FakeChunk(self.reply[:3]), FakeChunk(self.reply[3:])])
+        return FakeChunk(self.reply)
+
+
+class TestChatHistoryManager(unittest.TestCase):
+
+    def test_compacts_old_turns_when_over_budget(self):
+        """トークン数が上限を超えると、直近の往復だけを残して古い往復が要約されること"""
+        summarized = []
+
+        def summarize(previous, turns):
+            summarized.append(list(turns))
+            return (previous + " " if previous else "") + "+".join(u for u, _ in turns)
+
+        history = ChatHistoryManager(summarize, keep_turns=2, token_budget=40)
+        for i in range(6):
+            history.add_turn(f"質問{i}です", "あ" * 10)
+
+        self.assertLessEqual(len(history.turns), 3)
+        self.assertEqual(history.turns[-1], ("質問5です", "あ" * 10))
+        self.assertGreater(history.compactions, 0)
+        self.assertIn("質問0です", history.summary)
+        self.assertLessEqual(history.token_count, 40 + estimate_tokens("質問5です" + "あ" * 10))
+
+        contents = history.build_contents("次の質問")
+        self.assertIn(history.summary, contents[0]["parts"][0])
+        self.assertEqual(contents[-1], {"role": "user", "parts": ["次の質問"]})
+
+    def test_background_compaction_does_not_block_add_turn(self):
+        """background=True の場合、要約中も add_turn がすぐに戻り、要約中に追加した往復は残ること"""
+        started, release = threading.Event(), threading.Event()
+
+        def summarize(previous, turns):
+            started.set()
+            release.wait(5)
+            return "+".join(u for u, _ in turns)
+
+        history = ChatHistoryManager(summarize, keep_turns=1, token_budget=10, background=True)
+        history.add_turn("質問0", "あ" * 10)
+        self.assertTrue(history.add_turn("質問1", "あ" * 10))
+        self.assertTrue(started.wait(5))
+        t0 = time.monotonic()
+        self.assertFalse(history.add_turn("質問2", "あ" * 10))  # 要約中は重ねて要約しない
+        self.assertLess(time.monotonic() - t0, 0.5)
+        self.assertEqual(history.build_contents()[0], {"role": "user", "parts": ["質問0"]})
+
+        release.set()
+        history.wait(5)
+        self.assertEqual(history.summary, "質問0")
+        self.assertEqual([u for u, _ in history.turns], ["質問1", "質問2"])
+        self.assertEqual(history.compactions, 1)
+
+    def test_bounded_over_long_session(self):
+        """長い会話でも履歴のトークン数が上限付近に収まること"""
+        history = ChatHistoryManager(truncating_summarizer(max_chars=200), keep_turns=4, token_budget=500)
+        peak = 0
+        for i in range(500):
+            history.add_turn(f"視聴者{i}の質問です。Monadについて教えて", "Monadは高性能なL1ブロックチェーンやで。" * 3)
+            peak = max(peak, history.token_count)
+        self.assertLess(peak, 700)
+
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("自己紹介"), 4)
+        self.assertEqual(estimate_tokens("abcdefgh"), 2)
+
+
+class TestManagedChatSession(unittest.TestCase):
+
+    def test_send_message_records_history_and_stats(self):
+        """応答が履歴に追加され、リクエストの大きさが記録されること (ストリーミングを含む)"""
+        model = FakeModel()
+        session = ManagedChatSession(model, ChatHistoryManager(truncating_summarizer(), token_budget=1000))
+        self.assertEqual(session.send_message("こんにちは").text, "はい、そうやで。")
+
+        chunks = list(session.send_message("元気？", stream=True))
+        self.assertEqual("".join(c.text for c in chunks), "はい、そうやで。")
+        self.assertEqual(session.history.turns, [("こんにちは", "はい、そうやで。"), ("元気？", "はい、そうやで。")])
+        self.assertEqual(len(model.requests[1]), 3)
+        self.assertGreater(session.last_request["payload_bytes"], 0)
+        self.assertEqual(session.last_request["history_turns"], 1)
+
+        session.record_turn("キャッシュ", "応答")
+        self.assertEqual(len(session.history.turns), 3)
+
+    def test_interrupted_stream_is_recorded(self):
+        """ストリーミング応答を途中で閉じても、発言とそこまでの応答が履歴に残ること"""
+        session = ManagedChatSession(FakeModel(), ChatHistoryManager(truncating_summarizer(), token_budget=1000))
+        stream = session.send_message("元気？", stream=True)
+        self.assertEqual(next(stream).text, "はい、")
+        stream.close()
+        self.assertEqual(session.history.turns, [("元気？", "はい、")])
+
+    def test_stream_failing_before_the_first_chunk_leaves_no_empty_reply(self):
+        """最初の断片の前に失敗した場合や、テキストのない断片だけの場合も、空の応答を履歴に残さないこと"""
+        class BlockedChunk:
+            @property
+            def text(self):
+                raise ValueError("安全性フィルターでブロックされました")
+
+        class FailingModel(FakeModel):
+            def generate_content(self, contents, stream=False):
+                self.requests.append(contents)
+
+                def chunks():
+                    if len(self.requests) == 1:
+                        raise ConnectionError("503")
+                    yield BlockedChunk()
+                return chunks()
+
+        session = ManagedChatSession(FailingModel(), ChatHistoryManager(truncating_summarizer(), token_budget=1000))
+        with self.assertRaises(ConnectionError):
+            list(session.send_message("こんにちは", stream=True))
+        self.assertEqual(len(list(session.send_message("元気？", stream=True))), 1)
+
+        contents = session.history.build_contents("次の質問")
+        self.assertEqual([c["parts"][0] for c in contents if c["role"] == "model"],
+                         [INTERRUPTED_REPLY, INTERRUPTED_REPLY])
+        self.assertTrue(all(c["parts"][0] for c in contents))
+
+
+if __name__ == '__main__':
+    unittest.main()
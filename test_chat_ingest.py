@@ -0,0 +1,209 @@
+import asyncio
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from chat_ingest import ChatIngestor, HTTPChatSource, JSONLReplaySource, TokenBucket
+from conversation_core import ScriptedInputSource, UserMessage
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def viewer(text, user="viewer", priority=0):
+    return UserMessage(text, user=user, source="http", priority=priority)
+
+
+class TestChatIngestor(unittest.TestCase):
+
+    def drain(self, ingestor):
+        async def collect():
+            return [m async for m in ingestor]
+        return asyncio.run(collect())
+
+    def test_priority_then_arrival_order(self):
+        """優先度の高い順、同じ優先度では到着順に取り出されること"""
+        ingestor = ChatIngestor([])
+        for text, priority in [("a", 0), ("b", 5), ("c", 0), ("d", 5)]:
+            ingestor.offer(viewer(text, user=text, priority=priority))
+        self.assertEqual([m.text for m in self.drain(ingestor)], ["b", "d", "a", "c"])
+
+    def test_dedupe_and_per_user_rate_limit(self):
+        """同じユーザーの重複とレート超過が破棄され、時間が経てば再び受け付けること"""
+        clock = FakeClock()
+        ingestor = ChatIngestor([], user_rate_capacity=2, user_rate_per_minute=60, dedupe_window=10, clock=clock)
+        self.assertTrue(ingestor.offer(viewer("自己紹介して")))
+        self.assertFalse(ingestor.offer(viewer("自己紹介して ")))
+        self.assertTrue(ingestor.offer(viewer("自己紹介して", user="other")))
+        self.assertTrue(ingestor.offer(viewer("Monadって何？")))
+        self.assertFalse(ingestor.offer(viewer("好きな食べ物は？")))
+        self.assertEqual(ingestor.stats, {"accepted": 3, "duplicate": 1, "rate_limited": 1, "overflow": 0,
+                                           "discarded": 0})
+
+        clock.now = 11.0
+        self.assertTrue(ingestor.offer(viewer("自己紹介して")))
+        # コンソール (配信者) の入力は制限しない
+        for _ in range(5):
+            self.assertTrue(ingestor.offer(UserMessage("テスト")))
+
+    def test_exempt_sources_are_served_before_viewers(self):
+        """コンソール (配信者) の入力は、優先度を指定した視聴者のコメントよりも先に取り出されること"""
+        ingestor = ChatIngestor([])
+        ingestor.offer(viewer("a", user="a"))
+        ingestor.offer(viewer("vip", user="b", priority=10))
+        ingestor.offer(UserMessage("配信者"))
+        self.assertEqual([m.text for m in self.drain(ingestor)], ["配信者", "vip", "a"])
+
+    def test_drop_oldest_lowest_priority_on_overflow(self):
+        """あふれた場合は優先度が最も低いもののうち最も古いものが破棄されること"""
+        dropped = []
+        ingestor = ChatIngestor([], max_queue=3, on_drop=lambda m, reason: dropped.append(m.text))
+        ingestor.offer(viewer("old", user="u1"))
+        ingestor.offer(viewer("vip", user="u2", priority=10))
+        ingestor.offer(viewer("new", user="u3"))
+        ingestor.offer(viewer("newest", user="u4"))
+        self.assertEqual(dropped, ["old"])
+        self.assertEqual([m.text for m in self.drain(ingestor)], ["vip", "new", "newest"])
+
+    def test_merges_sources_until_primary_ends(self):
+        """複数の入力元をまとめ、until の入力元が終わると終了すること"""
+        console = ScriptedInputSource(["配信者", (0.1, "終わり")])
+
+        async def endless():
+            i = 0
+            while True:
+                await asyncio.sleep(0.02)
+                i += 1
+                yield viewer(f"コメント{i}", user=f"u{i}")
+
+        ingestor = ChatIngestor([console, endless()], until=console)
+        texts = [m.text for m in self.drain(ingestor)]
+        self.assertIn("配信者", texts)
+        self.assertIn("終わり", texts)
+        self.assertTrue(any(t.startswith("コメント") for t in texts))
+
+
+    def test_viewer_comments_are_discarded_when_the_console_ends(self):
+        """コンソールが終わると、キューに残った視聴者のコメントは破棄され、配信者の入力だけが取り出されること"""
+        async def viewers():
+            for i in range(5):
+                yield viewer(f"質問{i}", user=f"u{i}")
+
+        console = ScriptedInputSource([(0.05, "最後のひとこと")])
+
+        async def collect(ingestor):
+            received = []
+            async for message in ingestor:
+                received.append(message.text)
+                if len(received) == 1:
+                    await asyncio.sleep(0.2)  # 最初のコメントに応答している間にコンソールが終わる
+            return received
+
+        ingestor = ChatIngestor([console, viewers()], until=console)
+        self.assertEqual(asyncio.run(collect(ingestor)), ["質問0", "最後のひとこと"])
+        self.assertEqual(ingestor.stats["discarded"], 4)
+
+        drained = ChatIngestor([ScriptedInputSource([(0.05, "最後のひとこと")]), viewers()], drain_on_close=True)
+        drained.until = drained.sources[0]
+        self.assertEqual(len(asyncio.run(collect(drained))), 6)
+
+
+class TestSources(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_jsonl_replay(self):
+        """JSONLの各行がメッセージとして再生されること (requests.jsonl 形式を含む)"""
+        path = os.path.join(self.tmp_dir, "chat.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"user": "alice", "text": "こんにちは", "timestamp": 0}, ensure_ascii=False) + "\n")
+            f.write("\n{broken\n")
+            f.write(json.dumps({"request_id": "user-001", "title": "Streaming TTS", "body": "長い本文"}) + "\n")
+
+        async def collect():
+            return [m async for m in JSONLReplaySource(path)]
+        messages = asyncio.run(collect())
+        self.assertEqual([(m.user, m.text, m.source) for m in messages],
+                         [("alice", "こんにちは", "replay"), ("user-001", "Streaming TTS", "replay")])
+
+    def test_jsonl_replay_skips_invalid_priority(self):
+        """数値でない優先度の行は読み飛ばし、範囲外の優先度は切り詰めて再生を続けること"""
+        path = os.path.join(self.tmp_dir, "chat.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"user": "a", "text": "文字列", "priority": "high"}, ensure_ascii=False) + "\n")
+            f.write(json.dumps({"user": "b", "text": "null", "priority": None}) + "\n")
+            f.write(json.dumps({"user": "c", "text": "大きすぎる", "priority": 1000}, ensure_ascii=False) + "\n")
+            f.write(json.dumps({"user": "d", "text": "負の値", "priority": -5}, ensure_ascii=False) + "\n")
+
+        async def collect():
+            ingestor = ChatIngestor([JSONLReplaySource(path, max_priority=10)])
+            return [m async for m in ingestor]
+        with redirect_stdout(io.StringIO()):
+            messages = asyncio.run(collect())
+        self.assertEqual([(m.text, m.priority) for m in messages], [("大きすぎる", 10), ("負の値", 0)])
+
+    def test_http_endpoint(self):
+        """POST /chat で受け取ったメッセージがキューに入ること"""
+        async def scenario():
+            source = HTTPChatSource(port=0)
+            ingestor = ChatIngestor([source])
+            received = []
+
+            async def consume():
+                async for message in ingestor:
+                    received.append(message)
+                    ingestor.close()
+
+            consumer = asyncio.create_task(consume())
+            while source.bound_port is None:
+                await asyncio.sleep(0.01)
+
+            async def post(path, payload):
+                reader, writer = await asyncio.open_connection("127.0.0.1", source.bound_port)
+                body = json.dumps(payload).encode("utf-8")
+                writer.write(f"POST {path} HTTP/1.1\r\nHost: x\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+                await writer.drain()
+                response = await reader.read()
+                writer.close()
+                return response.split(b"\r\n", 1)[0]
+
+            self.assertIn(b"404", await post("/other", {}))
+            self.assertIn(b"400", await post("/chat", {"text": ""}))
+            self.assertIn(b"400", await post("/chat", [1]))
+            self.assertIn(b"400", await post("/chat", {"text": "hi", "priority": None}))
+            self.assertIn(b"202", await post("/chat", {"user": "bob", "text": "hi", "priority": 10 ** 9}))
+            await asyncio.wait_for(consumer, 5)
+            return received
+
+        received = asyncio.run(scenario())
+        # クライアントが指定した優先度は max_priority に切り詰められる
+        self.assertEqual([(m.user, m.text, m.priority, m.source) for m in received], [("bob", "hi", 10, "http")])
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_refill(self):
+        """時間の経過でトークンが補充されること"""
+        clock = FakeClock()
+        bucket = TokenBucket(1, 0.5, clock=clock)
+        self.assertTrue(bucket.consume())
+        self.assertFalse(bucket.consume())
+        clock.now = 2.0
+        self.assertTrue(bucket.consume())
+
+
+if __name__ == '__main__':
+    unittest.main()
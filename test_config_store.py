@@ -0,0 +1,74 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from config_store import ConfigStore
+
+LANGUAGES_MAP = {"ja": "ja-JP", "en": "en-US", "es": "es-ES"}
+
+
+class TestConfigStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "config.local.json")
+        self.write_config({
+            "languages": {
+                "ja": {"templates": {"self_introduction": "ウチがモナミンやで！", "self_introduction_triggers": ["自己紹介して"]}},
+                "en": {"templates": {"self_introduction": "I'm Monamin!", "empty": ""}},
+            }
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def write_config(self, data, mtime=None):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        if mtime is not None:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_language_fallback_is_resolved(self):
+        """指定言語になければデフォルト言語のテンプレートを返すこと"""
+        store = ConfigStore(self.path, LANGUAGES_MAP, check_interval=0)
+        self.assertEqual(store.get_template("self_introduction", "en-US"), "I'm Monamin!")
+        self.assertEqual(store.get_template("self_introduction", "es-ES"), "ウチがモナミンやで！")
+        self.assertEqual(store.get_template("self_introduction_triggers", "en-US"), ["自己紹介して"])
+        self.assertEqual(store.get_template("self_introduction", "fr-FR"), "ウチがモナミンやで！")
+        self.assertEqual(store.get_template("empty", "en-US"), "")
+        self.assertIsNone(store.get_template("missing", "ja-JP"))
+
+    def test_reloads_only_when_mtime_changes(self):
+        """更新時刻が変わったときだけ再読み込みし、バージョンが増えること"""
+        store = ConfigStore(self.path, LANGUAGES_MAP, check_interval=0)
+        version = store.version
+        self.assertFalse(store.reload_if_changed())
+        self.assertEqual(store.version, version)
+
+        stat = os.stat(self.path)
+        self.write_config({"languages": {"ja": {"templates": {"self_introduction": "更新後"}}}},
+                          mtime=stat.st_mtime + 10)
+        self.assertEqual(store.get_template("self_introduction", "ja-JP"), "更新後")
+        self.assertEqual(store.version, version + 1)
+
+    def test_invalid_json_keeps_previous_snapshot(self):
+        """編集途中の不正なJSONでは以前の内容を使い続けること"""
+        store = ConfigStore(self.path, LANGUAGES_MAP, check_interval=0)
+        stat = os.stat(self.path)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write('{"languages": ')
+        os.utime(self.path, (stat.st_mtime + 10, stat.st_mtime + 10))
+        self.assertEqual(store.get_template("self_introduction", "ja-JP"), "ウチがモナミンやで！")
+
+    def test_check_interval_avoids_stat_on_every_read(self):
+        """確認間隔内はファイルを確認しないこと"""
+        store = ConfigStore(self.path, LANGUAGES_MAP, check_interval=3600)
+        stat = os.stat(self.path)
+        self.write_config({"languages": {}}, mtime=stat.st_mtime + 10)
+        self.assertEqual(store.get_template("self_introduction", "ja-JP"), "ウチがモナミンやで！")
+
+
+if __name__ == '__main__':
+    unittest.main()
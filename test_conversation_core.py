@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from conversation_core import ConversationCore, ScriptedInputSource
+
+
+class InterruptiblePlayer:
+    """PCMの長さ分だけ待つ再生関数。interrupt() で再生中の音声を止められる。"""
+
+    def __init__(self, sample_rate=24000):
+        self.sample_rate = sample_rate
+        self.played = []
+        self._stop = threading.Event()
+
+    def __call__(self, pcm):
+        self._stop.clear()
+        self.played.append(len(pcm))
+        self._stop.wait(len(pcm) / 2 / self.sample_rate)
+
+    def interrupt(self):
+        self._stop.set()
+
+
+def tts(text):
+    time.sleep(0.01)
+    return b"\0\0" * int(len(text) * 0.02 * 24000)  # 1文字0.02秒
+
+
+def streaming_reply(message):
+    for sentence in [f"{message.text}への返事です。", "二文目を話しています。", "三文目で終わりです。"]:
+        time.sleep(0.02)
+        yield sentence
+
+
+class TestConversationCore(unittest.TestCase):
+
+    def run_core(self, core, source):
+        return asyncio.run(core.run(source))
+
+    def test_turns_are_spoken_in_order(self):
+        """割り込みなしの場合、すべてのターンが文単位で順番に話されること"""
+        player = InterruptiblePlayer()
+        spoken = []
+        core = ConversationCore(streaming_reply, tts, player, interrupt=False, min_chars=0,
+                                on_sentence=lambda message, sentence: spoken.append(sentence))
+        results = self.run_core(core, ScriptedInputSource(["こんにちは", "元気"]))
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0].reply, "こんにちはへの返事です。二文目を話しています。三文目で終わりです。")
+        self.assertFalse(any(r.cancelled for r in results))
+        self.assertEqual(spoken[3], "元気への返事です。")
+        self.assertEqual(len(player.played), 6)
+        self.assertLess(results[0].time_to_first_audio, results[0].total_time)
+
+    def test_new_message_interrupts_stale_speech(self):
+        """新しいメッセージが届くと、古い応答の再生が打ち切られること"""
+        player = InterruptiblePlayer()
+        core = ConversationCore(streaming_reply, tts, player, interrupt_playback=player.interrupt, min_chars=0)
+        t0 = time.monotonic()
+        results = self.run_core(core, ScriptedInputSource(["一つ目", (0.2, "二つ目")]))
+
+        self.assertTrue(results[0].cancelled)
+        self.assertLess(len(results[0].sentences), 3)
+        self.assertFalse(results[1].cancelled)
+        self.assertEqual(len(results[1].sentences), 3)
+        # 一つ目の応答をすべて再生していたら2秒以上かかる
+        self.assertLess(time.monotonic() - t0, 1.9 + 0.2)
+
+    def test_stale_stream_is_read_to_the_end_before_the_next_message(self):
+        """打ち切った応答のストリームは最後まで読まれ、次のメッセージを送る時点で読み終えていること"""
+        class ChatSession:
+            """前の応答を読み終える前に送信するとエラーになるチャットセッション。"""
+
+            def __init__(self):
+                self.pending = False
+                self.sent = []
+
+            def send(self, message):
+                if self.pending:
+                    raise RuntimeError("IncompleteIterationError")
+                self.sent.append(message.text)
+                self.pending = True
+                return self._stream(message)
+
+            def _stream(self, message):
+                for reply in streaming_reply(message):
+                    time.sleep(0.05)
+                    yield reply
+                self.pending = False
+
+        chat = ChatSession()
+        player = InterruptiblePlayer()
+        core = ConversationCore(chat.send, tts, player, interrupt_playback=player.interrupt, min_chars=0)
+        results = self.run_core(core, ScriptedInputSource(["一つ目", (0.1, "二つ目")]))
+
+        self.assertTrue(results[0].cancelled)
+        self.assertEqual(results[1].errors, [])
+        self.assertEqual(len(results[1].sentences), 3)
+        self.assertEqual(chat.sent, ["一つ目", "二つ目"])
+        self.assertFalse(chat.pending)
+
+    def test_errors_are_recorded_per_turn(self):
+        """応答生成の例外はターンの結果に記録され、次のターンは処理されること"""
+        def respond(message):
+            if message.text == "bad":
+                raise RuntimeError("boom")
+            return "短い返事です。"
+
+        on_complete = []
+        core = ConversationCore(respond, tts, InterruptiblePlayer(), interrupt=False,
+                                on_turn_complete=on_complete.append)
+        results = self.run_core(core, ScriptedInputSource(["bad", "good"]))
+        self.assertIsInstance(results[0].errors[0], RuntimeError)
+        self.assertEqual(results[1].reply, "短い返事です。")
+        self.assertEqual(on_complete, results)
+
+
+if __name__ == '__main__':
+    unittest.main()
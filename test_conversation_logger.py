@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from conversation_logger import ConversationLogger
+
+
+class TestConversationLogger(unittest.TestCase):
+
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.log_dir, ignore_errors=True)
+
+    def read(self, name):
+        with open(os.path.join(self.log_dir, name), encoding="utf-8") as f:
+            return f.read()
+
+    @patch('conversation_logger.datetime')
+    def test_text_and_jsonl_output(self, mock_datetime):
+        """従来と同じ形式のテキストログと、計測値付きのJSONLが出力されること"""
+        mock_datetime.now.return_value = datetime(2025, 7, 8, 12, 34, 56)
+        logger = ConversationLogger(self.log_dir, flush_interval=60, jsonl=True)
+        logger.log("User", "自己紹介して")
+        logger.log("モナミン", "ウチがモナミンやで！", "ja-JP", response_seconds=0.25)
+        self.assertTrue(logger.flush(timeout=5))
+
+        self.assertEqual(self.read("conversation_2025-07-08.log"),
+                         "[12:34:56] User: 自己紹介して\n\n[12:34:56] モナミン (ja-JP): ウチがモナミンやで！\n\n")
+        records = [json.loads(line) for line in self.read("conversation_2025-07-08.jsonl").splitlines()]
+        self.assertEqual(records[1]["speaker"], "モナミン")
+        self.assertEqual(records[1]["language"], "ja-JP")
+        self.assertEqual(records[1]["response_seconds"], 0.25)
+        logger.close()
+
+    @patch('conversation_logger.datetime')
+    def test_cache_status_in_text_log(self, mock_datetime):
+        """JSONLが無効でも、キャッシュの利用状況がテキストログに残ること"""
+        mock_datetime.now.return_value = datetime(2025, 7, 8, 12, 34, 56)
+        logger = ConversationLogger(self.log_dir, flush_interval=60)
+        logger.log("モナミン", "ウチがモナミンやで！", "ja-JP", cache="hit")
+        logger.log("モナミン", "はじめまして", "ja-JP", cache="miss")
+        logger.log("モナミン", "おおきに", "ja-JP", cache=None)
+        logger.close()
+
+        self.assertEqual(self.read("conversation_2025-07-08.log"),
+                         "[12:34:56] モナミン (ja-JP) [cache hit]: ウチがモナミンやで！\n\n"
+                         "[12:34:56] モナミン (ja-JP) [cache miss]: はじめまして\n\n"
+                         "[12:34:56] モナミン (ja-JP): おおきに\n\n")
+        self.assertFalse(os.path.exists(os.path.join(self.log_dir, "conversation_2025-07-08.jsonl")))
+
+    @patch('conversation_logger.datetime')
+    def test_rotates_at_midnight(self, mock_datetime):
+        """日付が変わると新しい日のファイルに書き込むこと"""
+        logger = ConversationLogger(self.log_dir, flush_interval=60)
+        mock_datetime.now.return_value = datetime(2025, 7, 8, 23, 59, 59)
+        logger.log("User", "before")
+        mock_datetime.now.return_value = datetime(2025, 7, 9, 0, 0, 1)
+        logger.log("User", "after")
+        logger.close()
+
+        self.assertIn("before", self.read("conversation_2025-07-08.log"))
+        self.assertNotIn("after", self.read("conversation_2025-07-08.log"))
+        self.assertIn("after", self.read("conversation_2025-07-09.log"))
+
+    def test_close_writes_pending_records(self):
+        """close() で未フラッシュのレコードが書き込まれ、以降のlogは無視されること"""
+        logger = ConversationLogger(self.log_dir, flush_interval=3600, max_batch=1000)
+        for i in range(100):
+            logger.log("User", f"message {i}")
+        logger.close()
+        logger.log("User", "ignored")
+
+        today = datetime.now().strftime("%Y-%m-%d")
+        content = self.read(f"conversation_{today}.log")
+        self.assertEqual(content.count("message "), 100)
+        self.assertNotIn("ignored", content)
+
+
+if __name__ == '__main__':
+    unittest.main()
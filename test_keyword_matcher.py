@@ -0,0 +1,78 @@
+import random
+import unittest
+
+from keyword_matcher import KeywordMatcher, build_response_matcher
+
+
+def linear_scan(groups, text):
+    """従来の check_special_response と同じ判定 (比較用)。"""
+    for i, keywords in enumerate(groups):
+        if any(keyword.lower() in text.lower() for keyword in keywords):
+            return i
+    return None
+
+
+class TestKeywordMatcher(unittest.TestCase):
+
+    def test_case_insensitive_substring_match(self):
+        """大文字・小文字を区別せずに部分一致すること"""
+        matcher = KeywordMatcher()
+        matcher.add_group(["Gmonamin"], payload="greet")
+        matcher.build()
+        self.assertEqual(matcher.match("みんな GMONAMIN!"), "greet")
+        self.assertIsNone(matcher.match("おはよう"))
+
+    def test_earlier_group_wins(self):
+        """複数のグループに一致する場合は先に追加したグループを返すこと"""
+        matcher = KeywordMatcher()
+        matcher.add_group(["monad"], payload="first")
+        matcher.add_group(["mon"], payload="second")
+        matcher.build()
+        self.assertEqual(matcher.match("what is monad"), "first")
+        self.assertEqual(matcher.match("mon ami"), "second")
+
+    def test_overlapping_keywords(self):
+        """接尾辞が重なるキーワードも検出すること"""
+        matcher = KeywordMatcher()
+        matcher.add_group(["she"], payload="she")
+        matcher.add_group(["he"], payload="he")
+        matcher.add_group(["hers"], payload="hers")
+        matcher.build()
+        self.assertEqual(matcher.match("ushers"), "she")
+        self.assertEqual(matcher.match("hers"), "he")
+
+    def test_matches_linear_scan_on_random_inputs(self):
+        """ランダムな入力で従来の線形スキャンと同じ結果になること"""
+        rng = random.Random(0)
+        alphabet = "abcあいモA"
+        for _ in range(500):
+            groups = [["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4)))
+                       for _ in range(rng.randint(1, 3))] for _ in range(rng.randint(1, 6))]
+            matcher = KeywordMatcher()
+            for keywords in groups:
+                matcher.add_group(keywords)
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+            self.assertEqual(matcher.match_group(text), linear_scan(groups, text), (groups, text))
+
+
+class TestBuildResponseMatcher(unittest.TestCase):
+
+    def test_invalid_groups_are_ignored(self):
+        """不正なグループは無視し、応答が文字列でない場合はNoneを返すこと"""
+        patterns_data = {
+            "patterns": [
+                "not a dict",
+                {"keywords": [], "response": "empty keywords"},
+                {"keywords": "monad", "response": "keywords not a list"},
+                {"keywords": ["bad"], "response": 123},
+                {"keywords": [42, "monad"], "response": "Monadの話やな！"},
+            ]
+        }
+        matcher = build_response_matcher(patterns_data)
+        self.assertEqual(matcher.match("Monadって何？"), "Monadの話やな！")
+        self.assertIsNone(matcher.match("bad"))
+        self.assertIsNone(build_response_matcher({}).match("monad"))
+
+
+if __name__ == '__main__':
+    unittest.main()
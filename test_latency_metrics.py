@@ -0,0 +1,104 @@
+import threading
+import unittest
+import urllib.request
+
+from latency_metrics import LatencyRecorder, TurnTimer, percentile, start_metrics_server
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTurnTimer(unittest.TestCase):
+
+    def test_marks_keep_first_time_unless_last(self):
+        clock = FakeClock()
+        timer = TurnTimer(1, clock=clock)
+        clock.now = 100.5
+        timer.mark("playback_start")
+        timer.mark("playback_end", last=True)
+        clock.now = 101.0
+        timer.mark("playback_start")
+        timer.mark("playback_end", last=True)
+        record = timer.record()
+        self.assertEqual(record["stages"], {"input_received": 0.0, "playback_start": 0.5, "playback_end": 1.0})
+        self.assertEqual(record["spans"], {"time_to_first_audio": 0.5, "playback": 0.5, "turn_total": 1.0})
+
+    def test_wrap_stream_marks_first_token_and_done(self):
+        clock = FakeClock()
+        timer = TurnTimer(1, clock=clock)
+
+        def chunks():
+            clock.now = 100.3
+            yield "こんにちは"
+            clock.now = 100.9
+            yield "！"
+
+        self.assertEqual("".join(timer.wrap_stream(chunks())), "こんにちは！")
+        spans = timer.spans()
+        self.assertAlmostEqual(spans["llm_first_token"], 0.3)
+        self.assertAlmostEqual(spans["llm_total"], 0.9)
+
+
+class TestLatencyRecorder(unittest.TestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertIsNone(percentile([], 50))
+
+    def test_rolling_percentiles_and_finish_once(self):
+        clock = FakeClock()
+        records = []
+        recorder = LatencyRecorder(window=10, clock=clock, on_record=records.append)
+        for i in range(20):
+            timer = recorder.start_turn()
+            clock.now += (i + 1) / 10
+            timer.mark("playback_start")
+            recorder.finish(timer)
+        self.assertIsNone(recorder.finish(timer))
+        self.assertEqual(len(records), 20)
+        stats = recorder.summary()[("interactive", "time_to_first_audio")]
+        self.assertEqual(stats["count"], 10)  # 直近10ターン (1.1〜2.0秒)
+        self.assertAlmostEqual(stats["p50"], 1.5)
+        self.assertAlmostEqual(stats["p99"], 2.0)
+        self.assertIn("time_to_first_audio", recorder.format_report())
+
+    def test_prometheus_endpoint(self):
+        recorder = LatencyRecorder(buckets=(0.5, 1.0))
+        timer = recorder.start_turn("script")
+        timer.mark("tts_request", at=0.0)
+        timer.mark("tts_first_byte", at=0.75)
+        recorder.finish(timer)
+        server = start_metrics_server(recorder, port=0)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode("utf-8")
+        finally:
+            server.shutdown()
+        self.assertIn('aituber_latency_seconds_bucket{kind="script",span="tts_first_byte",le="0.5"} 0', body)
+        self.assertIn('aituber_latency_seconds_bucket{kind="script",span="tts_first_byte",le="1"} 1', body)
+        self.assertIn('aituber_latency_seconds_count{kind="script",span="tts_first_byte"} 1', body)
+        self.assertIn('quantile="0.95"} 0.750000', body)
+
+    def test_concurrent_finish(self):
+        recorder = LatencyRecorder()
+        timers = [recorder.start_turn() for _ in range(200)]
+        for timer in timers:
+            timer.mark("pattern_matched")
+        threads = [threading.Thread(target=lambda t=t: recorder.finish(t)) for t in timers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(recorder.summary()[("interactive", "pattern_match")]["count"], 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import time
+import unittest
+
+import numpy as np
+
+from chat_history import ChatHistoryManager, ManagedChatSession, truncating_summarizer
+from providers import (
+    LLM_PROVIDERS, TTS_PROVIDERS, StubChatModel, StubTTSProvider, create_llm, create_tts,
+    register_tts_provider, synthesize_batch, to_pcm16,
+)
+
+
+class FakeStyleBertVITS2:
+    """`StyleBertVITS2` の代わりに、44.1kHzのステレオ音声を返すエンジン。"""
+
+    model_config = {"server_url": "http://127.0.0.1:5000", "speaker_id": 1, "style_id": 2}
+
+    def __init__(self):
+        self.sample_rate = 44100
+        self.texts = []
+
+    def synthesize(self, text):
+        self.texts.append(text)
+        return np.full((44100, 2), 0.5)
+
+    def synthesize_batch(self, texts):
+        return [self.synthesize(text)[:44100 * (i + 1) // 2] for i, text in enumerate(texts)], 44100
+
+
+class TestStubChatModel(unittest.TestCase):
+
+    def test_reply_is_deterministic_and_stream_matches(self):
+        model = create_llm("stub", system_instruction="ペルソナ", sentences=3, chunk_chars=5)
+        reply = model.generate_content("Monadって何？").text
+        self.assertEqual(model.generate_content("Monadって何？").text, reply)
+        self.assertIn("Monadって何？", reply)
+        chunks = [c.text for c in model.generate_content("Monadって何？", stream=True)]
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), reply)
+        self.assertEqual(model.calls, 3)
+
+    def test_latency_is_applied_before_first_chunk(self):
+        model = StubChatModel(latency=0.05)
+        started = time.monotonic()
+        next(iter(model.generate_content("こんにちは", stream=True)))
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+
+    def test_chat_sessions_keep_history(self):
+        model = StubChatModel()
+        session = model.start_chat()
+        session.send_message("一つ目")
+        "".join(c.text for c in session.send_message("二つ目", stream=True))
+        self.assertEqual([c["role"] for c in session.history], ["user", "model", "user", "model"])
+
+        managed = ManagedChatSession(model, ChatHistoryManager(truncating_summarizer()))
+        self.assertIn("三つ目", managed.send_message("三つ目").text)
+        self.assertEqual(len(managed.history.turns), 1)
+
+
+class TestTTSProviders(unittest.TestCase):
+
+    def test_stub_tts_is_deterministic_with_length_proportional_to_text(self):
+        tts = create_tts("stub", chars_per_second=10.0, sample_rate=16000)
+        short = tts.synthesize("こんにちは")
+        self.assertEqual(short, tts.synthesize("こんにちは"))
+        self.assertEqual(len(short), 2 * 16000 * 5 // 10)
+        self.assertEqual(len(tts.synthesize("こんにちは" * 2)), 2 * len(short))
+        self.assertEqual(tts.calls, 3)
+
+    def test_stub_tts_latency(self):
+        tts = StubTTSProvider(latency=0.02, seconds_per_char=0.01)
+        started = time.monotonic()
+        tts.synthesize("あいう")
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+
+    def test_to_pcm16_resamples_and_downmixes(self):
+        pcm = to_pcm16(np.full((44100, 2), 0.5), 44100, 24000)
+        samples = np.frombuffer(pcm, dtype="<i2")
+        self.assertEqual(len(samples), 24000)
+        self.assertTrue(np.all(samples == 16383))
+        self.assertEqual(to_pcm16(np.array([1000, -1000], dtype=np.int16), 24000, 24000),
+                         to_pcm16(np.array([1000, -1000]) / 32767, 24000, 24000))
+
+    def test_style_bert_vits2_provider_converts_to_playback_format(self):
+        engine = FakeStyleBertVITS2()
+        tts = create_tts("style_bert_vits2", engine=engine)
+        pcm = tts.synthesize("テスト")
+        self.assertEqual(engine.texts, ["テスト"])
+        self.assertEqual(len(pcm), 2 * 24000)
+        self.assertRegex(tts.voice, r"^sbv2:1:2:[0-9a-f]{8}$")
+        self.assertEqual(tts.model, "http://127.0.0.1:5000")
+
+    def test_stub_batch_matches_single_synthesis_and_pays_latency_once(self):
+        tts = StubTTSProvider(latency=0.1)
+        texts = ["一つ目", "二つ目の文", "三"]
+        started = time.monotonic()
+        batch = tts.synthesize_batch(texts)
+        self.assertLess(time.monotonic() - started, 0.25)
+        self.assertEqual(tts.calls, 1)
+        self.assertEqual(batch, [StubTTSProvider().synthesize(text) for text in texts])
+
+    def test_style_bert_vits2_batch_returns_pcm_per_text(self):
+        engine = FakeStyleBertVITS2()
+        tts = create_tts("style_bert_vits2", engine=engine)
+        pcms = synthesize_batch(tts, ["あ", "い"])
+        self.assertEqual(engine.texts, ["あ", "い"])
+        self.assertEqual([len(pcm) for pcm in pcms], [2 * 12000, 2 * 24000])
+
+
+class TestRegistry(unittest.TestCase):
+
+    def test_unknown_provider_raises(self):
+        with self.assertRaises(ValueError):
+            create_llm("unknown")
+        with self.assertRaises(ValueError):
+            create_tts("unknown")
+
+    def test_register_tts_provider(self):
+        register_tts_provider("silence", lambda **options: StubTTSProvider(**options))
+        try:
+            self.assertEqual(len(create_tts("silence", chars_per_second=1.0, sample_rate=100).synthesize("a")), 200)
+            with self.assertRaises(ValueError):
+                register_tts_provider("Bad Name", StubTTSProvider)
+        finally:
+            TTS_PROVIDERS.pop("silence", None)
+        self.assertIn("gemini", LLM_PROVIDERS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import asyncio
+import unittest
+
+from chat_ingest import ChatIngestor
+from conversation_core import ScriptedInputSource, UserMessage
+from question_batcher import BatchingSource, QuestionBatcher, format_askers, normalize_question
+
+
+def viewer(text, user):
+    return UserMessage(text, user=user, source="http")
+
+
+class TestQuestionBatcher(unittest.TestCase):
+
+    def test_near_duplicates_are_grouped(self):
+        """表記ゆれのある同じ質問は1つのグループにまとめられ、別の質問は分かれること"""
+        batcher = QuestionBatcher(window=5)
+        for i, text in enumerate(["自己紹介して", "自己紹介して！", "じこしょうかい", "自己紹介してね",
+                                  "What is Monad?", "what is monad", "WHAT IS MONAD!!", "好きな食べ物は？"]):
+            batcher.add(viewer(text, f"u{i}"), now=0.0)
+        self.assertEqual(batcher.pop_ready(now=1.0), [])
+
+        groups = batcher.pop_ready(now=5.0)
+        self.assertEqual([(g.text, g.size) for g in groups],
+                         [("自己紹介して", 3), ("じこしょうかい", 1), ("What is Monad?", 3), ("好きな食べ物は？", 1)])
+        self.assertEqual(groups[0].askers, ["u0", "u1", "u3"])
+        self.assertEqual(batcher.calls_saved, 4)
+
+    def test_questions_about_different_entities_are_not_grouped(self):
+        """固有名詞・数字だけが違う質問はまとめられないこと"""
+        for a, b in [("Monadのノードの作り方は？", "Solanaのノードの作り方は？"),
+                     ("What is Monad?", "What is Solana?"),
+                     ("MonadのTPSはいくつ？", "SolanaのTPSはいくつ？"),
+                     ("イーサリアムのノードの作り方は？", "ソラナのノードの作り方は？"),
+                     ("ステップ1のやり方を教えて", "ステップ2のやり方を教えて"),
+                     ("今日の配信は何時まで？", "今日の配信は何時から？")]:
+            batcher = QuestionBatcher(window=5)
+            batcher.add(viewer(a, "u1"), now=0.0)
+            batcher.add(viewer(b, "u2"), now=0.0)
+            self.assertEqual([g.size for g in batcher.flush()], [1, 1], (a, b))
+
+    def test_window_and_max_group_size(self):
+        """受付時間を過ぎた質問は新しいグループになり、満杯のグループはすぐに取り出せること"""
+        batcher = QuestionBatcher(window=2, max_group_size=2)
+        batcher.add(viewer("Monadって何？", "a"), now=0.0)
+        batcher.add(viewer("Monadって何", "b"), now=0.5)
+        self.assertEqual([g.size for g in batcher.pop_ready(now=0.6)], [2])
+        batcher.add(viewer("Monadって何？", "c"), now=0.7)
+        self.assertEqual(batcher.pop_ready(now=1.0), [])
+        self.assertEqual([g.askers for g in batcher.flush()], [["c"]])
+
+    def test_normalize_and_format_askers(self):
+        """正規化と質問者への呼びかけ文"""
+        self.assertEqual(normalize_question("ＷＨＡＴ is  Monad？"), "whatismonad")
+        self.assertEqual(format_askers(["a"]), "")
+        self.assertEqual(format_askers(["a", "b", "c", "d"], "ja-JP"), "aさん、bさん、cさんほか1人から同じ質問が来てるで！")
+        self.assertEqual(format_askers(["a", "b"], "en-US"), "a, b asked the same thing!")
+
+
+class TestBatchingSource(unittest.TestCase):
+
+    def test_groups_viewer_messages_and_passes_console_through(self):
+        """視聴者の質問はまとめて流れ、コンソール入力はすぐに流れること"""
+        class Source:
+            async def __aiter__(self):
+                for text, user in [("自己紹介して", "a"), ("自己紹介して！", "b")]:
+                    yield viewer(text, user)
+                await asyncio.sleep(0.05)
+                yield UserMessage("配信者です")
+                await asyncio.sleep(0.2)
+
+        async def collect():
+            source = BatchingSource(Source(), QuestionBatcher(window=0.1))
+            return [m async for m in source]
+
+        messages = asyncio.run(collect())
+        self.assertEqual([m.text for m in messages], ["配信者です", "自己紹介して"])
+        self.assertEqual(messages[1].askers, ["a", "b"])
+
+    def test_chat_ingestor_bounds_and_orders_while_consumer_is_busy(self):
+        """応答中に届いたコメントは ChatIngestor の上限で破棄され、残りは優先度順に流れること"""
+        class Source:
+            async def __aiter__(self):
+                yield viewer("最初の質問", "first")
+                await asyncio.sleep(0.1)
+                for i in range(49):
+                    message = viewer(f"質問{i}", f"u{i}")
+                    if i == 10:
+                        message.priority = 5
+                    yield message
+
+        ingestor = ChatIngestor([Source()], max_queue=5)
+
+        async def collect():
+            received = []
+            async for message in BatchingSource(ingestor, QuestionBatcher(window=0.05)):
+                received.append(message)
+                if len(received) == 1:
+                    await asyncio.sleep(0.3)  # 最初の質問に応答している間
+            return received
+
+        messages = asyncio.run(collect())
+        self.assertEqual(len(messages) + ingestor.stats["overflow"], 50)
+        self.assertLessEqual(len(messages), 1 + 1 + 5)
+        self.assertEqual(messages[0].text, "最初の質問")
+        # 優先度の高いコメントは破棄されず、ほかのコメントより先に流れる
+        self.assertEqual(messages[1].text, "質問10")
+        later = messages[2:]
+        self.assertEqual([m.received_at for m in later], sorted(m.received_at for m in later))
+
+    def test_open_groups_are_discarded_when_the_console_ends(self):
+        """コンソールが終わった後は、まとめている途中の視聴者の質問を流さないこと"""
+        console = ScriptedInputSource([(0.05, "おわり")])
+
+        async def viewers():
+            for i in range(3):
+                yield viewer(f"質問{i}", f"u{i}")
+
+        async def collect():
+            ingestor = ChatIngestor([console, viewers()], until=console)
+            received = []
+            async for message in BatchingSource(ingestor, QuestionBatcher(window=0.01)):
+                received.append(message.text)
+                if len(received) == 1:
+                    await asyncio.sleep(0.2)
+            return received
+
+        messages = asyncio.run(collect())
+        self.assertEqual(messages[0], "質問0")
+        self.assertEqual(messages[1:], ["おわり"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from response_cache import ResponseCache, is_context_dependent
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, "cache", "responses.sqlite3")
+        self.clock = FakeClock()
+        self.persona = ResponseCache.persona_hash("モナミン", ["関西弁で話す"])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def make_cache(self, **kwargs):
+        return ResponseCache(self.db_path, clock=self.clock, **kwargs)
+
+    def test_normalized_key_and_persistence(self):
+        """表記ゆれは同じキーになり、再起動後もヒットすること"""
+        key = ResponseCache.make_key("Monadって何？", "ja-JP", self.persona)
+        self.assertEqual(key, ResponseCache.make_key("monadって何 ", "ja-JP", self.persona))
+        self.assertNotEqual(key, ResponseCache.make_key("Monadって何？", "en-US", self.persona))
+        self.assertNotEqual(key, ResponseCache.make_key("Monadって何？", "ja-JP", ResponseCache.persona_hash("別人")))
+
+        cache = self.make_cache()
+        self.assertIsNone(cache.get(key))
+        cache.put(key, "Monadって何？", "ja-JP", "高性能なL1やで！")
+        cache.close()
+
+        cache = self.make_cache()
+        self.assertEqual(cache.get(key), "高性能なL1やで！")
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+        cache.close()
+
+    def test_ttl_and_lru(self):
+        """期限切れのエントリは使われず、上限を超えると最も使われていないものから削除されること"""
+        cache = self.make_cache(ttl_seconds=60, max_entries=2)
+        cache.put("a", "a", "ja-JP", "A")
+        self.clock.now += 1
+        cache.put("b", "b", "ja-JP", "B")
+        self.clock.now += 1
+        cache.get("a")
+        self.clock.now += 1
+        cache.put("c", "c", "ja-JP", "C")
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "A")
+
+        self.clock.now += 61
+        self.assertIsNone(cache.get("c"))
+        cache.close()
+
+    def test_wrap_stream_stores_only_complete_replies(self):
+        """最後まで受け取ったストリーミング応答だけが保存されること"""
+        cache = self.make_cache()
+        self.assertEqual(list(cache.wrap_stream("k1", "q", "ja-JP", iter(["はい、", "そうやで。"]))), ["はい、", "そうやで。"])
+        self.assertEqual(cache.get("k1"), "はい、そうやで。")
+
+        stream = cache.wrap_stream("k2", "q", "ja-JP", iter(["途中", "まで"]))
+        next(stream)
+        stream.close()
+        self.assertIsNone(cache.get("k2"))
+        cache.close()
+
+    def test_context_dependent_turns(self):
+        """直前の会話に依存する質問を判定できること"""
+        self.assertTrue(is_context_dependent("さっきの話の続きして"))
+        self.assertTrue(is_context_dependent("Can you say that again?"))
+        self.assertFalse(is_context_dependent("自己紹介して"))
+        self.assertFalse(is_context_dependent("What is Monad?"))
+
+
+if __name__ == '__main__':
+    unittest.main()
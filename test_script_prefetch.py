@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from script_prefetch import ParagraphPrefetcher, clear_checkpoint, load_checkpoint, save_checkpoint
+
+
+class TestParagraphPrefetcher(unittest.TestCase):
+
+    def test_next_paragraph_is_synthesized_while_playing(self):
+        """段落Nの再生中に段落N+1の合成が終わっており、順番どおりに返されること"""
+        paragraphs = ["一", "二", "三", "四"]
+        synthesized = []
+
+        def synthesize(text):
+            time.sleep(0.05)
+            synthesized.append(text)
+            return text.encode("utf-8")
+
+        results = []
+        with ParagraphPrefetcher(paragraphs, synthesize, lookahead=1, workers=2) as prefetcher:
+            for index, paragraph, pcm, error in prefetcher:
+                time.sleep(0.1)  # 再生中
+                if index + 1 < len(paragraphs):
+                    self.assertIn(paragraphs[index + 1], synthesized)
+                results.append((index, pcm.decode("utf-8"), error))
+        self.assertEqual(results, [(i, p, None) for i, p in enumerate(paragraphs)])
+
+    def test_memory_bound_limits_lookahead(self):
+        """未再生の音声が上限を超えている間は、先の段落の合成を始めないこと"""
+        paragraphs = [f"p{i}" for i in range(5)]
+        started = []
+        lock = threading.Lock()
+
+        def synthesize(text):
+            with lock:
+                started.append(text)
+            return b"\0" * 1000
+
+        with ParagraphPrefetcher(paragraphs, synthesize, lookahead=4, workers=1,
+                                 max_buffered_bytes=1500) as prefetcher:
+            for index, paragraph, pcm, error in prefetcher:
+                time.sleep(0.05)  # 再生中
+                # 合成済みの未再生音声が上限を超えた時点で、それ以上は投入されない
+                self.assertLessEqual(len(started), index + 3)
+                self.assertLessEqual(prefetcher.buffered_bytes, 2000)
+        self.assertEqual(len(started), 5)
+
+    def test_synthesis_error_is_returned_and_start_index(self):
+        """合成の失敗は例外として返され、start_indexから読み上げが始まること"""
+        def synthesize(text):
+            if text == "bad":
+                raise RuntimeError("boom")
+            return b"ok"
+
+        with ParagraphPrefetcher(["skip", "bad", "good"], synthesize, start_index=1) as prefetcher:
+            items = list(prefetcher)
+        self.assertEqual([item[0] for item in items], [1, 2])
+        self.assertIsNone(items[0][2])
+        self.assertIsInstance(items[0][3], RuntimeError)
+        self.assertEqual(items[1][2], b"ok")
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.checkpoint = os.path.join(self.tmp_dir, "logs", "script_progress.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_save_load_and_clear(self):
+        """原稿ごとに再生位置を保存・読み込み・削除できること"""
+        self.assertIsNone(load_checkpoint(self.checkpoint, "a.txt"))
+        save_checkpoint(self.checkpoint, "a.txt", 3, 10)
+        save_checkpoint(self.checkpoint, "b.txt", 7, 8)
+        self.assertEqual(load_checkpoint(self.checkpoint, "a.txt"), 3)
+        self.assertEqual(load_checkpoint(self.checkpoint, "b.txt"), 7)
+
+        clear_checkpoint(self.checkpoint, "a.txt")
+        self.assertIsNone(load_checkpoint(self.checkpoint, "a.txt"))
+        self.assertEqual(load_checkpoint(self.checkpoint, "b.txt"), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import wave
+
+from script_render import RateLimiter, render_script, split_paragraphs
+
+
+def write_wav(filename, pcm, channels=1, rate=24000, sample_width=2):
+    with wave.open(filename, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(sample_width)
+        wf.setframerate(rate)
+        wf.writeframes(pcm)
+
+
+class FakeTTS:
+    """テキスト1文字あたり0.01秒の無音を返す合成関数。"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, text):
+        self.calls.append(text)
+        return bytes(len(text) * 240 * 2)
+
+
+class TestRenderScript(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.script = os.path.join(self.tmp_dir, "script.txt")
+        self.output_dir = os.path.join(self.tmp_dir, "renders", "script")
+        self.write_script("こんにちは\n\n今日の配信です\n\nまたね")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def write_script(self, text):
+        with open(self.script, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def render(self, tts, **kwargs):
+        return render_script(self.script, self.output_dir, tts, write_wav, voice_name="zephyr",
+                             paragraph_gap=0.5, **kwargs)
+
+    def test_writes_paragraphs_full_track_and_manifest(self):
+        """段落ごとのWAV・連結したWAV・長さ付きのマニフェストが出力されること"""
+        manifest = self.render(FakeTTS())
+
+        self.assertEqual([p["file"] for p in manifest["paragraphs"]], ["0001.wav", "0002.wav", "0003.wav"])
+        self.assertEqual([p["duration_seconds"] for p in manifest["paragraphs"]], [0.05, 0.07, 0.03])
+        self.assertAlmostEqual(manifest["total_duration_seconds"], 0.15 + 0.5 * 2)
+        with wave.open(os.path.join(self.output_dir, "full.wav"), "rb") as wf:
+            self.assertAlmostEqual(wf.getnframes() / wf.getframerate(), manifest["total_duration_seconds"])
+        with open(os.path.join(self.output_dir, "manifest.json"), encoding="utf-8") as f:
+            self.assertEqual(json.load(f), manifest)
+
+    def test_skips_up_to_date_paragraphs(self):
+        """2回目は変更された段落だけが合成されること"""
+        self.render(FakeTTS())
+        self.write_script("こんにちは\n\n今日の配信は雑談です\n\nまたね")
+
+        tts = FakeTTS()
+        manifest = self.render(tts)
+        self.assertEqual(tts.calls, ["今日の配信は雑談です"])
+        self.assertEqual([p["skipped"] for p in manifest["paragraphs"]], [True, False, True])
+
+        tts = FakeTTS()
+        self.render(tts, force=True)
+        self.assertEqual(len(tts.calls), 3)
+
+    def test_inserted_paragraph_does_not_rerender_later_ones(self):
+        """段落を挿入しても、位置がずれた段落は合成し直さず前回の音声を使うこと"""
+        self.render(FakeTTS())
+        self.write_script("こんにちは\n\n追加の段落\n\n今日の配信です\n\nまたね")
+
+        tts = FakeTTS()
+        manifest = self.render(tts)
+        self.assertEqual(tts.calls, ["追加の段落"])
+        self.assertEqual([p["skipped"] for p in manifest["paragraphs"]], [True, False, True, True])
+        self.assertEqual([p["duration_seconds"] for p in manifest["paragraphs"]], [0.05, 0.05, 0.07, 0.03])
+        with wave.open(os.path.join(self.output_dir, "0004.wav"), "rb") as wf:
+            self.assertEqual(wf.getnframes(), len("またね") * 240)
+
+    def test_failed_paragraph_fails_the_render(self):
+        """失敗した段落があると連結した音声を書き出さず、2回目は失敗した段落だけを合成すること"""
+        self.render(FakeTTS())
+
+        def broken(text):
+            if text == "今日の配信は雑談です":
+                raise ValueError("invalid text")
+            return bytes(len(text) * 240 * 2)
+
+        self.write_script("こんにちは\n\n今日の配信は雑談です\n\nまたね")
+        manifest = self.render(broken)
+        self.assertFalse(manifest["complete"])
+        self.assertEqual(manifest["failed_paragraphs"], [2])
+        self.assertIsNone(manifest["full_track"])
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "full.wav")))
+
+        tts = FakeTTS()
+        manifest = self.render(tts)
+        self.assertEqual(tts.calls, ["今日の配信は雑談です"])
+        self.assertTrue(manifest["complete"])
+        self.assertEqual(manifest["full_track"], "full.wav")
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, "full.wav")))
+
+    def test_rate_limit_error_is_retried(self):
+        """レート制限のエラーは待機後に再試行され、それ以外のエラーはマニフェストに記録されること"""
+        attempts = {}
+
+        def flaky(text):
+            attempts[text] = attempts.get(text, 0) + 1
+            if text == "またね":
+                raise ValueError("invalid text")
+            if attempts[text] == 1:
+                raise RuntimeError("429 RESOURCE_EXHAUSTED")
+            return bytes(480)
+
+        manifest = self.render(flaky, retry_wait=0.01)
+        self.assertEqual(attempts, {"こんにちは": 2, "今日の配信です": 2, "またね": 1})
+        self.assertIn("invalid text", manifest["paragraphs"][2]["error"])
+        self.assertNotIn("file", manifest["paragraphs"][2])
+
+    def test_cached_paragraphs_do_not_use_the_rate_limit(self):
+        """キャッシュから取り出せた段落はレート制限を待たずに書き出され、合成関数も呼ばれないこと"""
+        cached = {"こんにちは": bytes(480), "またね": bytes(480)}
+        tts = FakeTTS()
+        started = time.monotonic()
+        manifest = self.render(tts, requests_per_minute=60, lookup=cached.get)  # 1秒間隔
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(tts.calls, ["今日の配信です"])
+        self.assertTrue(manifest["complete"])
+        self.assertEqual(manifest["paragraphs"][0]["duration_seconds"], 0.01)
+
+
+class TestHelpers(unittest.TestCase):
+
+    def test_split_paragraphs(self):
+        """空行区切りで分割し、空の段落を除くこと"""
+        self.assertEqual(split_paragraphs("a\nb\n\n\n\n c \n\n"), ["a\nb", "c"])
+
+    def test_rate_limiter_spaces_requests(self):
+        """1分あたりのリクエスト数に応じて間隔が空くこと"""
+        limiter = RateLimiter(requests_per_minute=1200)  # 0.05秒間隔
+        t0 = time.monotonic()
+        for _ in range(4):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - t0, 0.14)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import threading
+import time
+import unittest
+
+from streaming_tts import (SentenceSplitter, StreamingTTSPipeline, StubChatSession,
+                           iter_response_text, split_sentences)
+
+
+class TestSentenceSplitter(unittest.TestCase):
+
+    def test_split_multilingual_punctuation(self):
+        """日本語・英語・スペイン語の文末記号で分割されること"""
+        text = "こんにちは！ウチはモナミンやで。Hello there. ¿Qué tal? Bien."
+        self.assertEqual(
+            split_sentences(text),
+            ["こんにちは！", "ウチはモナミンやで。", "Hello there.", "¿Qué tal?", "Bien."],
+        )
+
+    def test_decimal_point_is_not_a_sentence_end(self):
+        """小数点やバージョン表記で文が切れないこと"""
+        self.assertEqual(split_sentences("Web3.0 is 1.5x faster. OK"), ["Web3.0 is 1.5x faster.", "OK"])
+
+    def test_streaming_chunks_across_boundaries(self):
+        """文末記号が断片の境界をまたいでも正しく分割されること"""
+        splitter = SentenceSplitter()
+        sentences = []
+        for chunk in ["Hel", "lo.", " Wor", "ld! ", "終わり", "。"]:
+            sentences += splitter.feed(chunk)
+        sentences += splitter.flush()
+        self.assertEqual(sentences, ["Hello.", "World!", "終わり。"])
+
+    def test_min_chars_merges_short_sentences(self):
+        """min_chars未満の文が次の文と結合されること"""
+        self.assertEqual(split_sentences("はい。そうです。ありがとうございます。", min_chars=5),
+                         ["はい。そうです。", "ありがとうございます。"])
+
+
+class TestStreamingTTSPipeline(unittest.TestCase):
+
+    def test_sentences_are_played_in_order(self):
+        """全ての文が順番通りに合成・再生され、TTFAが記録されること"""
+        played = []
+        pipeline = StreamingTTSPipeline(
+            synthesize=lambda text: text.encode("utf-8"),
+            play=lambda pcm: played.append(pcm.decode("utf-8")),
+            min_chars=0,
+        )
+        chat = StubChatSession("一つ目。二つ目！Third one. 四つ目", first_token_delay=0, chunk_chars=3, chunk_delay=0)
+        result = pipeline.run(iter_response_text(chat.send_message("test", stream=True)))
+
+        self.assertEqual(played, ["一つ目。", "二つ目！", "Third one.", "四つ目"])
+        self.assertEqual(result.text, "一つ目。二つ目！Third one. 四つ目")
+        self.assertIsNotNone(result.time_to_first_audio)
+        self.assertEqual(result.errors, [])
+
+    def test_synthesis_overlaps_playback(self):
+        """前の文の再生中に次の文の合成が行われること"""
+        events = []
+        lock = threading.Lock()
+
+        def synthesize(text):
+            with lock:
+                events.append(("synth_start", text))
+            time.sleep(0.02)
+            return text.encode("utf-8")
+
+        def play(pcm):
+            with lock:
+                events.append(("play_start", pcm.decode("utf-8")))
+            time.sleep(0.1)
+            with lock:
+                events.append(("play_end", pcm.decode("utf-8")))
+
+        pipeline = StreamingTTSPipeline(synthesize=synthesize, play=play, min_chars=0)
+        pipeline.run(["文その一。", "文その二。"])
+
+        self.assertLess(events.index(("synth_start", "文その二。")), events.index(("play_end", "文その一。")))
+
+    def test_synthesis_error_stops_pipeline(self):
+        """合成中の例外が結果に記録され、パイプラインが停止すること"""
+        def synthesize(text):
+            raise RuntimeError("tts down")
+
+        pipeline = StreamingTTSPipeline(synthesize=synthesize, play=lambda pcm: None, min_chars=0)
+        result = pipeline.run(["一。", "二。", "三。"])
+        self.assertEqual(len(result.errors), 1)
+        self.assertIsNone(result.time_to_first_audio)
+
+    def test_stream_is_read_to_the_end_after_an_error(self):
+        """合成のエラーで中断しても、LLMのストリームは最後まで読まれること (チャットセッションを壊さない)"""
+        read = []
+
+        def chunks():
+            for i in range(20):
+                read.append(i)
+                yield f"文{i}。"
+
+        def synthesize(text):
+            raise RuntimeError("tts down")
+
+        pipeline = StreamingTTSPipeline(synthesize=synthesize, play=lambda pcm: None, min_chars=0)
+        result = pipeline.run(chunks())
+        self.assertEqual(len(result.errors), 1)
+        self.assertEqual(read, list(range(20)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import threading
+import time
+import unittest
+
+from providers import StubTTSProvider
+from tts_batcher import BatchingTTSProvider
+
+
+class RecordingProvider:
+    """`synthesize_batch` に渡されたテキストを記録し、テキストをそのままバイト列で返すプロバイダー。"""
+
+    name = "recording"
+    voice = "v"
+    model = "m"
+    sample_rate = 24000
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    def synthesize(self, text, language_code="ja-JP"):
+        return self.synthesize_batch([text], language_code)[0]
+
+    def synthesize_batch(self, texts, language_code="ja-JP"):
+        self.batches.append((list(texts), language_code))
+        if self.fail:
+            raise RuntimeError("合成に失敗")
+        return [text.encode("utf-8") for text in texts]
+
+
+class SingleOnlyProvider:
+    """`synthesize_batch` を持たないプロバイダー。"""
+
+    def __init__(self):
+        self.texts = []
+
+    def synthesize(self, text, language_code="ja-JP"):
+        self.texts.append(text)
+        return text.encode("utf-8")
+
+
+class TestBatchingTTSProvider(unittest.TestCase):
+
+    def create(self, provider, **kwargs):
+        batcher = BatchingTTSProvider(provider, **kwargs)
+        self.addCleanup(batcher.close)
+        return batcher
+
+    def test_concurrent_requests_are_grouped_up_to_max_batch(self):
+        provider = RecordingProvider()
+        batcher = self.create(provider, max_batch=3, max_wait=1.0)
+        futures = [batcher.submit(f"文{i}") for i in range(7)]
+        self.assertEqual([f.result(timeout=5) for f in futures], [f"文{i}".encode("utf-8") for i in range(7)])
+        self.assertEqual([len(texts) for texts, _ in provider.batches], [3, 3, 1])
+        self.assertEqual((batcher.batches, batcher.items), (3, 7))
+
+    def test_waits_at_most_max_wait_for_a_partial_batch(self):
+        provider = RecordingProvider()
+        batcher = self.create(provider, max_batch=8, max_wait=0.05)
+        started = time.monotonic()
+        self.assertEqual(batcher.synthesize("ひとつ"), "ひとつ".encode("utf-8"))
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(provider.batches, [(["ひとつ"], "ja-JP")])
+
+    def test_language_codes_are_not_mixed(self):
+        provider = RecordingProvider()
+        batcher = self.create(provider, max_batch=4, max_wait=0.1)
+        futures = [batcher.submit("a", "en-US"), batcher.submit("あ"), batcher.submit("b", "en-US")]
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(provider.batches[0], (["a"], "en-US"))
+        self.assertEqual(sorted(lang for _, lang in provider.batches), ["en-US", "en-US", "ja-JP"])
+
+    def test_errors_reach_every_request_in_the_batch(self):
+        batcher = self.create(RecordingProvider(fail=True), max_batch=2, max_wait=1.0)
+        futures = [batcher.submit("x"), batcher.submit("y")]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+
+    def test_provider_without_batch_api_is_called_per_item(self):
+        provider = SingleOnlyProvider()
+        batcher = self.create(provider, max_batch=4, max_wait=0.01)
+        self.assertEqual(batcher.synthesize_batch(["い", "ろ", "は"]), [t.encode("utf-8") for t in ("い", "ろ", "は")])
+        self.assertEqual(provider.texts, ["い", "ろ", "は"])
+
+    def test_delegates_provider_attributes_and_close_drains(self):
+        batcher = BatchingTTSProvider(RecordingProvider(), max_batch=2, max_wait=10.0)
+        self.assertEqual((batcher.name, batcher.voice, batcher.model, batcher.sample_rate), ("recording", "v", "m", 24000))
+        future = batcher.submit("残り")
+        batcher.close()  # 待ち時間の途中でも受け付け済みの依頼は合成する
+        self.assertEqual(future.result(timeout=1), "残り".encode("utf-8"))
+        with self.assertRaises(RuntimeError):
+            batcher.submit("閉じた後")
+
+    def test_batching_raises_throughput_of_a_batch_engine(self):
+        provider = StubTTSProvider(latency=0.1)
+        batcher = self.create(provider, max_batch=4, max_wait=0.05)
+        results = []
+        threads = [threading.Thread(target=lambda i=i: results.append(batcher.synthesize(f"セリフ{i}"))) for i in range(8)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLess(time.monotonic() - started, 0.6)  # 1件ずつなら 0.8 秒以上かかる
+        self.assertEqual(len(results), 8)
+        self.assertEqual(provider.calls, batcher.batches)
+        self.assertLessEqual(batcher.batches, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
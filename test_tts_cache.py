@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from tts_cache import TTSAudioCache
+
+
+class TestTTSAudioCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_key_depends_on_all_fields(self):
+        """テキスト・ボイス・モデル・言語のいずれかが違えば別のキーになること"""
+        base = TTSAudioCache.make_key("こんにちは", "zephyr", "tts-model", "ja-JP")
+        self.assertEqual(base, TTSAudioCache.make_key("こんにちは", "zephyr", "tts-model", "ja-JP"))
+        self.assertNotEqual(base, TTSAudioCache.make_key("こんばんは", "zephyr", "tts-model", "ja-JP"))
+        self.assertNotEqual(base, TTSAudioCache.make_key("こんにちは", "kore", "tts-model", "ja-JP"))
+        self.assertNotEqual(base, TTSAudioCache.make_key("こんにちは", "zephyr", "other-model", "ja-JP"))
+        self.assertNotEqual(base, TTSAudioCache.make_key("こんにちは", "zephyr", "tts-model", "en-US"))
+
+    def test_get_or_synthesize_counts_hits_and_misses(self):
+        """2回目以降は合成関数を呼ばずにキャッシュから返すこと"""
+        cache = TTSAudioCache(self.cache_dir)
+        calls = []
+
+        def synthesize(text):
+            calls.append(text)
+            return b"\x01\x00\x02\x00"
+
+        first = cache.get_or_synthesize("自己紹介", "zephyr", "m", "ja-JP", synthesize)
+        second = cache.get_or_synthesize("自己紹介", "zephyr", "m", "ja-JP", synthesize)
+
+        self.assertEqual(calls, ["自己紹介"])
+        self.assertEqual(bytes(first), bytes(second))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_entries_persist_across_instances(self):
+        """再起動後も保存済みの音声が利用できること"""
+        key = TTSAudioCache.make_key("hello", "zephyr", "m", "en-US")
+        TTSAudioCache(self.cache_dir).put(key, b"\x00\x01" * 10)
+        cached = TTSAudioCache(self.cache_dir).get(key)
+        self.assertEqual(cached[:], b"\x00\x01" * 10)
+        cached.close()
+
+    def test_lru_eviction_respects_max_bytes(self):
+        """上限を超えると最も長く使われていないエントリから削除されること"""
+        cache = TTSAudioCache(self.cache_dir, max_bytes=30)
+        cache.put("a", b"a" * 10)
+        cache.put("b", b"b" * 10)
+        cache.put("c", b"c" * 10)
+        cache.get("a").close()  # aを最近使ったことにする
+        cache.put("d", b"d" * 10)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, "b.pcm")))
+        self.assertLessEqual(cache.total_bytes, 30)
+
+    def test_lru_order_is_restored_from_mtime(self):
+        """再起動時にファイルの更新時刻からLRU順序が復元されること"""
+        cache = TTSAudioCache(self.cache_dir, max_bytes=100)
+        cache.put("old", b"o" * 10)
+        cache.put("new", b"n" * 10)
+        past = time.time() - 60
+        os.utime(os.path.join(self.cache_dir, "old.pcm"), (past, past))
+
+        reloaded = TTSAudioCache(self.cache_dir, max_bytes=15)
+        self.assertIsNone(reloaded.get("old"))
+        self.assertIsNotNone(reloaded.get("new"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,605 @@
+import contextlib
+import enum
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+import unittest
+import wave
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import requests
+import soundfile as sf
+
+from backend import tts_engine
+from backend.tts_engine import CircuitBreaker, CircuitOpenError, StyleBertVITS2, WavStreamParser, split_sentences
+
+logging.getLogger("backend.tts_engine").setLevel(logging.CRITICAL)
+
+
+def make_wav(samples, sample_rate=22050):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(np.arange(samples, dtype="<i2").tobytes())
+    return buf.getvalue()
+
+
+class VoiceServer:
+    """`/voice` にWAVを返すテスト用サーバー。`statuses` の順にエラーを返してから成功します。
+
+    `body` に関数を渡した場合は、テキストごとに `body(text)` を返します。
+    `gate` を指定した場合は、本文の前半を送ったあと、`gate` がセットされるまで残りを送りません。
+    """
+
+    def __init__(self, statuses=(), delay=0.0, body=None, gate=None):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.body = body if body is not None else make_wav(2205)
+        self.gate = gate
+        self.connections = 0
+        self.texts = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                server.connections += 1
+
+            def do_GET(self):
+                text = parse_qs(urlparse(self.path).query)["text"][0]
+                server.texts.append(text)
+                time.sleep(server.delay)
+                status = server.statuses.pop(0) if server.statuses else 200
+                body = server.body(text) if callable(server.body) else server.body
+                body = body if status == 200 else b"error"
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if server.gate is None:
+                    self.wfile.write(body)
+                    return
+                self.wfile.write(body[:len(body) // 2])
+                self.wfile.flush()
+                server.gate.wait(5)
+                self.wfile.write(body[len(body) // 2:])
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class RangeServer:
+    """`data` を返すダウンロード用のテスト用サーバー。Range・If-Range に対応します。
+
+    `cuts` の順に、GETリクエストへの応答を指定したバイト数だけ送ったところで接続を切ります。
+    `ranges=False` の場合は Range を無視し、Accept-Ranges を返しません。
+    """
+
+    def __init__(self, data, etag='"v1"', ranges=True, cuts=()):
+        self.data = data
+        self.etag = etag
+        self.ranges = ranges
+        self.cuts = list(cuts)
+        self.requests = []  # GETリクエストの Range ヘッダー
+        self.bytes_sent = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def send_headers(self, status, start, end):
+                self.send_response(status)
+                self.send_header("Content-Length", str(end - start + 1))
+                self.send_header("ETag", server.etag)
+                if server.ranges:
+                    self.send_header("Accept-Ranges", "bytes")
+                    if status == 206:
+                        self.send_header("Content-Range", f"bytes {start}-{end}/{len(server.data)}")
+                self.end_headers()
+
+            def do_HEAD(self):
+                self.send_headers(200, 0, len(server.data) - 1)
+
+            def do_GET(self):
+                header = self.headers.get("Range")
+                server.requests.append(header)
+                start, end, status = 0, len(server.data) - 1, 200
+                if server.ranges and header and self.headers.get("If-Range", server.etag) == server.etag:
+                    first, last = header[len("bytes="):].split("-")
+                    start, end, status = int(first), int(last) if last else end, 206
+                self.send_headers(status, start, end)
+                body = server.data[start:end + 1]
+                if server.cuts:
+                    body = body[:server.cuts.pop(0)]
+                    self.close_connection = True
+                self.wfile.write(body)
+                server.bytes_sent += len(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/model.safetensors"
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FakeTorch:
+    """`LocalModel` が使う部分だけを持つ torch の代わり。inference_mode の中かどうかを記録します。"""
+
+    def __init__(self):
+        self.num_threads = 8
+        self.num_interop_threads = 8
+        self.in_inference_mode = False
+        self.cuda = types.SimpleNamespace(is_available=lambda: False)
+
+    def set_num_threads(self, n):
+        self.num_threads = n
+
+    def set_num_interop_threads(self, n):
+        self.num_interop_threads = n
+
+    def get_num_threads(self):
+        return self.num_threads
+
+    @contextlib.contextmanager
+    def inference_mode(self):
+        self.in_inference_mode = True
+        try:
+            yield
+        finally:
+            self.in_inference_mode = False
+
+
+def fake_style_bert_vits2(torch):
+    """`style_bert_vits2` の代わりのモジュール (sys.modules に入れる辞書) と、TTSModelのクラスを返します。"""
+
+    class Languages(enum.Enum):
+        JP = "JP"
+        EN = "EN"
+
+    class TTSModel:
+        instances = []
+
+        def __init__(self, model_path, config_path, style_vec_path, device):
+            self.model_path = model_path
+            self.loaded = False
+            self.style2id = {"Neutral": 0}
+            self.calls = []  # (テキスト, inference_mode の中だったかどうか)
+            TTSModel.instances.append(self)
+
+        def load(self):
+            self.loaded = True
+
+        def infer(self, text, **kwargs):
+            self.calls.append((text, torch.in_inference_mode))
+            return 44100, np.full(100, 1000, dtype=np.int16)
+
+    package = types.ModuleType("style_bert_vits2")
+    constants = types.ModuleType("style_bert_vits2.constants")
+    constants.Languages = Languages
+    nlp = types.ModuleType("style_bert_vits2.nlp")
+    nlp.bert_models = types.SimpleNamespace(load_model=lambda *args: None, load_tokenizer=lambda *args: None)
+    tts_model = types.ModuleType("style_bert_vits2.tts_model")
+    tts_model.TTSModel = TTSModel
+    modules = {"style_bert_vits2": package, "style_bert_vits2.constants": constants,
+               "style_bert_vits2.nlp": nlp, "style_bert_vits2.tts_model": tts_model}
+    return modules, TTSModel
+
+
+class EngineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def start_server(self, **kwargs):
+        server = VoiceServer(**kwargs)
+        self.addCleanup(server.stop)
+        return server
+
+    def create_engine(self, server_url, segmentation=None, backend="server", local=None, **http):
+        config_path = os.path.join(self.tmp_dir, "config.json")
+        settings = {"retry_backoff": 0.0}
+        settings.update(http)
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump({"style_bert_vits2": {
+                "model_path": os.path.join(self.tmp_dir, "models"),
+                "config_path": os.path.join(self.tmp_dir, "models", "config.json"),
+                "device": "cpu", "language": "JP", "speaker_id": 0, "style_id": 0,
+                "noise_scale": 0.6, "noise_scale_w": 0.8, "length_scale": 1.0,
+                "server_url": server_url, "http": settings, "segmentation": segmentation or {},
+                "backend": backend, "local": local or {},
+            }}, f)
+        engine = StyleBertVITS2(config_path)
+        self.addCleanup(engine.close)
+        return engine
+
+
+class TestHTTPClient(EngineTestCase):
+
+    def test_connection_is_reused(self):
+        server = self.start_server()
+        engine = self.create_engine(server.url)
+        for i in range(5):
+            audio = engine.synthesize(f"テスト{i}")
+        self.assertEqual(len(audio), 2205)
+        self.assertEqual(engine.sample_rate, 22050)
+        self.assertEqual(server.connections, 1)
+
+    def test_retries_server_errors_then_succeeds(self):
+        server = self.start_server(statuses=[503, 500])
+        engine = self.create_engine(server.url, max_retries=2)
+        self.assertEqual(len(engine.synthesize("再試行")), 2205)
+        self.assertEqual(server.texts, ["再試行"] * 3)
+        self.assertEqual(engine.breaker.state, "closed")
+
+    def test_client_errors_are_not_retried(self):
+        server = self.start_server(statuses=[400])
+        engine = self.create_engine(server.url, max_retries=2)
+        with self.assertRaises(Exception):
+            engine.synthesize("不正")
+        self.assertEqual(len(server.texts), 1)
+
+    def test_read_timeout_bounds_a_hung_server(self):
+        server = self.start_server(delay=1.0)
+        engine = self.create_engine(server.url, read_timeout=0.1, max_retries=1)
+        started = time.monotonic()
+        with self.assertRaises(requests.Timeout):
+            engine.synthesize("応答なし")
+        self.assertLess(time.monotonic() - started, 0.9)
+        self.assertEqual(len(server.texts), 2)
+
+    def test_breaker_fails_fast_after_consecutive_failures(self):
+        server = self.start_server(statuses=[503] * 10)
+        engine = self.create_engine(server.url, max_retries=0, breaker_failures=2, breaker_reset=60.0)
+        for _ in range(2):
+            with self.assertRaises(Exception):
+                engine.synthesize("失敗")
+        with self.assertRaises(CircuitOpenError):
+            engine.synthesize("遮断")
+        self.assertEqual(len(server.texts), 2)
+
+
+class TestStreaming(EngineTestCase):
+
+    def test_frames_arrive_before_the_whole_body(self):
+        gate = threading.Event()
+        server = self.start_server(body=make_wav(22050), gate=gate)
+        engine = self.create_engine(server.url)
+        stream = engine.synthesize_stream("ストリーミング", chunk_size=1024)
+        first = next(stream)  # 本文の後半はまだ送られていない
+        self.assertEqual(engine.sample_rate, 22050)
+        gate.set()
+        frames = np.concatenate([first] + list(stream))
+        np.testing.assert_array_equal(frames, np.arange(22050, dtype="<i2"))
+
+    def test_file_is_written_only_when_requested(self):
+        body = make_wav(4410)
+        server = self.start_server(body=body)
+        engine = self.create_engine(server.url)
+        list(engine.synthesize_stream("保存しない"))
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ["config.json", "models"])
+        output_path = os.path.join(self.tmp_dir, "out.wav")
+        list(engine.synthesize_stream("保存する", output_path=output_path))
+        with open(output_path, "rb") as f:
+            self.assertEqual(f.read(), body)
+
+
+class TestSegmentation(EngineTestCase):
+    TEXT = "一つ目の文です。二つ目の文はもう少し長めです！三つ目の文？"
+    SENTENCES = ["一つ目の文です。", "二つ目の文はもう少し長めです！", "三つ目の文？"]
+
+    def start_segment_server(self, delay=0.0):
+        return self.start_server(delay=delay, body=lambda text: make_wav(100 * len(text)))
+
+    def expected_frames(self, interval_frames):
+        blocks = []
+        for i, sentence in enumerate(self.SENTENCES):
+            if i:
+                blocks.append(np.zeros(interval_frames, dtype="<i2"))
+            blocks.append(np.arange(100 * len(sentence), dtype="<i2"))
+        return np.concatenate(blocks)
+
+    def test_sentences_are_requested_concurrently_and_joined_in_order(self):
+        server = self.start_segment_server(delay=0.3)
+        engine = self.create_engine(server.url, {"max_workers": 3, "min_chars": 1, "split_interval": 0.01})
+        started = time.monotonic()
+        audio = engine.synthesize(self.TEXT)
+        self.assertLess(time.monotonic() - started, 0.6)  # 直列なら 0.9 秒以上かかる
+        self.assertEqual(sorted(server.texts), sorted(self.SENTENCES))
+        np.testing.assert_allclose(audio, self.expected_frames(220) / 32768)
+
+    def test_stream_and_file_match_the_joined_audio(self):
+        server = self.start_segment_server()
+        engine = self.create_engine(server.url, {"min_chars": 1, "split_interval": 0.01})
+        output_path = os.path.join(self.tmp_dir, "out.wav")
+        frames = np.concatenate(list(engine.synthesize_stream(self.TEXT, output_path=output_path)))
+        np.testing.assert_array_equal(frames, self.expected_frames(220))
+        written, sample_rate = sf.read(output_path, dtype="int16")
+        self.assertEqual(sample_rate, 22050)
+        np.testing.assert_array_equal(written, frames)
+
+    def test_batch_returns_audio_per_text_in_order(self):
+        server = self.start_segment_server(delay=0.3)
+        engine = self.create_engine(server.url, {"max_workers": 3})
+        started = time.monotonic()
+        audios, sample_rate = engine.synthesize_batch(self.SENTENCES)
+        self.assertLess(time.monotonic() - started, 0.6)  # 直列なら 0.9 秒以上かかる
+        self.assertEqual([len(audio) for audio in audios], [100 * len(text) for text in self.SENTENCES])
+        self.assertEqual(sample_rate, 22050)
+        self.assertEqual(engine.synthesize_batch([])[0], [])
+
+    def test_disabled_sends_the_whole_text(self):
+        server = self.start_segment_server()
+        engine = self.create_engine(server.url, {"enabled": False})
+        self.assertEqual(len(engine.synthesize(self.TEXT)), 100 * len(self.TEXT))
+        self.assertEqual(server.texts, [self.TEXT])
+
+    def test_split_sentences(self):
+        self.assertEqual(split_sentences(self.TEXT, min_chars=1), self.SENTENCES)
+        self.assertEqual(split_sentences("「本当？」うん。そうなんだ。\n次の行", min_chars=1),
+                         ["「本当？」", "うん。", "そうなんだ。", "次の行"])
+        self.assertEqual(split_sentences("うん。そうなんだ。はい。", min_chars=5), ["うん。そうなんだ。はい。"])
+        self.assertEqual(split_sentences("Hi. It is 3.14 now."), ["Hi. It is 3.14 now."])
+
+
+class TestLocalBackend(EngineTestCase):
+
+    def test_missing_model_fails_at_startup(self):
+        with self.assertRaises(FileNotFoundError):
+            self.create_engine("http://127.0.0.1:9", backend="local")
+
+    def test_provider_cache_key_follows_synthesis_params(self):
+        """話速やモデルのファイルを変えると、TTSキャッシュのキーが変わること"""
+        from providers import StyleBertVITS2TTSProvider
+        from tts_cache import TTSAudioCache
+
+        def cache_key(engine):
+            tts = StyleBertVITS2TTSProvider(engine=engine)
+            return TTSAudioCache.make_key("こんにちは", tts.voice, tts.model, "ja-JP")
+
+        base = cache_key(self.create_engine("http://127.0.0.1:9"))
+        self.assertEqual(cache_key(self.create_engine("http://127.0.0.1:9")), base)
+        slower = self.create_engine("http://127.0.0.1:9")
+        slower.model_config["length_scale"] = 1.2
+        self.assertNotEqual(cache_key(slower), base)
+        other_model = self.create_engine("http://127.0.0.1:9", local={"model_file": "other.safetensors"})
+        self.assertNotEqual(cache_key(other_model), base)
+
+    def test_server_backend_does_not_import_torch(self):
+        """サーバーで合成する場合は、モデルの設定ファイルがあってもtorchを読み込まないこと"""
+        os.makedirs(os.path.join(self.tmp_dir, "models"))
+        with open(os.path.join(self.tmp_dir, "models", "config.json"), "w", encoding="utf-8") as f:
+            json.dump({"audio": {"sampling_rate": 44100}}, f)
+        with mock.patch.dict(sys.modules, {"torch": None}):  # import torch が ImportError になる
+            engine = self.create_engine("http://127.0.0.1:9", backend="server")
+        self.assertEqual(engine.sample_rate, 44100)
+        self.assertIsNone(engine.local_model)
+
+
+class TestLocalModel(EngineTestCase):
+    """プロセス内のモデルで合成する場合 (torch と style_bert_vits2 は偽のモジュールに差し替える)。"""
+
+    def setUp(self):
+        super().setUp()
+        self.torch = FakeTorch()
+        modules, self.TTSModel = fake_style_bert_vits2(self.torch)
+        modules["torch"] = self.torch
+        patchers = [mock.patch.dict(sys.modules, modules), mock.patch.dict(tts_engine._local_models, clear=True)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        models_dir = os.path.join(self.tmp_dir, "models")
+        os.makedirs(models_dir)
+        with open(os.path.join(models_dir, "config.json"), "w", encoding="utf-8") as f:
+            json.dump({"audio": {"sampling_rate": 44100}}, f)
+        open(os.path.join(models_dir, "model.safetensors"), "wb").close()
+        self.server = self.start_server()
+
+    def create_local_engine(self, **local):
+        return self.create_engine(self.server.url, backend="local", local=local)
+
+    def test_model_is_loaded_once_per_process(self):
+        first = self.create_local_engine()
+        second = self.create_local_engine()
+        self.assertIs(first.local_model, second.local_model)
+        self.assertEqual(len(self.TTSModel.instances), 1)
+        self.assertTrue(self.TTSModel.instances[0].loaded)
+
+    def test_inference_runs_in_inference_mode(self):
+        engine = self.create_local_engine(warmup_text="ウォームアップ")
+        engine.synthesize("こんにちは")
+        calls = self.TTSModel.instances[0].calls
+        self.assertEqual(calls, [("ウォームアップ", True), ("こんにちは", True)])
+        self.assertFalse(self.torch.in_inference_mode)
+
+    def test_thread_settings_are_applied(self):
+        self.create_local_engine(num_threads=3, num_interop_threads=2)
+        self.assertEqual((self.torch.num_threads, self.torch.num_interop_threads), (3, 2))
+
+    def test_synthesis_goes_through_the_local_model_without_http(self):
+        engine = self.create_local_engine(warmup_text="")
+        audio = engine.synthesize("こんにちは")
+        self.assertEqual(len(audio), 100)
+        self.assertAlmostEqual(float(audio[0]), 1000 / 32768, places=4)
+        frames = list(engine.synthesize_stream("おはようございます、みなさん。今日も配信を始めていきますよ。"))
+        self.assertEqual(sum(len(f) for f in frames if f.any()), 200)  # 2文 (間は無音)
+        self.assertEqual(engine.sample_rate, 44100)
+        self.assertEqual([text for text, _ in self.TTSModel.instances[0].calls],
+                         ["こんにちは", "おはようございます、みなさん。", "今日も配信を始めていきますよ。"])
+        self.assertEqual((self.server.connections, self.server.texts), (0, []))
+
+
+class TestDownloadModel(EngineTestCase):
+    DATA = np.random.default_rng(1).integers(0, 256, 300000, dtype=np.uint8).tobytes()
+    SHA256 = hashlib.sha256(DATA).hexdigest()
+
+    def setUp(self):
+        super().setUp()
+        self.engine = self.create_engine("http://127.0.0.1:9")
+        self.save_path = os.path.join(self.tmp_dir, "models", "model.safetensors")
+
+    def start_range_server(self, **kwargs):
+        server = RangeServer(kwargs.pop("data", self.DATA), **kwargs)
+        self.addCleanup(server.stop)
+        return server
+
+    def download(self, server, **kwargs):
+        options = {"segments": 4, "min_segment_size": 1, "chunk_size": 16384, "max_retries": 0}
+        options.update(kwargs)
+        self.engine.download_model(server.url, self.save_path, **options)
+
+    def read(self):
+        with open(self.save_path, "rb") as f:
+            return f.read()
+
+    def test_parallel_ranges_are_verified_and_renamed(self):
+        server = self.start_range_server()
+        manifest_path = os.path.join(self.tmp_dir, "manifest.json")
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump({"files": {"model.safetensors": self.SHA256.upper()}}, f)
+        self.download(server, manifest=manifest_path)
+        self.assertEqual(self.read(), self.DATA)
+        self.assertEqual(sorted(server.requests), ["bytes=0-74999", "bytes=150000-224999",
+                                                   "bytes=225000-299999", "bytes=75000-149999"])
+        self.assertEqual(sorted(os.listdir(os.path.dirname(self.save_path))), ["model.safetensors"])
+
+    def test_resumes_from_the_saved_offset(self):
+        server = self.start_range_server(cuts=[100000])
+        with self.assertRaises(requests.RequestException):
+            self.download(server, segments=1)
+        self.assertFalse(os.path.exists(self.save_path))
+        with open(self.save_path + ".part.json", encoding="utf-8") as f:
+            done = json.load(f)["segments"][0][2]  # 書き込み終えた分 (最後の途中の塊は含まない)
+        self.assertGreater(done, 0)
+        self.download(server, segments=1, sha256=self.SHA256)
+        self.assertEqual(self.read(), self.DATA)
+        self.assertEqual(server.requests, ["bytes=0-299999", f"bytes={done}-299999"])
+        self.assertLess(server.bytes_sent, len(self.DATA) + 100000)
+
+    def test_retries_dropped_segments_within_one_call(self):
+        server = self.start_range_server(cuts=[5000, 5000])
+        self.download(server, max_retries=2, sha256=self.SHA256)
+        self.assertEqual(self.read(), self.DATA)
+        self.assertEqual(len(server.requests), 6)
+
+    def test_changed_file_is_downloaded_from_the_start(self):
+        server = self.start_range_server(cuts=[100000])
+        with self.assertRaises(requests.RequestException):
+            self.download(server, segments=1)
+        server.data, server.etag = self.DATA[::-1], '"v2"'
+        self.download(server, segments=1)
+        self.assertEqual(self.read(), self.DATA[::-1])
+        self.assertEqual(server.requests[-1], "bytes=0-299999")
+
+    def test_checksum_mismatch_leaves_no_file(self):
+        server = self.start_range_server()
+        with self.assertRaises(ValueError):
+            self.download(server, manifest={"model.safetensors": "0" * 64})
+        self.assertEqual(os.listdir(os.path.dirname(self.save_path)), [])
+
+    def test_server_without_range_support_uses_one_stream(self):
+        server = self.start_range_server(ranges=False)
+        self.download(server, sha256=self.SHA256)
+        self.assertEqual(self.read(), self.DATA)
+        self.assertEqual(server.requests, [None])
+
+
+class TestWavStreamParser(unittest.TestCase):
+
+    def parse(self, data, step):
+        parser = WavStreamParser()
+        blocks = [parser.feed(data[i:i + step]) for i in range(0, len(data), step)]
+        parser.close()
+        return parser, [b for b in blocks if b is not None]
+
+    def test_byte_by_byte_matches_soundfile(self):
+        buf = io.BytesIO()
+        stereo = (np.random.default_rng(0).uniform(-1, 1, (300, 2))).astype(np.float32)
+        sf.write(buf, stereo, 16000, format="WAV", subtype="FLOAT")
+        data = buf.getvalue()
+        for step in (1, 7, 4096):
+            parser, blocks = self.parse(data, step)
+            self.assertEqual((parser.sample_rate, parser.channels), (16000, 2))
+            np.testing.assert_array_equal(np.concatenate(blocks), stereo)
+
+    def test_skips_other_chunks_and_respects_data_size(self):
+        pcm = np.arange(100, dtype="<i2").tobytes()
+        fmt = (1).to_bytes(2, "little") + (1).to_bytes(2, "little") + (8000).to_bytes(4, "little") \
+            + (16000).to_bytes(4, "little") + (2).to_bytes(2, "little") + (16).to_bytes(2, "little")
+        data = (b"RIFF" + (0).to_bytes(4, "little") + b"WAVE"
+                + b"fmt " + len(fmt).to_bytes(4, "little") + fmt
+                + b"LIST" + (3).to_bytes(4, "little") + b"abc\x00"  # 奇数長のチャンクは1バイト詰める
+                + b"data" + len(pcm).to_bytes(4, "little") + pcm
+                + b"LIST" + (4).to_bytes(4, "little") + b"tail")
+        _, blocks = self.parse(data, 5)
+        np.testing.assert_array_equal(np.concatenate(blocks), np.arange(100, dtype="<i2"))
+
+    def test_rejects_non_wav(self):
+        with self.assertRaises(ValueError):
+            WavStreamParser().feed(b"ID3\x03" + b"\x00" * 20)
+        parser = WavStreamParser()
+        parser.feed(b"RIFF")
+        with self.assertRaises(ValueError):
+            parser.close()
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_half_open_allows_one_trial(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0, clock=lambda: now[0])
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+        now[0] = 10.0
+        self.assertEqual(breaker.state, "half_open")
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # 試行中は他のリクエストを通さない
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())  # 試行が失敗したので開き直す
+
+        now[0] = 20.0
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow())
+
+
+if __name__ == "__main__":
+    unittest.main()
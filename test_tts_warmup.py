@@ -0,0 +1,46 @@
+import threading
+import unittest
+
+from tts_warmup import TTSWarmup
+
+
+class TestTTSWarmup(unittest.TestCase):
+
+    def test_synthesizes_unique_items_and_skips_cached(self):
+        """重複を除いて合成し、キャッシュ済みの項目はスキップすること"""
+        synthesized = []
+        lock = threading.Lock()
+
+        def synthesize(text, language_code):
+            with lock:
+                synthesized.append((text, language_code))
+            return b"\x00\x00"
+
+        items = [("挨拶", "ja-JP"), ("挨拶", "ja-JP"), ("Hello", "en-US"), ("自己紹介", "ja-JP"), ("", "ja-JP")]
+        warmup = TTSWarmup(items, synthesize, max_workers=3,
+                           is_cached=lambda text, lang: text == "自己紹介").start()
+
+        self.assertTrue(warmup.wait(timeout=5))
+        self.assertEqual(sorted(synthesized), [("Hello", "en-US"), ("挨拶", "ja-JP")])
+        self.assertEqual((warmup.total, warmup.completed, warmup.skipped, warmup.failed), (3, 2, 1, 0))
+
+    def test_start_does_not_block_and_counts_failures(self):
+        """start() は合成完了を待たずに戻り、失敗した項目を数えること"""
+        release = threading.Event()
+
+        def synthesize(text, language_code):
+            release.wait(timeout=5)
+            if text == "bad":
+                raise RuntimeError("quota exceeded")
+            return None if text == "empty" else b"\x00\x00"
+
+        warmup = TTSWarmup([("ok", "ja-JP"), ("bad", "ja-JP"), ("empty", "ja-JP")], synthesize).start()
+        self.assertFalse(warmup.is_done())
+        release.set()
+
+        self.assertTrue(warmup.wait(timeout=5))
+        self.assertEqual((warmup.completed, warmup.failed), (1, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+############################################
+# TTSのバッチ合成
+# 複数のスレッドから同時に届いた合成の依頼を、最大 `max_batch` 件・最大 `max_wait` 秒待ってまとめ、
+# プロバイダーの `synthesize_batch()` で1回に合成します (バッチで推論するエンジンや、並列にリクエストを
+# 送れるHTTPのバックエンドで、1件ずつ合成するより多くの発話を合成できます)。
+############################################
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from providers import synthesize_batch
+
+
+class _Request:
+    __slots__ = ("text", "language_code", "future", "submitted_at")
+
+    def __init__(self, text, language_code, submitted_at):
+        self.text = text
+        self.language_code = language_code
+        self.future = Future()
+        self.submitted_at = submitted_at
+
+
+class BatchingTTSProvider:
+    """合成の依頼をまとめてTTSプロバイダーに渡すスケジューラー。TTSプロバイダーと同じように使えます。
+
+    最初の依頼が届いてから `max_wait` 秒の間に届いた依頼を、`max_batch` 件に達した時点か
+    待ち時間が過ぎた時点でまとめて合成します。1回にまとめるのは言語コードが同じ依頼だけです。
+    `name`・`voice`・`model`・`sample_rate` などは、元のプロバイダーのものをそのまま返します。
+
+    使い方:
+        tts = BatchingTTSProvider(create_tts("style_bert_vits2"), max_batch=4, max_wait=0.02)
+        pcm = tts.synthesize("こんにちは")  # 複数のスレッドから呼ぶとまとめて合成される
+        tts.close()
+
+    Args:
+        provider: TTSプロバイダー (`synthesize_batch` がなければ1件ずつ合成します)
+        max_batch (int, optional): 1回にまとめる最大の件数
+        max_wait (float, optional): 最初の依頼から、ほかの依頼を待つ最大の秒数
+        clock (callable, optional): 現在時刻 (秒) を返す関数 (テスト用)
+    """
+
+    def __init__(self, provider, max_batch=4, max_wait=0.02, clock=time.monotonic):
+        self.provider = provider
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait)
+        self.clock = clock
+        self.batches = 0  # プロバイダーを呼んだ回数
+        self.items = 0    # 合成した依頼の数
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = None
+
+    def __getattr__(self, name):
+        # name・voice・model・sample_rate などはプロバイダーのものを使う
+        return getattr(self.provider, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def average_batch_size(self):
+        """1回にまとめた依頼の平均の件数。"""
+        return self.items / self.batches if self.batches else 0.0
+
+    def submit(self, text, language_code="ja-JP"):
+        """合成を依頼し、PCMを結果に持つ `concurrent.futures.Future` を返します。"""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("BatchingTTSProvider は閉じられています")
+            request = _Request(text, language_code, self.clock())
+            self._pending.append(request)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="tts-batcher", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return request.future
+
+    def synthesize(self, text, language_code="ja-JP"):
+        """合成が終わるまで待ち、モノラル・int16のRAW PCMデータを返します。"""
+        return self.submit(text, language_code).result()
+
+    def synthesize_batch(self, texts, language_code="ja-JP"):
+        """複数のテキストを依頼し、テキストごとのPCMのリストを返します (ほかの依頼とまとめられることがあります)。"""
+        futures = [self.submit(text, language_code) for text in texts]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """受け付け済みの依頼を合成し終えてから、スケジューラーのスレッドを終了します。"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _next_batch(self):
+        """まとめる依頼を取り出します。閉じられていて依頼が残っていなければNone。"""
+        with self._condition:
+            while not self._pending and not self._closed:
+                self._condition.wait()
+            if not self._pending:
+                return None
+            deadline = self._pending[0].submitted_at + self.max_wait
+            while len(self._pending) < self.max_batch and not self._closed:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            language_code = self._pending[0].language_code
+            batch = []
+            while self._pending and len(batch) < self.max_batch and self._pending[0].language_code == language_code:
+                batch.append(self._pending.popleft())
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = synthesize_batch(self.provider, [request.text for request in batch], batch[0].language_code)
+                if len(results) != len(batch):
+                    raise RuntimeError(f"synthesize_batch が {len(batch)} 件に対して {len(results)} 件の結果を返しました")
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+            else:
+                for request, pcm in zip(batch, results):
+                    request.future.set_result(pcm)
+            self.batches += 1
+            self.items += len(batch)
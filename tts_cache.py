@@ -0,0 +1,183 @@
+############################################
+# TTS音声キャッシュ
+# 合成済みの音声 (int16 RAW PCM) をディスクに保存し、同じテキストの
+# 再合成を省略します。キーは (テキスト, ボイス, モデル, 言語) のハッシュです。
+############################################
+import hashlib
+import json
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+PCM_SUFFIX = ".pcm"
+
+
+class TTSAudioCache:
+    """内容アドレス方式の永続TTS音声キャッシュ。
+
+    音声は `<cache_dir>/<sha256>.pcm` にRAW PCM (int16, 24kHz, モノラル) のまま保存します。
+    合計サイズが `max_bytes` を超えると、最も長く使われていないものから削除します (LRU)。
+    最終利用時刻はファイルの更新時刻に記録するため、再起動後もLRU順序が引き継がれます。
+    ヒット時はファイルをメモリマップして返すので、読み込みのコピーが発生しません。
+
+    Args:
+        cache_dir (str): キャッシュディレクトリ
+        max_bytes (int, optional): キャッシュの最大合計サイズ (バイト)
+    """
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # key -> サイズ (先頭が最も古い)
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(text, voice_name, model, language):
+        """キャッシュキーを生成します。
+
+        Args:
+            text (str): 合成するテキスト
+            voice_name (str): ボイス名
+            model (str): TTSモデル名
+            language (str): 言語コード
+
+        Returns:
+            str: SHA-256の16進文字列
+        """
+        payload = json.dumps([text, voice_name, model, language], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + PCM_SUFFIX)
+
+    def _load_index(self):
+        """既存のキャッシュファイルを最終利用時刻順に読み込みます。"""
+        found = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(PCM_SUFFIX):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            found.append((st.st_mtime, name[:-len(PCM_SUFFIX)], st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    def contains(self, key):
+        """キーがキャッシュに存在するかを返します (ヒット・ミスの統計には数えません)。
+
+        Args:
+            key (str): `make_key` で生成したキー
+
+        Returns:
+            bool: 存在すればTrue
+        """
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key):
+        """キャッシュから音声を取得します。
+
+        Args:
+            key (str): `make_key` で生成したキー
+
+        Returns:
+            mmap.mmap or None: 読み取り専用でメモリマップしたPCMデータ。見つからない場合はNone。
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                os.utime(path)
+            except (OSError, ValueError):
+                # ファイルが外部から削除された、または空の場合はミス扱いにする
+                self.total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, pcm):
+        """音声をキャッシュに保存します。
+
+        Args:
+            key (str): `make_key` で生成したキー
+            pcm (bytes-like): int16のRAW PCMデータ
+        """
+        size = len(pcm)
+        if not size or size > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(pcm)
+        os.replace(tmp_path, path)  # 書き込み途中のファイルが読まれないようにアトミックに置き換える
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)
+            self._entries[key] = size
+            self.total_bytes += size
+            self._evict()
+
+    def get_or_synthesize(self, text, voice_name, model, language, synthesize):
+        """キャッシュにあればそれを返し、なければ合成して保存します。
+
+        Args:
+            text (str): 合成するテキスト
+            voice_name (str): ボイス名
+            model (str): TTSモデル名
+            language (str): 言語コード
+            synthesize (callable): `synthesize(text) -> bytes` キャッシュミス時に呼ぶ合成関数
+
+        Returns:
+            bytes-like or None: PCMデータ。合成に失敗した場合はNone。
+        """
+        key = self.make_key(text, voice_name, model, language)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        pcm = synthesize(text)
+        if pcm:
+            self.put(key, pcm)
+        return pcm
+
+    def _evict(self):
+        """合計サイズが上限を超えている間、最も古いエントリを削除します (ロック取得済みで呼ぶこと)。"""
+        while self.total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                # Windowsでメモリマップ中のファイルは削除できないため、次回起動時に再評価する
+                pass
+
+    def stats(self):
+        """キャッシュの統計情報を返します。
+
+        Returns:
+            dict: hits, misses, hit_rate, entries, total_bytes
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "total_bytes": self.total_bytes,
+            }
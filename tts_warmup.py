@@ -0,0 +1,114 @@
+############################################
+# TTSウォームアップ
+# 起動時に分かっている定型文 (挨拶・自己紹介・特殊応答など) を
+# バックグラウンドで事前に音声合成し、TTS音声キャッシュに載せておきます。
+############################################
+import queue
+import threading
+import time
+
+
+class TTSWarmup:
+    """定型文をバックグラウンドのスレッドプールで事前合成します。
+
+    ワーカーはデーモンスレッドなので、ウォームアップ中でもプロンプトの表示や
+    プログラムの終了を妨げません。
+
+    Args:
+        items (list[tuple[str, str]]): (テキスト, 言語コード) のリスト
+        synthesize (callable): `synthesize(text, language_code)` 合成関数 (結果はキャッシュに保存される想定)
+        max_workers (int, optional): 同時に合成するスレッド数
+        is_cached (callable, optional): `is_cached(text, language_code) -> bool` 合成済みかどうかの判定関数。
+                                        Trueを返した項目は合成をスキップします。
+        on_progress (callable, optional): 1件終わるごとに呼ばれる `on_progress(warmup)`
+        on_complete (callable, optional): 全件終わったときに呼ばれる `on_complete(warmup)`
+    """
+
+    def __init__(self, items, synthesize, max_workers=4, is_cached=None, on_progress=None, on_complete=None):
+        # 重複を除き、順序は保つ
+        self.items = list(dict.fromkeys((text, lang) for text, lang in items if text))
+        self.synthesize = synthesize
+        self.max_workers = max(1, max_workers)
+        self.is_cached = is_cached
+        self.on_progress = on_progress
+        self.on_complete = on_complete
+        self.completed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.started_at = None
+        self.finished_at = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._remaining = len(self.items)
+
+    @property
+    def total(self):
+        return len(self.items)
+
+    @property
+    def elapsed(self):
+        """開始からの経過秒数 (完了済みなら所要時間)。"""
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.started_at
+
+    def start(self):
+        """ウォームアップを開始し、すぐに戻ります。
+
+        Returns:
+            TTSWarmup: 自分自身
+        """
+        self.started_at = time.monotonic()
+        if not self.items:
+            self._finish()
+            return self
+        for item in self.items:
+            self._queue.put(item)
+        for i in range(min(self.max_workers, len(self.items))):
+            threading.Thread(target=self._worker, name=f"tts-warmup-{i}", daemon=True).start()
+        return self
+
+    def wait(self, timeout=None):
+        """ウォームアップの完了を待ちます。
+
+        Args:
+            timeout (float, optional): 最大待機秒数
+
+        Returns:
+            bool: 完了していればTrue
+        """
+        return self._done.wait(timeout)
+
+    def is_done(self):
+        return self._done.is_set()
+
+    def _worker(self):
+        while True:
+            try:
+                text, language_code = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            status = "completed"
+            try:
+                if self.is_cached and self.is_cached(text, language_code):
+                    status = "skipped"
+                elif not self.synthesize(text, language_code):
+                    status = "failed"
+            except Exception:
+                status = "failed"
+            with self._lock:
+                setattr(self, status, getattr(self, status) + 1)
+                self._remaining -= 1
+                finished = self._remaining == 0
+            if self.on_progress:
+                self.on_progress(self)
+            if finished:
+                self._finish()
+
+    def _finish(self):
+        self.finished_at = time.monotonic()
+        self._done.set()
+        if self.on_complete:
+            self.on_complete(self)